@@ -0,0 +1,262 @@
+"""
+AI Assistant for AutoPilot IDE
+Runs assistant requests on a pluggable backend in background tasks and
+streams the reply back in chunks, with per-client limits and cancellation
+"""
+import os
+import re
+import time
+import uuid
+import threading
+import logging
+
+from terminal import CommandControl
+
+logger = logging.getLogger(__name__)
+
+# Backend answering assistant requests (see BACKENDS)
+AI_BACKEND = os.environ.get('AI_BACKEND', 'fake')
+
+# Requests one client may have running at once, and the server-wide total
+AI_MAX_PER_CLIENT = int(os.environ.get('AI_MAX_PER_CLIENT', 2))
+AI_MAX_CONCURRENT = int(os.environ.get('AI_MAX_CONCURRENT', 16))
+
+# Fragments are collected into one ai_response_chunk until this many
+# characters are waiting or this many seconds have passed since the last one
+AI_CHUNK_CHARS = int(os.environ.get('AI_CHUNK_CHARS', 64))
+AI_CHUNK_INTERVAL = float(os.environ.get('AI_CHUNK_INTERVAL', 0.05))
+
+# Longest message passed to a backend
+AI_MAX_MESSAGE = 1000
+
+# Seconds between the fake backend's words
+AI_FAKE_TOKEN_DELAY = float(os.environ.get('AI_FAKE_TOKEN_DELAY', 0.02))
+
+
+class AIBackend:
+    """Base class for assistant backends
+
+    ``stream`` is a generator yielding the reply as text fragments; ``files``
+    lists the absolute paths of the project files the request refers to. It
+    runs in a background task, so it may block on network I/O; it should stop
+    soon after ``control`` is cancelled, either by checking
+    ``control.cancelled`` between fragments or by registering a stop
+    callback with ``control.attach``.
+    """
+
+    name = None
+
+    def stream(self, message, mode, control, files=()):
+        raise NotImplementedError
+
+
+class FakeBackend(AIBackend):
+    """Deterministic offline backend that sends a canned reply word by word"""
+
+    name = 'fake'
+
+    TEMPLATES = {
+        "Chat": "I received your message: {message}",
+        "Explain": "Explaining: {message}",
+        "Debug": "Debugging: {message}",
+        "Refactor": "Refactoring: {message}"
+    }
+
+    def __init__(self, token_delay=AI_FAKE_TOKEN_DELAY, repeat=1):
+        self.token_delay = token_delay
+        self.repeat = repeat
+
+    def reply(self, message, mode):
+        text = self.TEMPLATES.get(mode, "Processing: {message}").format(message=message)
+        return ' '.join([text] * self.repeat)
+
+    def stream(self, message, mode, control, files=()):
+        stopped = threading.Event()
+        control.attach(stopped.set)
+        try:
+            for token in re.findall(r'\s*\S+', self.reply(message, mode)):
+                if self.token_delay and stopped.wait(self.token_delay):
+                    return
+                if stopped.is_set():
+                    return
+                yield token
+        finally:
+            control.detach()
+
+
+BACKENDS = {'fake': FakeBackend}
+
+
+def register_backend(cls):
+    """Make a backend class available under its ``name`` (usable as a decorator)"""
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+def create_backend(name=AI_BACKEND):
+    """Instantiate the backend registered as ``name``"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown AI backend '{name}' (expected one of: {', '.join(sorted(BACKENDS))})")
+    return BACKENDS[name]()
+
+
+class AIRequestManager:
+    """Runs assistant requests as background tasks and streams their replies
+
+    ``send(client, event, payload)`` delivers events and ``start_task(fn)``
+    runs ``fn`` in the background (e.g. ``socketio.start_background_task``).
+    Each request sends ``ai_response_chunk`` events ``{id, seq, text}`` as the
+    backend produces text, then one ``ai_response`` with the whole reply.
+    Fragments are batched per ``chunk_chars``/``chunk_interval`` so a backend
+    producing one token at a time does not cost one event per token.
+    Completed replies are kept in ``cache`` (a ResponseCache), when given, and
+    a repeated request is answered from it without calling the backend.
+    """
+
+    def __init__(self, backend, send, start_task, max_per_client=AI_MAX_PER_CLIENT,
+                 max_concurrent=AI_MAX_CONCURRENT, chunk_chars=AI_CHUNK_CHARS, chunk_interval=AI_CHUNK_INTERVAL,
+                 cache=None):
+        self.backend = backend
+        self.cache = cache
+        self.send = send
+        self.start_task = start_task
+        self.max_per_client = max_per_client
+        self.max_concurrent = max_concurrent
+        self.chunk_chars = chunk_chars
+        self.chunk_interval = chunk_interval
+        self.closed = False
+        self.requests = 0
+        self.rejected = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.chunks = 0
+        self.characters = 0
+        self._active = {}  # (client, request id) -> CommandControl
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def submit(self, client, message, mode='Chat', request_id=None, files=()):
+        """Start a request about ``files`` (absolute paths) and return its id
+
+        Raises RuntimeError when the client or the server is at its limit.
+        """
+        request_id = request_id or uuid.uuid4().hex
+        with self._lock:
+            if self.closed:
+                raise RuntimeError("Server is shutting down")
+            if (client, request_id) in self._active:
+                raise RuntimeError(f"Request {request_id} is already running")
+            if sum(1 for key in self._active if key[0] == client) >= self.max_per_client:
+                self.rejected += 1
+                raise RuntimeError(f"At most {self.max_per_client} assistant requests may run at once")
+            if len(self._active) >= self.max_concurrent:
+                self.rejected += 1
+                raise RuntimeError("The assistant is busy, try again shortly")
+            control = self._active[(client, request_id)] = CommandControl()
+            self.requests += 1
+        files = list(files)
+        self.start_task(lambda: self._run(client, request_id, message[:AI_MAX_MESSAGE], mode, control, files))
+        return request_id
+
+    def cancel(self, client, request_id=None):
+        """Cancel one of the client's requests, or all of them; return the ids"""
+        with self._lock:
+            controls = [
+                (key[1], control) for key, control in self._active.items()
+                if key[0] == client and request_id in (None, key[1])
+            ]
+        for _, control in controls:
+            control.cancel()
+        return [key for key, _ in controls]
+
+    def close(self):
+        """Refuse new requests and cancel running ones; return how many were cancelled"""
+        with self._lock:
+            self.closed = True
+            controls = list(self._active.values())
+        for control in controls:
+            control.cancel()
+        return len(controls)
+
+    def wait_idle(self, timeout=None):
+        """Wait until no request is running; return False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._active, timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "active": len(self._active),
+                "requests": self.requests,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "failed": self.failed,
+                "chunks": self.chunks,
+                "characters": self.characters
+            }
+
+    def _run(self, client, request_id, message, mode, control, files):
+        parts = []
+        pending = []
+        state = {'seq': 0, 'waiting': 0, 'sent_at': time.monotonic()}
+
+        def flush():
+            if not pending:
+                return
+            state['seq'] += 1
+            text = ''.join(pending)
+            pending.clear()
+            state['waiting'] = 0
+            state['sent_at'] = time.monotonic()
+            with self._lock:
+                self.chunks += 1
+                self.characters += len(text)
+            self.send(client, 'ai_response_chunk', {'id': request_id, 'seq': state['seq'], 'text': text})
+
+        error = None
+        cached = None
+        try:
+            if self.cache is not None:
+                key = self.cache.key(mode, message, files)
+                cached = self.cache.get(key)
+            fragments = [cached] if cached is not None else self.backend.stream(message, mode, control, files)
+            for fragment in fragments:
+                if control.cancelled:
+                    break
+                parts.append(fragment)
+                pending.append(fragment)
+                state['waiting'] += len(fragment)
+                # The first fragment goes out at once so the reply starts promptly
+                if (not state['seq'] or state['waiting'] >= self.chunk_chars
+                        or time.monotonic() - state['sent_at'] >= self.chunk_interval):
+                    flush()
+            if not control.cancelled:
+                flush()
+                if self.cache is not None and cached is None:
+                    self.cache.put(key, ''.join(parts))
+        except Exception as e:
+            logger.error(f"AI backend {self.backend.name} failed: {e}")
+            error = "The assistant failed to respond"
+        finally:
+            with self._lock:
+                self._active.pop((client, request_id), None)
+                if control.cancelled:
+                    self.cancelled += 1
+                elif error:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                if not self._active:
+                    self._idle.notify_all()
+
+        result = {
+            'id': request_id, 'mode': mode, 'message': ''.join(parts),
+            'cancelled': control.cancelled, 'cached': cached is not None
+        }
+        if error:
+            result['error'] = error
+        logger.info(f"AI request {request_id} finished in {mode} mode")
+        self.send(client, 'ai_response', result)
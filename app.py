@@ -1,15 +1,38 @@
 import os
-import json
+import re
+import gzip
 import shlex
+import uuid
+import hashlib
 import logging
 import webbrowser
 import threading
+import time
+from functools import wraps
 from pathlib import Path
-from flask import Flask, jsonify, send_from_directory, request
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, jsonify, send_file, send_from_directory, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
+from werkzeug.wsgi import get_input_stream
 from config import config
 from appdata_manager import appdata_manager
+from ai_assistant import AIRequestManager, create_backend
+from response_cache import AI_CACHE_ENABLED, AI_CACHE_SPILL, ResponseCache
+from file_watcher import EVENT_NAMES, FileWatcher
+from file_tree import FileTree
+from path_index import FILES_FIND_ENABLED, FILES_FIND_RESULTS, PathIndex
+from file_content import FILE_WRITE_MAX_BYTES, Conflict, FileContent, TooLarge
+from search_index import SEARCH_ENABLED, SEARCH_MAX_RESULTS, SEARCH_RESULTS, SearchIndex
+from symbol_index import SYMBOLS_ENABLED, SYMBOLS_RESULTS, SYMBOLS_WORKERS, SymbolIndex
+from message_queue import create_manager
+from project_rooms import ProjectRooms, room_name
+from terminal import (
+    CommandControl, CommandResult, CommandScheduler, ScrollbackStore, SessionManager, TERMINAL_MAX_OUTPUT,
+    TERMINAL_MAX_PER_CLIENT, TERMINAL_SESSION_IDLE, command_timeout, run_streaming, sessions_supported
+)
+import serialization
+import fast_commands
 
 # Configure logging
 logging.basicConfig(
@@ -22,7 +45,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes through the serialization module (orjson when installed)"""
+    
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return serialization.dumps_str(obj, default=self.default)
+    
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return serialization.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        body = serialization.dumps(obj, pretty, self.default) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
 app = Flask(__name__, static_folder='.')
+app.json = FastJSONProvider(app)
 
 # Get environment from environment variable, default to development
 env = os.environ.get('FLASK_ENV', 'development')
@@ -32,7 +75,24 @@ app.config.from_object(config.get(env, config['development']))
 allowed_origins = os.environ.get('CORS_ORIGINS', 'http://localhost:3000,http://localhost:5000,http://127.0.0.1:5000').split(',')
 CORS(app, resources={r"/api/*": {"origins": allowed_origins}})
 
-socketio = SocketIO(app, cors_allowed_origins=allowed_origins)
+# With several worker processes, emits and AppData cache invalidations go
+# through a shared message queue
+message_queue = (
+    create_manager(app.config['MESSAGE_QUEUE'], app.config['MESSAGE_QUEUE_CHANNEL'])
+    if app.config.get('MESSAGE_QUEUE') else None
+)
+
+socketio = SocketIO(
+    app, cors_allowed_origins=allowed_origins, async_mode=app.config['ASYNC_MODE'], client_manager=message_queue
+)
+
+if message_queue is not None:
+    # Listen right away rather than on the first connection, so this worker
+    # hears about other workers' writes even before it has clients
+    socketio.server.manager_initialized = True
+    message_queue.initialize()
+    message_queue.add_invalidation_listener(appdata_manager.invalidate_cache)
+    appdata_manager.add_change_listener(message_queue.publish_invalidation)
 
 # Whitelist of safe commands for terminal
 ALLOWED_COMMANDS = {
@@ -82,6 +142,11 @@ def validate_command(command):
         if char in command:
             return False, f"Dangerous character '{char}' not allowed in commands"
     
+    # Control characters would reach the shell as line editing keys
+    for char in command:
+        if ord(char) < 0x20 or ord(char) == 0x7f:
+            return False, f"Control character {ord(char):#04x} not allowed in commands"
+    
     return True, "Valid command"
 
 def open_browser(host, port):
@@ -100,6 +165,54 @@ for directory in [app.config.get('PROJECTS_DIR'), app.config.get('UPLOAD_FOLDER'
     if directory:
         Path(directory).mkdir(parents=True, exist_ok=True)
 
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/css', 'text/plain', 'text/javascript'}
+
+@app.after_request
+def compress_response(response):
+    """Gzip large responses for clients that accept it"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip']:
+        return response
+    
+    body = response.get_data()
+    if len(body) < app.config.get('GZIP_MIN_SIZE', 1024):
+        return response
+    
+    response.set_data(gzip.compress(body, compresslevel=app.config.get('GZIP_LEVEL', 3), mtime=0))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def conditional(*collections):
+    """Answer GET requests with 304 Not Modified while the collections are unchanged
+    
+    The ETag is derived from the collections' versions and the request's
+    query string, so an unchanged collection is answered without touching
+    storage or serializing JSON.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            state = [request.full_path] + [appdata_manager.collection_version(c) for c in collections]
+            etag = hashlib.sha1(repr(state).encode('utf-8')).hexdigest()
+            
+            if request.if_none_match.contains_weak(etag):
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
 @app.route('/')
 def index():
     """Serve the main HTML file"""
@@ -117,12 +230,50 @@ def serve_static(filename):
 # PROJECTS API
 # ============================================================================
 
+QUERY_PARAMS = ('limit', 'offset', 'cursor', 'sort', 'type', 'fields')
+
+def parse_query_args(args):
+    """Parse paging/sorting/filter/projection query parameters"""
+    def to_int(name):
+        value = args.get(name)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"{name} must be an integer")
+    
+    fields = args.get('fields')
+    return {
+        "limit": to_int('limit'),
+        "offset": to_int('offset') or 0,
+        "cursor": args.get('cursor'),
+        "sort": args.get('sort'),
+        "fields": [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+    }
+
 @app.route('/api/projects', methods=['GET'])
+@conditional('projects')
 def get_projects():
-    """Get list of all projects"""
+    """Get list of all projects (summaries by default, ?full=true for full records)
+    
+    Supports limit, cursor/offset, sort (lastOpened, name, createdAt; prefix
+    with '-' for descending), type and fields query parameters.
+    """
     try:
-        projects = appdata_manager.list_projects()
+        if any(name in request.args for name in QUERY_PARAMS):
+            page = appdata_manager.query_projects(
+                record_type=request.args.get('type'), **parse_query_args(request.args)
+            )
+            return jsonify({"projects": page['items'], "total": page['total'], "nextCursor": page['nextCursor']})
+        
+        if request.args.get('full', '').lower() in ('1', 'true', 'yes'):
+            projects = appdata_manager.list_projects()
+        else:
+            projects = appdata_manager.list_project_summaries()
         return jsonify({"projects": projects})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error getting projects: {e}")
         return jsonify({"error": "Failed to load projects"}), 500
@@ -181,11 +332,22 @@ def delete_project(project_id):
 # ============================================================================
 
 @app.route('/api/layouts', methods=['GET'])
+@conditional('layouts')
 def get_layouts():
-    """Get all saved layouts"""
+    """Get all saved layouts
+    
+    Supports limit, cursor/offset, sort (savedAt, name) and fields query
+    parameters; without them the full list is returned.
+    """
     try:
+        if any(name in request.args for name in QUERY_PARAMS):
+            page = appdata_manager.query_layouts(**parse_query_args(request.args))
+            return jsonify({"layouts": page['items'], "total": page['total'], "nextCursor": page['nextCursor']})
+        
         layouts = appdata_manager.list_layouts()
         return jsonify(layouts)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error getting layouts: {e}")
         return jsonify({"error": "Failed to load layouts"}), 500
@@ -232,6 +394,7 @@ def delete_layout(layout_id):
 # ============================================================================
 
 @app.route('/api/themes', methods=['GET'])
+@conditional('themes')
 def get_themes():
     """Get all available themes"""
     try:
@@ -272,6 +435,7 @@ def save_theme():
 # ============================================================================
 
 @app.route('/api/extensions', methods=['GET'])
+@conditional('extensions')
 def get_extensions():
     """Get all extensions"""
     try:
@@ -330,6 +494,50 @@ def uninstall_extension(ext_id):
         logger.error(f"Error uninstalling extension: {e}")
         return jsonify({"error": "Failed to uninstall extension"}), 500
 
+# ============================================================================
+# BATCH API
+# ============================================================================
+
+BATCH_COLLECTIONS = ('projects', 'layouts', 'themes', 'extensions')
+
+def batch_get(collection):
+    """Load many records of a collection in one request"""
+    try:
+        data = request.get_json(silent=True) or {}
+        ids = data.get('ids')
+        if not isinstance(ids, list):
+            return jsonify({"error": "'ids' must be a list"}), 400
+        items = appdata_manager.batch_get(collection, ids)
+        return jsonify({"items": items})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error batch loading {collection}: {e}")
+        return jsonify({"error": f"Failed to load {collection}"}), 500
+
+def batch_upsert(collection):
+    """Create or replace many records of a collection in one transaction"""
+    try:
+        data = request.get_json(silent=True) or {}
+        records = data.get('records')
+        if not isinstance(records, list):
+            return jsonify({"error": "'records' must be a list"}), 400
+        ok, items = appdata_manager.batch_upsert(collection, records)
+        if not ok:
+            return jsonify({"error": "Batch rejected, no records were saved", "items": items}), 400
+        return jsonify({"status": "success", "items": items})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error batch saving {collection}: {e}")
+        return jsonify({"error": f"Failed to save {collection}"}), 500
+
+for _collection in BATCH_COLLECTIONS:
+    app.add_url_rule(f'/api/{_collection}:batchGet', f'batch_get_{_collection}',
+                     lambda collection=_collection: batch_get(collection), methods=['POST'])
+    app.add_url_rule(f'/api/{_collection}:batchUpsert', f'batch_upsert_{_collection}',
+                     lambda collection=_collection: batch_upsert(collection), methods=['POST'])
+
 # ============================================================================
 # SETTINGS API
 # ============================================================================
@@ -365,19 +573,371 @@ def get_storage_info():
         logger.error(f"Error getting storage info: {e}")
         return jsonify({"error": "Failed to get storage info"}), 500
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Get runtime metrics for server-side caches"""
+    try:
+        return jsonify({
+            "appdataCache": appdata_manager.get_cache_stats(),
+            "appdataWriter": appdata_manager.get_writer_stats(),
+            "fileWatcher": file_watcher.stats(),
+            "fileTree": file_tree.stats(),
+            "pathIndex": path_index.stats() if path_index is not None else None,
+            "fileContent": file_content.stats(),
+            "search": search_index.stats() if search_index is not None else None,
+            "symbols": symbol_index.stats() if symbol_index is not None else None,
+            "messageQueue": message_queue.stats() if message_queue is not None else None,
+            "projectRooms": project_rooms.stats(),
+            "aiRequests": ai_requests.stats(),
+            "aiCache": ai_cache.stats() if ai_cache is not None else None,
+            "terminalSessions": terminal_sessions.stats() if terminal_sessions is not None else None,
+            "terminalQueue": terminal_scheduler.stats(),
+            "terminalScrollback": terminal_scrollback.stats()
+        })
+    except Exception as e:
+        logger.error(f"Error getting metrics: {e}")
+        return jsonify({"error": "Failed to get metrics"}), 500
+
 @app.route('/api/files', methods=['GET'])
 def get_files():
-    """Get file tree structure"""
-    return jsonify({
-        "files": [
-            {"name": "main.py", "type": "file", "path": "main.py"},
-            {"name": "src", "type": "folder", "path": "src", "children": [
-                {"name": "utils.py", "type": "file", "path": "src/utils.py"},
-                {"name": "config.py", "type": "file", "path": "src/config.py"}
-            ]},
-            {"name": "README.md", "type": "file", "path": "README.md"}
-        ]
-    })
+    """List one directory level under PROJECTS_DIR
+    
+    ``path`` selects the directory (default: PROJECTS_DIR itself). Folders
+    come first, then files, each sorted by name; page with limit and
+    cursor/offset.
+    """
+    try:
+        args = parse_query_args(request.args)
+        return jsonify(file_tree.list(
+            request.args.get('path', ''), limit=args['limit'], offset=args['offset'], cursor=args['cursor']
+        ))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except (FileNotFoundError, NotADirectoryError):
+        return jsonify({"error": "Directory not found"}), 404
+    except Exception as e:
+        logger.error(f"Error listing files: {e}")
+        return jsonify({"error": "Failed to list files"}), 500
+
+@app.route('/api/files/find', methods=['GET'])
+def find_files():
+    """Quick open: rank the files under PROJECTS_DIR against a fuzzy query
+    
+    The characters of ``q`` must appear in the path in order, ignoring case
+    and spaces; matches in the file name rank first. ``project`` limits the
+    search to one top-level directory and ``limit`` caps the results. Each
+    result has the ``positions`` of the matched characters for highlighting.
+    """
+    if path_index is None:
+        return jsonify({"error": "Quick open is disabled"}), 503
+    if not path_index.ready:
+        return jsonify({"error": "The file index is still being built"}), 503, {"Retry-After": "5"}
+    try:
+        limit = parse_query_args(request.args)['limit']
+        limit = FILES_FIND_RESULTS if limit is None else limit
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        started = time.perf_counter()
+        result = path_index.find(request.args.get('q', ''), limit=limit, project=request.args.get('project') or None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error finding files: {e}")
+        return jsonify({"error": "Failed to find files"}), 500
+    result["elapsedMs"] = round((time.perf_counter() - started) * 1000, 1)
+    return jsonify(result)
+
+# Ranged reads and streamed writes of files under PROJECTS_DIR
+file_content = FileContent(app.config.get('PROJECTS_DIR', '.'))
+
+@app.route('/api/file', methods=['GET'])
+def read_file():
+    """Read part of a file under PROJECTS_DIR
+    
+    With ``line`` (and ``count``) returns lines starting at that 1-based
+    line, and with ``total=true`` the file's line count; otherwise returns
+    ``length`` bytes from ``offset``. Both page through files of any size.
+    """
+    def to_int(name):
+        value = request.args.get(name)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"{name} must be an integer")
+    
+    path = request.args.get('path', '')
+    try:
+        if 'line' in request.args or 'count' in request.args:
+            result = file_content.read_lines(
+                path, line=to_int('line') or 1, count=to_int('count'),
+                total=request.args.get('total', '').lower() in ('1', 'true', 'yes')
+            )
+        else:
+            result = file_content.read_bytes(path, offset=to_int('offset') or 0, length=to_int('length'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except (FileNotFoundError, NotADirectoryError):
+        return jsonify({"error": "File not found"}), 404
+    except IsADirectoryError:
+        return jsonify({"error": "Path is a directory"}), 400
+    except Exception as e:
+        logger.error(f"Error reading file {path}: {e}")
+        return jsonify({"error": "Failed to read file"}), 500
+    return jsonify(result), 200, {"ETag": result['etag']}
+
+@app.route('/api/file/raw', methods=['GET'])
+def read_file_raw():
+    """Download a file under PROJECTS_DIR; supports Range requests"""
+    try:
+        target = file_content.resolve(request.args.get('path', ''))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not target.is_file():
+        return jsonify({"error": "File not found"}), 404
+    return send_file(target, conditional=True, etag=True)
+
+@app.route('/api/file', methods=['PUT'])
+def write_file():
+    """Replace a file under PROJECTS_DIR with the request body, streamed to disk
+    
+    Send ``If-Match`` with the ETag from the last read to refuse the write
+    (412) if the file has changed since.
+    """
+    path = request.args.get('path', '')
+    too_large = {"error": f"Files are limited to {FILE_WRITE_MAX_BYTES} bytes"}
+    if (request.content_length or 0) > FILE_WRITE_MAX_BYTES:
+        return jsonify(too_large), 413
+    # Read the body directly rather than through request.stream, which is
+    # capped at the app-wide MAX_CONTENT_LENGTH; write() counts the bytes
+    # against FILE_WRITE_MAX_BYTES instead
+    stream = get_input_stream(request.environ, max_content_length=None)
+    try:
+        result = file_content.write(path, stream, if_match=request.headers.get('If-Match'),
+                                    max_bytes=FILE_WRITE_MAX_BYTES)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Conflict as e:
+        return jsonify({"error": str(e)}), 412
+    except TooLarge:
+        return jsonify(too_large), 413
+    except (FileNotFoundError, NotADirectoryError):
+        return jsonify({"error": "Directory not found"}), 404
+    except IsADirectoryError:
+        return jsonify({"error": "Path is a directory"}), 400
+    except Exception as e:
+        logger.error(f"Error writing file {path}: {e}")
+        return jsonify({"error": "Failed to write file"}), 500
+    return jsonify(result), 200, {"ETag": result['etag']}
+
+@app.route('/api/search', methods=['GET'])
+def search_files():
+    """Search the text files under PROJECTS_DIR, streaming matches as NDJSON
+    
+    ``q`` is a literal string, or a regular expression with ``regex=true``;
+    matching ignores case unless ``case=true``. ``path`` narrows the search
+    to one directory and ``limit`` caps the matching lines returned. Each
+    line of the response is one match ``{path, line, column, text}``; the
+    last line is a summary with ``done: true``, and ``timedOut: true`` if the
+    search ran out of time before reading every candidate file.
+    """
+    if search_index is None:
+        return jsonify({"error": "Search is disabled"}), 503
+    if not search_index.ready:
+        return jsonify({"error": "The search index is still being built"}), 503, {"Retry-After": "5"}
+    
+    def flag(name):
+        return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+    
+    try:
+        limit = parse_query_args(request.args)['limit']
+        limit = SEARCH_RESULTS if limit is None else limit
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        started = time.perf_counter()
+        candidates, matches = search_index.search(
+            request.args.get('q', ''), regex=flag('regex'), case_sensitive=flag('case'),
+            path=request.args.get('path', '')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    limit = min(limit, SEARCH_MAX_RESULTS)
+    
+    def generate():
+        count = 0
+        files = set()
+        truncated = False
+        try:
+            for match in matches:
+                if count == limit:
+                    truncated = True
+                    break
+                count += 1
+                files.add(match['path'])
+                yield serialization.dumps(match) + b'\n'
+        finally:
+            matches.close()
+        yield serialization.dumps({
+            "done": True, "matches": count, "files": len(files), "candidates": candidates,
+            "truncated": truncated or matches.timed_out, "timedOut": matches.timed_out, "elapsedMs": round((time.perf_counter() - started) * 1000, 1)
+        }) + b'\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/symbols', methods=['GET'])
+def get_symbols():
+    """Outline one Python file (``path``) or look up definitions across PROJECTS_DIR (``q``)
+    
+    Lookups match ``q`` exactly unless ``match`` is prefix or substring;
+    ``kind`` (class, function or method) and ``limit`` narrow the results.
+    """
+    if symbol_index is None:
+        return jsonify({"error": "Symbol indexing is disabled"}), 503
+    
+    path = request.args.get('path')
+    try:
+        if path is not None:
+            return jsonify(symbol_index.outline(path))
+        if not symbol_index.ready:
+            return jsonify({"error": "The symbol index is still being built"}), 503, {"Retry-After": "5"}
+        limit = parse_query_args(request.args)['limit']
+        limit = SYMBOLS_RESULTS if limit is None else limit
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        symbols = symbol_index.lookup(
+            request.args.get('q', ''), match=request.args.get('match', 'exact'),
+            kind=request.args.get('kind') or None, limit=limit
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({"error": "File not found"}), 404
+    except Exception as e:
+        logger.error(f"Error getting symbols: {e}")
+        return jsonify({"error": "Failed to get symbols"}), 500
+    return jsonify({"symbols": symbols, "count": len(symbols)})
+
+# ============================================================================
+# FILE WATCHER
+# ============================================================================
+
+file_watcher = FileWatcher(appdata_manager, app.config.get('PROJECTS_DIR'))
+
+file_tree = FileTree(app.config.get('PROJECTS_DIR', '.'))
+file_watcher.add_listener(file_tree.on_file_changes)
+
+# Every file path, for quick open
+path_index = PathIndex(app.config.get('PROJECTS_DIR', '.')) if FILES_FIND_ENABLED else None
+if path_index is not None:
+    file_watcher.add_listener(path_index.on_file_changes)
+
+# Trigram index for /api/search, saved in the AppData cache between runs
+search_index = SearchIndex(
+    app.config.get('PROJECTS_DIR', '.'), appdata_manager.get_cache_dir() / 'search-index.bin'
+) if SEARCH_ENABLED else None
+if search_index is not None:
+    file_watcher.add_listener(search_index.on_file_changes)
+
+# Python symbol index for /api/symbols, cached by content hash in the AppData
+# cache. Worker processes do not mix with green threads, so eventlet and
+# gevent parse in the indexing thread.
+symbol_index = SymbolIndex(
+    app.config.get('PROJECTS_DIR', '.'), appdata_manager.get_cache_dir() / 'symbols',
+    workers=SYMBOLS_WORKERS if socketio.async_mode == 'threading' else 0
+) if SYMBOLS_ENABLED else None
+if symbol_index is not None:
+    file_watcher.add_listener(symbol_index.on_file_changes)
+
+# Connections following a project receive its project and file events
+project_rooms = ProjectRooms()
+
+def file_owners():
+    """Map each top-level directory under PROJECTS_DIR to the projects stored in it"""
+    projects_root = Path(app.config.get('PROJECTS_DIR', '.')).resolve()
+    owners = {}
+    for summary in appdata_manager.list_project_summaries():
+        path = summary.get('path')
+        if not isinstance(path, str) or not path:
+            continue
+        directory = (projects_root / path).resolve()
+        if directory.parent == projects_root:
+            owners.setdefault(directory.name, set()).add(summary['id'])
+    return owners
+
+def send_project_event(project_id, event, payload):
+    """Send an event to the project's subscribers on this worker, if there are any"""
+    if project_rooms.record(project_id):
+        socketio.emit(event, payload, to=room_name(project_id), ignore_queue=True)
+
+def broadcast_file_changes(events):
+    """Push a batch of filesystem changes to the clients that follow them
+    
+    File changes go to the project whose directory holds the file (a
+    directory without a project record counts as the project of the same
+    id), project record changes to that project. Other collections, and
+    database changes that do not say which record changed, go to everyone.
+    """
+    # Every worker runs its own watcher and sees the same changes, so each
+    # only tells its own clients
+    for event, payload in events.items():
+        if event == EVENT_NAMES['files']:
+            owners = file_owners()
+            by_project = {}
+            for change in payload['changes']:
+                directory = change['path'].split('/', 1)[0]
+                for project_id in owners.get(directory, (directory,)):
+                    by_project.setdefault(project_id, []).append(change)
+            for project_id, changes in by_project.items():
+                send_project_event(project_id, event, {"projectId": project_id, "changes": changes})
+        elif event == EVENT_NAMES['projects'] and payload['changes']:
+            for change in payload['changes']:
+                send_project_event(change['id'], event, {"collection": "projects", "changes": [change]})
+        else:
+            socketio.emit(event, payload, ignore_queue=True)
+
+file_watcher.add_listener(broadcast_file_changes)
+
+# ============================================================================
+# TERMINAL SESSIONS
+# ============================================================================
+
+terminal_sessions = (
+    SessionManager(cwd=Path(app.config.get('PROJECTS_DIR', '.')).resolve())
+    if sessions_supported() else None
+)
+
+# Recent output per terminal client, replayed when a client re-attaches
+terminal_scrollback = ScrollbackStore(max_age=TERMINAL_SESSION_IDLE)
+
+# Connections that attached with a stable client id: sid -> 'terminal:<clientId>'.
+# Other connections use their sid as client key, which is also their room.
+terminal_clients = {}
+
+# Commands that are queued or running: (client key, command id) -> CommandControl
+terminal_commands = {}
+
+def terminal_client(sid):
+    """Return the key a connection's terminal state is stored under"""
+    return terminal_clients.get(sid, sid)
+
+def send_terminal(client, event, payload):
+    """Record a terminal event in the client's scrollback and send it to the client"""
+    entry = terminal_scrollback.get(client).append(payload)
+    socketio.emit(event, entry, to=client)
+
+def notify_queue_position(client, command_id, position):
+    """Tell a client where its waiting command is in the queue"""
+    socketio.emit('terminal_queued', {'id': command_id, 'position': position}, to=client)
+
+# A session runs one command at a time, so its client's extra commands wait
+# in the queue instead of being refused
+terminal_scheduler = CommandScheduler(
+    max_per_client=1 if terminal_sessions is not None else TERMINAL_MAX_PER_CLIENT,
+    spawn=socketio.start_background_task,
+    on_position=notify_queue_position
+)
 
 # ============================================================================
 # WebSocket Events
@@ -393,78 +953,272 @@ def handle_connect():
 def handle_disconnect():
     """Handle client disconnection"""
     logger.info('Client disconnected')
+    project_rooms.leave_all(request.sid)
+    ai_requests.cancel(request.sid)
+    client = terminal_clients.pop(request.sid, request.sid)
+    if client != request.sid:
+        # An attached client may come back; its session and scrollback are
+        # kept until they have been idle for TERMINAL_SESSION_IDLE
+        return
+    for command_id in terminal_scheduler.drop_client(client):
+        terminal_commands.pop((client, command_id), None)
+    if terminal_sessions is not None:
+        terminal_sessions.close(client)
+    terminal_scrollback.discard(client)
+
+@socketio.on('join_project')
+def handle_join_project(data):
+    """Follow a project's change events"""
+    project_id = (data or {}).get('projectId')
+    if not isinstance(project_id, str) or not re.fullmatch(r'[A-Za-z0-9_.-]{1,128}', project_id) or '..' in project_id:
+        return {"error": "Invalid projectId"}
+    if not project_rooms.join(request.sid, project_id):
+        return {"error": f"Already following {project_rooms.max_per_client} projects"}
+    join_room(room_name(project_id))
+    return {"status": "joined", "projectId": project_id}
+
+@socketio.on('leave_project')
+def handle_leave_project(data):
+    """Stop following a project's change events"""
+    project_id = (data or {}).get('projectId')
+    if not project_rooms.leave(request.sid, project_id):
+        return {"error": "Not following this project"}
+    leave_room(room_name(project_id))
+    return {"status": "left", "projectId": project_id}
+
+@socketio.on('terminal_attach')
+def handle_terminal_attach(data):
+    """Bind this connection to a stable terminal client id and replay missed output"""
+    client_id = str((data or {}).get('clientId', ''))
+    if not re.fullmatch(r'[A-Za-z0-9_-]{16,64}', client_id):
+        return {"error": "Invalid clientId"}
+    
+    client = f"terminal:{client_id}"
+    join_room(client)
+    terminal_clients[request.sid] = client
+    terminal_scrollback.prune()
+    
+    try:
+        since = int((data or {}).get('since') or 0)
+    except (TypeError, ValueError):
+        since = 0
+    emit('terminal_scrollback', {'entries': terminal_scrollback.get(client).since(since)})
+    return {"status": "attached"}
 
 @socketio.on('terminal_execute')
 def handle_terminal_command(data):
-    """Execute terminal command with security validation"""
+    """Execute terminal command with security validation, streaming its output"""
     command = data.get('command', '').strip()
+    client = terminal_client(request.sid)
+    command_id = data.get('id') or uuid.uuid4().hex
     
     # Validate command
     is_valid, message = validate_command(command)
     
     if not is_valid:
         logger.warning(f"Blocked unsafe command: {command}")
-        emit('terminal_output', {
+        send_terminal(client, 'terminal_output', {
+            'id': command_id,
             'stderr': f"⚠️  Security Error: {message}"
         })
         return
     
+    # Use shlex.split for safe command parsing
+    parts = shlex.split(command)
+    terminal_scrollback.get(client).append({'id': command_id, 'command': command})
+    control = terminal_commands[(client, command_id)] = CommandControl()
     try:
-        # Use shlex.split for safe command parsing
-        import subprocess
-        parts = shlex.split(command)
-        
-        result = subprocess.run(
-            parts,
-            capture_output=True,
-            text=True,
-            timeout=10,
-            shell=False  # NEVER use shell=True
+        position = terminal_scheduler.submit(
+            client, command_id, lambda: stream_terminal_command(client, command_id, command, parts, control)
         )
-        
-        logger.info(f"Executed command: {command}")
-        emit('terminal_output', {
-            'stdout': result.stdout,
-            'stderr': result.stderr
-        })
-    except subprocess.TimeoutExpired:
-        logger.warning(f"Command timed out: {command}")
-        emit('terminal_output', {
-            'stderr': '⏱️  Command timed out (10s limit)'
-        })
+    except RuntimeError as e:
+        terminal_commands.pop((client, command_id), None)
+        send_terminal(client, 'terminal_output', {'id': command_id, 'stderr': f"⏳ {e}"})
+        send_terminal(client, 'terminal_exit', {'id': command_id, 'exitCode': None, 'cwd': None})
+        return {"id": command_id, "error": str(e)}
+    return {"id": command_id, "position": position}
+
+@socketio.on('terminal_cancel')
+def handle_terminal_cancel(data=None):
+    """Stop a command (or, without an id, all of the client's commands)"""
+    client = terminal_client(request.sid)
+    command_id = (data or {}).get('id')
+    cancelled = []
+    for (owner, running_id), control in list(terminal_commands.items()):
+        if owner != client or (command_id and running_id != command_id):
+            continue
+        control.cancel()
+        if terminal_scheduler.cancel(client, running_id):
+            # It never started, so nothing else will report its end
+            terminal_commands.pop((client, running_id), None)
+            send_terminal(client, 'terminal_exit', {
+                'id': running_id, 'exitCode': None, 'cwd': None, 'cancelled': True
+            })
+        cancelled.append(running_id)
+    return {"cancelled": cancelled}
+
+def stream_terminal_command(client, command_id, command, parts, control):
+    """Run a command in the background and stream its output to one client"""
+    def send(stream, text):
+        send_terminal(client, 'terminal_output', {'id': command_id, stream: text})
+    
+    timeout = command_timeout(parts)
+    result = None
+    cwd = None
+    try:
+        if control.cancelled:
+            result = CommandResult(None, False, True, False)
+        elif fast_commands.TERMINAL_FAST_PATH and parts[0] in fast_commands.COMMANDS:
+            # pwd, ls, cat and friends are answered without starting a process
+            if terminal_sessions is not None:
+                cwd = terminal_sessions.cwd_for(client)
+            result = fast_commands.run_fast(parts, send, cwd, timeout, control=control)
+        if result is None and terminal_sessions is not None:
+            # The client's own shell keeps cwd and environment between commands
+            # Quoted so the shell sees the same words as the whitelist did,
+            # without glob, brace or ~ expansion
+            session = terminal_sessions.get(client)
+            result = session.run(shlex.join(parts), lambda text: send('stdout', text), timeout, control=control)
+            cwd = session.cwd
+        elif result is None:
+            result = run_streaming(parts, send, timeout, control=control)
+        logger.info(f"Executed command: {command} (exit {result.exit_code})")
+        if result.timed_out:
+            logger.warning(f"Command timed out: {command}")
+            send('stderr', f"⏱️  Command timed out ({timeout:g}s limit)")
+        if result.truncated:
+            send('stderr', f"✂️  Output limit reached ({TERMINAL_MAX_OUTPUT:,} bytes), command stopped")
+        if result.cancelled:
+            send('stderr', "^C")
     except FileNotFoundError:
-        emit('terminal_output', {
-            'stderr': f"❌ Command not found: {parts[0]}"
-        })
+        send('stderr', f"❌ Command not found: {parts[0]}")
     except Exception as e:
         logger.error(f"Error executing command: {e}")
-        emit('terminal_output', {
-            'stderr': f"❌ Error: {str(e)}"
-        })
+        send('stderr', f"❌ Error: {str(e)}")
+    finally:
+        terminal_commands.pop((client, command_id), None)
+    send_terminal(client, 'terminal_exit', {
+        'id': command_id,
+        'exitCode': result.exit_code if result else None,
+        'cwd': cwd,
+        'cancelled': bool(result and result.cancelled)
+    })
+
+# Files one assistant request may refer to
+AI_MAX_FILES = 20
+
+# Repeated requests about unchanged files are answered from memory (and,
+# with AI_CACHE_SPILL, from the AppData cache directory)
+ai_cache = ResponseCache(
+    spill_dir=appdata_manager.get_cache_dir() / 'ai-responses' if AI_CACHE_SPILL else None
+) if AI_CACHE_ENABLED else None
+
+# Assistant replies stream back to the requesting connection
+ai_requests = AIRequestManager(
+    create_backend(), lambda sid, event, payload: socketio.emit(event, payload, to=sid),
+    socketio.start_background_task, cache=ai_cache
+)
+
+def resolve_project_path(path):
+    """Return the absolute path of ``path`` under PROJECTS_DIR, or None if it leads outside"""
+    if not isinstance(path, str) or not path or '\0' in path:
+        return None
+    root = Path(app.config.get('PROJECTS_DIR', '.')).resolve()
+    resolved = (root / path).resolve()
+    if resolved != root and root not in resolved.parents:
+        return None
+    return resolved
 
 @socketio.on('ai_message')
 def handle_ai_message(data):
-    """Handle AI assistant messages"""
+    """Start an AI assistant request; the reply streams back as ai_response_chunk events"""
+    data = data or {}
     message = data.get('message', '').strip()
     mode = data.get('mode', 'Chat')
+    request_id = str(data.get('id') or '')[:64] or None
     
     if not message:
         return
     
-    # Sanitize input
-    message = message[:1000]  # Limit message length
+    paths = data.get('files') or []
+    files = [resolve_project_path(path) for path in paths] if isinstance(paths, list) else [None]
+    if None in files or len(files) > AI_MAX_FILES:
+        return {"id": request_id, "error": f"files must be at most {AI_MAX_FILES} paths inside the project directory"}
     
-    # Simple AI response logic
-    responses = {
-        "Chat": f"I received your message: {message}",
-        "Explain": f"Explaining: {message}",
-        "Debug": f"Debugging: {message}",
-        "Refactor": f"Refactoring: {message}"
-    }
+    try:
+        request_id = ai_requests.submit(request.sid, message, mode, request_id, files)
+    except RuntimeError as e:
+        emit('ai_response', {'id': request_id, 'mode': mode, 'message': '', 'cancelled': False, 'error': str(e)})
+        return {"id": request_id, "error": str(e)}
+    return {"id": request_id}
+
+@socketio.on('ai_cancel')
+def handle_ai_cancel(data=None):
+    """Stop an assistant request (or, without an id, all of the connection's requests)"""
+    return {"cancelled": ai_requests.cancel(request.sid, (data or {}).get('id'))}
+
+# ============================================================================
+# SHUTDOWN
+# ============================================================================
+
+_shutdown_lock = threading.Lock()
+_shut_down = False
+
+def drain(timeout=None):
+    """Refuse new terminal commands, let running ones finish, then disconnect clients
+    
+    Queued commands are dropped and commands still running after ``timeout``
+    seconds are cancelled. Assistant requests are cancelled right away; the
+    client can resend them after reconnecting. Returns False if any terminal
+    command had to be cancelled.
+    """
+    timeout = app.config['GRACEFUL_TIMEOUT'] if timeout is None else timeout
+    if ai_requests.close():
+        ai_requests.wait_idle(5)
+    for client, command_ids in terminal_scheduler.close().items():
+        for command_id in command_ids:
+            terminal_commands.pop((client, command_id), None)
+            send_terminal(client, 'terminal_exit', {
+                'id': command_id, 'exitCode': None, 'cwd': None, 'cancelled': True
+            })
     
-    response = responses.get(mode, f"Processing: {message}")
-    logger.info(f"AI message processed in {mode} mode")
-    emit('ai_response', {'message': response})
+    running = terminal_scheduler.stats()['running']
+    if running:
+        logger.info(f"Waiting up to {timeout}s for {running} terminal command(s)")
+    finished = terminal_scheduler.wait_idle(timeout)
+    if not finished:
+        logger.warning("Cancelling terminal commands still running at shutdown")
+        for control in list(terminal_commands.values()):
+            control.cancel()
+        terminal_scheduler.wait_idle(5)
+    
+    # Clients reconnect on their own, to another worker or the restarted server
+    sids = [sid for sid, _ in socketio.server.manager.get_participants('/', None)]
+    for sid in sids:
+        socketio.server.disconnect(sid, namespace='/')
+    return finished
+
+def shutdown(timeout=None):
+    """Drain terminal work, then stop the watcher, shells and AppData writer (runs once)"""
+    global _shut_down
+    with _shutdown_lock:
+        if _shut_down:
+            return
+        _shut_down = True
+    
+    logger.info("Shutting down")
+    try:
+        drain(timeout)
+    except Exception as e:
+        logger.error(f"Error draining connections: {e}")
+    file_watcher.stop()
+    if search_index is not None:
+        search_index.stop()
+    if symbol_index is not None:
+        symbol_index.stop()
+    if terminal_sessions is not None:
+        terminal_sessions.close_all()
+    appdata_manager.close()
 
 if __name__ == '__main__':
     # Get configuration from environment
@@ -485,4 +1239,14 @@ if __name__ == '__main__':
     browser_thread = threading.Thread(target=open_browser, args=(host, port), daemon=True)
     browser_thread.start()
     
-    socketio.run(app, host=host, port=port, debug=debug, use_reloader=False, allow_unsafe_werkzeug=True)
+    file_watcher.start()
+    if path_index is not None:
+        path_index.start()
+    if search_index is not None:
+        search_index.start()
+    if symbol_index is not None:
+        symbol_index.start()
+    try:
+        socketio.run(app, host=host, port=port, debug=debug, use_reloader=False, allow_unsafe_werkzeug=True)
+    finally:
+        shutdown(timeout=0)
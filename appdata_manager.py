@@ -3,14 +3,43 @@ AppData Manager for AutoPilot IDE
 Manages application data storage in AppData folder with dedicated subdirectories
 """
 import os
+import copy
 import json
+import uuid
+import base64
+import bisect
 import shutil
+import threading
 from pathlib import Path
 from datetime import datetime
 import logging
+import serialization
+from storage_backends import (
+    COLLECTIONS, SUMMARY_FIELDS, StorageBackend, atomic_write_json, create_backend, sort_records,
+    summarize_record
+)
+from write_behind import DELETED, WRITE_COALESCE_WINDOW, CoalescingWriter
 
 logger = logging.getLogger(__name__)
 
+# Storage backend used by the global instance ('json' or 'sqlite')
+DEFAULT_BACKEND = os.environ.get('APPDATA_BACKEND', 'json')
+
+# Fields that paginated queries can sort on; the first is the default
+# (newest first). Sorting only uses summary fields, so pages never need
+# the full records.
+QUERY_SORT_FIELDS = {
+    'projects': ('lastOpened', 'name', 'createdAt'),
+    'layouts': ('savedAt', 'name')
+}
+
+MAX_PAGE_SIZE = 1000
+
+# Largest number of records accepted by one batch request
+MAX_BATCH_SIZE = 10000
+
+# Seconds between background scans that re-baseline /api/storage-info
+STORAGE_SCAN_INTERVAL = float(os.environ.get('APPDATA_STORAGE_SCAN_INTERVAL', 300))
 
 
 def _validate_path(path_str):
@@ -29,15 +58,111 @@ def _validate_path(path_str):
     return path_str
 
 
+class _QueryIndex:
+    """Sorted views over one collection's summaries for paginated queries
+    
+    A view is a list of ``(sort_value, id)`` tuples in ascending order, built
+    lazily per (sort field, type filter) and kept up to date with bisect on
+    every save/delete, so a page is a slice rather than a full sort.
+    """
+    
+    def __init__(self, summaries, version):
+        self.version = version
+        self.summaries = {s['id']: s for s in summaries if s.get('id')}
+        self._views = {}
+    
+    @staticmethod
+    def sort_value(summary, field):
+        value = summary.get(field)
+        if value is None:
+            return ''
+        value = str(value)
+        return value.casefold() if field == 'name' else value
+    
+    @staticmethod
+    def _matches(summary, record_type):
+        return record_type is None or summary.get('type') == record_type
+    
+    def view(self, field, record_type=None):
+        key = (field, record_type)
+        if key not in self._views:
+            self._views[key] = sorted(
+                (self.sort_value(s, field), record_id)
+                for record_id, s in self.summaries.items()
+                if self._matches(s, record_type)
+            )
+        return self._views[key]
+    
+    def remove(self, record_id):
+        old = self.summaries.pop(record_id, None)
+        if old is None:
+            return
+        for (field, record_type), items in self._views.items():
+            if self._matches(old, record_type):
+                entry = (self.sort_value(old, field), record_id)
+                position = bisect.bisect_left(items, entry)
+                if position < len(items) and items[position] == entry:
+                    del items[position]
+    
+    def upsert(self, summary):
+        record_id = summary.get('id')
+        if not record_id:
+            return
+        self.remove(record_id)
+        self.summaries[record_id] = summary
+        for (field, record_type), items in self._views.items():
+            if self._matches(summary, record_type):
+                bisect.insort(items, (self.sort_value(summary, field), record_id))
+    
+    def page(self, field, descending, record_type, limit, offset, after):
+        """Return (ids, total, last_entry, has_more) for one page of a view"""
+        items = self.view(field, record_type)
+        if descending:
+            end = len(items) if after is None else bisect.bisect_left(items, after)
+            positions = range(end - 1, -1, -1)
+        else:
+            start = 0 if after is None else bisect.bisect_right(items, after)
+            positions = range(start, len(items))
+        
+        positions = positions[offset:]
+        selected = positions if limit is None else positions[:limit]
+        has_more = len(positions) > len(selected)
+        last_entry = items[selected[-1]] if len(selected) else None
+        return [items[i][1] for i in selected], len(items), last_entry, has_more
+
+
 class AppDataManager:
     """Manages application data storage in AppData directory"""
     
-    def __init__(self, app_name="AutoPilot-IDE"):
-        """Initialize AppData manager with application name"""
+    COLLECTIONS = COLLECTIONS
+    
+    def __init__(self, app_name="AutoPilot-IDE", base_dir=None, backend='json',
+                 write_delay=WRITE_COALESCE_WINDOW, storage_scan_interval=STORAGE_SCAN_INTERVAL):
+        """Initialize AppData manager with application name
+        
+        ``backend`` is a StorageBackend instance or the name of one
+        ('json' or 'sqlite') to create inside the AppData directory.
+        Layout and settings saves are coalesced for ``write_delay`` seconds.
+        """
         self.app_name = app_name
-        self.base_dir = self._get_appdata_path()
+        self.base_dir = Path(base_dir) if base_dir else self._get_appdata_path()
         self._ensure_directories()
-        logger.info(f"AppData directory initialized at: {self.base_dir}")
+        if isinstance(backend, StorageBackend):
+            self.backend = backend
+        else:
+            self.backend = create_backend(backend, self.base_dir)
+        self._writer = CoalescingWriter(write_delay)
+        self._query_indexes = {}
+        self._query_lock = threading.RLock()
+        self._epoch = uuid.uuid4().hex[:8]
+        self._write_counts = {collection: 0 for collection in self.COLLECTIONS}
+        self._change_listeners = []
+        self.storage_scan_interval = storage_scan_interval
+        self._storage_scan = None
+        self._scan_lock = threading.Lock()
+        self._scan_thread = None
+        self._scan_stop = threading.Event()
+        logger.info(f"AppData directory initialized at: {self.base_dir} ({self.backend.name} backend)")
     
     def _get_appdata_path(self):
         """Get the appropriate AppData path for the current OS"""
@@ -79,18 +204,11 @@ class AppDataManager:
     
     def list_projects(self):
         """List all projects"""
-        projects_dir = self.get_projects_dir()
-        projects = []
-        
-        for project_file in projects_dir.glob('*.json'):
-            try:
-                with open(project_file, 'r', encoding='utf-8') as f:
-                    project_data = json.load(f)
-                    projects.append(project_data)
-            except Exception as e:
-                logger.error(f"Error loading project {project_file}: {e}")
-        
-        return sorted(projects, key=lambda x: x.get('lastOpened', ''), reverse=True)
+        return self.backend.list('projects')
+    
+    def list_project_summaries(self):
+        """List the summary fields of all projects from the manifest"""
+        return self.backend.summaries('projects')
     
     def save_project(self, project_data):
         """Save project data"""
@@ -99,31 +217,29 @@ class AppDataManager:
             raise ValueError("Project must have an 'id' field")
         
         project_id = _validate_path(project_id)
-        project_file = self.get_projects_dir() / f"{project_id}.json"
-        
-        with open(project_file, 'w', encoding='utf-8') as f:
-            json.dump(project_data, f, indent=2)
+        location = self.backend.put('projects', project_id, project_data)
+        self._write_counts['projects'] += 1
+        self._index_record('projects', project_data)
+        self._notify_change('projects')
         
         logger.info(f"Saved project: {project_data.get('name', project_id)}")
-        return project_file
+        return location
     
     def load_project(self, project_id):
         """Load project data by ID"""
         project_id = _validate_path(project_id)
-        project_file = self.get_projects_dir() / f"{project_id}.json"
         
-        if not project_file.exists():
+        try:
+            return self.backend.get('projects', project_id)
+        except FileNotFoundError:
             raise FileNotFoundError(f"Project not found: {project_id}")
-        
-        with open(project_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
     
     def delete_project(self, project_id):
         """Delete a project"""
-        project_file = self.get_projects_dir() / f"{project_id}.json"
-        
-        if project_file.exists():
-            project_file.unlink()
+        if self.backend.delete('projects', project_id):
+            self._write_counts['projects'] += 1
+            self._unindex_record('projects', project_id)
+            self._notify_change('projects')
             logger.info(f"Deleted project: {project_id}")
             return True
         return False
@@ -135,18 +251,7 @@ class AppDataManager:
     
     def list_themes(self):
         """List all available themes"""
-        themes_dir = self.get_themes_dir()
-        themes = []
-        
-        for theme_file in themes_dir.glob('*.json'):
-            try:
-                with open(theme_file, 'r', encoding='utf-8') as f:
-                    theme_data = json.load(f)
-                    themes.append(theme_data)
-            except Exception as e:
-                logger.error(f"Error loading theme {theme_file}: {e}")
-        
-        return themes
+        return self.backend.list('themes')
     
     def save_theme(self, theme_data):
         """Save theme data"""
@@ -154,23 +259,19 @@ class AppDataManager:
         if not theme_id:
             raise ValueError("Theme must have an 'id' field")
         
-        theme_file = self.get_themes_dir() / f"{theme_id}.json"
-        
-        with open(theme_file, 'w', encoding='utf-8') as f:
-            json.dump(theme_data, f, indent=2)
+        location = self.backend.put('themes', theme_id, theme_data)
+        self._write_counts['themes'] += 1
+        self._notify_change('themes')
         
         logger.info(f"Saved theme: {theme_data.get('name', theme_id)}")
-        return theme_file
+        return location
     
     def load_theme(self, theme_id):
         """Load theme data by ID"""
-        theme_file = self.get_themes_dir() / f"{theme_id}.json"
-        
-        if not theme_file.exists():
+        try:
+            return self.backend.get('themes', theme_id)
+        except FileNotFoundError:
             raise FileNotFoundError(f"Theme not found: {theme_id}")
-        
-        with open(theme_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
     
     # Extensions Management
     def get_extensions_dir(self):
@@ -179,18 +280,7 @@ class AppDataManager:
     
     def list_extensions(self):
         """List all installed extensions"""
-        extensions_dir = self.get_extensions_dir()
-        extensions = []
-        
-        for ext_file in extensions_dir.glob('*.json'):
-            try:
-                with open(ext_file, 'r', encoding='utf-8') as f:
-                    ext_data = json.load(f)
-                    extensions.append(ext_data)
-            except Exception as e:
-                logger.error(f"Error loading extension {ext_file}: {e}")
-        
-        return extensions
+        return self.backend.list('extensions')
     
     def save_extension(self, extension_data):
         """Save extension data"""
@@ -198,43 +288,45 @@ class AppDataManager:
         if not ext_id:
             raise ValueError("Extension must have an 'id' field")
         
-        ext_file = self.get_extensions_dir() / f"{ext_id}.json"
-        
-        with open(ext_file, 'w', encoding='utf-8') as f:
-            json.dump(extension_data, f, indent=2)
+        location = self.backend.put('extensions', ext_id, extension_data)
+        self._write_counts['extensions'] += 1
+        self._notify_change('extensions')
         
         logger.info(f"Saved extension: {extension_data.get('name', ext_id)}")
-        return ext_file
+        return location
     
     def load_extension(self, ext_id):
         """Load extension data by ID"""
-        ext_file = self.get_extensions_dir() / f"{ext_id}.json"
-        
-        if not ext_file.exists():
+        try:
+            return self.backend.get('extensions', ext_id)
+        except FileNotFoundError:
             raise FileNotFoundError(f"Extension not found: {ext_id}")
-        
-        with open(ext_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
     
     # Layouts Management
     def get_layouts_dir(self):
         """Get the layouts directory path"""
         return self.base_dir / 'layouts'
     
+    def _merge_pending(self, collection, records, summarize=False):
+        """Overlay writes still queued in the write-behind buffer on ``records``"""
+        pending = self._writer.pending_items(collection)
+        if not pending:
+            return records
+        saved = [record for record in pending.values() if record is not DELETED]
+        if summarize:
+            queued = [summarize_record(collection, record) for record in saved]
+        else:
+            queued = [copy.deepcopy(record) for record in saved]
+        merged = [record for record in records if record.get('id') not in pending]
+        return sort_records(collection, merged + queued)
+    
     def list_layouts(self):
         """List all saved layouts"""
-        layouts_dir = self.get_layouts_dir()
-        layouts = []
-        
-        for layout_file in layouts_dir.glob('*.json'):
-            try:
-                with open(layout_file, 'r', encoding='utf-8') as f:
-                    layout_data = json.load(f)
-                    layouts.append(layout_data)
-            except Exception as e:
-                logger.error(f"Error loading layout {layout_file}: {e}")
-        
-        return sorted(layouts, key=lambda x: x.get('savedAt', ''), reverse=True)
+        return self._merge_pending('layouts', self.backend.list('layouts'))
+    
+    def list_layout_summaries(self):
+        """List the summary fields of all layouts from the manifest"""
+        return self._merge_pending('layouts', self.backend.summaries('layouts'), summarize=True)
     
     def save_layout(self, layout_data):
         """Save window layout"""
@@ -245,33 +337,216 @@ class AppDataManager:
         # Add timestamp
         layout_data['savedAt'] = datetime.now().isoformat()
         
-        layout_file = self.get_layouts_dir() / f"{layout_id}.json"
-        
-        with open(layout_file, 'w', encoding='utf-8') as f:
-            json.dump(layout_data, f, indent=2)
+        # Window resizes save the same layout many times a second; queue the
+        # write so a burst reaches the disk once
+        self._writer.submit(
+            ('layouts', layout_id),
+            copy.deepcopy(layout_data),
+            lambda data: self._write_queued('layouts', lambda: self.backend.put('layouts', layout_id, data))
+        )
+        self._write_counts['layouts'] += 1
+        self._index_record('layouts', layout_data, synced=False)
         
         logger.info(f"Saved layout: {layout_data.get('name', layout_id)}")
-        return layout_file
     
     def load_layout(self, layout_id):
         """Load layout data by ID"""
-        layout_file = self.get_layouts_dir() / f"{layout_id}.json"
-        
-        if not layout_file.exists():
+        pending = self._writer.get_pending(('layouts', layout_id))
+        if pending is DELETED:
             raise FileNotFoundError(f"Layout not found: {layout_id}")
+        if pending is not None:
+            return copy.deepcopy(pending)
         
-        with open(layout_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        try:
+            return self.backend.get('layouts', layout_id)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Layout not found: {layout_id}")
     
     def delete_layout(self, layout_id):
-        """Delete a layout"""
-        layout_file = self.get_layouts_dir() / f"{layout_id}.json"
+        """Delete a layout
         
-        if layout_file.exists():
-            layout_file.unlink()
-            logger.info(f"Deleted layout: {layout_id}")
-            return True
-        return False
+        The delete is queued behind any save of the layout still being
+        written, so that save cannot bring the file back afterwards.
+        """
+        try:
+            self.load_layout(layout_id)
+        except FileNotFoundError:
+            return False
+        self._writer.delete(
+            ('layouts', layout_id),
+            lambda: self._write_queued('layouts', lambda: self.backend.delete('layouts', layout_id))
+        )
+        self._write_counts['layouts'] += 1
+        self._unindex_record('layouts', layout_id)
+        logger.info(f"Deleted layout: {layout_id}")
+        return True
+    
+    # Paginated Queries
+    def _get_query_index(self, collection):
+        """Return the collection's query index, rebuilding it if storage changed"""
+        version = self.backend.version(collection)
+        index = self._query_indexes.get(collection)
+        if index is None or index.version != version:
+            summaries = self._merge_pending(collection, self.backend.summaries(collection), summarize=True)
+            index = _QueryIndex(summaries, self.backend.version(collection))
+            self._query_indexes[collection] = index
+        return index
+    
+    def _index_record(self, collection, record, synced=True):
+        """Apply a save to an already built query index"""
+        self._index_records(collection, [record], synced)
+    
+    def _index_records(self, collection, records, synced=True):
+        """Apply several saves to an already built query index"""
+        with self._query_lock:
+            index = self._query_indexes.get(collection)
+            if index is None:
+                return
+            for record in records:
+                index.upsert(summarize_record(collection, record))
+            if synced:
+                index.version = self.backend.version(collection)
+    
+    def _unindex_record(self, collection, record_id):
+        """Apply a delete to an already built query index"""
+        with self._query_lock:
+            index = self._query_indexes.get(collection)
+            if index is None:
+                return
+            index.remove(record_id)
+            index.version = self.backend.version(collection)
+    
+    @staticmethod
+    def _encode_cursor(sort, entry):
+        raw = json.dumps([sort, entry[0], entry[1]]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+    
+    @staticmethod
+    def _decode_cursor(cursor, sort):
+        try:
+            cursor_sort, value, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except Exception:
+            raise ValueError("Invalid cursor")
+        if cursor_sort != sort:
+            raise ValueError("Cursor was issued for a different sort order")
+        return (value, record_id)
+    
+    def _query(self, collection, limit=None, offset=0, cursor=None, sort=None,
+               record_type=None, fields=None):
+        """Return one page of a collection from the sorted query index"""
+        sort_fields = QUERY_SORT_FIELDS[collection]
+        sort = sort or f"-{sort_fields[0]}"
+        descending = sort.startswith('-')
+        field = sort.lstrip('-')
+        if field not in sort_fields:
+            raise ValueError(f"Invalid sort field '{field}'. Allowed: {', '.join(sort_fields)}")
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be a positive integer")
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+        limit = min(limit, MAX_PAGE_SIZE) if limit is not None else None
+        after = self._decode_cursor(cursor, sort) if cursor else None
+        
+        with self._query_lock:
+            index = self._get_query_index(collection)
+            ids, total, last_entry, has_more = index.page(field, descending, record_type, limit, offset, after)
+            summaries = [index.summaries[record_id] for record_id in ids]
+        
+        if fields and set(fields) <= set(SUMMARY_FIELDS[collection]):
+            items = [{f: s[f] for f in fields if f in s} for s in summaries]
+        else:
+            load = self.load_project if collection == 'projects' else self.load_layout
+            items = []
+            for record_id in ids:
+                try:
+                    record = load(record_id)
+                except FileNotFoundError:
+                    continue
+                items.append({f: record[f] for f in fields if f in record} if fields else record)
+        
+        return {
+            "items": items,
+            "total": total,
+            "nextCursor": self._encode_cursor(sort, last_entry) if has_more else None
+        }
+    
+    def query_projects(self, limit=None, offset=0, cursor=None, sort=None, record_type=None, fields=None):
+        """Query projects with paging (limit + cursor/offset), sorting, type filter and projection"""
+        return self._query('projects', limit, offset, cursor, sort, record_type, fields)
+    
+    def query_layouts(self, limit=None, offset=0, cursor=None, sort=None, fields=None):
+        """Query layouts with paging (limit + cursor/offset), sorting and projection"""
+        return self._query('layouts', limit, offset, cursor, sort, None, fields)
+    
+    # Batch Operations
+    def batch_get(self, collection, record_ids):
+        """Load many records at once; return a status entry per requested id"""
+        if len(record_ids) > MAX_BATCH_SIZE:
+            raise ValueError(f"Batch too large: at most {MAX_BATCH_SIZE} items")
+        
+        results = []
+        valid_ids = []
+        for record_id in record_ids:
+            try:
+                valid_ids.append(_validate_path(record_id))
+            except ValueError as e:
+                results.append({"id": record_id, "status": "invalid", "error": str(e)})
+                continue
+            results.append({"id": record_id, "status": None})
+        
+        wanted = set(valid_ids)
+        found = self.backend.get_many(collection, valid_ids)
+        for record_id, record in self._writer.pending_items(collection).items():
+            if record is DELETED:
+                found.pop(record_id, None)
+            elif record_id in wanted:
+                found[record_id] = copy.deepcopy(record)
+        
+        for result in results:
+            if result['status'] is None:
+                record = found.get(result['id'])
+                if record is None:
+                    result['status'] = "not_found"
+                else:
+                    result['status'] = "ok"
+                    result['record'] = record
+        return results
+    
+    def batch_upsert(self, collection, records):
+        """Validate every record, then write them all in one backend transaction
+        
+        Returns ``(ok, results)``. If any record is invalid nothing is
+        written and ``ok`` is False; ``results`` holds a status per record.
+        """
+        if len(records) > MAX_BATCH_SIZE:
+            raise ValueError(f"Batch too large: at most {MAX_BATCH_SIZE} items")
+        
+        results = []
+        for record in records:
+            record_id = record.get('id') if isinstance(record, dict) else None
+            try:
+                if not record_id:
+                    raise ValueError("Record must be an object with an 'id' field")
+                _validate_path(record_id)
+                results.append({"id": record_id, "status": "ok"})
+            except ValueError as e:
+                results.append({"id": record_id, "status": "invalid", "error": str(e)})
+        
+        if any(result['status'] != "ok" for result in results):
+            return False, results
+        
+        if collection == 'layouts':
+            saved_at = datetime.now().isoformat()
+            for record in records:
+                record['savedAt'] = saved_at
+                self._writer.cancel(('layouts', record['id']))
+        
+        self.backend.put_many(collection, [(record['id'], record) for record in records])
+        self._write_counts[collection] += 1
+        self._index_records(collection, records)
+        self._notify_change(collection)
+        logger.info(f"Batch saved {len(records)} {collection}")
+        return True, results
     
     # Settings Management
     def get_settings_file(self):
@@ -280,14 +555,17 @@ class AppDataManager:
     
     def load_settings(self):
         """Load application settings"""
+        pending = self._writer.get_pending(('settings', 'settings'))
+        if pending is not None:
+            return copy.deepcopy(pending)
+        
         settings_file = self.get_settings_file()
         
         if not settings_file.exists():
             return self._get_default_settings()
         
         try:
-            with open(settings_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return serialization.load_file(settings_file)
         except Exception as e:
             logger.error(f"Error loading settings: {e}")
             return self._get_default_settings()
@@ -296,8 +574,13 @@ class AppDataManager:
         """Save application settings"""
         settings_file = self.get_settings_file()
         
-        with open(settings_file, 'w', encoding='utf-8') as f:
-            json.dump(settings_data, f, indent=2)
+        self._writer.submit(
+            ('settings', 'settings'),
+            copy.deepcopy(settings_data),
+            lambda data: self._write_and_notify(
+                'settings', lambda: atomic_write_json(settings_file, data, serialization.PRETTY_JSON)
+            )
+        )
         
         logger.info("Saved application settings")
         return settings_file
@@ -339,8 +622,88 @@ class AppDataManager:
             return True
         return False
     
-    def get_storage_info(self):
-        """Get storage information"""
+    def collection_version(self, collection):
+        """Get a token that changes whenever a collection's content may have changed
+        
+        Combines a per-process epoch, the backend's version (which also
+        notices out-of-band changes) and a counter of this manager's writes
+        (which covers saves still queued in the write-behind buffer).
+        """
+        return f"{self._epoch}.{self.backend.version(collection)}.{self._write_counts[collection]}"
+    
+    def get_cache_stats(self):
+        """Get hit/miss counters of the in-memory collection caches"""
+        return self.backend.stats()
+    
+    def get_writer_stats(self):
+        """Get counters of the layout/settings write-behind queue"""
+        return self._writer.stats()
+    
+    def flush(self):
+        """Write all queued layout and settings saves (and deferred manifests) to disk"""
+        self._writer.flush()
+        self.backend.flush()
+    
+    def close(self):
+        """Flush queued writes, stop background scans and release the storage backend"""
+        self._scan_stop.set()
+        self._writer.close()
+        self.backend.close()
+    
+    def rebuild_manifest(self, collection):
+        """Rebuild a collection's manifest (_index.json) from its record files"""
+        self.backend.rebuild_index(collection)
+    
+    def invalidate_cache(self, collection=None):
+        """Force the given collection (or all of them) to be re-read from storage"""
+        if collection == 'settings':
+            return  # settings are read from disk every time
+        self.backend.invalidate(collection)
+    
+    def add_change_listener(self, callback):
+        """Call ``callback(collection)`` after this process writes to a collection or to 'settings'
+        
+        Queued layout and settings saves are reported once they reach storage.
+        """
+        self._change_listeners.append(callback)
+    
+    def _notify_change(self, collection):
+        for listener in list(self._change_listeners):
+            try:
+                listener(collection)
+            except Exception as e:
+                logger.error(f"AppData change listener failed: {e}")
+    
+    def _write_and_notify(self, collection, write):
+        result = write()
+        self._notify_change(collection)
+        return result
+    
+    def _write_queued(self, collection, write):
+        """Run a write from the write-behind queue and keep the query index current
+        
+        The index already holds the change (it was applied when queued), so
+        once the write lands only the index's version moves along with
+        storage's, unless something else changed storage in the meantime.
+        """
+        before = self.backend.version(collection)
+        result = self._write_and_notify(collection, write)
+        with self._query_lock:
+            index = self._query_indexes.get(collection)
+            if index is not None and index.version == before:
+                index.version = self.backend.version(collection)
+        return result
+    
+    def _collection_usage(self):
+        """Get record counts and bytes per collection from the backend's running totals"""
+        usage = {}
+        for collection in self.COLLECTIONS:
+            count, size = self.backend.usage(collection)
+            usage[collection] = {"count": count, "bytes": size}
+        return usage
+    
+    def reconcile_storage(self):
+        """Walk the whole AppData tree and re-baseline the storage totals"""
         def get_dir_size(path):
             total = 0
             try:
@@ -353,15 +716,60 @@ class AppDataManager:
                 logger.error(f"Error calculating size for {path}: {e}")
             return total
         
+        with self._scan_lock:
+            # Let the backend notice records changed behind its back first
+            for collection in self.COLLECTIONS:
+                self.backend.version(collection)
+            self.backend.flush()
+            total = get_dir_size(self.base_dir)
+            tracked = sum(u['bytes'] for u in self._collection_usage().values())
+            self._storage_scan = {
+                "otherBytes": max(total - tracked, 0),
+                "scannedAt": datetime.now().isoformat()
+            }
+        logger.debug(f"Reconciled AppData storage: {total} bytes")
+        return total
+    
+    def _ensure_storage_reconciler(self):
+        """Start the periodic background reconciliation scan if it is not running"""
+        if self._scan_thread is not None and self._scan_thread.is_alive():
+            return
+        
+        def run():
+            while not self._scan_stop.is_set():
+                try:
+                    self.reconcile_storage()
+                except Exception as e:
+                    logger.error(f"Error reconciling storage: {e}")
+                self._scan_stop.wait(self.storage_scan_interval)
+        
+        self._scan_stop.clear()
+        self._scan_thread = threading.Thread(target=run, name='appdata-storage-scan', daemon=True)
+        self._scan_thread.start()
+    
+    def get_storage_info(self):
+        """Get storage information
+        
+        Record counts and bytes are running totals kept by the save/delete
+        paths. Everything else (logs, cache, settings) comes from the last
+        background reconciliation scan, so this never walks the tree.
+        """
+        self._ensure_storage_reconciler()
+        usage = self._collection_usage()
+        tracked = sum(u['bytes'] for u in usage.values())
+        scan = self._storage_scan
+        
         return {
             "basePath": str(self.base_dir),
-            "totalSize": get_dir_size(self.base_dir),
-            "projects": len(self.list_projects()),
-            "themes": len(self.list_themes()),
-            "extensions": len(self.list_extensions()),
-            "layouts": len(self.list_layouts())
+            "totalSize": tracked + (scan['otherBytes'] if scan else 0),
+            "projects": usage['projects']['count'],
+            "themes": usage['themes']['count'],
+            "extensions": usage['extensions']['count'],
+            "layouts": usage['layouts']['count'],
+            "collections": usage,
+            "lastScan": scan['scannedAt'] if scan else None
         }
 
 
 # Global instance
-appdata_manager = AppDataManager()
+appdata_manager = AppDataManager(backend=DEFAULT_BACKEND)
@@ -0,0 +1,105 @@
+"""
+AI Assistant Streaming Benchmark
+================================
+
+Runs many concurrent requests on the deterministic fake backend and reports
+replies/second, events per reply and time to first chunk with per-token
+events against batched chunks, then measures how quickly a cancelled
+request ends.
+
+Run with:
+    python benchmarks/bench_ai.py
+    python benchmarks/bench_ai.py 200
+"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_assistant import AIRequestManager, FakeBackend  # noqa: E402
+
+CLIENTS = 8
+
+
+class Sink:
+    """Counts events and records when each request got its first chunk and finished."""
+
+    def __init__(self):
+        self.events = 0
+        self.first_chunk = {}
+        self.finished = {}
+        self.lock = threading.Lock()
+        self.done = threading.Condition(self.lock)
+
+    def __call__(self, client, event, payload):
+        now = time.perf_counter()
+        with self.lock:
+            self.events += 1
+            if event == 'ai_response_chunk':
+                self.first_chunk.setdefault(payload['id'], now)
+            else:
+                self.finished[payload['id']] = now
+                self.done.notify_all()
+
+    def wait(self, count):
+        with self.done:
+            self.done.wait_for(lambda: len(self.finished) >= count, 60)
+
+
+def start_thread(fn):
+    threading.Thread(target=fn, daemon=True).start()
+
+
+def run(requests, token_delay, chunk_chars, chunk_interval):
+    """Return (replies/s, events per reply, median ms to first chunk)."""
+    sink = Sink()
+    manager = AIRequestManager(
+        FakeBackend(token_delay=token_delay, repeat=20), sink, start_thread,
+        max_per_client=requests, max_concurrent=requests,
+        chunk_chars=chunk_chars, chunk_interval=chunk_interval
+    )
+    started = {}
+    start = time.perf_counter()
+    for n in range(requests):
+        request_id = f'r{n}'
+        started[request_id] = time.perf_counter()
+        manager.submit(f'client-{n % CLIENTS}', 'explain this function', 'Explain', request_id)
+    sink.wait(requests)
+    elapsed = time.perf_counter() - start
+    firsts = sorted(sink.first_chunk[r] - started[r] for r in started if r in sink.first_chunk)
+    return requests / elapsed, sink.events / requests, firsts[len(firsts) // 2] * 1000
+
+
+def cancel_latency(repeat=20):
+    """Return the median ms between cancel() and the final ai_response."""
+    sink = Sink()
+    manager = AIRequestManager(FakeBackend(token_delay=1.0), sink, start_thread)
+    latencies = []
+    for n in range(repeat):
+        request_id = f'c{n}'
+        manager.submit('client', 'a long request', 'Chat', request_id)
+        time.sleep(0.01)
+        cancelled_at = time.perf_counter()
+        manager.cancel('client', request_id)
+        sink.wait(n + 1)
+        latencies.append(sink.finished[request_id] - cancelled_at)
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1000
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    print(f"{requests} concurrent requests from {CLIENTS} clients, 80-word replies")
+    print(f"{'tokens':<14}{'chunking':<22}{'replies/s':>12}{'events/reply':>14}{'first chunk':>14}")
+    for token_delay, label in ((0, 'instant'), (0.002, '2 ms apart')):
+        for chunk_chars, chunk_interval, name in ((1, 0, 'one event per token'), (64, 0.05, '64 chars / 50 ms')):
+            rate, events, first = run(requests, token_delay, chunk_chars, chunk_interval)
+            print(f"{label:<14}{name:<22}{rate:>12,.0f}{events:>14.1f}{first:>12.1f}ms")
+    print(f"\nCancel to final ai_response (backend mid-wait): {cancel_latency():.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+API Serialization Benchmark
+===========================
+
+Compares response size and latency of /api/projects and /api/extensions
+with Flask's stock JSON provider, the orjson-backed provider, and the
+orjson-backed provider with gzip.
+
+Run with:
+    python benchmarks/bench_api.py
+    python benchmarks/bench_api.py 5000
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from appdata_manager import AppDataManager  # noqa: E402
+from bench_storage import make_project  # noqa: E402
+
+URLS = ['/api/projects', '/api/projects?full=true', '/api/extensions']
+
+
+def make_extension(i):
+    """Build an extension catalog entry of realistic size."""
+    return {
+        'id': f'extension-{i}',
+        'name': f'Extension {i}',
+        'version': f'1.{i % 10}.{i % 7}',
+        'author': 'AutoPilot Community',
+        'description': 'Adds language support, snippets and linting for a popular toolchain. ' * 3,
+        'installed': i % 3 == 0,
+        'enabled': i % 6 == 0,
+        'keywords': ['language', 'snippets', 'lint', f'tag{i % 20}']
+    }
+
+
+def measure(client, url, headers, repeat):
+    """Return (body bytes, median latency in ms) for ``url``."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        times.append(time.perf_counter() - start)
+    return len(response.data), statistics.median(times) * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    random.seed(42)
+    app = app_module.app
+    app.debug = False
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        manager = AppDataManager(base_dir=base_dir, write_delay=0)
+        manager.batch_upsert('projects', [make_project(i) for i in range(count)])
+        manager.batch_upsert('extensions', [make_extension(i) for i in range(count // 4)])
+        app_module.appdata_manager = manager
+
+        variants = [
+            ('stdlib json', DefaultJSONProvider(app), {}),
+            ('fast json', app_module.FastJSONProvider(app), {}),
+            ('fast json + gzip', app_module.FastJSONProvider(app), {'Accept-Encoding': 'gzip'})
+        ]
+        print(f"{count:,} projects, {count // 4:,} extensions")
+        print(f"{'endpoint':<26}{'variant':<18}{'bytes':>12}{'latency':>12}")
+        with app.test_client() as client:
+            for url in URLS:
+                for name, provider, headers in variants:
+                    app.json = provider
+                    size, latency = measure(client, url, headers, repeat=20)
+                    print(f"{url:<26}{name:<18}{size:>12,}{latency:>10.2f}ms")
+        manager.close()
+
+
+if __name__ == '__main__':
+    main()
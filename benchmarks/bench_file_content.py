@@ -0,0 +1,92 @@
+"""
+File Content Benchmark
+======================
+
+Writes a large log file (2 GB by default) through the streamed write path,
+then times ranged reads: the first page, a page from the middle and the last
+page by line number (cold and with the line index cached), a byte range
+near the end, and counting all lines. Peak Python heap use is measured for
+each step in a second, traced pass; it stays at a few megabytes however
+large the file is.
+
+Run with:
+    python benchmarks/bench_file_content.py
+    python benchmarks/bench_file_content.py 256
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_content import FileContent  # noqa: E402
+
+LINE = b'2024-01-01T00:00:00Z INFO request handled path=/api/projects status=200 ms=12\n'
+
+
+class LogStream:
+    """Readable stream of ``size`` bytes of log lines, repeating one 1 MB block"""
+
+    def __init__(self, size):
+        self.remaining = size
+        self.block = LINE * (1024 * 1024 // len(LINE))
+
+    def read(self, size):
+        data = self.block[:min(size, self.remaining)]
+        self.remaining -= len(data)
+        return data
+
+
+def steps(size):
+    """(label, fn(files)) for each timed read"""
+    middle = size // len(LINE) // 2
+    total = size // len(LINE) + (1 if size % len(LINE) else 0)
+    return [
+        ("lines 1-1000", lambda files: files.read_lines('big.log', line=1, count=1000)),
+        (f"lines {middle:,}+ (cold index)", lambda files: files.read_lines('big.log', line=middle, count=1000)),
+        (f"lines {middle:,}+ (cached index)", lambda files: files.read_lines('big.log', line=middle, count=1000)),
+        ("count all lines", lambda files: files.read_lines('big.log', count=1, total=True)),
+        (f"last 1000 lines (of {total:,})", lambda files: files.read_lines('big.log', line=total - 999, count=1000)),
+        ("256 KB byte range at 90%", lambda files: files.read_bytes('big.log', offset=size * 9 // 10)),
+    ]
+
+
+def run(fn, trace):
+    """Return (ms, peak traced bytes or None); tracing slows the call, so time and trace separately"""
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    peak = tracemalloc.get_traced_memory()[1] if trace else None
+    if trace:
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 2048
+    size = megabytes * 1024 * 1024
+    workdir = tempfile.mkdtemp()
+    try:
+        print(f"{'step':<42}{'time':>13}{'peak heap':>13}")
+        write_ms, _ = run(lambda: FileContent(workdir).write('big.log', LogStream(size)), trace=False)
+        _, write_peak = run(lambda: FileContent(workdir).write('big.log', LogStream(size)), trace=True)
+        print(f"{f'streamed write of {megabytes:,} MB':<42}{write_ms:>10.1f} ms{write_peak / 1e6:>10.1f} MB")
+
+        # Each pass starts without cached line indexes
+        timed, traced = FileContent(workdir), FileContent(workdir)
+        for label, fn in steps(size):
+            elapsed, _ = run(lambda: fn(timed), trace=False)
+            _, peak = run(lambda: fn(traced), trace=True)
+            print(f"{label:<42}{elapsed:>10.1f} ms{peak / 1e6:>10.1f} MB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
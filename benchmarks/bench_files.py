@@ -0,0 +1,67 @@
+"""
+File Tree Benchmark
+===================
+
+Builds a project of many files (by default 500 folders of 1,000 files, plus
+one flat folder of 100,000 files) and measures the time to list the project
+root, a folder and pages deep into the flat folder, cold and from the
+listing cache, against walking the whole tree with os.walk.
+
+Run with:
+    python benchmarks/bench_files.py
+    python benchmarks/bench_files.py 100 1000 20000
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_tree import FileTree  # noqa: E402
+
+
+def make_tree(root, folders, files_per_folder, flat_files):
+    for i in range(folders):
+        folder = os.path.join(root, f'package_{i:04d}')
+        os.mkdir(folder)
+        for j in range(files_per_folder):
+            open(os.path.join(folder, f'module_{j:05d}.py'), 'w').close()
+    flat = os.path.join(root, 'assets')
+    os.mkdir(flat)
+    for j in range(flat_files):
+        open(os.path.join(flat, f'image_{j:06d}.png'), 'w').close()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    folders, per_folder, flat = (int(arg) for arg in (sys.argv[1:] + ['500', '1000', '100000'][len(sys.argv) - 1:]))
+    with tempfile.TemporaryDirectory() as root:
+        print(f"Creating {folders * per_folder + flat:,} files...")
+        make_tree(root, folders, per_folder, flat)
+        tree = FileTree(root)
+
+        print(f"{'request':<46}{'cold':>10}{'cached':>10}")
+        for label, path in (('project root (first page)', ''), ('one folder (first page)', 'package_0000'),
+                            (f'flat folder of {flat:,} (first page)', 'assets')):
+            tree.invalidate()
+            cold, _ = timed(lambda: tree.list(path))
+            warm, _ = timed(lambda: tree.list(path))
+            print(f"{label:<46}{cold:>8.2f}ms{warm:>8.2f}ms")
+
+        page = tree.list('assets', offset=flat // 2)
+        cursor_ms, _ = timed(lambda: tree.list('assets', cursor=page['nextCursor']))
+        print(f"{'flat folder, page by cursor at 50%':<46}{'':>10}{cursor_ms:>8.2f}ms")
+
+        walk_ms, count = timed(lambda: sum(len(names) for _, _, names in os.walk(root)))
+        print(f"\nos.walk of the whole tree ({count:,} files): {walk_ms:,.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
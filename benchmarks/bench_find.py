@@ -0,0 +1,100 @@
+"""
+Path Index Benchmark
+====================
+
+Generates the paths of a large monorepo (1,000,000 files by default, about
+15 per directory, in a few dozen top-level projects), indexes them and times
+quick-open queries: narrow and broad fuzzy queries, a path-style query, a
+query with no matches and one limited to a project. Also reports the time
+to add and remove a file and the time to build the index. No files are
+written; the paths are indexed directly.
+
+Run with:
+    python benchmarks/bench_find.py
+    python benchmarks/bench_find.py 200000
+"""
+
+import gc
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from path_index import PathIndex  # noqa: E402
+
+PROJECTS = ['web', 'api', 'mobile', 'billing', 'search', 'auth', 'infra', 'data', 'ml', 'tools', 'docs', 'admin']
+DIRS = [
+    'src', 'lib', 'components', 'models', 'views', 'utils', 'services', 'handlers', 'tests', 'internal',
+    'core', 'common', 'config', 'store', 'hooks', 'pages', 'widgets', 'client', 'server', 'migrations'
+]
+WORDS = [
+    'user', 'account', 'session', 'request', 'response', 'router', 'controller', 'helper', 'parser', 'loader',
+    'render', 'widget', 'button', 'dialog', 'store', 'cache', 'auth', 'token', 'invoice', 'payment', 'search',
+    'index', 'query', 'schema', 'event', 'queue', 'worker', 'client', 'settings', 'profile'
+]
+EXTENSIONS = ['.py', '.js', '.ts', '.tsx', '.css', '.md', '.json', '.go', '_test.py', '.spec.ts']
+
+# (label, query, project)
+QUERIES = [
+    ('file name', 'usercontroller', None),
+    ('abbreviation', 'usrctl', None),
+    ('name and extension', 'invoice.py', None),
+    ('path fragments', 'billing/models/payment', None),
+    ('two letters', 'rt', None),
+    ('one letter', 'x', None),
+    ('no match', 'zzqj', None),
+    ('in one project', 'sessionstore', 'auth'),
+]
+
+
+def make_paths(count):
+    rng = random.Random(7)
+    paths = {}
+    while len(paths) < count:
+        directory = '/'.join([rng.choice(PROJECTS)] + [rng.choice(DIRS) for _ in range(rng.randint(1, 5))])
+        for _ in range(rng.randint(5, 25)):
+            name = '_'.join(rng.sample(WORDS, rng.randint(1, 3)))
+            paths[f"{directory}/{name}{rng.choice(EXTENSIONS)}"] = None
+    return list(paths)[:count]
+
+
+def timed(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(f"Generating {count:,} paths...")
+    paths = make_paths(count)
+
+    index = PathIndex(os.getcwd())
+    build_ms, _ = timed(lambda: index._rebuild(paths), repeat=1)
+    index.ready = True
+    del paths
+    gc.collect()
+    print(f"Indexed {len(index._ids):,} paths in {build_ms / 1000:.1f} s\n")
+
+    print(f"{'query':<42}{'time':>10}{'candidates':>12}{'examined':>10}  top result")
+    for label, query, project in QUERIES:
+        elapsed, result = timed(lambda: index.find(query, project=project))
+        top = result['results'][0]['path'] if result['results'] else '-'
+        mark = '*' if result['truncated'] else ''
+        print(f"{label + ' ' + repr(query):<42}{elapsed:>8.1f}ms{result['candidates']:>12,}"
+              f"{result['examined']:>9,}{mark:1}  {top}")
+    print("\n* candidate budget reached; the best of the shortest candidates are returned")
+
+    add_ms, _ = timed(lambda: index._add('web/src/brand_new_file.py'), repeat=1)
+    remove_ms, _ = timed(lambda: index._remove_tree('web/src/brand_new_file.py'), repeat=1)
+    print(f"\nAdd one path: {add_ms:.2f} ms, remove one path: {remove_ms:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
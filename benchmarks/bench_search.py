@@ -0,0 +1,124 @@
+"""
+Search Index Benchmark
+======================
+
+Generates a project of source-like files (by default 3,000 files of about
+16 KB), builds the trigram index, and compares query latency with
+``grep -rn`` for rare and common literals, a case-insensitive literal and a
+regular expression, both for every match and for the first page of matches
+that /api/search returns by default. Also reports the time to load the saved index and to
+re-index one changed file.
+
+Run with:
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py 1000 32
+"""
+
+import os
+import sys
+import time
+import random
+import itertools
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SEARCH_RESULTS, SearchIndex  # noqa: E402
+
+WORDS = [
+    'self', 'return', 'value', 'result', 'config', 'request', 'response', 'items', 'index', 'data',
+    'path', 'name', 'count', 'error', 'logger', 'cache', 'client', 'server', 'options', 'state',
+]
+
+# (label, query, regex, case_sensitive, grep flags)
+QUERIES = [
+    ('rare identifier (3 files)', 'reconcile_ledger_entries', False, True, ['-F']),
+    ('common word', 'return result', False, True, ['-F']),
+    ('literal, ignoring case', 'HTTPConnectionPool', False, False, ['-F', '-i']),
+    ('regex', r'def \w+_handler\(self', True, True, ['-E']),
+]
+
+
+def make_tree(root, files, kilobytes):
+    rng = random.Random(7)
+    planted = {'reconcile_ledger_entries': {5, files // 2, files - 1}, 'httpconnectionpool': {11, 12}}
+    for n in range(files):
+        directory = os.path.join(root, f'pkg_{n // 100:03d}')
+        os.makedirs(directory, exist_ok=True)
+        lines = []
+        size = 0
+        while size < kilobytes * 1024:
+            a, b, c = rng.choice(WORDS), rng.choice(WORDS), rng.choice(WORDS)
+            if rng.random() < 0.05:
+                line = f'def {a}_{b}_{rng.randrange(10 ** 6)}_handler({c}):'
+            else:
+                line = f'    {a}_{rng.randrange(10 ** 4)} = {b}.{c}({rng.randrange(10 ** 6)})'
+                if rng.random() < 0.1:
+                    line = f'    return result  # {a} {b}'
+            lines.append(line)
+            size += len(line) + 1
+        for token, where in planted.items():
+            if n in where:
+                lines.insert(len(lines) // 2, f'    {token}(self)')
+        with open(os.path.join(directory, f'module_{n:05d}.py'), 'w') as f:
+            f.write('\n'.join(lines))
+
+
+def timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    kilobytes = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    workdir = tempfile.mkdtemp()
+    try:
+        root = os.path.join(workdir, 'projects')
+        index_path = os.path.join(workdir, 'search-index.bin')
+        print(f"Generating {files:,} files of ~{kilobytes} KB...")
+        make_tree(root, files, kilobytes)
+
+        index = SearchIndex(root, index_path)
+        build_ms, _ = timed(index.build, repeat=1)
+        stats = index.stats()
+        print(f"Built index in {build_ms / 1000:.1f} s: {stats['trigrams']:,} trigrams, "
+              f"{stats['postings']:,} postings, {os.path.getsize(index_path) / 1e6:.1f} MB on disk")
+        load_ms, _ = timed(lambda: SearchIndex(root, index_path).load(), repeat=1)
+        print(f"Loaded saved index in {load_ms:.0f} ms")
+
+        changed = os.path.join(root, 'pkg_000', 'module_00000.py')
+        with open(changed, 'a') as f:
+            f.write('\n    freshly_added_symbol()\n')
+        update_ms, _ = timed(lambda: index._update(['pkg_000/module_00000.py']), repeat=1)
+        print(f"Re-indexed one changed file in {update_ms:.1f} ms\n")
+
+        have_grep = shutil.which('grep') is not None
+        print(f"{'query':<30}{'matches':>9}{'candidates':>12}{'first ' + str(SEARCH_RESULTS):>11}"
+              f"{'all':>11}{'grep -rn':>11}")
+        for label, query, regex, case_sensitive, grep_flags in QUERIES:
+            def run(limit=None):
+                candidates, matches = index.search(query, regex=regex, case_sensitive=case_sensitive)
+                return candidates, sum(1 for _ in itertools.islice(matches, limit))
+            page_ms, _ = timed(lambda: run(SEARCH_RESULTS))
+            index_ms, (candidates, count) = timed(run)
+            grep_text = 'n/a'
+            if have_grep:
+                grep_ms, _ = timed(lambda: subprocess.run(
+                    ['grep', '-rn', *grep_flags, query, root], stdout=subprocess.DEVNULL
+                ))
+                grep_text = f"{grep_ms:.1f}ms"
+            print(f"{label:<30}{count:>9,}{candidates:>12,}{page_ms:>9.1f}ms{index_ms:>9.1f}ms{grep_text:>11}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
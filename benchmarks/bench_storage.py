@@ -0,0 +1,94 @@
+"""
+Storage Backend Benchmark
+=========================
+
+Compares the JSON-file and SQLite AppData backends at 10k and 100k records.
+
+Run with:
+    python benchmarks/bench_storage.py
+    python benchmarks/bench_storage.py 1000,10000
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage_backends import JSONFileBackend, SQLiteBackend  # noqa: E402
+
+BACKENDS = {
+    'json': lambda base_dir: JSONFileBackend(base_dir),
+    'sqlite': lambda base_dir: SQLiteBackend(os.path.join(base_dir, 'appdata.db'))
+}
+
+
+def make_project(i):
+    """Build a project record of realistic size."""
+    return {
+        'id': f'project-{i}',
+        'name': f'Project {i}',
+        'path': f'/home/user/projects/project-{i}',
+        'type': random.choice(['Python', 'JavaScript', 'Go']),
+        'createdAt': f'2024-01-01T00:00:{i % 60:02d}',
+        'lastOpened': f'2024-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:00:00',
+        'files': [{'name': f'file{j}.py', 'type': 'file'} for j in range(10)]
+    }
+
+
+def timed(fn, repeat=1):
+    """Return the best wall time of ``repeat`` runs in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench(name, count):
+    """Benchmark one backend at one collection size."""
+    results = {}
+    records = [(f'project-{i}', make_project(i)) for i in range(count)]
+    ids = [record_id for record_id, _ in records]
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        backend = BACKENDS[name](base_dir)
+        results['bulk load'] = timed(lambda: backend.put_many('projects', records))
+        backend.close()
+
+        # A fresh instance models a server restart
+        backend = BACKENDS[name](base_dir)
+        results['summaries (cold)'] = timed(lambda: backend.summaries('projects'))
+        results['summaries (warm)'] = timed(lambda: backend.summaries('projects'), repeat=3)
+        results['full list (cold)'] = timed(lambda: backend.list('projects'))
+        results['full list (warm)'] = timed(lambda: backend.list('projects'), repeat=3)
+
+        sample = random.sample(ids, 1000)
+        results['1000 gets'] = timed(lambda: [backend.get('projects', record_id) for record_id in sample])
+
+        updates = [make_project(i) for i in random.sample(range(count), 20)]
+        results['put (per op)'] = timed(
+            lambda: [backend.put('projects', record['id'], record) for record in updates]
+        ) / len(updates)
+        backend.close()
+
+    return results
+
+
+def main():
+    sizes = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else '10000,100000').split(',')]
+    random.seed(42)
+
+    for count in sizes:
+        print(f"\n=== {count:,} projects ===")
+        rows = {name: bench(name, count) for name in BACKENDS}
+        print(f"{'operation':<20}" + ''.join(f"{name:>12}" for name in rows))
+        for operation in rows['json']:
+            print(f"{operation:<20}" + ''.join(f"{rows[name][operation]:>10.1f}ms" for name in rows))
+
+
+if __name__ == '__main__':
+    main()
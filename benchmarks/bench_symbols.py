@@ -0,0 +1,97 @@
+"""
+Symbol Index Benchmark
+======================
+
+Generates a project of Python modules (by default 2,000 modules of about
+300 lines), then times a cold build parsing in-process and with a process
+pool, a restart that reuses the manifest and cache, re-indexing one
+changed file, and exact and prefix lookups.
+
+Run with:
+    python benchmarks/bench_symbols.py
+    python benchmarks/bench_symbols.py 500 4
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from symbol_index import SymbolIndex  # noqa: E402
+
+WORDS = ['load', 'save', 'parse', 'render', 'fetch', 'update', 'build', 'check', 'close', 'open']
+
+
+def make_tree(root, files):
+    rng = random.Random(7)
+    for n in range(files):
+        directory = os.path.join(root, f'pkg_{n // 100:03d}')
+        os.makedirs(directory, exist_ok=True)
+        lines = ['import os', 'from collections import OrderedDict', '']
+        for c in range(6):
+            lines.append(f'class Model{n}_{c}(object):')
+            for m in range(8):
+                lines.append(f'    def {rng.choice(WORDS)}_{m}(self, value):')
+                lines.extend([f'        result = value * {m}', '        if result:', '            return result',
+                              '        return None', ''])
+        for f in range(10):
+            lines.extend([f'def {rng.choice(WORDS)}_helper_{n}_{f}(path):', '    return os.path.basename(path)', ''])
+        with open(os.path.join(directory, f'module_{n:05d}.py'), 'w') as out:
+            out.write('\n'.join(lines))
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    workdir = tempfile.mkdtemp()
+    try:
+        root = os.path.join(workdir, 'projects')
+        print(f"Generating {files:,} modules...")
+        make_tree(root, files)
+
+        inline_ms, _ = timed(SymbolIndex(root, os.path.join(workdir, 'inline'), workers=0).build)
+        print(f"{'cold build, in-process':<40}{inline_ms:>10.0f} ms")
+
+        index = SymbolIndex(root, os.path.join(workdir, 'pool'), workers=workers)
+        try:
+            pool_ms, _ = timed(index.build)
+            print(f"{f'cold build, {workers} worker processes':<40}{pool_ms:>10.0f} ms")
+        finally:
+            index.stop()
+
+        restarted = SymbolIndex(root, os.path.join(workdir, 'pool'), workers=workers)
+        restart_ms, _ = timed(restarted.build)
+        print(f"{'restart with manifest and cache':<40}{restart_ms:>10.0f} ms  "
+              f"({restarted.stats()['parsed']} parsed)")
+
+        changed = os.path.join(root, 'pkg_000', 'module_00000.py')
+        with open(changed, 'a') as out:
+            out.write('\n\ndef freshly_added():\n    pass\n')
+        update_ms, parsed = timed(lambda: restarted.reindex(['pkg_000/module_00000.py']))
+        print(f"{'re-index one changed file':<40}{update_ms:>10.1f} ms  ({parsed} parsed)")
+
+        stats = restarted.stats()
+        print(f"\n{stats['files']:,} files, {stats['names']:,} distinct names")
+        for label, fn in [
+            ("exact lookup 'freshly_added'", lambda: restarted.lookup('freshly_added')),
+            ("exact lookup 'load_0' (many)", lambda: restarted.lookup('load_0')),
+            ("prefix lookup 'render_helper_1'", lambda: restarted.lookup('render_helper_1', match='prefix')),
+        ]:
+            elapsed, found = timed(fn)
+            print(f"{label:<40}{elapsed:>10.2f} ms  ({len(found)} results)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Terminal Fast Path Benchmark
+============================
+
+Measures commands per second for pwd, ls, cat, head, tail, wc, echo and
+date answered in-process by fast_commands, against spawning the real
+program (run_streaming) and, where PTYs are available, running it in a
+persistent shell session.
+
+Run with:
+    python benchmarks/bench_terminal.py
+    python benchmarks/bench_terminal.py 500
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fast_commands import run_fast  # noqa: E402
+from terminal import ShellSession, run_streaming, sessions_supported  # noqa: E402
+
+COMMANDS = [
+    ['pwd'],
+    ['echo', 'hello', 'world'],
+    ['date', '+%F'],
+    ['ls', '-A'],
+    ['cat', 'module.py'],
+    ['head', '-n', '20', 'module.py'],
+    ['tail', '-n', '20', 'app.log'],
+    ['wc', 'module.py', 'app.log']
+]
+
+
+def make_workspace(base_dir):
+    """Create a small project directory to run the commands in."""
+    for i in range(200):
+        open(os.path.join(base_dir, f'file_{i:03d}.txt'), 'w').close()
+    with open(os.path.join(base_dir, 'module.py'), 'w') as f:
+        f.write(''.join(f'def function_{i}(value):\n    return value * {i}\n\n' for i in range(150)))
+    with open(os.path.join(base_dir, 'app.log'), 'w') as f:
+        f.write(''.join(f'2024-01-01 12:00:{i % 60:02d} INFO request {i} served\n' for i in range(50000)))
+
+
+def rate(run, repeat):
+    """Return commands per second for ``repeat`` calls of ``run``."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return repeat / (time.perf_counter() - start)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    discard = lambda *args: None  # noqa: E731
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        make_workspace(base_dir)
+        session = None
+        if sessions_supported():
+            session = ShellSession(base_dir)
+            session.start()
+
+        print(f"{repeat} runs per command (commands/second)")
+        print(f"{'command':<28}{'subprocess':>12}{'session':>12}{'in-process':>12}{'speedup':>10}")
+        for parts in COMMANDS:
+            assert run_fast(parts, discard, base_dir) is not None, parts
+            spawned = rate(lambda: run_streaming(parts, discard, cwd=base_dir), repeat)
+            in_shell = rate(lambda: session.run(' '.join(parts), discard), repeat) if session else float('nan')
+            fast = rate(lambda: run_fast(parts, discard, base_dir), repeat * 10)
+            print(f"{' '.join(parts):<28}{spawned:>12,.0f}{in_shell:>12,.0f}{fast:>12,.0f}{fast / spawned:>9.0f}x")
+
+        if session:
+            session.close()
+
+
+if __name__ == '__main__':
+    main()
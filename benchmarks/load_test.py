@@ -0,0 +1,171 @@
+"""
+HTTP Load Test
+==============
+
+Starts the server three ways - the development server (``python app.py``),
+``server.py`` in eventlet mode and ``server.py`` in threading mode - and
+reports requests/second and latency percentiles for a mix of API reads
+under concurrent keep-alive clients.
+
+Run with:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --concurrency 64 --duration 20 --workers 2
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_storage import make_project  # noqa: E402
+
+URLS = ['/api/projects', '/api/settings', '/api/extensions', '/api/projects?full=true']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/settings')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def client_process(port, threads, duration, results):
+    """Run ``threads`` keep-alive clients for ``duration`` seconds; report latencies."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def run(offset):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        mine = []
+        i = offset
+        while time.monotonic() < stop_at:
+            url = URLS[i % len(URLS)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                connection.request('GET', url, headers={'Accept-Encoding': 'gzip'})
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise OSError(response.status)
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                continue
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    workers = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results.put((latencies, errors[0]))
+
+
+def load(port, concurrency, duration):
+    """Return (requests/second, p50 ms, p99 ms, errors)."""
+    processes = max(1, min(concurrency, multiprocessing.cpu_count() // 2 or 1))
+    results = multiprocessing.Queue()
+    clients = [
+        multiprocessing.Process(
+            target=client_process,
+            args=(port, concurrency // processes + (n < concurrency % processes), duration, results)
+        )
+        for n in range(processes)
+    ]
+    for client in clients:
+        client.start()
+    latencies = []
+    errors = 0
+    for _ in clients:
+        batch, failed = results.get()
+        latencies.extend(batch)
+        errors += failed
+    for client in clients:
+        client.join()
+    latencies.sort()
+    if not latencies:
+        return 0.0, 0.0, 0.0, errors
+    return (
+        len(latencies) / duration,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        errors
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--projects', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        # The app keeps AppData under ~/.config on Linux
+        from appdata_manager import AppDataManager
+        manager = AppDataManager(base_dir=os.path.join(home, '.config', 'AutoPilot-IDE'), write_delay=0)
+        manager.batch_upsert('projects', [make_project(i) for i in range(args.projects)])
+        manager.close()
+
+        env = dict(os.environ, HOME=home, SECRET_KEY='load-test', DEBUG='False', WATCH_ENABLED='false',
+                   PROJECTS_DIR=os.path.join(home, 'projects'), UPLOAD_FOLDER=os.path.join(home, 'uploads'),
+                   BROWSER='true')
+        variants = [
+            ('dev server (app.py)', [sys.executable, 'app.py'], {'FLASK_ENV': 'development'}),
+            (f'server.py eventlet x{args.workers}',
+             [sys.executable, 'server.py', '--async-mode', 'eventlet', '--workers', str(args.workers)], {}),
+            (f'server.py threading x{args.workers}',
+             [sys.executable, 'server.py', '--async-mode', 'threading', '--workers', str(args.workers)], {})
+        ]
+
+        print(f"{args.concurrency} clients, {args.duration:g}s per server, {args.projects} projects")
+        print(f"{'server':<30}{'req/s':>10}{'p50':>10}{'p99':>10}{'errors':>8}")
+        for name, command, extra_env in variants:
+            port = free_port()
+            command = command + (['--bind', f'127.0.0.1:{port}'] if 'server.py' in command else [])
+            process = subprocess.Popen(
+                command, cwd=ROOT, env=dict(env, HOST='127.0.0.1', PORT=str(port), **extra_env),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                wait_ready(port)
+                rps, p50, p99, errors = load(port, args.concurrency, args.duration)
+                print(f"{name:<30}{rps:>10,.0f}{p50:>8.1f}ms{p99:>8.1f}ms{errors:>8}")
+            except RuntimeError as e:
+                print(f"{name:<30}{e}")
+            finally:
+                process.terminate()
+                process.wait(timeout=60)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,12 @@ class Config:
     PROJECTS_DIR = os.environ.get('PROJECTS_DIR', './projects')
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', './uploads')
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB default
+    GZIP_MIN_SIZE = int(os.environ.get('GZIP_MIN_SIZE', 1024))  # Smallest response body worth compressing
+    GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 3))
+    ASYNC_MODE = os.environ.get('ASYNC_MODE', 'threading')  # Socket.IO async mode: eventlet or threading
+    GRACEFUL_TIMEOUT = int(os.environ.get('GRACEFUL_TIMEOUT', 30))  # Seconds to let terminal commands finish on shutdown
+    MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')  # Shared by workers, e.g. tcp://127.0.0.1:5557 or redis://
+    MESSAGE_QUEUE_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'autopilot-ide')
     
     # Ensure directories exist
     Path(PROJECTS_DIR).mkdir(parents=True, exist_ok=True)
@@ -25,6 +31,9 @@ class ProductionConfig(Config):
     ENV = 'production'
     HOST = os.environ.get('HOST', '0.0.0.0')
     PORT = int(os.environ.get('PORT', 8000))
+    ASYNC_MODE = os.environ.get('ASYNC_MODE', 'eventlet')
+    WORKERS = int(os.environ.get('WORKERS', 1))
+    THREADS = int(os.environ.get('THREADS', 100))  # Connections per worker in threading mode
     
     @classmethod
     def validate(cls):
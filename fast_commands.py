@@ -0,0 +1,451 @@
+"""
+In-Process Terminal Commands for AutoPilot IDE
+Answers common read-only commands without spawning a process
+
+Supported subset (anything else falls back to the real program):
+
+    pwd                      no options
+    echo [-n] [ARG...]       no -e/-E
+    date [-u] [+FORMAT]
+    ls [-1aA] [PATH...]      one name per line, sorted by code point
+    cat FILE...              no options, no stdin
+    head [-n N | -N] FILE...
+    tail [-n N | -N] FILE... no -f
+    wc [-lwmc] FILE...
+
+Only regular files are read here; FIFOs, devices and other special files
+are left to the real program, which runs under the usual timeout.
+Commands with shell pattern, expansion or control characters in their
+arguments (globs, ``$``, ``~``, pipes, redirections, ...) are never handled
+here, because a shell session would have given them a meaning.
+"""
+import os
+import stat
+import time
+import errno
+import codecs
+import signal
+import logging
+
+from terminal import CommandResult, TERMINAL_MAX_OUTPUT, _OutputLimit, command_timeout
+
+logger = logging.getLogger(__name__)
+
+# Set TERMINAL_FAST_PATH=false to always run the real programs
+TERMINAL_FAST_PATH = os.environ.get('TERMINAL_FAST_PATH', 'true').lower() == 'true'
+
+READ_CHUNK_SIZE = 64 * 1024
+
+_SHELL_SPECIAL = set('*?[]{}~!\\$`|&;<>()#\'"')
+
+
+class Unsupported(Exception):
+    """Raised when a command uses something outside the supported subset"""
+
+
+def _resolve(cwd, path):
+    return path if os.path.isabs(path) else os.path.join(cwd, path)
+
+
+def _error(program, message):
+    return ('stderr', f"{program}: {message}\n")
+
+
+def _describe(error):
+    if isinstance(error, FileNotFoundError):
+        return "No such file or directory"
+    if isinstance(error, IsADirectoryError):
+        return "Is a directory"
+    if isinstance(error, PermissionError):
+        return "Permission denied"
+    return error.strerror or str(error)
+
+
+def _count_option(args, program):
+    """Parse ``-n N``, ``-nN`` or ``-N``; return (count, files)"""
+    count = 10
+    files = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == '-n' and i + 1 < len(args):
+            value = args[i + 1]
+            i += 1
+        elif arg.startswith('-n') and len(arg) > 2:
+            value = arg[2:]
+        elif arg.startswith('-') and arg[1:].isdigit():
+            value = arg[1:]
+        elif arg.startswith('-') and arg != '-':
+            raise Unsupported(f"{program} {arg}")
+        else:
+            files.append(arg)
+            i += 1
+            continue
+        if not value.isdigit():
+            raise Unsupported(f"{program} -n {value}")
+        count = int(value)
+        i += 1
+    if not files or '-' in files:
+        raise Unsupported(f"{program} without files")
+    return count, files
+
+
+def _split_flags(args, allowed, program):
+    """Split leading single-letter flags from operands"""
+    flags = set()
+    operands = []
+    for arg in args:
+        if arg.startswith('-') and len(arg) > 1 and not operands:
+            letters = arg[1:]
+            if not set(letters) <= set(allowed):
+                raise Unsupported(f"{program} {arg}")
+            flags.update(letters)
+        else:
+            operands.append(arg)
+    return flags, operands
+
+
+def _require_regular(program, cwd, files):
+    """Decline operands that are neither regular files nor directories
+
+    Reading a FIFO or a device such as /dev/zero can block or never end.
+    Missing files and directories are reported by the command itself.
+    """
+    for path in files:
+        try:
+            mode = os.stat(_resolve(cwd, path)).st_mode
+        except OSError:
+            continue
+        if not stat.S_ISREG(mode) and not stat.S_ISDIR(mode):
+            raise Unsupported(f"{program} {path}: not a regular file")
+
+
+# Commands. Each takes (args, cwd) and yields (stream, text) chunks; the
+# exit status is the generator's return value. A None chunk carries no
+# output and only lets run_fast check for cancellation and the timeout.
+
+def _pwd(args, cwd):
+    if args:
+        raise Unsupported("pwd with arguments")
+    yield ('stdout', cwd + '\n')
+    return 0
+
+
+def _is_echo_option(arg):
+    """Whether bash's echo takes ``arg`` as options (-n, -e, -E in any mix)"""
+    return len(arg) > 1 and arg[0] == '-' and set(arg[1:]) <= set('neE')
+
+
+def _echo(args, cwd):
+    newline = True
+    if args and args[0] == '-n':
+        newline = False
+        args = args[1:]
+    # Any other option (-e, -nE, a second -n, ...) changes escapes or would
+    # be taken as an option rather than printed; leave those to bash
+    if args and _is_echo_option(args[0]):
+        raise Unsupported(f"echo {args[0]}")
+    yield ('stdout', ' '.join(args) + ('\n' if newline else ''))
+    return 0
+
+
+def _date(args, cwd):
+    utc = False
+    fmt = '%a %b %e %H:%M:%S %Z %Y'
+    for arg in args:
+        if arg == '-u':
+            utc = True
+        elif arg.startswith('+'):
+            fmt = arg[1:]
+        else:
+            raise Unsupported(f"date {arg}")
+    now = time.gmtime() if utc else time.localtime()
+    if utc:
+        fmt = fmt.replace('%Z', 'UTC')
+    yield ('stdout', time.strftime(fmt, now) + '\n')
+    return 0
+
+
+def _ls(args, cwd):
+    flags, paths = _split_flags(args, '1aA', 'ls')
+    show_all = 'a' in flags
+    almost_all = 'A' in flags
+    paths = paths or ['.']
+    status = 0
+
+    files = []
+    directories = []
+    for path in paths:
+        full = _resolve(cwd, path)
+        if os.path.isdir(full):
+            directories.append((path, full))
+        elif os.path.lexists(full):
+            files.append(path)
+        else:
+            yield _error('ls', f"cannot access '{path}': No such file or directory")
+            status = 2
+
+    for path in sorted(files):
+        yield ('stdout', path + '\n')
+
+    show_headers = len(paths) > 1
+    for index, (path, full) in enumerate(sorted(directories)):
+        if show_headers:
+            yield ('stdout', ('\n' if files or index else '') + f"{path}:\n")
+        try:
+            with os.scandir(full) as entries:
+                names = [entry.name for entry in entries]
+        except OSError as e:
+            yield _error('ls', f"cannot open directory '{path}': {_describe(e)}")
+            status = 2
+            continue
+        if show_all:
+            names += ['.', '..']
+        elif not almost_all:
+            names = [name for name in names if not name.startswith('.')]
+        if names:
+            yield ('stdout', '\n'.join(sorted(names)) + '\n')
+    return status
+
+
+def _open_each(program, cwd, files):
+    """Yield (path, open binary file) pairs, reporting files that cannot be opened"""
+    for path in files:
+        try:
+            f = _open_regular(_resolve(cwd, path))
+        except OSError as e:
+            yield path, None, _error(program, f"{path}: {_describe(e)}")
+            continue
+        yield path, f, None
+
+
+def _open_regular(path):
+    """Open a regular file for reading without blocking on a FIFO swapped in after the stat"""
+    fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    try:
+        mode = os.fstat(fd).st_mode
+        if stat.S_ISDIR(mode):
+            raise IsADirectoryError(errno.EISDIR, os.strerror(errno.EISDIR), path)
+        if not stat.S_ISREG(mode):
+            raise OSError(errno.EINVAL, "Not a regular file", path)
+    except OSError:
+        os.close(fd)
+        raise
+    return os.fdopen(fd, 'rb')
+
+
+def _decode(data):
+    return data.decode('utf-8', errors='replace')
+
+
+def _cat(args, cwd):
+    if not args or any(arg.startswith('-') for arg in args):
+        raise Unsupported("cat options or stdin")
+    _require_regular('cat', cwd, args)
+    status = 0
+    for path, f, error in _open_each('cat', cwd, args):
+        if error:
+            yield error
+            status = 1
+            continue
+        with f:
+            try:
+                while True:
+                    data = f.read(READ_CHUNK_SIZE)
+                    if not data:
+                        break
+                    yield ('stdout', _decode(data))
+            except IsADirectoryError:
+                yield _error('cat', f"{path}: Is a directory")
+                status = 1
+    return status
+
+
+def _head(args, cwd):
+    count, files = _count_option(args, 'head')
+    _require_regular('head', cwd, files)
+    status = 0
+    for index, (path, f, error) in enumerate(_open_each('head', cwd, files)):
+        if error:
+            yield error
+            status = 1
+            continue
+        with f:
+            if len(files) > 1:
+                yield ('stdout', ('\n' if index else '') + f"==> {path} <==\n")
+            try:
+                # Bounded reads, so one huge line is passed on in pieces
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+                remaining = count
+                pending = []
+                size = 0
+                while remaining:
+                    data = f.readline(READ_CHUNK_SIZE)
+                    if not data:
+                        break
+                    if data.endswith(b'\n'):
+                        remaining -= 1
+                    pending.append(data)
+                    size += len(data)
+                    if size >= READ_CHUNK_SIZE:
+                        yield ('stdout', decoder.decode(b''.join(pending)))
+                        pending = []
+                        size = 0
+                    else:
+                        yield None
+                yield ('stdout', decoder.decode(b''.join(pending), final=True))
+            except IsADirectoryError:
+                yield _error('head', f"error reading '{path}': Is a directory")
+                status = 1
+    return status
+
+
+def _tail_lines(f, count):
+    """Return the last ``count`` lines of a binary file, reading backwards in blocks"""
+    if count == 0:
+        return b''
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    position = end
+    data = b''
+    # A trailing newline ends the last line rather than starting a new one
+    needed = count + 1
+    while position > 0 and data.count(b'\n') < needed:
+        step = min(READ_CHUNK_SIZE, position)
+        position -= step
+        f.seek(position)
+        data = f.read(step) + data
+    lines = data.split(b'\n')
+    if data.endswith(b'\n'):
+        return b'\n'.join(lines[-count - 1:])
+    return b'\n'.join(lines[-count:])
+
+
+def _tail(args, cwd):
+    if any(arg in ('-f', '-F') or arg.startswith('--follow') for arg in args):
+        raise Unsupported("tail -f")
+    count, files = _count_option(args, 'tail')
+    _require_regular('tail', cwd, files)
+    status = 0
+    for index, (path, f, error) in enumerate(_open_each('tail', cwd, files)):
+        if error:
+            yield error
+            status = 1
+            continue
+        with f:
+            if len(files) > 1:
+                yield ('stdout', ('\n' if index else '') + f"==> {path} <==\n")
+            try:
+                yield ('stdout', _decode(_tail_lines(f, count)))
+            except IsADirectoryError:
+                yield _error('tail', f"error reading '{path}': Is a directory")
+                status = 1
+    return status
+
+
+def _wc(args, cwd):
+    flags, files = _split_flags(args, 'lwmc', 'wc')
+    if not files or '-' in files:
+        raise Unsupported("wc without files")
+    _require_regular('wc', cwd, files)
+    # Same column order as coreutils: lines, words, chars, bytes
+    columns = [flag for flag in 'lwmc' if flag in flags] or ['l', 'w', 'c']
+    status = 0
+    rows = []
+    totals = dict.fromkeys(columns, 0)
+    total_size = 0
+    for path, f, error in _open_each('wc', cwd, files):
+        if error:
+            yield error
+            status = 1
+            continue
+        counts = {'l': 0, 'w': 0, 'm': 0, 'c': 0}
+        with f:
+            try:
+                in_word = False
+                while True:
+                    data = f.read(READ_CHUNK_SIZE)
+                    if not data:
+                        break
+                    counts['l'] += data.count(b'\n')
+                    counts['c'] += len(data)
+                    if 'm' in columns:
+                        counts['m'] += len(data) - sum(1 for byte in data if 0x80 <= byte < 0xC0)
+                    if 'w' in columns:
+                        words = data.split()
+                        counts['w'] += len(words)
+                        # A word split across two reads was counted twice
+                        if in_word and words and not data[:1].isspace():
+                            counts['w'] -= 1
+                        in_word = not data[-1:].isspace()
+                    yield None
+            except IsADirectoryError:
+                yield _error('wc', f"{path}: Is a directory")
+                status = 1
+                continue
+            total_size += os.fstat(f.fileno()).st_size
+        rows.append(([counts[c] for c in columns], path))
+        for column in columns:
+            totals[column] += counts[column]
+
+    if len(rows) > 1:
+        rows.append(([totals[c] for c in columns], 'total'))
+    width = 1 if len(columns) == 1 and len(files) == 1 else len(str(total_size))
+    for values, path in rows:
+        yield ('stdout', ' '.join(str(value).rjust(width) for value in values) + f" {path}\n")
+    return status
+
+
+COMMANDS = {
+    'pwd': _pwd,
+    'echo': _echo,
+    'date': _date,
+    'ls': _ls,
+    'cat': _cat,
+    'head': _head,
+    'tail': _tail,
+    'wc': _wc
+}
+
+
+def run_fast(parts, on_output, cwd=None, timeout=None, max_output=TERMINAL_MAX_OUTPUT, control=None):
+    """Run a supported command in-process; return None to fall back to the real program
+
+    Output goes to ``on_output(stream, text)`` in the same way as
+    ``run_streaming``, with the same timeout, output cap and cancellation.
+    Returns a CommandResult when the command was handled.
+    """
+    if not TERMINAL_FAST_PATH or not parts or parts[0] not in COMMANDS:
+        return None
+    if any(_SHELL_SPECIAL & set(arg) for arg in parts[1:]):
+        return None
+
+    chunks = COMMANDS[parts[0]](parts[1:], cwd or os.getcwd())
+    try:
+        # Options are checked before the first chunk, so nothing has been
+        # sent yet when a command is declined
+        chunk = next(chunks)
+    except Unsupported as e:
+        logger.debug(f"Fast path declined {parts[0]}: {e}")
+        return None
+    except StopIteration as stop:
+        return CommandResult(stop.value, False, False, False)
+
+    deadline = time.monotonic() + (command_timeout(parts) if timeout is None else timeout)
+    limit = _OutputLimit(on_output, max_output, chunks.close)
+    try:
+        while True:
+            # Reported like a program killed by the cancel or the timeout
+            if control is not None and control.cancelled:
+                chunks.close()
+                return CommandResult(-signal.SIGKILL, False, True, False)
+            if time.monotonic() > deadline:
+                chunks.close()
+                return CommandResult(-signal.SIGKILL, True, False, False)
+            if chunk is not None:
+                limit(*chunk)
+                if limit.truncated:
+                    return CommandResult(-signal.SIGKILL, False, False, True)
+            chunk = next(chunks)
+    except StopIteration as stop:
+        return CommandResult(stop.value, False, False, False)
@@ -0,0 +1,339 @@
+"""
+File Content for AutoPilot IDE
+Reads byte and line ranges of project files through mmap and a cached
+line-offset index, and replaces files from a streamed request body, so
+files of any size are served with bounded memory
+"""
+import os
+import mmap
+import uuid
+import stat
+import bisect
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bytes returned by a byte-range read by default, and the most any read
+# (byte or line range) returns
+FILE_READ_CHUNK = int(os.environ.get('FILE_READ_CHUNK', 256 * 1024))
+FILE_READ_MAX = int(os.environ.get('FILE_READ_MAX', 4 * 1024 * 1024))
+
+# Lines returned by a line-range read by default and at most; longer lines
+# are cut at FILE_LINE_MAX_BYTES
+FILE_LINES = int(os.environ.get('FILE_LINES', 1000))
+FILE_MAX_LINES = 10000
+FILE_LINE_MAX_BYTES = 64 * 1024
+
+# The line index records the line count at every block of this many bytes;
+# a lookup scans at most one block. Indexes of this many file versions are kept.
+FILE_LINE_BLOCK = 64 * 1024
+FILE_INDEX_CACHE = int(os.environ.get('FILE_INDEX_CACHE', 32))
+
+# Largest file accepted by a write, and the size of the chunks it is copied in
+FILE_WRITE_MAX_BYTES = int(os.environ.get('FILE_WRITE_MAX_BYTES', 4 * 1024 * 1024 * 1024))
+FILE_WRITE_CHUNK = 1024 * 1024
+
+
+class Conflict(Exception):
+    """The file changed since the version the writer last read"""
+
+
+class TooLarge(Exception):
+    """The content written is longer than the limit"""
+
+
+def etag(stat_result):
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _utf8_boundary(data):
+    """Length of ``data`` without a UTF-8 sequence cut off at its end"""
+    end = len(data)
+    for back in range(1, min(4, end) + 1):
+        byte = data[end - back]
+        if byte & 0xC0 == 0x80:
+            continue  # continuation byte; keep looking for the lead byte
+        needed = 2 if byte >> 5 == 0b110 else 3 if byte >> 4 == 0b1110 else 4 if byte >> 3 == 0b11110 else 1
+        return end - back if needed > back else end
+    return end
+
+
+class LineIndex:
+    """Line numbers of one version of a file, found lazily
+
+    ``counts[i]`` is the number of newlines before byte ``i * block``. Blocks
+    are counted only as far as a lookup needs, so reading the start of a
+    huge file does not scan the rest of it.
+    """
+
+    def __init__(self, size, block=FILE_LINE_BLOCK):
+        self.size = size
+        self.block = block
+        self.counts = array('Q', [0])
+        self.lock = threading.Lock()
+
+    @property
+    def complete(self):
+        return (len(self.counts) - 1) * self.block >= self.size
+
+    def _scan_block(self, mm):
+        start = (len(self.counts) - 1) * self.block
+        end = min(start + self.block, self.size)
+        self.counts.append(self.counts[-1] + mm[start:end].count(b'\n'))
+
+    def offset_of(self, mm, line):
+        """Byte offset where 1-based ``line`` starts, or None past the last line"""
+        with self.lock:
+            newlines = line - 1
+            while self.counts[-1] < newlines and not self.complete:
+                self._scan_block(mm)
+            if self.counts[-1] < newlines:
+                return None
+            block = max(bisect.bisect_left(self.counts, newlines) - 1, 0) if newlines else 0
+            position = block * self.block
+            for _ in range(newlines - self.counts[block]):
+                position = mm.find(b'\n', position) + 1
+        return position if position < self.size else None
+
+    def total_lines(self, mm):
+        """Number of lines, counting a last line without a newline"""
+        with self.lock:
+            while not self.complete:
+                self._scan_block(mm)
+        if not self.size:
+            return 0
+        return self.counts[-1] + (0 if mm[self.size - 1:self.size] == b'\n' else 1)
+
+
+class FileContent:
+    """Reads and writes files under ``root``"""
+
+    def __init__(self, root, cache_size=FILE_INDEX_CACHE):
+        self.root = Path(root).resolve()
+        self.cache_size = cache_size
+        self.reads = 0
+        self.writes = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.conflicts = 0
+        self._indexes = OrderedDict()  # absolute path -> (mtime_ns, size, LineIndex)
+        self._lock = threading.Lock()
+
+    def resolve(self, path):
+        """Return the absolute path of ``path`` (relative to root); ValueError if it leads outside"""
+        if not isinstance(path, str) or not path.strip('/') or '\0' in path:
+            raise ValueError("path must name a file")
+        resolved = (self.root / path.strip('/')).resolve()
+        if self.root not in resolved.parents:
+            raise ValueError("Path is outside the projects directory")
+        return resolved
+
+    def info(self, path, stat_result):
+        return {
+            "path": path.relative_to(self.root).as_posix(),
+            "size": stat_result.st_size,
+            "modified": stat_result.st_mtime,
+            "etag": etag(stat_result)
+        }
+
+    def read_bytes(self, path, offset=0, length=None):
+        """Return up to ``length`` bytes from ``offset`` as text
+
+        The range is shortened so it does not end inside a UTF-8 character
+        (unless ``length`` is shorter than the character);
+        ``nextOffset`` is where the following read should start (None at the
+        end of the file).
+        """
+        length = FILE_READ_CHUNK if length is None else length
+        if offset < 0 or length < 1:
+            raise ValueError("offset must not be negative and length must be positive")
+        length = min(length, FILE_READ_MAX)
+        with self._open(path) as (target, stat_result, mm):
+            size = stat_result.st_size
+            if offset > size:
+                raise ValueError("offset is past the end of the file")
+            end = min(offset + length, size)
+            data = mm[offset:end] if mm is not None else b''
+            if end < size:
+                data = data[:_utf8_boundary(data)] or data
+            result = self.info(target, stat_result)
+            result.update({
+                "offset": offset,
+                "length": len(data),
+                "text": data.decode('utf-8', errors='replace'),
+                "binary": b'\0' in data[:8192],
+                "nextOffset": offset + len(data) if offset + len(data) < size else None
+            })
+        self._count_read(len(data))
+        return result
+
+    def read_lines(self, path, line=1, count=None, total=False):
+        """Return ``count`` lines starting at 1-based ``line``
+
+        Lines are returned without their newline. Reading stops early once
+        FILE_READ_MAX bytes are collected; lines longer than
+        FILE_LINE_MAX_BYTES are cut and listed in ``truncated``. With
+        ``total`` the whole file is counted for ``totalLines``; otherwise it is
+        only given once the read or the index has reached the end of the file.
+        """
+        count = FILE_LINES if count is None else count
+        if line < 1 or count < 1:
+            raise ValueError("line and count must be positive")
+        count = min(count, FILE_MAX_LINES)
+        with self._open(path) as (target, stat_result, mm):
+            size = stat_result.st_size
+            index = self._line_index(target, stat_result)
+            start = index.offset_of(mm, line) if mm is not None else None
+            lines, truncated = [], []
+            position = start if start is not None else size
+            budget = FILE_READ_MAX
+            while len(lines) < count and position < size and budget > 0:
+                newline = mm.find(b'\n', position)
+                stop = size if newline == -1 else newline
+                take = min(stop - position, FILE_LINE_MAX_BYTES, budget)
+                if take < stop - position:
+                    truncated.append(line + len(lines))
+                lines.append(mm[position:position + take].decode('utf-8', errors='replace'))
+                budget -= take + 1
+                position = stop + 1
+            if mm is None:
+                known_total = 0
+            elif total or index.complete:
+                known_total = index.total_lines(mm)
+            elif lines and position >= size:
+                known_total = line + len(lines) - 1
+            else:
+                known_total = None
+            result = self.info(target, stat_result)
+            result.update({
+                "line": line,
+                "offset": start,
+                "lines": lines,
+                "truncated": truncated,
+                "nextLine": line + len(lines) if position < size else None,
+                "totalLines": known_total
+            })
+        self._count_read(FILE_READ_MAX - budget if lines else 0)
+        return result
+
+    def write(self, path, stream, if_match=None, max_bytes=FILE_WRITE_MAX_BYTES):
+        """Replace the file at ``path`` with the bytes read from ``stream``
+
+        The content is copied in chunks to a temporary file next to the
+        target and moved over it once complete, so readers never see a
+        partial file. ``if_match`` is an ETag the current file must have
+        ('*' for any existing file); Conflict is raised otherwise. TooLarge
+        is raised, and the file left as it was, once more than ``max_bytes``
+        bytes have been read.
+        """
+        target = self.resolve(path)
+        if target.is_dir():
+            raise IsADirectoryError(str(target))
+        if not target.parent.is_dir():
+            raise FileNotFoundError(str(target.parent))
+        try:
+            current = os.stat(target)
+        except FileNotFoundError:
+            current = None
+        if if_match is not None and not (
+                current is not None and if_match in ('*', etag(current))):
+            with self._lock:
+                self.conflicts += 1
+            raise Conflict("The file was changed by someone else")
+
+        # A leading dot and .tmp suffix keep the file watcher from reporting it
+        tmp_path = target.parent / f".{target.name}.{uuid.uuid4().hex[:8]}.tmp"
+        written = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in iter(lambda: stream.read(FILE_WRITE_CHUNK), b''):
+                    written += len(chunk)
+                    if written > max_bytes:
+                        raise TooLarge(f"Files are limited to {max_bytes} bytes")
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            if current is not None:
+                os.chmod(tmp_path, stat.S_IMODE(current.st_mode))
+            os.replace(tmp_path, target)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            self._indexes.pop(target, None)
+            self.writes += 1
+            self.bytes_written += written
+        return self.info(target, os.stat(target))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "lineIndexes": len(self._indexes),
+                "reads": self.reads,
+                "writes": self.writes,
+                "bytesRead": self.bytes_read,
+                "bytesWritten": self.bytes_written,
+                "conflicts": self.conflicts
+            }
+
+    def _count_read(self, size):
+        with self._lock:
+            self.reads += 1
+            self.bytes_read += size
+
+    def _line_index(self, target, stat_result):
+        stamp = (stat_result.st_mtime_ns, stat_result.st_size)
+        with self._lock:
+            cached = self._indexes.get(target)
+            if cached is not None and cached[:2] == stamp:
+                self._indexes.move_to_end(target)
+                return cached[2]
+            index = LineIndex(stat_result.st_size)
+            self._indexes[target] = stamp + (index,)
+            self._indexes.move_to_end(target)
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _open(self, path):
+        return _MappedFile(self.resolve(path))
+
+
+class _MappedFile:
+    """Context manager yielding ``(path, stat, mmap or None for an empty file)``"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.mm = None
+
+    def __enter__(self):
+        # Opening a FIFO or device could block or never end; only map regular
+        # files, and open without blocking in case the path is swapped meanwhile
+        self._check(os.stat(self.path))
+        self.file = os.fdopen(os.open(self.path, os.O_RDONLY | getattr(os, 'O_NONBLOCK', 0)), 'rb')
+        try:
+            stat_result = os.fstat(self.file.fileno())
+            self._check(stat_result)
+            if stat_result.st_size:
+                self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self.file.close()
+            raise
+        return self.path, stat_result, self.mm
+
+    def _check(self, stat_result):
+        if stat.S_ISDIR(stat_result.st_mode):
+            raise IsADirectoryError(str(self.path))
+        if not stat.S_ISREG(stat_result.st_mode):
+            raise ValueError("Path is not a regular file")
+
+    def __exit__(self, *exc_info):
+        if self.mm is not None:
+            self.mm.close()
+        self.file.close()
@@ -0,0 +1,226 @@
+"""
+File Tree for AutoPilot IDE
+Lists the project directory one level at a time, in pages, with ignore
+patterns and a short-lived listing cache keyed by directory mtime
+"""
+import os
+import re
+import json
+import time
+import base64
+import bisect
+import fnmatch
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import logging
+
+from file_watcher import WATCH_IGNORE_DIRS
+
+logger = logging.getLogger(__name__)
+
+# Names (fnmatch patterns) left out of listings
+FILES_IGNORE = [
+    pattern.strip() for pattern in
+    os.environ.get('FILES_IGNORE', ','.join(sorted(WATCH_IGNORE_DIRS | {'.DS_Store', '*.pyc'}))).split(',')
+    if pattern.strip()
+]
+
+# Entries per page by default, and the most one request may ask for
+FILES_PAGE_SIZE = int(os.environ.get('FILES_PAGE_SIZE', 500))
+FILES_MAX_PAGE_SIZE = 5000
+
+# Listings are reused while the directory mtime is unchanged, for at most
+# this many seconds (mtime granularity can hide a change made in the same tick)
+FILES_CACHE_TTL = float(os.environ.get('FILES_CACHE_TTL', 10))
+
+# Cached listings are dropped least recently used first beyond this many names
+FILES_CACHE_MAX_NAMES = int(os.environ.get('FILES_CACHE_MAX_NAMES', 1000000))
+
+
+def compile_ignore(patterns):
+    """Return a predicate telling whether a name matches any of the fnmatch ``patterns``"""
+    # Exact names are a set lookup; only real patterns go through a regex
+    names = {pattern for pattern in patterns if not set(pattern) & set('*?[')}
+    wildcards = [fnmatch.translate(pattern) for pattern in patterns if pattern not in names]
+    regex = re.compile('|'.join(wildcards)) if wildcards else None
+    if regex is None:
+        return names.__contains__
+    return lambda name: name in names or regex.match(name) is not None
+
+
+def _sort_key(name):
+    return (name.casefold(), name)
+
+
+class _Listing:
+    """The sorted names of one directory: folders first, then files"""
+
+    __slots__ = ('mtime', 'loaded_at', 'names', 'folders')
+
+    def __init__(self, mtime, names, folders):
+        self.mtime = mtime
+        self.loaded_at = time.monotonic()
+        self.names = names
+        self.folders = folders  # names[:folders] are directories
+
+
+class FileTree:
+    """Pages through directories under ``root``
+
+    A listing reads names and types with ``os.scandir`` (no per-entry stat)
+    and is cached until the directory's mtime changes or ``ttl`` passes; only
+    the entries of the requested page are stat'ed for size and mtime.
+    """
+
+    def __init__(self, root, ignore=None, ttl=FILES_CACHE_TTL, max_names=FILES_CACHE_MAX_NAMES):
+        self.root = Path(root).resolve()
+        self.ignore = FILES_IGNORE if ignore is None else list(ignore)
+        self.is_ignored = compile_ignore(self.ignore)
+        self.ttl = ttl
+        self.max_names = max_names
+        self.hits = 0
+        self.misses = 0
+        self._listings = OrderedDict()  # absolute directory path -> _Listing
+        self._names = 0
+        self._lock = threading.Lock()
+
+    def resolve(self, path):
+        """Return the absolute path of ``path`` (relative to root); ValueError if it leads outside"""
+        if not isinstance(path, str) or '\0' in path:
+            raise ValueError("Invalid path")
+        resolved = (self.root / path.strip('/')).resolve()
+        if resolved != self.root and self.root not in resolved.parents:
+            raise ValueError("Path is outside the projects directory")
+        return resolved
+
+    def list(self, path='', limit=None, offset=0, cursor=None):
+        """Return one page of the directory at ``path``
+
+        Raises ValueError for bad arguments and FileNotFoundError or
+        NotADirectoryError when ``path`` is not a directory.
+        """
+        limit = FILES_PAGE_SIZE if limit is None else limit
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+        limit = min(limit, FILES_MAX_PAGE_SIZE)
+
+        directory = self.resolve(path)
+        listing = self._listing(directory)
+        names, folders = listing.names, listing.folders
+        start = self._after(listing, self._decode_cursor(cursor)) if cursor else offset
+        end = min(start + limit, len(names))
+
+        relative = directory.relative_to(self.root).as_posix()
+        prefix = '' if relative == '.' else relative + '/'
+        entries = []
+        for position in range(start, end):
+            name = names[position]
+            entry = {"name": name, "type": "folder" if position < folders else "file", "path": prefix + name}
+            if position >= folders:
+                try:
+                    stat_result = os.stat(directory / name)
+                    entry["size"] = stat_result.st_size
+                    entry["modified"] = stat_result.st_mtime
+                except OSError:
+                    pass
+            entries.append(entry)
+
+        return {
+            "path": prefix.rstrip('/'),
+            "files": entries,
+            "total": len(names),
+            "nextCursor": self._encode_cursor(names[end - 1], end - 1 >= folders) if end < len(names) else None
+        }
+
+    def invalidate(self, path=None):
+        """Forget the cached listing of ``path`` (relative to root), or all listings"""
+        with self._lock:
+            if path is None:
+                self._listings.clear()
+                self._names = 0
+                return
+            listing = self._listings.pop(self.root / path.strip('/'), None)
+            if listing is not None:
+                self._names -= len(listing.names)
+
+    def on_file_changes(self, events):
+        """File watcher listener: drop listings of directories whose entries changed"""
+        payload = events.get('file_changed')
+        if not payload:
+            return
+        for change in payload.get('changes', ()):
+            if change.get('change') != 'modified':
+                self.invalidate(os.path.dirname(change['path']))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "listings": len(self._listings),
+                "names": self._names,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def _listing(self, directory):
+        mtime = os.stat(directory).st_mtime_ns
+        with self._lock:
+            listing = self._listings.get(directory)
+            if (listing is not None and listing.mtime == mtime
+                    and time.monotonic() - listing.loaded_at < self.ttl):
+                self._listings.move_to_end(directory)
+                self.hits += 1
+                return listing
+            self.misses += 1
+
+        folders, files = [], []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if self.is_ignored(entry.name):
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                (folders if is_dir else files).append(entry.name)
+        # Same order as _sort_key, without building a tuple per name
+        for names in (folders, files):
+            names.sort()
+            names.sort(key=str.casefold)
+        listing = _Listing(mtime, folders + files, len(folders))
+
+        with self._lock:
+            previous = self._listings.pop(directory, None)
+            if previous is not None:
+                self._names -= len(previous.names)
+            self._listings[directory] = listing
+            self._names += len(listing.names)
+            while self._names > self.max_names and len(self._listings) > 1:
+                _, evicted = self._listings.popitem(last=False)
+                self._names -= len(evicted.names)
+        return listing
+
+    @staticmethod
+    def _after(listing, last):
+        """Position just after the entry a cursor points at"""
+        name, is_file = last
+        names, folders = listing.names, listing.folders
+        lo, hi = (folders, len(names)) if is_file else (0, folders)
+        return bisect.bisect_right(names, _sort_key(name), lo, hi, key=_sort_key)
+
+    @staticmethod
+    def _encode_cursor(name, is_file):
+        raw = json.dumps([name, is_file]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        try:
+            name, is_file = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except Exception:
+            raise ValueError("Invalid cursor")
+        if not isinstance(name, str):
+            raise ValueError("Invalid cursor")
+        return name, bool(is_file)
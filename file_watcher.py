@@ -0,0 +1,267 @@
+"""
+Filesystem Watcher for AutoPilot IDE
+Watches the AppData and projects directories, invalidates caches and reports
+debounced batches of changes to listeners (e.g. Socket.IO broadcasts)
+"""
+import os
+import time
+import threading
+from pathlib import Path
+import logging
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+logger = logging.getLogger(__name__)
+
+# Set WATCH_ENABLED=false to disable filesystem watching
+WATCH_ENABLED = os.environ.get('WATCH_ENABLED', 'true').lower() == 'true'
+
+# Seconds of quiet before a burst of changes is reported, and the longest a
+# change may wait during a steady stream of events
+WATCH_DEBOUNCE = float(os.environ.get('WATCH_DEBOUNCE', 0.25))
+WATCH_MAX_DELAY = float(os.environ.get('WATCH_MAX_DELAY', 1.0))
+
+# Directory names under PROJECTS_DIR whose changes are not reported
+WATCH_IGNORE_DIRS = {'.git', 'node_modules', '__pycache__', '.venv', 'venv', '.mypy_cache', '.pytest_cache'}
+
+# Socket.IO event emitted for each kind of change
+EVENT_NAMES = {
+    'projects': 'project_changed',
+    'layouts': 'layout_changed',
+    'themes': 'theme_changed',
+    'extensions': 'extension_changed',
+    'settings': 'settings_changed',
+    'files': 'file_changed'
+}
+
+# AppData files written by the SQLite backend
+_DATABASE_SUFFIXES = ('.db', '.db-wal', '.db-shm', '.db-journal')
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards watchdog events for one root to the watcher"""
+
+    def __init__(self, watcher, root):
+        super().__init__()
+        self.watcher = watcher
+        self.root = root
+
+    def on_any_event(self, event):
+        if event.event_type in ('opened', 'closed', 'closed_no_write'):
+            return
+        if event.event_type == 'moved':
+            self.watcher.record(self.root, event.src_path, 'deleted', event.is_directory)
+            self.watcher.record(self.root, event.dest_path, 'modified', event.is_directory)
+        else:
+            self.watcher.record(self.root, event.src_path, event.event_type, event.is_directory)
+
+
+class FileWatcher:
+    """Debounced watcher over the AppData directory and the projects directory
+
+    Raw filesystem events are classified (AppData record, settings, or a
+    file under the projects directory) and collected per key, so a burst of
+    writes to the same file is reported once. When the burst settles, the
+    affected AppData collections are invalidated and every listener is
+    called with ``{event_name: payload}`` for the batch.
+    """
+
+    def __init__(self, appdata_manager, projects_dir, debounce=WATCH_DEBOUNCE, max_delay=WATCH_MAX_DELAY):
+        self.appdata_manager = appdata_manager
+        self.appdata_dir = Path(appdata_manager.base_dir).resolve()
+        self.projects_dir = Path(projects_dir).resolve() if projects_dir else None
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.events_seen = 0
+        self.batches = 0
+        self._listeners = []
+        self._pending = {}  # (kind, key) -> change
+        self._database_changed = False
+        self._first_event = None
+        self._last_event = None
+        self._versions = {}
+        self._observer = None
+        self._thread = None
+        self._stopped = False
+        self._cond = threading.Condition()
+
+    def add_listener(self, callback):
+        """Call ``callback(events)`` with ``{event_name: payload}`` after each batch"""
+        self._listeners.append(callback)
+
+    def start(self):
+        """Start watching; return False if watchdog is unavailable or disabled"""
+        if not WATCH_ENABLED:
+            logger.info("Filesystem watcher disabled (WATCH_ENABLED=false)")
+            return False
+        if Observer is None:
+            logger.warning("watchdog is not installed; filesystem changes will not be pushed to clients")
+            return False
+
+        self._stopped = False
+        self._versions = self._collection_versions()
+        self._observer = Observer()
+        for root in (self.appdata_dir, self.projects_dir):
+            if root is not None and root.is_dir():
+                self._observer.schedule(_EventHandler(self, root), str(root), recursive=True)
+        self._observer.daemon = True
+        self._observer.start()
+
+        self._thread = threading.Thread(target=self._loop, name='file-watcher', daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {self.appdata_dir} and {self.projects_dir}")
+        return True
+
+    def stop(self):
+        """Stop watching and report anything still pending"""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def record(self, root, path, change, is_directory=False):
+        """Queue one raw change to ``path`` under the watched ``root``"""
+        key = self._classify(Path(root), Path(path), is_directory)
+        if key is None:
+            return
+
+        with self._cond:
+            self.events_seen += 1
+            now = time.monotonic()
+            if key == 'database':
+                self._database_changed = True
+            else:
+                self._pending[key] = self._merge_change(self._pending.get(key), change)
+            if self._first_event is None:
+                self._first_event = now
+            self._last_event = now
+            self._cond.notify()
+
+    def flush(self):
+        """Report every pending change now; return the events that were sent"""
+        with self._cond:
+            pending, self._pending = self._pending, {}
+            database_changed, self._database_changed = self._database_changed, False
+            self._first_event = self._last_event = None
+
+        if not pending and not database_changed:
+            return {}
+
+        events = {}
+        changed_collections = set()
+        for (kind, key), change in sorted(pending.items()):
+            if kind == 'files':
+                events.setdefault(EVENT_NAMES['files'], {"changes": []})["changes"].append(
+                    {"path": key, "change": change}
+                )
+            elif kind == 'settings':
+                events[EVENT_NAMES['settings']] = {"change": change}
+            else:
+                changed_collections.add(kind)
+                events.setdefault(EVENT_NAMES[kind], {"collection": kind, "changes": []})["changes"].append(
+                    {"id": key, "change": change}
+                )
+
+        for collection in changed_collections:
+            self.appdata_manager.invalidate_cache(collection)
+
+        if database_changed:
+            # The database does not say which records changed, only which
+            # collections did
+            versions = self._collection_versions()
+            for collection, version in versions.items():
+                if version != self._versions.get(collection) and EVENT_NAMES[collection] not in events:
+                    events[EVENT_NAMES[collection]] = {"collection": collection, "changes": []}
+            self._versions = versions
+
+        if events:
+            self.batches += 1
+            for listener in list(self._listeners):
+                try:
+                    listener(events)
+                except Exception as e:
+                    logger.error(f"File watcher listener failed: {e}")
+        return events
+
+    def stats(self):
+        """Return watcher counters"""
+        with self._cond:
+            return {
+                "running": self._observer is not None,
+                "eventsSeen": self.events_seen,
+                "batches": self.batches,
+                "pending": len(self._pending)
+            }
+
+    def _classify(self, root, path, is_directory):
+        """Map a path to a pending-change key, or None if it is not reported"""
+        try:
+            parts = path.relative_to(root).parts
+        except ValueError:
+            return None
+        if not parts:
+            return None
+        name = parts[-1]
+        if name.startswith('.') and name.endswith('.tmp'):
+            return None
+
+        if root == self.appdata_dir:
+            if len(parts) == 1 and name.endswith(_DATABASE_SUFFIXES):
+                return 'database'
+            if is_directory or len(parts) != 2 or not name.endswith('.json'):
+                return None
+            directory, record_id = parts[0], name[:-5]
+            if directory == 'settings':
+                return ('settings', record_id)
+            if directory in self.appdata_manager.COLLECTIONS and record_id != '_index':
+                return (directory, record_id)
+            return None
+
+        if any(part in WATCH_IGNORE_DIRS for part in parts):
+            return None
+        return ('files', '/'.join(parts))
+
+    @staticmethod
+    def _merge_change(previous, change):
+        if previous == 'created' and change == 'modified':
+            return 'created'
+        if previous == 'deleted' and change in ('created', 'modified'):
+            return 'modified'
+        return change
+
+    def _collection_versions(self):
+        versions = {}
+        for collection in self.appdata_manager.COLLECTIONS:
+            try:
+                versions[collection] = self.appdata_manager.collection_version(collection)
+            except Exception as e:
+                logger.error(f"Error reading version of {collection}: {e}")
+        return versions
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    if self._last_event is not None:
+                        now = time.monotonic()
+                        due = min(self._last_event + self.debounce, self._first_event + self.max_delay)
+                        if now >= due:
+                            break
+                        self._cond.wait(due - now)
+                    else:
+                        self._cond.wait()
+            self.flush()
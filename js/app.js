@@ -9,6 +9,16 @@ let layoutManager = null;
 let installedExtensions = [];
 let availableExtensions = [];
 let currentDropdown = null;
+let terminalPrompt = 'user@autopilot:~/project$';
+let terminalLastSeq = 0;
+let currentProjectId = null;
+const aiReplies = {};  // request id -> message element being streamed into
+
+// Stable per-tab id so a reloaded or reconnected tab gets its terminal back
+const terminalClientId = sessionStorage.getItem('autopilot-terminal-client') ||
+    (window.crypto && crypto.randomUUID ? crypto.randomUUID() :
+        Array.from({ length: 32 }, () => Math.floor(Math.random() * 16).toString(16)).join(''));
+sessionStorage.setItem('autopilot-terminal-client', terminalClientId);
 
 // ============================================================================
 // INITIALIZATION
@@ -51,6 +61,10 @@ function initSocket() {
         console.log('[WebSocket] Connected to backend');
         addTerminalOutput('✓ Connected to backend', 'success');
         updateConnectionStatus(true);
+        socket.emit('terminal_attach', { clientId: terminalClientId, since: terminalLastSeq });
+        if (currentProjectId) {
+            socket.emit('join_project', { projectId: currentProjectId });
+        }
     });
 
     socket.on('disconnect', () => {
@@ -59,13 +73,44 @@ function initSocket() {
         updateConnectionStatus(false);
     });
 
-    socket.on('terminal_output', (data) => {
-        if (data.stdout) addTerminalOutput(data.stdout, 'output');
-        if (data.stderr) addTerminalOutput(data.stderr, 'error');
+    socket.on('terminal_output', renderTerminalEntry);
+    socket.on('terminal_exit', renderTerminalEntry);
+
+    socket.on('terminal_scrollback', (data) => {
+        data.entries.forEach(renderTerminalEntry);
+    });
+
+    socket.on('terminal_queued', (data) => {
+        addTerminalOutput(`[queued, position ${data.position}]`, 'output');
+    });
+
+    // Only sent for the project this tab follows
+    socket.on('project_changed', (data) => {
+        console.log('[Projects] Project changed:', data.changes);
+    });
+
+    socket.on('file_changed', (data) => {
+        console.log('[Files] Changed in', data.projectId, data.changes);
+    });
+
+    // Replies stream in as chunks; ai_response carries the whole reply
+    socket.on('ai_response_chunk', (data) => {
+        const msg = aiReplies[data.id] || (aiReplies[data.id] = addAIMessage('', false));
+        if (msg) {
+            msg.textContent += data.text;
+            msg.parentElement.scrollTop = msg.parentElement.scrollHeight;
+        }
     });
 
     socket.on('ai_response', (data) => {
-        addAIMessage(data.message, false);
+        const text = data.error ? `⚠️ ${data.error}` : data.message + (data.cancelled ? ' [stopped]' : '');
+        const msg = aiReplies[data.id];
+        delete aiReplies[data.id];
+        if (msg) {
+            msg.textContent = text;
+        } else {
+            addAIMessage(text, false);
+        }
     });
 }
 
@@ -408,12 +453,19 @@ function initUIHandlers() {
             if (e.key === 'Enter') {
                 const command = this.value.trim();
                 if (command && socket) {
-                    addTerminalOutput(`user@autopilot:~/project$ ${command}`, 'command');
+                    addTerminalOutput(`${terminalPrompt} ${command}`, 'command');
                     socket.emit('terminal_execute', { command: command });
                     this.value = '';
                 }
             }
         });
+        terminalInput.addEventListener('keydown', function(e) {
+            // Ctrl+C with nothing selected stops the running command
+            if (e.ctrlKey && e.key === 'c' && this.selectionStart === this.selectionEnd && socket) {
+                e.preventDefault();
+                socket.emit('terminal_cancel', {});
+            }
+        });
     }
     
     // Close modals on outside click
@@ -442,6 +494,22 @@ function initUIHandlers() {
 // TERMINAL FUNCTIONS
 // ============================================================================
 
+function renderTerminalEntry(entry) {
+    if (entry.seq) {
+        if (entry.seq <= terminalLastSeq) return;
+        terminalLastSeq = entry.seq;
+    }
+    if (entry.command) addTerminalOutput(`${terminalPrompt} ${entry.command}`, 'command');
+    if (entry.stdout) addTerminalOutput(entry.stdout, 'output');
+    if (entry.stderr) addTerminalOutput(entry.stderr, 'error');
+    if (entry.exitCode) addTerminalOutput(`[exit code ${entry.exitCode}]`, 'error');
+    if (entry.cwd) {
+        terminalPrompt = `user@autopilot:${entry.cwd}$`;
+        const prompt = document.querySelector('.terminal-input-line .terminal-prompt');
+        if (prompt) prompt.textContent = terminalPrompt;
+    }
+}
+
 function addTerminalOutput(text, type = 'output') {
     const content = document.getElementById('terminalContent');
     if (!content) return;
@@ -491,6 +559,7 @@ function addAIMessage(message, isUser = false) {
     msg.textContent = message;
     chat.appendChild(msg);
     chat.scrollTop = chat.scrollHeight;
+    return msg;
 }
 
 // ============================================================================
@@ -580,6 +649,7 @@ async function openProjectById(projectId) {
             projectName.textContent = project.name;
         }
         
+        followProject(projectId);
         closeProjectModal();
         console.log('[Projects] Opened project:', project.name);
     } catch (error) {
@@ -588,6 +658,16 @@ async function openProjectById(projectId) {
     }
 }
 
+function followProject(projectId) {
+    if (socket && currentProjectId && currentProjectId !== projectId) {
+        socket.emit('leave_project', { projectId: currentProjectId });
+    }
+    currentProjectId = projectId;
+    if (socket && socket.connected) {
+        socket.emit('join_project', { projectId: projectId });
+    }
+}
+
 function createNewProject() {
     const name = prompt('Enter project name:');
     if (name && name.trim()) {
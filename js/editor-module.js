@@ -5,6 +5,9 @@
 const EditorModule = (() => {
     let files = {};
     let currentFile = null;
+    // Filename -> ETag of the version last read or saved, sent with saves so
+    // a file changed elsewhere is not overwritten
+    const etags = {};
 
     const init = () => {
         console.log('[EditorModule] Initializing...');
@@ -24,9 +27,30 @@ const EditorModule = (() => {
         console.log(`[EditorModule] Closed file: ${filename}`);
     };
 
-    const saveFile = (filename, content) => {
+    // Fetch `count` lines from `line` (1-based); large files are read a page at a time
+    const readLines = async (filename, line = 1, count = 1000) => {
+        const params = new URLSearchParams({ path: filename, line, count });
+        const page = await APIModule.get(`/file?${params}`);
+        etags[filename] = page.etag;
+        return page;
+    };
+
+    const saveFile = async (filename, content) => {
         files[filename] = content;
+        const headers = etags[filename] ? { 'If-Match': etags[filename] } : {};
+        const response = await fetch(`${APIModule.baseURL}/file?${new URLSearchParams({ path: filename })}`, {
+            method: 'PUT',
+            headers,
+            body: new Blob([content])
+        });
+        const result = await response.json();
+        if (!response.ok) {
+            console.error(`[EditorModule] Failed to save ${filename}: ${result.error}`);
+            throw new Error(result.error);
+        }
+        etags[filename] = result.etag;
         console.log(`[EditorModule] Saved file: ${filename}`);
+        return result;
     };
 
     const getContent = (filename) => {
@@ -37,6 +61,7 @@ const EditorModule = (() => {
         init,
         openFile,
         closeFile,
+        readLines,
         saveFile,
         getContent,
         files,
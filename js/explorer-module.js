@@ -4,24 +4,97 @@
 
 const ExplorerModule = (() => {
     let files = [];
+    // Folder path -> {files, nextCursor}; folders are listed when first expanded
+    const children = {};
 
     const init = () => {
         console.log('[ExplorerModule] Initializing...');
         loadFiles();
     };
 
+    const listFolder = async (path, cursor) => {
+        const params = new URLSearchParams({ path });
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        const data = await APIModule.get(`/files?${params}`);
+        const listing = children[path] || (children[path] = { files: [], nextCursor: null });
+        listing.files = cursor ? listing.files.concat(data.files || []) : (data.files || []);
+        listing.nextCursor = data.nextCursor;
+        return listing;
+    };
+
     const loadFiles = async () => {
         try {
-            const data = await APIModule.get('/files');
-            files = data.files || [];
+            files = (await listFolder('')).files;
             render();
         } catch (error) {
             console.error('[ExplorerModule] Failed to load files:', error);
         }
     };
 
-    const expandFolder = (folderId) => {
-        console.log(`[ExplorerModule] Expanded folder: ${folderId}`);
+    const expandFolder = async (folderPath) => {
+        console.log(`[ExplorerModule] Expanded folder: ${folderPath}`);
+        try {
+            if (!children[folderPath]) {
+                await listFolder(folderPath);
+            }
+            render();
+        } catch (error) {
+            console.error('[ExplorerModule] Failed to list folder:', error);
+        }
+    };
+
+    // Fetch the next page of a large folder
+    const loadMore = async (folderPath) => {
+        const listing = children[folderPath];
+        if (listing && listing.nextCursor) {
+            await listFolder(folderPath, listing.nextCursor);
+            render();
+        }
+    };
+
+    // Stream /api/search results, calling onMatch for each matching line;
+    // resolves with the summary line
+    const searchFiles = async (query, { regex = false, caseSensitive = false, path = '' } = {}, onMatch = () => {}) => {
+        const params = new URLSearchParams({ q: query, regex, case: caseSensitive, path });
+        const response = await fetch(`${APIModule.baseURL}/search?${params}`);
+        if (!response.ok) {
+            throw new Error((await response.json()).error || `HTTP ${response.status}`);
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+        let summary = null;
+        for (;;) {
+            const { done, value } = await reader.read();
+            buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+            const lines = buffered.split('\n');
+            buffered = lines.pop();
+            for (const line of lines.filter(Boolean)) {
+                const item = JSON.parse(line);
+                if (item.done) {
+                    summary = item;
+                } else {
+                    onMatch(item);
+                }
+            }
+            if (done) {
+                return summary;
+            }
+        }
+    };
+
+    // Quick open: rank file paths against a fuzzy query; each result has the
+    // positions of the matched characters for highlighting
+    const findFiles = async (query, { project = '', limit = 50 } = {}) => {
+        const params = new URLSearchParams({ q: query, project, limit });
+        const response = await fetch(`${APIModule.baseURL}/files/find?${params}`);
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || `HTTP ${response.status}`);
+        }
+        return data.results;
     };
 
     const selectFile = (filename) => {
@@ -37,6 +110,9 @@ const ExplorerModule = (() => {
         init,
         loadFiles,
         expandFolder,
+        loadMore,
+        searchFiles,
+        findFiles,
         selectFile,
         render,
         files
@@ -0,0 +1,341 @@
+"""
+Message Queue for AutoPilot IDE
+Shares Socket.IO emits and AppData cache invalidations between worker processes
+
+``SOCKETIO_MESSAGE_QUEUE`` selects the queue:
+
+    tcp://127.0.0.1:5557       the built-in broker (python message_queue.py)
+    redis://localhost:6379/0   Redis (needs the redis package)
+    amqp://guest@localhost//   RabbitMQ or another kombu transport (needs kombu)
+
+The built-in broker is a stand-in for running several workers on one
+machine: it relays every message to every connected worker and keeps nothing.
+"""
+import sys
+import time
+import socket
+import struct
+import argparse
+import threading
+import logging
+
+import socketio
+
+logger = logging.getLogger(__name__)
+
+# Each message is a 4-byte big-endian length followed by a JSON body
+_HEADER = struct.Struct('!I')
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+# Seconds before the first retry to reach the broker; each further retry
+# waits twice as long, up to RECONNECT_MAX_DELAY
+RECONNECT_DELAY = 0.5
+RECONNECT_MAX_DELAY = 10.0
+
+# Attempts to publish one message before it is dropped, so emits (and the
+# requests and threads making them) never wait long on a broker that is down
+PUBLISH_ATTEMPTS = 3
+
+# Seconds allowed to connect to the broker, and to send one message
+BROKER_TIMEOUT = 2.0
+
+
+def _send_message(sock, data):
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv_message(sock):
+    """Return the next message body, or None once the connection is closed"""
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_MESSAGE_SIZE:
+        raise ConnectionError(f"Message of {size} bytes exceeds the {MAX_MESSAGE_SIZE} byte limit")
+    return _recv_exactly(sock, size)
+
+
+def _backoff(attempt):
+    """Seconds to wait before retry number ``attempt`` (1 for the first retry)"""
+    return min(RECONNECT_DELAY * 2 ** (attempt - 1), RECONNECT_MAX_DELAY)
+
+
+def _parse_tcp_url(url):
+    host, _, port = url[len('tcp://'):].rstrip('/').rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+class MessageBroker:
+    """Relays every message from one connected worker to all of them"""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self.relayed = 0
+        self._server = None
+        self._clients = {}  # socket -> send lock
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    @property
+    def url(self):
+        return f"tcp://{self.host}:{self.port}"
+
+    def start(self):
+        """Listen and relay in background threads; return the broker URL"""
+        self._server = socket.create_server((self.host, self.port))
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept_loop, name='message-broker', daemon=True).start()
+        logger.info(f"Message broker listening on {self.url}")
+        return self.url
+
+    def serve_forever(self):
+        self.start()
+        self._stopped.wait()
+
+    def stop(self):
+        self._stopped.set()
+        if self._server is not None:
+            self._server.close()
+        with self._lock:
+            clients, self._clients = list(self._clients), {}
+        for client in clients:
+            client.close()
+
+    def stats(self):
+        with self._lock:
+            return {"clients": len(self._clients), "relayed": self.relayed}
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self._clients[client] = threading.Lock()
+            threading.Thread(target=self._client_loop, args=(client,), daemon=True).start()
+
+    def _client_loop(self, client):
+        try:
+            while True:
+                data = _recv_message(client)
+                if data is None:
+                    break
+                self._relay(data)
+        except (OSError, ConnectionError) as e:
+            logger.debug(f"Broker client dropped: {e}")
+        finally:
+            self._drop(client)
+
+    def _relay(self, data):
+        with self._lock:
+            clients = list(self._clients.items())
+            self.relayed += 1
+        for client, send_lock in clients:
+            try:
+                with send_lock:
+                    _send_message(client, data)
+            except OSError:
+                self._drop(client)
+
+    def _drop(self, client):
+        with self._lock:
+            self._clients.pop(client, None)
+        client.close()
+
+
+class _InvalidationMixin:
+    """Carries AppData cache invalidations over a Socket.IO pub/sub manager
+
+    Invalidations travel on the same channel as emits, as messages with a
+    method the Socket.IO listener does not know, and are taken out of the
+    stream before it sees them.
+    """
+
+    INVALIDATE = 'appdata_invalidate'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.invalidations_sent = 0
+        self.invalidations_received = 0
+        self._invalidation_listeners = []
+
+    def add_invalidation_listener(self, callback):
+        """Call ``callback(collection)`` when another worker changes a collection"""
+        self._invalidation_listeners.append(callback)
+
+    def publish_invalidation(self, collection):
+        """Tell the other workers that ``collection`` changed"""
+        self.invalidations_sent += 1
+        self._publish({'method': self.INVALIDATE, 'collection': collection, 'host_id': self.host_id})
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "channel": self.channel,
+            "invalidationsSent": self.invalidations_sent,
+            "invalidationsReceived": self.invalidations_received
+        }
+
+    def _listen(self):
+        for message in super()._listen():
+            data = message
+            if isinstance(message, (bytes, str)):
+                try:
+                    data = self.json.loads(message)
+                except ValueError:
+                    pass
+            if isinstance(data, dict) and data.get('method') == self.INVALIDATE:
+                if data.get('host_id') != self.host_id:
+                    self.invalidations_received += 1
+                    for listener in list(self._invalidation_listeners):
+                        try:
+                            listener(data.get('collection'))
+                        except Exception as e:
+                            logger.error(f"Invalidation listener failed: {e}")
+                continue
+            yield message
+
+
+class _TCPPubSubManager(socketio.PubSubManager):
+    """Socket.IO pub/sub transport over the built-in broker"""
+
+    name = 'tcp'
+
+    def __init__(self, url, channel='socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.address = _parse_tcp_url(url)
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+        self.messages_dropped = 0
+
+    def _connect(self, timeout=None):
+        """Open a connection to the broker; ``timeout`` applies to later sends"""
+        sock = socket.create_connection(self.address, timeout=BROKER_TIMEOUT)
+        sock.settimeout(timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _publish(self, data):
+        """Send one message, retrying with backoff; drop it once attempts run out
+
+        The lock only guards the shared connection while a message is written,
+        so connecting and waiting between attempts never hold up other emits.
+        """
+        body = self.json.dumps({'channel': self.channel, 'data': data}).encode('utf-8')
+        error = None
+        for attempt in range(PUBLISH_ATTEMPTS):
+            if attempt:
+                time.sleep(_backoff(attempt))
+            with self._publish_lock:
+                sock = self._publisher
+            try:
+                if sock is None:
+                    sock = self._connect(timeout=BROKER_TIMEOUT)
+                    with self._publish_lock:
+                        if self._publisher is None:
+                            self._publisher = sock
+                        else:
+                            sock.close()
+                            sock = self._publisher
+                with self._publish_lock:
+                    _send_message(sock, body)
+                return
+            except OSError as e:
+                error = e
+                with self._publish_lock:
+                    if self._publisher is sock:
+                        self._publisher = None
+                if sock is not None:
+                    sock.close()
+        self.messages_dropped += 1
+        self._get_logger().error(
+            f"Message broker {self.address} unreachable, dropped a message after {PUBLISH_ATTEMPTS} attempts: {error}"
+        )
+
+    def _listen(self):
+        attempt = 0
+        while True:
+            try:
+                sock = self._connect()
+            except OSError as e:
+                attempt += 1
+                self._get_logger().warning(f"Message broker {self.address} unreachable: {e}")
+                time.sleep(_backoff(attempt))
+                continue
+            attempt = 0
+            try:
+                while True:
+                    body = _recv_message(sock)
+                    if body is None:
+                        break
+                    message = self.json.loads(body)
+                    if message.get('channel') == self.channel:
+                        yield message['data']
+            except (OSError, ConnectionError, ValueError) as e:
+                self._get_logger().warning(f"Message broker connection lost: {e}")
+            finally:
+                sock.close()
+            time.sleep(RECONNECT_DELAY)
+
+
+class TCPManager(_InvalidationMixin, _TCPPubSubManager):
+    """Socket.IO client manager on the built-in broker"""
+
+    def stats(self):
+        return dict(super().stats(), messagesDropped=self.messages_dropped)
+
+
+_MANAGERS = {}
+
+
+def _manager_class(url):
+    """Pick the Socket.IO manager for a queue URL, with invalidation support"""
+    if url.startswith('tcp://'):
+        return TCPManager
+    if url.startswith(('redis://', 'rediss://')):
+        base = socketio.RedisManager
+    elif url.startswith('kafka://'):
+        base = socketio.KafkaManager
+    elif url.startswith('zmq'):
+        base = socketio.ZmqManager
+    else:
+        base = socketio.KombuManager
+    if base not in _MANAGERS:
+        _MANAGERS[base] = type(base.__name__, (_InvalidationMixin, base), {})
+    return _MANAGERS[base]
+
+
+def create_manager(url, channel='socketio'):
+    """Create the Socket.IO client manager for ``url``"""
+    return _manager_class(url)(url, channel=channel)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the built-in Socket.IO message broker")
+    parser.add_argument('--bind', default='127.0.0.1:5557', help="HOST:PORT to listen on")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    host, _, port = args.bind.rpartition(':')
+    broker = MessageBroker(host or '127.0.0.1', int(port))
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        broker.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,422 @@
+"""
+Path Index for AutoPilot IDE
+Keeps every file path under the projects directory in memory, kept current
+from file watcher events, and ranks them against fuzzy quick-open queries
+"""
+import os
+import re
+import time
+import heapq
+import bisect
+import operator
+import threading
+from pathlib import Path
+import logging
+
+from file_tree import FILES_IGNORE, compile_ignore
+
+logger = logging.getLogger(__name__)
+
+# Set FILES_FIND_ENABLED=false to turn off the path index and /api/files/find
+FILES_FIND_ENABLED = os.environ.get('FILES_FIND_ENABLED', 'true').lower() == 'true'
+
+# Results returned by default, and the most one request may ask for
+FILES_FIND_RESULTS = int(os.environ.get('FILES_FIND_RESULTS', 50))
+FILES_FIND_MAX_RESULTS = 1000
+
+# Candidates (paths containing every character of the query) checked per
+# query, best tier and shortest paths first. Bounds the time of broad
+# queries; the response says when it was reached. Of the matches, the
+# FILES_FIND_SHORTLIST best by match end and length (at least ``limit``) are
+# fully scored.
+FILES_FIND_CANDIDATES = int(os.environ.get('FILES_FIND_CANDIDATES', 5000))
+FILES_FIND_SHORTLIST = 200
+
+# Longest query accepted
+FILES_FIND_MAX_QUERY = 256
+
+# Characters with a bitset of the paths (and of the basenames) containing them
+ALPHABET = frozenset('abcdefghijklmnopqrstuvwxyz0123456789._-')
+
+# Candidates are visited in these path length buckets, shortest first
+LENGTH_BUCKETS = (16, 24, 32, 40, 48, 64, 96, 128)
+
+# Score bonuses for matched characters
+SCORE_START = 12
+SCORE_WORD = 8
+SCORE_CONSECUTIVE = 6
+SEPARATORS = frozenset('/_-. ')
+
+# Set bit positions of each byte value, and a table marking non-zero bytes
+_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+_NONZERO = bytes([0] + [1] * 255)
+
+# Possessive quantifiers (Python 3.11+) skip backtracking the matcher can
+# never use; on Python 3.10 the negated classes keep plain ``*`` linear too
+try:
+    re.compile('a*+')
+    _SKIP = '*+'
+except re.error:  # Python 3.10
+    _SKIP = '*'
+
+
+def _set_bits(value):
+    """Yield the positions of the set bits of a non-negative int, lowest first"""
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'little')
+    # bytes.find skips runs of zero bytes at memchr speed
+    marks = data.translate(_NONZERO)
+    position = marks.find(1)
+    while position != -1:
+        base = position * 8
+        for bit in _BITS[data[position]]:
+            yield base + bit
+        position = marks.find(1, position + 1)
+
+
+def _bitset(flags):
+    """Pack an iterable of truth values into a bytearray, bit ``i`` for item ``i``"""
+    data = bytes(flags)
+    # Byte j of data[k::8] is item 8j + k; as a little-endian int that is
+    # bit 8j, shifted by k to its place
+    value = 0
+    for k in range(8):
+        value |= int.from_bytes(data[k::8], 'little') << k
+    return bytearray(value.to_bytes((len(data) + 7) // 8, 'little'))
+
+
+def _equal(value):
+    """Translation table mapping byte ``value`` to 1 and every other byte to 0"""
+    return bytes(int(byte == value) for byte in range(256))
+
+
+def _set(bits, doc, on):
+    byte = doc >> 3
+    if byte >= len(bits):
+        bits.extend(bytes(byte - len(bits) + 1))
+    if on:
+        bits[byte] |= 1 << (doc & 7)
+    else:
+        bits[byte] &= ~(1 << (doc & 7)) & 0xFF
+
+
+def _matcher(query, groups=False):
+    """Regex matching text that contains ``query`` as a subsequence, ignoring case"""
+    pattern = "({})" if groups else "{}"
+    return re.compile(''.join(
+        f"[^{re.escape(char.lower())}{re.escape(char.upper())}]{_SKIP}" + pattern.format(re.escape(char))
+        for char in query
+    ), re.IGNORECASE)
+
+
+def score(text, positions, start=0):
+    """Score a match of the characters at ``positions`` of ``text``
+
+    Matches at the start of ``text[start:]``, at the start of words (after a
+    separator or at a lower-to-upper case change) and runs of consecutive
+    characters score higher; gaps between matched characters and longer
+    texts score lower.
+    """
+    total = 0
+    previous = None
+    for position in positions:
+        if position == start:
+            total += SCORE_START
+        else:
+            before = text[position - 1]
+            if before in SEPARATORS or (before.islower() and text[position].isupper()):
+                total += SCORE_WORD
+        if previous is not None and position == previous + 1:
+            total += SCORE_CONSECUTIVE
+        previous = position
+    return total - (positions[-1] - positions[0] + 1 - len(positions)) - len(text) // 16
+
+
+class PathIndex:
+    """Every file path under ``root`` with bitsets for fuzzy lookups
+
+    Each path has a document id; per character of ALPHABET a bitset marks the
+    ids whose path (and, separately, whose basename) contains it, and further
+    bitsets mark basenames by first character, paths by length bucket and
+    paths by top-level directory (project). A query ANDs the bitsets of its
+    characters, so only paths containing all of them are checked against the
+    subsequence regex. Candidates are checked in tiers: basenames starting
+    with the query's first character, other basenames containing the whole
+    query, then whole paths; a higher tier always ranks first.
+    """
+
+    def __init__(self, root, ignore=None, candidates=FILES_FIND_CANDIDATES):
+        self.root = Path(root).resolve()
+        self.is_ignored = compile_ignore(FILES_IGNORE if ignore is None else list(ignore))
+        self.candidates = candidates
+        self.ready = False
+        self.build_ms = None
+        self.queries = 0
+        self.truncated = 0
+        self._paths = []  # doc id -> path, None once removed
+        self._ids = {}  # path -> doc id
+        self._dead = 0
+        self._bits = {}  # ('live'|'char'|'base'|'first'|'length'|'project', key) -> bytearray
+        self._ints = {}  # the same bitsets as ints, until the next change
+        self._pending = set()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Build the index in the background"""
+        self._thread = threading.Thread(target=self._run, name='path-index', daemon=True)
+        self._thread.start()
+        return True
+
+    def build(self):
+        """Walk root and index every file, then apply changes reported meanwhile"""
+        started = time.perf_counter()
+        self._rebuild(list(self._walk(self.root)))
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            self.ready = True
+        if pending:
+            self.update(pending)
+        self.build_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Path index ready in {self.build_ms:.0f} ms: {len(self._ids)} files")
+
+    def on_file_changes(self, events):
+        """File watcher listener: add, remove or rescan the created, deleted and moved paths"""
+        payload = events.get('file_changed')
+        if not payload:
+            return
+        paths = {change['path'] for change in payload.get('changes', ()) if change.get('change') != 'modified'}
+        if not paths:
+            return
+        with self._lock:
+            if not self.ready:
+                self._pending.update(paths)
+                return
+        self.update(paths)
+
+    def update(self, paths):
+        """Bring ``paths`` (relative to root, files or directories) up to date with the disk"""
+        for path in paths:
+            if any(self.is_ignored(part) for part in path.split('/')):
+                continue
+            full = self.root / path
+            if full.is_dir():
+                for found in self._walk(full):
+                    self._add(found)
+            elif full.is_file():
+                self._add(path)
+            else:
+                self._remove_tree(path)
+        with self._lock:
+            compact = self._dead >= 1000 and self._dead * 2 >= len(self._paths)
+        if compact:
+            self._rebuild(list(self._ids))
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def find(self, query, limit=FILES_FIND_RESULTS, project=None):
+        """Return the best ``limit`` paths for a fuzzy query
+
+        Spaces in ``query`` are ignored; its other characters must appear in
+        the path in order, ignoring case. ``project`` limits the search to
+        one top-level directory. Returns ``{results, candidates, examined,
+        truncated}``; each result has the matched ``positions`` in ``path``.
+        """
+        if not isinstance(query, str):
+            raise ValueError("q must be a string")
+        query = ''.join(query.split())
+        if not query:
+            raise ValueError("q must not be empty")
+        if len(query) > FILES_FIND_MAX_QUERY:
+            raise ValueError(f"q must be at most {FILES_FIND_MAX_QUERY} characters")
+        limit = min(limit, FILES_FIND_MAX_RESULTS)
+        chars = set(query.lower()) & ALPHABET
+        first = query[0].lower()
+
+        with self._lock:
+            self.queries += 1
+            in_path = self._int('project', project) if project is not None else self._int('live')
+            for char in chars:
+                in_path &= self._int('char', char)
+            tiers = []
+            if '/' not in query:
+                in_base = in_path
+                for char in chars:
+                    in_base &= self._int('base', char)
+                starting = in_base & self._int('first', first)
+                tiers = [(2, starting), (1, in_base ^ starting)]
+                in_path ^= in_base
+            tiers.append((0, in_path))
+            lengths = [self._int('length', n) for n in range(len(LENGTH_BUCKETS) + 1)]
+            paths = self._paths
+
+        # Check candidates until the budget runs out, keeping each match with
+        # a cheap key: how far into the name it ends, and the path length
+        matcher = _matcher(query)
+        found = []
+        examined = 0
+        truncated = False
+        for tier, mask in tiers:
+            if truncated or len(found) >= limit:
+                break
+            for bucket in lengths:
+                for doc in _set_bits(mask & bucket):
+                    if examined == self.candidates:
+                        truncated = True
+                        break
+                    examined += 1
+                    path = paths[doc]
+                    if path is None:
+                        continue
+                    start = path.rfind('/') + 1 if tier else 0
+                    match = matcher.match(path, start)
+                    if match is not None:
+                        found.append((tier, start - match.end() - (len(path) >> 4), doc, start))
+                if truncated:
+                    break
+
+        # Score the best of them properly
+        matcher = _matcher(query, groups=True)
+        ranked = []
+        for tier, _, doc, start in heapq.nlargest(max(limit, FILES_FIND_SHORTLIST), found):
+            path = paths[doc]
+            if path is None:  # removed since it was checked
+                continue
+            match = matcher.match(path, start)
+            positions = [match.start(group) for group in range(1, len(query) + 1)]
+            ranked.append((tier, score(path, positions, start), path, positions))
+        ranked.sort(key=lambda entry: (-entry[0], -entry[1], len(entry[2]), entry[2]))
+        if truncated:
+            with self._lock:
+                self.truncated += 1
+        return {
+            "results": [
+                {"path": path, "name": path[path.rfind('/') + 1:], "score": total, "positions": positions}
+                for _, total, path, positions in ranked[:limit]
+            ],
+            "candidates": sum(mask.bit_count() for _, mask in tiers),
+            "examined": examined,
+            "truncated": truncated
+        }
+
+    # ------------------------------------------------------------------
+    # Indexing
+    # ------------------------------------------------------------------
+
+    def _int(self, kind, key=None):
+        """A bitset as an int, converted once per change to the index (lock held)"""
+        value = self._ints.get((kind, key))
+        if value is None:
+            value = self._ints[(kind, key)] = int.from_bytes(self._bits.get((kind, key), b''), 'little')
+        return value
+
+    def _walk(self, directory):
+        for current, dirnames, filenames in os.walk(directory):
+            dirnames[:] = [name for name in dirnames if not self.is_ignored(name)]
+            relative = Path(current).relative_to(self.root).as_posix()
+            prefix = '' if relative == '.' else relative + '/'
+            for name in filenames:
+                if not self.is_ignored(name):
+                    yield prefix + name
+            # Under eventlet this is a green thread; let others run
+            time.sleep(0)
+
+    def _rebuild(self, paths):
+        """Index ``paths`` from scratch, a bitset at a time"""
+        count = len(paths)
+        lower = [path.lower() for path in paths]
+        slashes = [path.rfind('/') for path in lower]
+        bases = [path[slash + 1:] for path, slash in zip(lower, slashes)]
+        # Many files share a directory, so directories are tested once each
+        directory_ids = {}
+        directories = [directory_ids.setdefault(path[:slash], len(directory_ids))
+                       for path, slash in zip(lower, slashes)]
+        gather = operator.itemgetter(*directories) if count > 1 else (lambda flags: tuple(flags[:count]))
+        firsts = ''.join([base[:1] if base[:1] in ALPHABET else ' ' for base in bases]).encode('ascii')
+        buckets = bytes([bisect.bisect_left(LENGTH_BUCKETS, len(path)) for path in paths])
+
+        bits = {('live', None): _bitset(b'\x01' * count)}
+        for char in ALPHABET:
+            in_base = _bitset([char in base for base in bases])
+            in_directory = _bitset(gather([char in directory for directory in directory_ids]))
+            bits[('base', char)] = in_base
+            bits[('char', char)] = bytearray(
+                (int.from_bytes(in_base, 'little') | int.from_bytes(in_directory, 'little')).to_bytes(len(in_base), 'little')
+            )
+            bits[('first', char)] = _bitset(firsts.translate(_equal(ord(char))))
+        for n in range(len(LENGTH_BUCKETS) + 1):
+            bits[('length', n)] = _bitset(buckets.translate(_equal(n)))
+        for doc, path in enumerate(paths):
+            slash = path.find('/')
+            if slash > 0:
+                project = bits.get(('project', path[:slash]))
+                if project is None:
+                    project = bits[('project', path[:slash])] = bytearray((count + 7) // 8)
+                project[doc >> 3] |= 1 << (doc & 7)
+
+        with self._lock:
+            self._paths = list(paths)
+            self._ids = {path: doc for doc, path in enumerate(paths)}
+            self._dead = 0
+            self._bits = bits
+            self._ints = {}
+
+    def _add(self, path):
+        with self._lock:
+            if path in self._ids:
+                return
+            doc = len(self._paths)
+            self._paths.append(path)
+            self._ids[path] = doc
+            self._mark(doc, path, True)
+
+    def _remove_tree(self, path):
+        """Remove ``path``, or every path under it if it was a directory"""
+        prefix = path + '/'
+        with self._lock:
+            doc = self._ids.get(path)
+            removed = [(path, doc)] if doc is not None else [
+                (found, found_doc) for found, found_doc in self._ids.items() if found.startswith(prefix)
+            ]
+            for found, found_doc in removed:
+                del self._ids[found]
+                self._paths[found_doc] = None
+                self._mark(found_doc, found, False)
+                self._dead += 1
+
+    def _mark(self, doc, path, on):
+        """Set or clear ``doc`` in the bitsets ``path`` belongs to (lock held)"""
+        lower = path.lower()
+        base = lower[lower.rfind('/') + 1:]
+        keys = [('live', None), ('length', bisect.bisect_left(LENGTH_BUCKETS, len(path)))]
+        keys += [('char', char) for char in set(lower) & ALPHABET]
+        keys += [('base', char) for char in set(base) & ALPHABET]
+        if base[:1] in ALPHABET:
+            keys.append(('first', base[0]))
+        if '/' in path:
+            keys.append(('project', path[:path.index('/')]))
+        for key in keys:
+            _set(self._bits.setdefault(key, bytearray()), doc, on)
+        self._ints = {}
+
+    def _run(self):
+        try:
+            self.build()
+        except Exception as e:
+            logger.error(f"Building the path index failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "files": len(self._ids),
+                "projects": sum(1 for kind, _ in self._bits if kind == 'project'),
+                "queries": self.queries,
+                "truncated": self.truncated,
+                "buildMs": self.build_ms
+            }
@@ -0,0 +1,115 @@
+"""
+Project Rooms for AutoPilot IDE
+Tracks which Socket.IO connections follow which project, so project and file
+change events are sent only to that project's subscribers, and counts the
+fan-out of each room
+"""
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Most projects one connection may follow at a time
+PROJECT_ROOMS_PER_CLIENT = int(os.environ.get('PROJECT_ROOMS_PER_CLIENT', 16))
+
+
+def room_name(project_id):
+    """Return the Socket.IO room of a project"""
+    return f"project:{project_id}"
+
+
+class ProjectRooms:
+    """Project room membership per connection, with per-room fan-out counters
+
+    Socket.IO keeps the rooms themselves; this keeps a local copy of who is in
+    them so an event for a project nobody follows is dropped before it is
+    serialized, and so each room can report how many copies it sent.
+    """
+
+    def __init__(self, max_per_client=PROJECT_ROOMS_PER_CLIENT):
+        self.max_per_client = max_per_client
+        self._members = {}  # project id -> set of sids
+        self._joined = {}  # sid -> set of project ids
+        self._counters = {}  # project id -> {"events": n, "deliveries": n}
+        self._sent = 0
+        self._delivered = 0
+        self._skipped = 0
+        self._lock = threading.Lock()
+
+    def join(self, sid, project_id):
+        """Add ``sid`` to the project's room; return False if it follows too many"""
+        with self._lock:
+            joined = self._joined.setdefault(sid, set())
+            if project_id not in joined and len(joined) >= self.max_per_client:
+                return False
+            joined.add(project_id)
+            self._members.setdefault(project_id, set()).add(sid)
+            self._counters.setdefault(project_id, {"events": 0, "deliveries": 0})
+            return True
+
+    def leave(self, sid, project_id):
+        """Remove ``sid`` from the project's room; return whether it was in it"""
+        with self._lock:
+            joined = self._joined.get(sid)
+            if not joined or project_id not in joined:
+                return False
+            joined.discard(project_id)
+            if not joined:
+                del self._joined[sid]
+            self._discard_member(sid, project_id)
+            return True
+
+    def leave_all(self, sid):
+        """Forget a disconnected ``sid``; return the projects it followed"""
+        with self._lock:
+            joined = self._joined.pop(sid, set())
+            for project_id in joined:
+                self._discard_member(sid, project_id)
+            return sorted(joined)
+
+    def projects(self, sid):
+        with self._lock:
+            return sorted(self._joined.get(sid, ()))
+
+    def subscribers(self, project_id):
+        with self._lock:
+            return len(self._members.get(project_id, ()))
+
+    def record(self, project_id):
+        """Count one event for the project; return False if nobody would receive it"""
+        with self._lock:
+            members = len(self._members.get(project_id, ()))
+            if not members:
+                self._skipped += 1
+                return False
+            counters = self._counters[project_id]
+            counters["events"] += 1
+            counters["deliveries"] += members
+            self._sent += 1
+            self._delivered += members
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rooms": len(self._members),
+                "connections": len(self._joined),
+                "eventsSent": self._sent,
+                "deliveries": self._delivered,
+                "eventsSkipped": self._skipped,
+                "perRoom": {
+                    project_id: dict(counters, subscribers=len(self._members[project_id]))
+                    for project_id, counters in self._counters.items()
+                }
+            }
+
+    def _discard_member(self, sid, project_id):
+        members = self._members.get(project_id)
+        if members is None:
+            return
+        members.discard(sid)
+        if not members:
+            # Rooms come and go with their subscribers, counters included
+            del self._members[project_id]
+            self._counters.pop(project_id, None)
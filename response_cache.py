@@ -0,0 +1,254 @@
+"""
+Response Cache for AutoPilot IDE
+Bounded LRU cache with expiry for AI assistant replies, keyed on the mode, the
+normalized message and the contents of the files the request refers to, with
+an optional spill of evicted replies to the AppData cache directory
+"""
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import logging
+
+import serialization
+
+logger = logging.getLogger(__name__)
+
+# Set AI_CACHE_ENABLED=false to send every request to the backend
+AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', 'true').lower() == 'true'
+
+# Replies kept in memory, by count and by total size, and how long they stay valid
+AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', 512))
+AI_CACHE_MAX_BYTES = int(os.environ.get('AI_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+AI_CACHE_TTL = float(os.environ.get('AI_CACHE_TTL', 3600))
+
+# Write replies evicted from memory to disk, up to this many bytes
+AI_CACHE_SPILL = os.environ.get('AI_CACHE_SPILL', 'false').lower() == 'true'
+AI_CACHE_SPILL_MAX_BYTES = int(os.environ.get('AI_CACHE_SPILL_MAX_BYTES', 64 * 1024 * 1024))
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_message(message):
+    """Collapse runs of whitespace so re-sent or re-wrapped requests match"""
+    return _WHITESPACE.sub(' ', message).strip()
+
+
+class FileHasher:
+    """Content hashes of files, re-read only when their size or mtime changes"""
+
+    def __init__(self):
+        self._hashes = {}  # path -> (mtime_ns, size, digest)
+        self._lock = threading.Lock()
+
+    def digest(self, path):
+        """Return the SHA-256 of the file's contents, or None if it cannot be read"""
+        path = str(path)
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        stamp = (stat_result.st_mtime_ns, stat_result.st_size)
+        with self._lock:
+            cached = self._hashes.get(path)
+        if cached is not None and cached[:2] == stamp:
+            return cached[2]
+
+        sha = hashlib.sha256()
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(block)
+        except OSError:
+            return None
+        digest = sha.hexdigest()
+        with self._lock:
+            self._hashes[path] = stamp + (digest,)
+        return digest
+
+
+class ResponseCache:
+    """LRU cache of replies with a time-to-live and an optional disk spill
+
+    Memory holds at most ``max_entries`` replies and ``max_bytes`` of reply
+    text. Replies pushed out by newer ones are written to ``spill_dir`` (when
+    given) and promoted back to memory on their next hit; the spill directory
+    is trimmed oldest-first to ``spill_max_bytes``. Expired replies are
+    dropped wherever they are found.
+    """
+
+    def __init__(self, max_entries=AI_CACHE_MAX_ENTRIES, max_bytes=AI_CACHE_MAX_BYTES, ttl=AI_CACHE_TTL,
+                 spill_dir=None, spill_max_bytes=AI_CACHE_SPILL_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.spill_max_bytes = spill_max_bytes
+        self.hasher = FileHasher()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value, size)
+        self._bytes = 0
+        self._spilled = None  # key -> size, loaded from disk on first use
+        self._spilled_bytes = 0
+        self._lock = threading.Lock()
+
+    def key(self, mode, message, files=()):
+        """Build the cache key for a request referring to ``files`` (absolute paths)"""
+        digests = sorted((str(path), self.hasher.digest(path)) for path in files)
+        material = serialization.dumps_str([mode, normalize_message(message), digests])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached reply for ``key``, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self._remove(key)
+                self.expirations += 1
+
+        value = self._load_spilled(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        return value[1]
+
+    def put(self, key, value):
+        """Cache a reply; replies larger than the whole memory budget are not kept"""
+        self._insert(key, time.time() + self.ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._load_index()
+            self._entries.clear()
+            self._bytes = 0
+            spilled, self._spilled = self._spilled or {}, {}
+            self._spilled_bytes = 0
+        for key in spilled:
+            self._spill_path(key).unlink(missing_ok=True)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "diskHits": self.disk_hits,
+                "misses": self.misses,
+                "hitRatio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "spilledEntries": len(self._spilled or ()),
+                "spilledBytes": self._spilled_bytes
+            }
+
+    def _insert(self, key, expires_at, value):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                old_key, old_entry = self._entries.popitem(last=False)
+                self._bytes -= old_entry[2]
+                self.evictions += 1
+                evicted.append((old_key, old_entry))
+        for old_key, (old_expires, old_value, _) in evicted:
+            self._spill(old_key, old_expires, old_value)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+
+    # ------------------------------------------------------------------
+    # Disk spill
+    # ------------------------------------------------------------------
+
+    def _spill_path(self, key):
+        return self.spill_dir / f"{key}.json"
+
+    def _load_index(self):
+        """Find replies spilled by earlier runs (called with the lock held)"""
+        if self._spilled is not None:
+            return
+        self._spilled = {}
+        if self.spill_dir is None:
+            return
+        try:
+            files = [
+                (entry.stat().st_mtime, entry.name[:-5], entry.stat().st_size)
+                for entry in os.scandir(self.spill_dir) if entry.name.endswith('.json')
+            ]
+        except OSError:
+            return
+        # Oldest first, so trimming removes those
+        for _, key, size in sorted(files):
+            self._spilled[key] = size
+            self._spilled_bytes += size
+
+    def _spill(self, key, expires_at, value):
+        if self.spill_dir is None or expires_at <= time.time():
+            return
+        data = serialization.dumps({"expiresAt": expires_at, "value": value})
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            # No fsync: a reply torn by a crash fails to parse and is a miss
+            self._spill_path(key).write_bytes(data)
+        except OSError as e:
+            logger.warning(f"Could not spill AI response to {self.spill_dir}: {e}")
+            return
+
+        with self._lock:
+            self._load_index()
+            self._spilled_bytes += len(data) - self._spilled.pop(key, 0)
+            self._spilled[key] = len(data)
+            trimmed = []
+            while self._spilled_bytes > self.spill_max_bytes and self._spilled:
+                old_key = next(iter(self._spilled))
+                self._spilled_bytes -= self._spilled.pop(old_key)
+                trimmed.append(old_key)
+        for old_key in trimmed:
+            self._spill_path(old_key).unlink(missing_ok=True)
+
+    def _load_spilled(self, key, now):
+        """Move a spilled reply back into memory; return (expires_at, value) or None"""
+        if self.spill_dir is None:
+            return None
+        with self._lock:
+            self._load_index()
+            size = self._spilled.pop(key, None)
+            if size is None:
+                return None
+            self._spilled_bytes -= size
+        path = self._spill_path(key)
+        try:
+            record = serialization.loads(path.read_bytes())
+        except (OSError, ValueError):
+            return None
+        finally:
+            path.unlink(missing_ok=True)
+        if record.get("expiresAt", 0) <= now:
+            with self._lock:
+                self.expirations += 1
+            return None
+        self._insert(key, record["expiresAt"], record["value"])
+        return record["expiresAt"], record["value"]
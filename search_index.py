@@ -0,0 +1,550 @@
+"""
+Search Index for AutoPilot IDE
+Trigram index of the text files under the projects directory, persisted in
+the AppData cache and kept current from file watcher events, answering
+literal and regular-expression searches
+"""
+import os
+import re
+import time
+import struct
+import bisect
+import threading
+from array import array
+from pathlib import Path
+import logging
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python 3.10
+    import sre_parse
+
+import serialization
+from file_tree import FILES_IGNORE, compile_ignore
+
+logger = logging.getLogger(__name__)
+
+# Set SEARCH_ENABLED=false to turn off indexing and /api/search
+SEARCH_ENABLED = os.environ.get('SEARCH_ENABLED', 'true').lower() == 'true'
+
+# Files larger than this many bytes are not indexed or searched
+SEARCH_MAX_FILE_SIZE = int(os.environ.get('SEARCH_MAX_FILE_SIZE', 1024 * 1024))
+
+# Seconds between saves of a changed index to the cache directory
+SEARCH_SAVE_INTERVAL = float(os.environ.get('SEARCH_SAVE_INTERVAL', 30))
+
+# Matches returned by one search by default, and the most one may ask for
+SEARCH_RESULTS = int(os.environ.get('SEARCH_RESULTS', 200))
+SEARCH_MAX_RESULTS = 5000
+
+# Longest query accepted, and longest line text returned with a match
+SEARCH_MAX_QUERY = 256
+SEARCH_MAX_LINE = 300
+
+# Seconds one search may spend reading and matching candidate files; a
+# search that runs out returns the matches found so far
+SEARCH_TIME_BUDGET = float(os.environ.get('SEARCH_TIME_BUDGET', 5))
+
+# Bumped whenever the on-disk layout changes; older files are rebuilt
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<Q')
+
+_REPEATS = tuple(
+    getattr(sre_parse, name) for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT') if hasattr(sre_parse, name)
+)
+
+
+def _fold(text):
+    """Index form of text: UTF-8 bytes with ASCII letters lowered, one char per byte"""
+    return text.encode('utf-8').lower().decode('latin-1')
+
+
+_THREE = re.compile('...', re.DOTALL)
+
+
+def _trigrams(folded):
+    """Every 3-character substring, collected as the 3-character chunks at offsets 0, 1 and 2"""
+    trigrams = set(_THREE.findall(folded))
+    trigrams.update(_THREE.findall(folded, 1))
+    trigrams.update(_THREE.findall(folded, 2))
+    return trigrams
+
+
+def _literal_runs(parsed, ignore_case):
+    """Literal strings every match of a parsed regex must contain"""
+    runs, current = [], []
+
+    def end_run():
+        if current:
+            runs.append(''.join(current))
+            current.clear()
+
+    for op, av in parsed:
+        if op is sre_parse.LITERAL and not (ignore_case and av > 127):
+            current.append(chr(av))
+        elif op is sre_parse.AT:
+            continue  # anchors match no characters
+        elif op is sre_parse.SUBPATTERN:
+            end_run()
+            _, add_flags, del_flags, pattern = av
+            inner_case = (ignore_case or bool(add_flags & re.IGNORECASE)) and not del_flags & re.IGNORECASE
+            runs.extend(_literal_runs(pattern, inner_case))
+        elif op in _REPEATS and av[0] >= 1:
+            end_run()
+            runs.extend(_literal_runs(av[2], ignore_case))
+        else:
+            end_run()
+    end_run()
+    return runs
+
+
+class _Matches:
+    """Lazily produced matches of one search; ``timed_out`` is set once the time budget ran out"""
+
+    def __init__(self, matches):
+        self.timed_out = False
+        self._matches = matches
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._matches)
+        except StopIteration as stop:
+            self.timed_out = bool(stop.value)
+            raise
+
+    def close(self):
+        self._matches.close()
+
+
+class SearchIndex:
+    """Trigram index over the text files under ``root``
+
+    Every indexed file is a document id; each trigram of its content (bytes,
+    ASCII letters lowered) maps to a sorted array of the ids containing it.
+    Ids only grow: a changed file gets a new id and its old one is marked
+    dead, so updates append to the arrays and dead ids are dropped when they
+    outnumber live ones. A query is narrowed to the files holding all of its
+    required trigrams and only those are read and matched.
+    """
+
+    def __init__(self, root, index_path=None, ignore=None, max_file_size=SEARCH_MAX_FILE_SIZE,
+                 save_interval=SEARCH_SAVE_INTERVAL):
+        self.root = Path(root).resolve()
+        self.index_path = Path(index_path) if index_path else None
+        self.is_ignored = compile_ignore(FILES_IGNORE if ignore is None else list(ignore))
+        self.max_file_size = max_file_size
+        self.save_interval = save_interval
+        self.ready = False
+        self.build_ms = None
+        self.queries = 0
+        self.updates = 0
+        self.saves = 0
+        self._docs = []  # document id -> path, or None once dead
+        self._files = {}  # path -> (document id or None if not indexed, mtime_ns, size)
+        self._postings = {}  # trigram -> array of document ids
+        self._dead = 0
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._pending = set()
+        self._stopped = False
+        self._thread = None
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._cond = threading.Condition()
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Load or build the index in the background and keep it current"""
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='search-index', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Stop updating and save any unsaved changes"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self.ready:
+            self._apply_pending()
+            self.save()
+
+    def build(self):
+        """Load the saved index, then bring it in line with the files on disk"""
+        started = time.perf_counter()
+        loaded = self.load()
+        seen = set()
+        changed = []
+        for path, stat_result in self._walk(self.root):
+            seen.add(path)
+            entry = self._files.get(path)
+            if entry is None or entry[1:] != (stat_result.st_mtime_ns, stat_result.st_size):
+                changed.append(path)
+        with self._lock:
+            removed = [path for path in self._files if path not in seen]
+        self._update(changed + removed)
+        self.build_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.ready = True
+        logger.info(
+            f"Search index {'loaded' if loaded else 'built'} in {self.build_ms:.0f} ms: "
+            f"{len(self._files)} files, {len(changed)} changed and {len(removed)} removed since the last save"
+        )
+        if self._dirty:
+            self.save()
+
+    def on_file_changes(self, events):
+        """File watcher listener: queue changed paths for re-indexing"""
+        payload = events.get('file_changed')
+        if not payload:
+            return
+        with self._cond:
+            self._pending.update(change['path'] for change in payload.get('changes', ()))
+            self._cond.notify()
+
+    # ------------------------------------------------------------------
+    # Searching
+    # ------------------------------------------------------------------
+
+    def search(self, query, regex=False, case_sensitive=False, path='', time_budget=SEARCH_TIME_BUDGET):
+        """Return ``(candidates, matches)`` for ``query`` in the files under ``path``
+
+        ``candidates`` is the number of files the index could not rule out and
+        ``matches`` an iterator of ``{path, line, column, text}``, one per
+        matching line, reading the candidate files as it is consumed and
+        stopping (with ``matches.timed_out`` set) after ``time_budget``
+        seconds. Changes still queued by the watcher are left to the
+        background thread; the search sees the index as it is. Raises
+        ValueError for an empty, too long or invalid query or a bad path.
+        """
+        if not isinstance(query, str) or not query:
+            raise ValueError("q must not be empty")
+        if len(query) > SEARCH_MAX_QUERY:
+            raise ValueError(f"q must be at most {SEARCH_MAX_QUERY} characters")
+        flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+        try:
+            pattern = re.compile(query if regex else re.escape(query), flags)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression: {e}")
+        prefix = self._prefix(path)
+
+        if regex:
+            parsed = sre_parse.parse(query, flags)
+            runs = _literal_runs(parsed, bool(parsed.state.flags & re.IGNORECASE))
+        else:
+            runs = _literal_runs(sre_parse.parse(re.escape(query)), not case_sensitive)
+        required = set()
+        for run in runs:
+            required |= _trigrams(_fold(run))
+
+        with self._lock:
+            self.queries += 1
+            paths = self._candidates(required, prefix)
+        deadline = time.monotonic() + time_budget
+        return len(paths), _Matches(self._matches(pattern, paths, deadline))
+
+    def _candidates(self, trigrams, prefix):
+        """Live paths under ``prefix`` whose documents hold every trigram (lock held)"""
+        if trigrams:
+            lists = sorted((self._postings.get(trigram, ()) for trigram in trigrams), key=len)
+            ids = set(lists[0])
+            for ids_with in lists[1:]:
+                if not ids:
+                    break
+                if len(ids) * 16 < len(ids_with):
+                    ids = {i for i in ids if self._contains(ids_with, i)}
+                else:
+                    ids.intersection_update(ids_with)
+            docs = (self._docs[i] for i in ids)
+        else:
+            docs = iter(self._docs)
+        return sorted(path for path in docs if path is not None and path.startswith(prefix))
+
+    @staticmethod
+    def _contains(ids, i):
+        position = bisect.bisect_left(ids, i)
+        return position < len(ids) and ids[position] == i
+
+    def _matches(self, pattern, paths, deadline):
+        """Yield the matching lines of ``paths``; return True if ``deadline`` cut them short"""
+        for path in paths:
+            if time.monotonic() > deadline:
+                return True
+            try:
+                with open(self.root / path, 'rb') as f:
+                    text = f.read(self.max_file_size + 1).decode('utf-8', errors='replace')
+            except OSError:
+                continue
+            line, counted, last_start = 1, 0, -1
+            for match in pattern.finditer(text):
+                if time.monotonic() > deadline:
+                    return True
+                start = match.start()
+                line += text.count('\n', counted, start)
+                counted = start
+                line_start = text.rfind('\n', 0, start) + 1
+                if line_start == last_start:
+                    continue
+                last_start = line_start
+                line_end = text.find('\n', start)
+                line_text = text[line_start:line_end if line_end != -1 else len(text)].rstrip('\r')
+                yield {
+                    "path": path,
+                    "line": line,
+                    "column": start - line_start + 1,
+                    "text": line_text[:SEARCH_MAX_LINE]
+                }
+        return False
+
+    def _prefix(self, path):
+        if not path:
+            return ''
+        if not isinstance(path, str) or '\0' in path:
+            raise ValueError("Invalid path")
+        resolved = (self.root / path.strip('/')).resolve()
+        if resolved != self.root and self.root not in resolved.parents:
+            raise ValueError("Path is outside the projects directory")
+        relative = resolved.relative_to(self.root).as_posix()
+        return '' if relative == '.' else relative + '/'
+
+    # ------------------------------------------------------------------
+    # Updating
+    # ------------------------------------------------------------------
+
+    def _walk(self, directory):
+        """Yield ``(relative path, stat)`` for the files under ``directory`` that are not ignored"""
+        for current, dirnames, filenames in os.walk(directory):
+            dirnames[:] = [name for name in dirnames if not self.is_ignored(name)]
+            relative = Path(current).relative_to(self.root).as_posix()
+            prefix = '' if relative == '.' else relative + '/'
+            for name in filenames:
+                if self.is_ignored(name):
+                    continue
+                try:
+                    stat_result = os.stat(os.path.join(current, name))
+                except OSError:
+                    continue
+                yield prefix + name, stat_result
+            # Under eventlet this is a green thread: let others run between
+            # directories (and between files in _update)
+            time.sleep(0)
+
+    def _apply_pending(self):
+        with self._cond:
+            pending, self._pending = self._pending, set()
+        if pending:
+            self._update(sorted(pending))
+
+    def _update(self, paths):
+        """Re-index, add or remove ``paths``; a path naming a directory covers its files"""
+        with self._update_lock:
+            for path in paths:
+                if any(self.is_ignored(part) for part in path.split('/')):
+                    continue
+                full = self.root / path
+                try:
+                    stat_result = os.stat(full)
+                except OSError:
+                    self._remove_tree(path)
+                    continue
+                if os.path.isdir(full):
+                    for child, child_stat in self._walk(full):
+                        self._index_file(child, child_stat)
+                else:
+                    self._index_file(path, stat_result)
+                time.sleep(0)
+            self._compact_if_needed()
+
+    def _index_file(self, path, stat_result):
+        stamp = (stat_result.st_mtime_ns, stat_result.st_size)
+        entry = self._files.get(path)
+        if entry is not None and entry[1:] == stamp:
+            return
+
+        trigrams = None
+        if stat_result.st_size <= self.max_file_size:
+            try:
+                with open(self.root / path, 'rb') as f:
+                    data = f.read(self.max_file_size + 1)
+            except OSError:
+                data = None
+            # A NUL byte near the start marks a binary file
+            if data is not None and b'\0' not in data[:8192]:
+                trigrams = _trigrams(data.lower().decode('latin-1'))
+
+        with self._lock:
+            self._forget(path)
+            doc_id = None
+            if trigrams is not None:
+                doc_id = len(self._docs)
+                self._docs.append(path)
+                postings = self._postings
+                for trigram in trigrams:
+                    ids = postings.get(trigram)
+                    if ids is None:
+                        ids = postings[trigram] = array('I')
+                    ids.append(doc_id)
+            self._files[path] = (doc_id,) + stamp
+            self._dirty = True
+            self.updates += 1
+
+    def _remove_tree(self, path):
+        with self._lock:
+            if path in self._files:
+                self._forget(path)
+            else:
+                prefix = path + '/'
+                for child in [child for child in self._files if child.startswith(prefix)]:
+                    self._forget(child)
+
+    def _forget(self, path):
+        """Drop ``path`` from the index (lock held)"""
+        entry = self._files.pop(path, None)
+        if entry is None:
+            return
+        if entry[0] is not None:
+            self._docs[entry[0]] = None
+            self._dead += 1
+        self._dirty = True
+
+    def _compact_if_needed(self):
+        """Renumber documents without the dead ones once those are the majority"""
+        with self._lock:
+            if self._dead < 1000 or self._dead * 2 < len(self._docs):
+                return
+            remap = array('i', [-1]) * len(self._docs)
+            docs = []
+            for doc_id, path in enumerate(self._docs):
+                if path is not None:
+                    remap[doc_id] = len(docs)
+                    docs.append(path)
+            postings = {}
+            for trigram, ids in self._postings.items():
+                kept = array('I', [remap[i] for i in ids if remap[i] >= 0])
+                if kept:
+                    postings[trigram] = kept
+            self._files = {
+                path: (remap[doc_id] if doc_id is not None else None, mtime, size)
+                for path, (doc_id, mtime, size) in self._files.items()
+            }
+            self._docs, self._postings, self._dead = docs, postings, 0
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self):
+        """Write the index to ``index_path`` in one step; return False if it could not"""
+        if self.index_path is None:
+            return False
+        with self._lock:
+            trigrams = list(self._postings)
+            meta = {
+                "version": _FORMAT_VERSION,
+                "root": str(self.root),
+                "itemsize": array('I').itemsize,
+                "docs": list(self._docs),
+                "files": {path: list(entry) for path, entry in self._files.items()},
+                "trigrams": [[trigram, len(self._postings[trigram])] for trigram in trigrams]
+            }
+            chunks = [self._postings[trigram].tobytes() for trigram in trigrams]
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        header = serialization.dumps(meta)
+
+        # Unique per process and thread, so two savers never share a temp file
+        tmp_path = self.index_path.with_name(f".{self.index_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(_HEADER.pack(len(header)))
+                f.write(header)
+                f.writelines(chunks)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"Could not save the search index to {self.index_path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            with self._lock:
+                self._dirty = True
+            return False
+        self.saves += 1
+        return True
+
+    def load(self):
+        """Replace the in-memory index with the saved one; return False if there is none to use"""
+        if self.index_path is None:
+            return False
+        try:
+            with open(self.index_path, 'rb') as f:
+                (length,) = _HEADER.unpack(f.read(_HEADER.size))
+                if length > os.fstat(f.fileno()).st_size:
+                    raise ValueError("header length exceeds the file")
+                meta = serialization.loads(f.read(length))
+                ids = array('I')
+                ids.frombytes(f.read())
+        except (OSError, ValueError, struct.error) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Ignoring unreadable search index {self.index_path}: {e}")
+            return False
+        if (meta.get("version") != _FORMAT_VERSION or meta.get("root") != str(self.root)
+                or meta.get("itemsize") != ids.itemsize):
+            return False
+
+        postings = {}
+        offset = 0
+        for trigram, count in meta["trigrams"]:
+            postings[trigram] = ids[offset:offset + count]
+            offset += count
+        if offset != len(ids):
+            logger.warning(f"Ignoring truncated search index {self.index_path}")
+            return False
+        with self._lock:
+            self._docs = meta["docs"]
+            self._files = {path: tuple(entry) for path, entry in meta["files"].items()}
+            self._postings = postings
+            self._dead = self._docs.count(None)
+            self._dirty = False
+        return True
+
+    def _run(self):
+        try:
+            self.build()
+        except Exception as e:
+            logger.error(f"Building the search index failed: {e}")
+            return
+        while True:
+            with self._cond:
+                if not self._pending and not self._stopped:
+                    self._cond.wait(self.save_interval)
+                if self._stopped:
+                    return
+            try:
+                self._apply_pending()
+                if self._dirty and time.monotonic() - self._saved_at >= self.save_interval:
+                    self.save()
+            except Exception as e:
+                logger.error(f"Updating the search index failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "files": len(self._docs) - self._dead,
+                "skippedFiles": sum(1 for entry in self._files.values() if entry[0] is None),
+                "trigrams": len(self._postings),
+                "postings": sum(len(ids) for ids in self._postings.values()),
+                "deadDocuments": self._dead,
+                "pending": len(self._pending),
+                "buildMs": self.build_ms,
+                "queries": self.queries,
+                "updates": self.updates,
+                "saves": self.saves
+            }
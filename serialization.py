@@ -0,0 +1,65 @@
+"""
+JSON Serialization for AutoPilot IDE
+Encodes with orjson when it is installed and falls back to the standard library
+"""
+import os
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Write AppData files indented for hand editing instead of compact
+PRETTY_JSON = os.environ.get('APPDATA_PRETTY_JSON', 'false').lower() == 'true'
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+# orjson reads integers outside the 64-bit range as rounded floats. Those
+# have at least 19 digits; this table maps digits to '1' and everything else
+# to '0', so such a run is found with one translate and find.
+_DIGITS = bytes(0x31 if 0x30 <= byte <= 0x39 else 0x30 for byte in range(256))
+_LONG_NUMBER = b'1' * 19
+
+
+def dumps(obj, pretty=False, default=None):
+    """Serialize ``obj`` to UTF-8 JSON bytes, compact unless ``pretty``"""
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # orjson rejects non-string keys and integers beyond 64 bits;
+            # the standard library accepts both
+            pass
+
+    if pretty:
+        text = json.dumps(obj, default=default, ensure_ascii=False, indent=2)
+    else:
+        text = json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':'))
+    return text.encode('utf-8')
+
+
+def dumps_str(obj, pretty=False, default=None):
+    """Serialize ``obj`` to a JSON string"""
+    return dumps(obj, pretty, default).decode('utf-8')
+
+
+def loads(data):
+    """Parse JSON from ``bytes`` or ``str``
+
+    Documents with a run of 19 or more digits, such as integers beyond 64
+    bits written by the standard library fallback in ``dumps``, are parsed
+    with the json module so those integers stay exact.
+    """
+    if orjson is not None:
+        raw = data.encode('utf-8') if isinstance(data, str) else data
+        if raw.translate(_DIGITS).find(_LONG_NUMBER) == -1:
+            return orjson.loads(raw)
+    return json.loads(data)
+
+
+def load_file(path):
+    """Read and parse a JSON file"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
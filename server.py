@@ -0,0 +1,172 @@
+"""
+Production Server for AutoPilot IDE
+Runs the app under gunicorn with the async mode, worker count and bind
+address from ProductionConfig, and drains terminal work on shutdown
+
+Usage:
+    python server.py
+    python server.py --bind 0.0.0.0:8000 --workers 1 --async-mode eventlet
+
+Without gunicorn (e.g. on Windows) a single process is served by eventlet's
+WSGI server, or by Werkzeug in threading mode.
+
+With several workers and no SOCKETIO_MESSAGE_QUEUE, the built-in message
+broker runs in the gunicorn master so workers share emits and AppData changes.
+"""
+import os
+import sys
+import signal
+import argparse
+import importlib.util
+import logging
+
+from config import ProductionConfig
+from message_queue import MessageBroker
+
+logger = logging.getLogger(__name__)
+
+ASYNC_MODES = ('eventlet', 'threading')
+
+
+def resolve_async_mode(requested):
+    """Return the async mode to run with, falling back to threading without eventlet"""
+    if requested not in ASYNC_MODES:
+        raise ValueError(f"Unknown async mode '{requested}' (expected one of: {', '.join(ASYNC_MODES)})")
+    if requested == 'eventlet' and importlib.util.find_spec('eventlet') is None:
+        logger.warning("eventlet is not installed; falling back to threading mode")
+        return 'threading'
+    return requested
+
+
+def prepare(async_mode=None):
+    """Select the async mode before the app is imported; return it
+
+    eventlet has to patch the standard library before anything else opens
+    sockets or starts threads.
+    """
+    os.environ.setdefault('FLASK_ENV', 'production')
+    async_mode = resolve_async_mode(async_mode or ProductionConfig.ASYNC_MODE)
+    if async_mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    ProductionConfig.ASYNC_MODE = async_mode
+    return async_mode
+
+
+def gunicorn_options(bind, workers, async_mode, threads=ProductionConfig.THREADS,
+                     graceful_timeout=ProductionConfig.GRACEFUL_TIMEOUT):
+    """Build the gunicorn settings for one async mode"""
+    options = {
+        'bind': bind,
+        'workers': workers,
+        # Leave time to disconnect clients after terminal commands drain
+        'graceful_timeout': graceful_timeout + 10,
+        'timeout': 120,
+        'accesslog': '-',
+        'post_worker_init': _post_worker_init,
+        'worker_exit': _worker_exit
+    }
+    if async_mode == 'eventlet':
+        options.update({'worker_class': 'eventlet', 'worker_connections': 1000})
+    else:
+        # Each long-polling or WebSocket connection holds a thread
+        options.update({'worker_class': 'gthread', 'threads': threads})
+    return options
+
+
+def _post_worker_init(worker):
+    """Start draining as soon as the worker is told to stop"""
+    stop = signal.getsignal(signal.SIGTERM)
+
+    def on_term(signum, frame):
+        import app as app_module
+        app_module.socketio.start_background_task(app_module.drain)
+        stop(signum, frame)
+
+    signal.signal(signal.SIGTERM, on_term)
+
+
+def _worker_exit(server, worker):
+    import app as app_module
+    app_module.shutdown()
+
+
+def start_local_broker():
+    """Run the built-in message broker in this process and point workers at it"""
+    broker = MessageBroker()
+    os.environ['SOCKETIO_MESSAGE_QUEUE'] = ProductionConfig.MESSAGE_QUEUE = broker.start()
+    return broker
+
+
+def serve_gunicorn(options):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from wsgi import app
+            return app
+
+    Application().run()
+
+
+def serve_single(host, port, async_mode):
+    """Serve from this process; used when gunicorn is not available"""
+    from wsgi import app, socketio
+    import app as app_module
+
+    def on_term(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, on_term)
+    if async_mode == 'threading':
+        logger.warning("gunicorn is not installed; serving with Werkzeug")
+    try:
+        socketio.run(app, host=host, port=port, use_reloader=False, log_output=True, allow_unsafe_werkzeug=True)
+    finally:
+        app_module.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run AutoPilot IDE in production")
+    parser.add_argument('--bind', default=f"{ProductionConfig.HOST}:{ProductionConfig.PORT}",
+                        help="HOST:PORT to listen on (default: HOST and PORT)")
+    parser.add_argument('--workers', type=int, default=ProductionConfig.WORKERS,
+                        help="worker processes (default: WORKERS)")
+    parser.add_argument('--threads', type=int, default=ProductionConfig.THREADS,
+                        help="threads per worker in threading mode (default: THREADS)")
+    parser.add_argument('--async-mode', choices=ASYNC_MODES, default=ProductionConfig.ASYNC_MODE,
+                        help="Socket.IO async mode (default: ASYNC_MODE)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    os.environ.setdefault('FLASK_ENV', 'production')
+    ProductionConfig.validate()
+    # Only resolved here: eventlet is patched in each worker by gunicorn, or
+    # when wsgi is imported below
+    async_mode = resolve_async_mode(args.async_mode)
+    os.environ['ASYNC_MODE'] = ProductionConfig.ASYNC_MODE = async_mode
+    if args.workers > 1:
+        logger.warning("Socket.IO long-polling with several workers needs sticky sessions; see DEPLOYMENT.md")
+
+    if importlib.util.find_spec('gunicorn') is not None:
+        broker = None
+        if args.workers > 1 and not ProductionConfig.MESSAGE_QUEUE:
+            broker = start_local_broker()
+        try:
+            serve_gunicorn(gunicorn_options(args.bind, args.workers, async_mode, args.threads))
+        finally:
+            if broker is not None:
+                broker.stop()
+    else:
+        if args.workers > 1:
+            logger.warning("gunicorn is not installed; running a single worker")
+        host, _, port = args.bind.rpartition(':')
+        serve_single(host or ProductionConfig.HOST, int(port), async_mode)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
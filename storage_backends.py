@@ -0,0 +1,906 @@
+"""
+Storage Backends for AutoPilot IDE
+Pluggable persistence for the AppData record collections (projects, themes,
+extensions, layouts): one JSON file per record, or a single SQLite database
+"""
+import os
+import copy
+import time
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+import logging
+import serialization
+
+logger = logging.getLogger(__name__)
+
+# Seconds between full per-file mtime checks of a cached collection. The
+# directory mtime is still checked on every access, so added or removed files
+# are noticed immediately; in-place edits are noticed within this interval.
+CACHE_REVALIDATE_INTERVAL = float(os.environ.get('APPDATA_CACHE_REVALIDATE', 2.0))
+
+# Minimum seconds between rewrites of a collection's manifest. Saves in
+# between only mark it out of date; the next save after the interval, the
+# background reconcile scan or close() writes it. A manifest left behind is
+# repaired from the record stamps when it is next loaded.
+MANIFEST_WRITE_INTERVAL = float(os.environ.get('APPDATA_MANIFEST_WRITE_INTERVAL', 2.0))
+
+# Fields kept in each collection's summary index
+SUMMARY_FIELDS = {
+    'projects': ('id', 'name', 'type', 'path', 'lastOpened', 'createdAt'),
+    'themes': ('id', 'name'),
+    'extensions': ('id', 'name', 'version', 'installed', 'enabled'),
+    'layouts': ('id', 'name', 'savedAt')
+}
+
+# Listings of these collections are ordered by this field, newest first
+SORT_KEYS = {
+    'projects': 'lastOpened',
+    'layouts': 'savedAt'
+}
+
+COLLECTIONS = tuple(SUMMARY_FIELDS)
+
+
+def sort_records(collection, records):
+    """Order records by the collection's sort key, newest first"""
+    sort_key = SORT_KEYS.get(collection)
+    if not sort_key:
+        return records
+    return sorted(records, key=lambda x: x.get(sort_key) or '', reverse=True)
+
+
+def summarize_record(collection, record):
+    """Return only the summary fields of a record"""
+    return {field: record[field] for field in SUMMARY_FIELDS[collection] if field in record}
+
+
+def stage_json(path, data, pretty=False):
+    """Write JSON to a synced temporary file next to ``path`` and return its path"""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(serialization.dumps(data, pretty))
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return tmp_path
+
+
+def atomic_write_json(path, data, pretty=False):
+    """Write JSON to a temporary file and move it over ``path`` in one step"""
+    tmp_path = stage_json(path, data, pretty)
+    try:
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+class _SizedIndex(dict):
+    """Summary index ``{id: (stamp, summary)}`` with a running total of record sizes"""
+    
+    def __init__(self, entries=()):
+        super().__init__()
+        self.total_bytes = 0
+        self.update(entries)
+    
+    def __setitem__(self, record_id, entry):
+        old = self.get(record_id)
+        if old is not None:
+            self.total_bytes -= old[0][1]
+        super().__setitem__(record_id, entry)
+        self.total_bytes += entry[0][1]
+    
+    def __delitem__(self, record_id):
+        self.total_bytes -= self[record_id][0][1]
+        super().__delitem__(record_id)
+    
+    def pop(self, record_id, default=None):
+        if record_id not in self:
+            return default
+        entry = self[record_id]
+        del self[record_id]
+        return entry
+    
+    def update(self, entries=()):
+        items = entries.items() if isinstance(entries, dict) else entries
+        for record_id, entry in items:
+            self[record_id] = entry
+
+
+class _CollectionCache:
+    """Write-through in-memory cache of the JSON records in one directory
+    
+    Besides the full records, the cache maintains a manifest file
+    (``_index.json``) holding the summary fields of every record, so that
+    listings which only need summaries cost a single file read. Rewriting
+    the manifest costs O(records), so it is written at most once per
+    ``manifest_write_interval``.
+    """
+    
+    MANIFEST_NAME = '_index'
+    
+    def __init__(self, directory, summary_fields=('id', 'name'),
+                 revalidate_interval=CACHE_REVALIDATE_INTERVAL,
+                 manifest_write_interval=MANIFEST_WRITE_INTERVAL):
+        self.directory = Path(directory)
+        self.summary_fields = tuple(summary_fields)
+        self.revalidate_interval = revalidate_interval
+        self.manifest_write_interval = manifest_write_interval
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+        self._records = {}
+        self._stamps = {}
+        self._loaded = False
+        self._dir_mtime = None
+        self._last_scan = 0.0
+        self._index = _SizedIndex()
+        self._index_loaded = False
+        self._index_dir_mtime = None
+        self._index_checked = None
+        self._manifest_dirty = False
+        self._manifest_written = float('-inf')
+        self._lock = threading.RLock()
+    
+    @property
+    def manifest_path(self):
+        return self.directory / f"{self.MANIFEST_NAME}.json"
+    
+    @staticmethod
+    def _stamp(stat_result):
+        return (stat_result.st_mtime_ns, stat_result.st_size)
+    
+    def _dir_mtime_now(self):
+        try:
+            return self.directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+    
+    def _summarize(self, record):
+        return {field: record[field] for field in self.summary_fields if field in record}
+    
+    def _is_stale(self):
+        if not self._loaded:
+            return True
+        if self._dir_mtime_now() != self._dir_mtime:
+            return True
+        return time.monotonic() - self._last_scan >= self.revalidate_interval
+    
+    def _read(self, path):
+        return serialization.load_file(path)
+    
+    def _scan_stamps(self):
+        """Return {record_id: (stamp, path)} for every record file on disk"""
+        found = {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return found
+        
+        for entry in entries:
+            if not entry.name.endswith('.json') or entry.name == self.manifest_path.name:
+                continue
+            try:
+                if entry.is_file():
+                    found[entry.name[:-5]] = (self._stamp(entry.stat()), entry.path)
+            except FileNotFoundError:
+                continue
+        return found
+    
+    def _rescan(self):
+        """Reload only the files whose mtime or size changed since the last scan"""
+        dir_mtime = self._dir_mtime_now()
+        found = self._scan_stamps()
+        loaded = 0
+        changed = False
+        
+        index_dirty = False
+        
+        for record_id, (stamp, path) in found.items():
+            if self._stamps.get(record_id) == stamp:
+                continue
+            try:
+                self._records[record_id] = self._read(path)
+                self._stamps[record_id] = stamp
+                loaded += 1
+                changed = True
+            except Exception as e:
+                logger.error(f"Error loading {path}: {e}")
+                continue
+            entry = self._index.get(record_id)
+            if self._index_loaded and (entry is None or entry[0] != stamp):
+                self._index[record_id] = (stamp, self._summarize(self._records[record_id]))
+                index_dirty = True
+        
+        for record_id in set(self._stamps) - set(found):
+            self._records.pop(record_id, None)
+            del self._stamps[record_id]
+            changed = True
+            if self._index.pop(record_id, None) is not None:
+                index_dirty = True
+        
+        self._dir_mtime = dir_mtime
+        self._last_scan = time.monotonic()
+        self._loaded = True
+        if changed:
+            self.version += 1
+        if index_dirty:
+            self._index_changed()
+        return loaded
+    
+    # Manifest handling
+    def _write_manifest(self):
+        """Persist the summary index atomically"""
+        data = {
+            "fields": list(self.summary_fields),
+            "records": {
+                record_id: {"stamp": list(stamp), "summary": summary}
+                for record_id, (stamp, summary) in self._index.items()
+            }
+        }
+        dir_mtime = self._dir_mtime_now()
+        index_fresh = self._index_dir_mtime == dir_mtime
+        records_fresh = self._loaded and self._dir_mtime == dir_mtime
+        try:
+            atomic_write_json(self.manifest_path, data)
+            self._manifest_dirty = False
+            self._manifest_written = time.monotonic()
+            # Stamp the manifest with the directory mtime it describes, so a
+            # later mismatch reveals files added or removed behind our back.
+            # An index already behind the directory keeps its older stamp.
+            dir_mtime = self._dir_mtime_now()
+            if index_fresh:
+                self._index_dir_mtime = dir_mtime
+            stamp = self._index_dir_mtime or 0
+            os.utime(self.manifest_path, ns=(stamp, stamp))
+            if records_fresh:
+                self._dir_mtime = dir_mtime
+        except OSError as e:
+            logger.error(f"Error writing manifest {self.manifest_path}: {e}")
+    
+    def _index_changed(self):
+        """Mark the manifest out of date, writing it if the last write is old enough"""
+        self._manifest_dirty = True
+        if time.monotonic() - self._manifest_written >= self.manifest_write_interval:
+            self._write_manifest()
+    
+    def flush_manifest(self):
+        """Write the manifest now if changes to it were deferred"""
+        with self._lock:
+            if self._manifest_dirty:
+                self._write_manifest()
+    
+    def _read_manifest(self):
+        """Load the manifest from disk; return False if missing or corrupted"""
+        try:
+            manifest_mtime = self.manifest_path.stat().st_mtime_ns
+            data = self._read(self.manifest_path)
+            if data.get('fields') != list(self.summary_fields):
+                return False
+            self._index = _SizedIndex(
+                (record_id, (tuple(entry['stamp']), entry['summary']))
+                for record_id, entry in data['records'].items()
+            )
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Manifest {self.manifest_path} is corrupted, rebuilding: {e}")
+            return False
+        
+        self._index_loaded = True
+        self._index_dir_mtime = manifest_mtime
+        # Record files may have been edited in place since it was written
+        self._index_checked = None
+        return True
+    
+    def _reconcile_index(self):
+        """Bring the manifest in line with the directory, parsing only changed files"""
+        dir_mtime = self._dir_mtime_now()
+        found = self._scan_stamps()
+        self._index_checked = time.monotonic()
+        changed = False
+        
+        for record_id, (stamp, path) in found.items():
+            entry = self._index.get(record_id)
+            if entry is not None and entry[0] == stamp:
+                continue
+            try:
+                record = self._read(path)
+            except Exception as e:
+                logger.error(f"Error loading {path}: {e}")
+                continue
+            self._index[record_id] = (stamp, self._summarize(record))
+            changed = True
+        
+        for record_id in set(self._index) - set(found):
+            del self._index[record_id]
+            changed = True
+        
+        if changed:
+            self.version += 1
+        if changed or dir_mtime != self._index_dir_mtime:
+            self._index_dir_mtime = dir_mtime
+            self._index_changed()
+        return changed
+    
+    def rebuild_index(self):
+        """Discard the manifest and rebuild it from the record files"""
+        with self._lock:
+            self._index = _SizedIndex()
+            self._index_loaded = True
+            self._reconcile_index()
+            self.flush_manifest()
+            logger.info(f"Rebuilt manifest {self.manifest_path} ({len(self._index)} records)")
+    
+    def _index_is_stale(self):
+        """Report whether the loaded manifest may be behind the record files
+        
+        Files added or removed change the directory mtime, which is checked
+        on every call; in-place edits only show in the record stamps, which
+        are compared at most once per revalidate interval.
+        """
+        if self._dir_mtime_now() != self._index_dir_mtime:
+            return True
+        if self._index_checked is None:
+            return True
+        return time.monotonic() - self._index_checked >= self.revalidate_interval
+    
+    def _index_is_fresh(self):
+        """Load the manifest if needed and report whether it matches the record files"""
+        if not self._index_loaded and not self._read_manifest():
+            return False
+        return not self._index_is_stale()
+    
+    def _sync_index(self, index_was_fresh, record_id, entry=None):
+        """Apply one write to the manifest, reconciling it if it was out of date"""
+        if index_was_fresh:
+            if entry is None:
+                self._index.pop(record_id, None)
+            else:
+                self._index[record_id] = entry
+            self._index_dir_mtime = self._dir_mtime_now()
+            self._index_changed()
+        else:
+            self._index_loaded = True
+            self._reconcile_index()
+    
+    def summaries(self):
+        """Return the summary fields of every record, answered from the manifest"""
+        with self._lock:
+            if not self._index_loaded and not self._read_manifest():
+                self.misses += 1
+                self.rebuild_index()
+            elif self._index_is_stale() and self._reconcile_index():
+                self.misses += 1
+            else:
+                self.hits += 1
+            return [dict(summary) for _, summary in self._index.values()]
+    
+    def usage(self):
+        """Return (record count, total record bytes) from the in-memory index"""
+        with self._lock:
+            if not self._index_loaded and not self._read_manifest():
+                self.rebuild_index()
+            return len(self._index), self._index.total_bytes
+    
+    # Record access
+    def records(self):
+        """Return the cached records, rescanning the directory if it changed"""
+        with self._lock:
+            if self._is_stale() and self._rescan():
+                self.misses += 1
+            else:
+                self.hits += 1
+            return list(self._records.values())
+    
+    def get(self, record_id, path):
+        """Return one record, re-reading it only if its file changed"""
+        with self._lock:
+            try:
+                stamp = self._stamp(path.stat())
+            except FileNotFoundError:
+                if record_id in self._stamps:
+                    self.discard(record_id)
+                raise
+            
+            if self._stamps.get(record_id) == stamp:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._records[record_id] = self._read(path)
+                self._stamps[record_id] = stamp
+                self.version += 1
+            return self._records[record_id]
+    
+    def put(self, record_id, record, path):
+        """Write a record to ``path`` and keep the cache and manifest in step"""
+        if record_id == self.MANIFEST_NAME:
+            raise ValueError(f"Invalid id: '{record_id}' is reserved")
+        
+        with self._lock:
+            was_fresh = self._loaded and self._dir_mtime_now() == self._dir_mtime
+            index_was_fresh = self._index_is_fresh()
+            
+            atomic_write_json(path, record, serialization.PRETTY_JSON)
+            
+            stamp = self._stamp(path.stat())
+            self._records[record_id] = copy.deepcopy(record)
+            self._stamps[record_id] = stamp
+            self.version += 1
+            if was_fresh:
+                self._dir_mtime = self._dir_mtime_now()
+            
+            self._sync_index(index_was_fresh, record_id, (stamp, self._summarize(record)))
+    
+    def put_many(self, items):
+        """Write many ``(record_id, record, path)`` items, updating the manifest once"""
+        # Later items for the same id win
+        items = list({record_id: (record_id, record, path) for record_id, record, path in items}.values())
+        for record_id, _, _ in items:
+            if record_id == self.MANIFEST_NAME:
+                raise ValueError(f"Invalid id: '{record_id}' is reserved")
+        
+        with self._lock:
+            was_fresh = self._loaded and self._dir_mtime_now() == self._dir_mtime
+            index_was_fresh = self._index_is_fresh()
+            
+            # Stage every file before replacing any, so a record that fails
+            # to serialize or write leaves the whole collection untouched
+            staged = []
+            try:
+                for record_id, record, path in items:
+                    staged.append(stage_json(path, record, serialization.PRETTY_JSON))
+            except BaseException:
+                for tmp_path in staged:
+                    tmp_path.unlink(missing_ok=True)
+                raise
+            
+            for tmp_path, (_, _, path) in zip(staged, items):
+                os.replace(tmp_path, path)
+            
+            for record_id, record, path in items:
+                stamp = self._stamp(path.stat())
+                self._records[record_id] = copy.deepcopy(record)
+                self._stamps[record_id] = stamp
+                if index_was_fresh:
+                    self._index[record_id] = (stamp, self._summarize(record))
+            
+            self.version += 1
+            if was_fresh:
+                self._dir_mtime = self._dir_mtime_now()
+            if index_was_fresh:
+                self._index_dir_mtime = self._dir_mtime_now()
+                self._index_changed()
+            else:
+                self._index_loaded = True
+                self._reconcile_index()
+    
+    def remove(self, record_id, path):
+        """Delete the record file at ``path``; return False if it did not exist"""
+        with self._lock:
+            was_fresh = self._loaded and self._dir_mtime_now() == self._dir_mtime
+            index_was_fresh = self._index_is_fresh()
+            
+            if not path.exists():
+                self.discard(record_id)
+                return False
+            path.unlink()
+            
+            self.discard(record_id)
+            if was_fresh:
+                self._dir_mtime = self._dir_mtime_now()
+            
+            self._sync_index(index_was_fresh, record_id)
+            return True
+    
+    def discard(self, record_id):
+        """Drop a record from the cache without touching the disk"""
+        with self._lock:
+            self._records.pop(record_id, None)
+            if self._stamps.pop(record_id, None) is not None:
+                self.version += 1
+    
+    def current_version(self):
+        """Return the version after a cheap check for out-of-band changes"""
+        with self._lock:
+            if self._index_loaded and self._index_is_stale():
+                self._reconcile_index()
+            if self._loaded and self._is_stale():
+                self._rescan()
+            return self.version
+    
+    def invalidate(self):
+        """Check every record file against its stamp on the next access
+        
+        Changed files are re-read and bump the version then; a write of our
+        own that the watcher reports costs a scandir, not a reload.
+        """
+        with self._lock:
+            self._last_scan = float('-inf')
+            self._index_checked = None
+    
+    def stats(self):
+        """Return hit/miss counters for this collection"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": round(self.hits / total, 4) if total else 0.0,
+                "records": len(self._records),
+                "version": self.version
+            }
+
+
+
+
+class StorageBackend:
+    """Interface shared by the AppData storage backends
+    
+    Records are JSON-serializable dicts identified by their ``id`` within a
+    collection. Listings are ordered by the collection's sort key.
+    """
+    
+    name = None
+    
+    def list(self, collection):
+        """Return all records of a collection"""
+        raise NotImplementedError
+    
+    def summaries(self, collection):
+        """Return the summary fields of all records of a collection"""
+        raise NotImplementedError
+    
+    def get(self, collection, record_id):
+        """Return one record; raise FileNotFoundError if it does not exist"""
+        raise NotImplementedError
+    
+    def get_many(self, collection, record_ids):
+        """Return ``{id: record}`` for the ids that exist"""
+        records = {}
+        for record_id in record_ids:
+            try:
+                records[record_id] = self.get(collection, record_id)
+            except FileNotFoundError:
+                pass
+        return records
+    
+    def put(self, collection, record_id, record):
+        """Insert or replace a record and return where it was stored"""
+        raise NotImplementedError
+    
+    def put_many(self, collection, records):
+        """Insert or replace many ``(record_id, record)`` pairs; return the count"""
+        records = list(records)
+        for record_id, record in records:
+            self.put(collection, record_id, record)
+        return len(records)
+    
+    def delete(self, collection, record_id):
+        """Delete a record; return False if it did not exist"""
+        raise NotImplementedError
+    
+    def version(self, collection):
+        """Return a number that changes whenever the collection changes"""
+        raise NotImplementedError
+    
+    def usage(self, collection):
+        """Return (record count, stored bytes) for a collection without scanning it"""
+        raise NotImplementedError
+    
+    def stats(self):
+        """Return per-collection cache/record counters"""
+        return {}
+    
+    def invalidate(self, collection=None):
+        """Drop any in-memory state so the next read goes to storage"""
+    
+    def rebuild_index(self, collection):
+        """Rebuild any derived index of a collection from its records"""
+    
+    def flush(self):
+        """Write out bookkeeping that earlier writes deferred"""
+    
+    def close(self):
+        """Release resources held by the backend"""
+
+
+class JSONFileBackend(StorageBackend):
+    """One JSON file per record, cached in memory with a summary manifest"""
+    
+    name = 'json'
+    
+    def __init__(self, base_dir):
+        self.base_dir = Path(base_dir)
+        self._caches = {}
+        for collection in COLLECTIONS:
+            directory = self.base_dir / collection
+            directory.mkdir(parents=True, exist_ok=True)
+            self._caches[collection] = _CollectionCache(directory, SUMMARY_FIELDS[collection])
+    
+    def _path(self, collection, record_id):
+        return self.base_dir / collection / f"{record_id}.json"
+    
+    def list(self, collection):
+        records = [dict(r) for r in self._caches[collection].records()]
+        return sort_records(collection, records)
+    
+    def summaries(self, collection):
+        return sort_records(collection, self._caches[collection].summaries())
+    
+    def get(self, collection, record_id):
+        record = self._caches[collection].get(record_id, self._path(collection, record_id))
+        return copy.deepcopy(record)
+    
+    def put(self, collection, record_id, record):
+        path = self._path(collection, record_id)
+        self._caches[collection].put(record_id, record, path)
+        return path
+    
+    def put_many(self, collection, records):
+        items = [(record_id, record, self._path(collection, record_id)) for record_id, record in records]
+        self._caches[collection].put_many(items)
+        return len(items)
+    
+    def delete(self, collection, record_id):
+        return self._caches[collection].remove(record_id, self._path(collection, record_id))
+    
+    def version(self, collection):
+        return self._caches[collection].current_version()
+    
+    def usage(self, collection):
+        return self._caches[collection].usage()
+    
+    def stats(self):
+        return {name: cache.stats() for name, cache in self._caches.items()}
+    
+    def invalidate(self, collection=None):
+        for name in [collection] if collection else COLLECTIONS:
+            self._caches[name].invalidate()
+    
+    def rebuild_index(self, collection):
+        self._caches[collection].rebuild_index()
+    
+    def flush(self):
+        for cache in self._caches.values():
+            cache.flush_manifest()
+    
+    def close(self):
+        self.flush()
+
+
+class SQLiteBackend(StorageBackend):
+    """All collections in one SQLite database (WAL mode)
+    
+    Each collection is a table keyed on ``id`` with an indexed ``sort_key``
+    column (``lastOpened`` for projects, ``savedAt`` for layouts) and a
+    pre-computed ``summary`` column, so listings never parse full records.
+    """
+    
+    name = 'sqlite'
+    
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._versions = {collection: 0 for collection in COLLECTIONS}
+        self._data_version = None
+        self._usage = {}  # collection -> [count, bytes], filled on first use
+        for collection in COLLECTIONS:
+            self._conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {collection} ('
+                'id TEXT PRIMARY KEY, sort_key TEXT, summary TEXT NOT NULL, data TEXT NOT NULL)'
+            )
+            self._conn.execute(
+                f'CREATE INDEX IF NOT EXISTS idx_{collection}_sort_key ON {collection} (sort_key)'
+            )
+    
+    @staticmethod
+    def _check(collection):
+        if collection not in SUMMARY_FIELDS:
+            raise ValueError(f"Unknown collection: {collection}")
+        return collection
+    
+    def _order_by(self, collection):
+        return ' ORDER BY sort_key DESC' if collection in SORT_KEYS else ''
+    
+    def _row(self, collection, record_id, record):
+        sort_key = SORT_KEYS.get(collection)
+        summary = summarize_record(collection, record)
+        return (
+            record_id,
+            record.get(sort_key) if sort_key else None,
+            serialization.dumps_str(summary),
+            serialization.dumps_str(record)
+        )
+    
+    def _adjust_usage(self, collection, count_delta, bytes_delta):
+        usage = self._usage.get(collection)
+        if usage is not None:
+            usage[0] += count_delta
+            usage[1] += bytes_delta
+    
+    def _stored_size(self, collection, record_id):
+        row = self._conn.execute(
+            f'SELECT LENGTH(CAST(data AS BLOB)) FROM {collection} WHERE id = ?', (record_id,)
+        ).fetchone()
+        return None if row is None else row[0]
+    
+    def list(self, collection):
+        collection = self._check(collection)
+        with self._lock:
+            rows = self._conn.execute(f'SELECT data FROM {collection}{self._order_by(collection)}').fetchall()
+        return [serialization.loads(data) for (data,) in rows]
+    
+    def summaries(self, collection):
+        collection = self._check(collection)
+        with self._lock:
+            rows = self._conn.execute(f'SELECT summary FROM {collection}{self._order_by(collection)}').fetchall()
+        return [serialization.loads(summary) for (summary,) in rows]
+    
+    def get(self, collection, record_id):
+        collection = self._check(collection)
+        with self._lock:
+            row = self._conn.execute(f'SELECT data FROM {collection} WHERE id = ?', (record_id,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Record not found: {collection}/{record_id}")
+        return serialization.loads(row[0])
+    
+    def get_many(self, collection, record_ids):
+        collection = self._check(collection)
+        record_ids = list(record_ids)
+        records = {}
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(record_ids), 500):
+                chunk = record_ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f'SELECT id, data FROM {collection} WHERE id IN ({placeholders})', chunk
+                ).fetchall()
+                records.update((record_id, serialization.loads(data)) for record_id, data in rows)
+        return records
+    
+    def put(self, collection, record_id, record):
+        collection = self._check(collection)
+        row = self._row(collection, record_id, record)
+        with self._lock:
+            old_size = self._stored_size(collection, record_id)
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {collection} (id, sort_key, summary, data) VALUES (?, ?, ?, ?)', row
+            )
+            self._versions[collection] += 1
+            self._adjust_usage(collection, 0 if old_size is not None else 1,
+                               len(row[3].encode('utf-8')) - (old_size or 0))
+        return self.db_path
+    
+    def put_many(self, collection, records):
+        """Insert or replace many ``(record_id, record)`` pairs in one transaction"""
+        collection = self._check(collection)
+        rows = [self._row(collection, record_id, record) for record_id, record in records]
+        with self._lock:
+            with self._conn:
+                self._conn.execute('BEGIN')
+                self._conn.executemany(
+                    f'INSERT OR REPLACE INTO {collection} (id, sort_key, summary, data) VALUES (?, ?, ?, ?)', rows
+                )
+            self._versions[collection] += 1
+            # Recounted on the next usage() call
+            self._usage.pop(collection, None)
+        return len(rows)
+    
+    def delete(self, collection, record_id):
+        collection = self._check(collection)
+        with self._lock:
+            old_size = self._stored_size(collection, record_id)
+            cursor = self._conn.execute(f'DELETE FROM {collection} WHERE id = ?', (record_id,))
+            if cursor.rowcount:
+                self._versions[collection] += 1
+                self._adjust_usage(collection, -1, -(old_size or 0))
+        return cursor.rowcount > 0
+    
+    def version(self, collection):
+        with self._lock:
+            # data_version changes when another connection commits
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if self._data_version is not None and data_version != self._data_version:
+                for name in self._versions:
+                    self._versions[name] += 1
+                self._usage.clear()
+            self._data_version = data_version
+            return self._versions[self._check(collection)]
+    
+    def usage(self, collection):
+        collection = self._check(collection)
+        with self._lock:
+            if collection not in self._usage:
+                count, size = self._conn.execute(
+                    f'SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(data AS BLOB))), 0) FROM {collection}'
+                ).fetchone()
+                self._usage[collection] = [count, size]
+            return tuple(self._usage[collection])
+    
+    def stats(self):
+        with self._lock:
+            return {
+                collection: {
+                    "records": self.usage(collection)[0],
+                    "version": self._versions[collection]
+                }
+                for collection in COLLECTIONS
+            }
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+BACKENDS = {
+    JSONFileBackend.name: lambda base_dir: JSONFileBackend(base_dir),
+    SQLiteBackend.name: lambda base_dir: SQLiteBackend(Path(base_dir) / 'appdata.db')
+}
+
+
+def create_backend(name, base_dir):
+    """Create a storage backend by name ('json' or 'sqlite')"""
+    try:
+        return BACKENDS[name](base_dir)
+    except KeyError:
+        raise ValueError(f"Unknown storage backend: {name}. Available: {', '.join(sorted(BACKENDS))}")
+
+
+def migrate(source, target, collections=COLLECTIONS):
+    """Copy every record from one backend to another; return counts per collection"""
+    counts = {}
+    for collection in collections:
+        records = source.list(collection)
+        target.put_many(collection, [(record['id'], record) for record in records])
+        counts[collection] = len(records)
+        logger.info(f"Migrated {len(records)} {collection} from {source.name} to {target.name}")
+    return counts
+
+
+def main(argv=None):
+    """Command line entry point: python storage_backends.py migrate json sqlite"""
+    parser = argparse.ArgumentParser(description="AutoPilot IDE storage backend tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser('migrate', help="Copy all AppData records between backends")
+    migrate_parser.add_argument('source', choices=sorted(BACKENDS))
+    migrate_parser.add_argument('target', choices=sorted(BACKENDS))
+    migrate_parser.add_argument('--base-dir', help="AppData directory (defaults to the platform location)")
+    args = parser.parse_args(argv)
+    
+    if args.source == args.target:
+        parser.error("source and target backends must differ")
+    
+    if args.base_dir:
+        base_dir = Path(args.base_dir)
+    else:
+        from appdata_manager import appdata_manager
+        base_dir = appdata_manager.base_dir
+    
+    source = create_backend(args.source, base_dir)
+    target = create_backend(args.target, base_dir)
+    try:
+        counts = migrate(source, target)
+    finally:
+        source.close()
+        target.close()
+    
+    for collection, count in counts.items():
+        print(f"[*] {collection}: {count} records")
+    print(f"[*] Migrated AppData in {base_dir} from {args.source} to {args.target}")
+    print(f"[*] Set APPDATA_BACKEND={args.target} to use it")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,529 @@
+"""
+Symbol Index for AutoPilot IDE
+Parses the Python files under the projects directory with ``ast`` in a
+process pool and indexes their classes, functions and imports for outlines
+and workspace-wide go-to-definition, caching results by content hash
+"""
+import os
+import ast
+import time
+import stat
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+import logging
+
+import serialization
+from file_tree import FILES_IGNORE, compile_ignore
+from storage_backends import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+# Set SYMBOLS_ENABLED=false to turn off the indexer and /api/symbols
+SYMBOLS_ENABLED = os.environ.get('SYMBOLS_ENABLED', 'true').lower() == 'true'
+
+# Processes parsing files; 0 parses in the indexing thread instead (e.g.
+# under eventlet, where multiprocessing does not mix with green threads)
+SYMBOLS_WORKERS = int(os.environ.get('SYMBOLS_WORKERS', os.cpu_count() or 1))
+
+# Worker processes start from a fresh interpreter rather than a fork of the
+# server, whose watcher, Socket.IO and writer threads may hold locks a forked
+# child would inherit held forever
+SYMBOLS_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Files sent to a worker at once, and the largest file parsed
+SYMBOLS_BATCH = 32
+SYMBOLS_MAX_FILE_SIZE = int(os.environ.get('SYMBOLS_MAX_FILE_SIZE', 2 * 1024 * 1024))
+
+# Bytes of source read ahead before they are handed to the parser, so a
+# cold build of a large tree never holds every file in memory at once
+SYMBOLS_CHUNK_BYTES = 32 * 1024 * 1024
+
+# Lookup results returned by default, and the most one request may ask for
+SYMBOLS_RESULTS = 50
+SYMBOLS_MAX_RESULTS = 1000
+
+# Bumped whenever extracted symbols change shape; results of older versions
+# live in another cache directory and are re-parsed
+_FORMAT_VERSION = 1
+
+# Statements whose bodies are still part of the enclosing scope's outline
+_BLOCKS = (ast.If, ast.Try, ast.With, ast.AsyncWith, ast.For, ast.AsyncFor, ast.While) + (
+    (ast.TryStar,) if hasattr(ast, 'TryStar') else ()
+)
+
+DEFINITION_KINDS = ('class', 'function', 'method')
+
+
+def _location(node):
+    return {"line": node.lineno, "column": node.col_offset + 1, "endLine": node.end_lineno}
+
+
+def _outline(nodes, container=None, in_class=False):
+    """Symbols defined by ``nodes``: definitions nest, imports are listed where they bind"""
+    symbols = []
+    for node in nodes:
+        if isinstance(node, ast.ClassDef):
+            qualname = f"{container}.{node.name}" if container else node.name
+            symbol = {"name": node.name, "kind": "class", "qualname": qualname, **_location(node)}
+            symbol["children"] = _outline(node.body, qualname, in_class=True)
+            symbols.append(symbol)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            qualname = f"{container}.{node.name}" if container else node.name
+            kind = "method" if in_class else "function"
+            symbol = {"name": node.name, "kind": kind, "qualname": qualname, **_location(node)}
+            symbol["children"] = [
+                child for child in _outline(node.body, qualname) if child["kind"] != "import"
+            ]
+            symbols.append(symbol)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                symbols.append({
+                    "name": alias.asname or alias.name, "kind": "import", "module": alias.name, **_location(node)
+                })
+        elif isinstance(node, ast.ImportFrom):
+            module = '.' * node.level + (node.module or '')
+            for alias in node.names:
+                symbols.append({
+                    "name": alias.asname or alias.name, "kind": "import", "module": module,
+                    "imported": alias.name, **_location(node)
+                })
+        elif isinstance(node, _BLOCKS):
+            for body in ('body', 'orelse', 'finalbody'):
+                symbols.extend(_outline(getattr(node, body, ()), container, in_class))
+            for handler in getattr(node, 'handlers', ()):
+                symbols.extend(_outline(handler.body, container, in_class))
+    return symbols
+
+
+def extract_symbols(source):
+    """Return ``{symbols, error}`` for Python source (bytes or str)"""
+    try:
+        return {"symbols": _outline(ast.parse(source).body), "error": None}
+    except SyntaxError as e:
+        return {"symbols": [], "error": f"{e.msg} (line {e.lineno})"}
+    except (ValueError, RecursionError) as e:
+        return {"symbols": [], "error": str(e)}
+
+
+def _parse_batch(batch):
+    """Process pool entry point: ``[(key, source)]`` -> ``[(key, result)]``"""
+    return [(key, extract_symbols(source)) for key, source in batch]
+
+
+def _definitions(symbols):
+    """Flatten the classes, functions and methods of an outline"""
+    for symbol in symbols:
+        if symbol["kind"] in DEFINITION_KINDS:
+            yield symbol
+            yield from _definitions(symbol.get("children", ()))
+
+
+class SymbolIndex:
+    """Outline and definition index of the Python files under ``root``
+
+    Each file's symbols are stored in ``cache_dir`` under the SHA-256 of its
+    content, and a manifest maps paths to ``(mtime_ns, size, digest)``, so
+    a file is re-read only when its size or mtime changes and re-parsed only
+    when its content is new. Parsing runs in a process pool in batches; the
+    server process keeps only a name -> definitions map for lookups and reads
+    outlines back from the cache.
+    """
+
+    def __init__(self, root, cache_dir=None, workers=SYMBOLS_WORKERS, ignore=None,
+                 max_file_size=SYMBOLS_MAX_FILE_SIZE):
+        self.root = Path(root).resolve()
+        self.cache_dir = Path(cache_dir) / f"v{_FORMAT_VERSION}" if cache_dir else None
+        self.workers = workers
+        self.is_ignored = compile_ignore(FILES_IGNORE if ignore is None else list(ignore))
+        self.max_file_size = max_file_size
+        self.ready = False
+        self.build_ms = None
+        self.parsed = 0
+        self.cache_hits = 0
+        self.lookups = 0
+        self._files = {}  # path -> (mtime_ns, size, digest)
+        self._results = {}  # digest -> result, when there is no cache_dir
+        self._definitions = {}  # name -> {path: [definition, ...]}
+        self._names = {}  # path -> names it defines
+        self._pool = None
+        self._pending = set()
+        self._stopped = False
+        self._thread = None
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._cond = threading.Condition()
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Index in the background, then keep up with file watcher events"""
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='symbol-index', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Stop indexing and shut the worker processes down"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def build(self):
+        """Index every Python file, reusing the manifest and cache of earlier runs"""
+        started = time.perf_counter()
+        self._load_manifest()
+        paths = list(self._walk(self.root))
+        present = set(paths)
+        with self._lock:
+            removed = [path for path in self._files if path not in present]
+        parsed = self.reindex(paths + removed)
+        self._collect_garbage()
+        self.build_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.ready = True
+        logger.info(
+            f"Symbol index ready in {self.build_ms:.0f} ms: {len(self._files)} Python files, {parsed} parsed"
+        )
+
+    def on_file_changes(self, events):
+        """File watcher listener: queue changed paths for re-indexing"""
+        payload = events.get('file_changed')
+        if not payload:
+            return
+        with self._cond:
+            self._pending.update(change['path'] for change in payload.get('changes', ()))
+            self._cond.notify()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def outline(self, path):
+        """Return ``{path, symbols, error}`` for one Python file
+
+        Served from the index when the file is unchanged; otherwise the
+        current content is looked up in the cache by digest or parsed here,
+        without waiting for a build or update in progress.
+        Raises ValueError for paths outside root, not ending in .py or over
+        the size limit, and FileNotFoundError for missing files.
+        """
+        relative = self._relative(path)
+        if not relative.endswith('.py'):
+            raise ValueError("Outlines are available for Python files only")
+        full = self.root / relative
+        try:
+            stat_result = os.stat(full)
+        except (FileNotFoundError, NotADirectoryError):
+            raise FileNotFoundError(relative)
+        if not stat.S_ISREG(stat_result.st_mode):
+            raise FileNotFoundError(relative)
+        stamp = (stat_result.st_mtime_ns, stat_result.st_size)
+        with self._lock:
+            entry = self._files.get(relative)
+        result = self._load_result(entry[2]) if entry is not None and entry[:2] == stamp else None
+        if result is None:
+            if stat_result.st_size > self.max_file_size:
+                raise ValueError(f"Files over {self.max_file_size} bytes are not outlined")
+            source = full.read_bytes()
+            digest = hashlib.sha256(source).hexdigest()
+            result = self._load_result(digest)
+            if result is None:
+                result = extract_symbols(source)
+                self._store_result(digest, result)
+            # Let the background indexer bring the file's definitions up to date
+            with self._cond:
+                self._pending.add(relative)
+                self._cond.notify()
+        return {"path": relative, "symbols": result["symbols"], "error": result["error"]}
+
+    def lookup(self, name, match='exact', kind=None, limit=SYMBOLS_RESULTS):
+        """Return definitions named ``name`` (``match`` 'exact', 'prefix' or 'substring', ignoring case but exact)"""
+        if not isinstance(name, str) or not name:
+            raise ValueError("q must not be empty")
+        if match not in ('exact', 'prefix', 'substring'):
+            raise ValueError("match must be exact, prefix or substring")
+        if kind is not None and kind not in DEFINITION_KINDS:
+            raise ValueError(f"kind must be one of: {', '.join(DEFINITION_KINDS)}")
+        limit = min(limit, SYMBOLS_MAX_RESULTS)
+        folded = name.casefold()
+        with self._lock:
+            self.lookups += 1
+            if match == 'exact':
+                names = [name] if name in self._definitions else []
+            elif match == 'prefix':
+                names = [n for n in self._definitions if n.casefold().startswith(folded)]
+            else:
+                names = [n for n in self._definitions if folded in n.casefold()]
+            results = [
+                dict(definition, path=path)
+                for found in names
+                for path, definitions in self._definitions[found].items()
+                for definition in definitions
+                if kind is None or definition["kind"] == kind
+            ]
+        # Exact names first, then shorter names, then by location
+        results.sort(key=lambda d: (d["name"] != name, len(d["name"]), d["name"], d["path"], d["line"]))
+        return results[:limit]
+
+    # ------------------------------------------------------------------
+    # Indexing
+    # ------------------------------------------------------------------
+
+    def reindex(self, paths, workers=None):
+        """Bring ``paths`` (files or directories, relative to root) up to date; return how many were parsed"""
+        workers = self.workers if workers is None else workers
+        with self._update_lock:
+            sources = {}  # digest -> source for content not in the cache
+            updates = []  # (path, stamp, digest) waiting for those sources
+            size = 0
+            parsed = 0
+            updated = False
+            for path in self._expand(paths):
+                full = self.root / path
+                try:
+                    stat_result = os.stat(full)
+                except OSError:
+                    self._remove(path)
+                    continue
+                stamp = (stat_result.st_mtime_ns, stat_result.st_size)
+                with self._lock:
+                    entry = self._files.get(path)
+                if entry is not None and entry[:2] == stamp:
+                    continue
+                if stat_result.st_size > self.max_file_size:
+                    self._remove(path)
+                    continue
+                try:
+                    source = full.read_bytes()
+                except OSError:
+                    self._remove(path)
+                    continue
+                digest = hashlib.sha256(source).hexdigest()
+                updates.append((path, stamp, digest))
+                updated = True
+                if digest not in sources and self._load_result(digest) is None:
+                    sources[digest] = source
+                    size += len(source)
+                else:
+                    self.cache_hits += 1
+                if size >= SYMBOLS_CHUNK_BYTES:
+                    parsed += self._parse_and_apply(sources, updates, workers)
+                    sources, updates, size = {}, [], 0
+
+            parsed += self._parse_and_apply(sources, updates, workers)
+            if updated:
+                self._save_manifest()
+            return parsed
+
+    def _parse_and_apply(self, sources, updates, workers):
+        """Parse ``sources`` into the cache and apply ``updates``; return how many were parsed"""
+        for digest, result in self._parse(sources, workers):
+            self._store_result(digest, result)
+        for path, stamp, digest in updates:
+            result = self._load_result(digest)
+            if result is not None:
+                self._apply(path, stamp, digest, result)
+        self.parsed += len(sources)
+        return len(sources)
+
+    def _expand(self, paths):
+        """Python files named by ``paths``, walking directories; deleted paths are kept"""
+        for path in paths:
+            if any(self.is_ignored(part) for part in path.split('/')):
+                continue
+            full = self.root / path
+            if full.is_dir():
+                yield from self._walk(full)
+            elif path.endswith('.py'):
+                yield path
+            elif not full.exists():
+                # A deleted directory: drop the files indexed under it
+                prefix = path + '/'
+                with self._lock:
+                    children = [child for child in self._files if child.startswith(prefix)]
+                yield from children
+
+    def _walk(self, directory):
+        for current, dirnames, filenames in os.walk(directory):
+            dirnames[:] = [name for name in dirnames if not self.is_ignored(name)]
+            relative = Path(current).relative_to(self.root).as_posix()
+            prefix = '' if relative == '.' else relative + '/'
+            for name in filenames:
+                if name.endswith('.py') and not self.is_ignored(name):
+                    yield prefix + name
+            # Under eventlet this is a green thread; let others run
+            time.sleep(0)
+
+    def _parse(self, sources, workers):
+        """Yield ``(digest, result)`` for each source, in worker processes when configured
+
+        A pool whose worker died is replaced and the unfinished batches are
+        sent again once. If the new pool breaks too, those files are left
+        unindexed until they next change or the index is rebuilt.
+        """
+        items = list(sources.items())
+        if not workers or len(items) < 2:
+            for digest, source in items:
+                yield digest, extract_symbols(source)
+            return
+        batches = [items[i:i + SYMBOLS_BATCH] for i in range(0, len(items), SYMBOLS_BATCH)]
+        done = 0
+        for _ in range(2):
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context(SYMBOLS_START_METHOD)
+                )
+            try:
+                for results in self._pool.map(_parse_batch, batches[done:]):
+                    done += 1
+                    yield from results
+                return
+            except BrokenProcessPool as e:
+                logger.warning(f"Symbol parser process died, replacing the pool: {e}")
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+        skipped = sum(len(batch) for batch in batches[done:])
+        logger.error(f"Symbol parser processes keep dying; {skipped} files were not indexed")
+
+    def _apply(self, path, stamp, digest, result):
+        definitions = {}
+        for symbol in _definitions(result["symbols"]):
+            definitions.setdefault(symbol["name"], []).append({
+                "name": symbol["name"], "kind": symbol["kind"], "qualname": symbol["qualname"],
+                "line": symbol["line"], "column": symbol["column"]
+            })
+        with self._lock:
+            self._forget(path)
+            self._files[path] = stamp + (digest,)
+            self._names[path] = list(definitions)
+            for name, found in definitions.items():
+                self._definitions.setdefault(name, {})[path] = found
+
+    def _remove(self, path):
+        with self._lock:
+            if self._files.pop(path, None) is not None:
+                self._forget(path)
+
+    def _forget(self, path):
+        """Drop the definitions ``path`` contributed (lock held)"""
+        for name in self._names.pop(path, ()):
+            by_path = self._definitions.get(name)
+            if by_path is not None:
+                by_path.pop(path, None)
+                if not by_path:
+                    del self._definitions[name]
+
+    def _relative(self, path):
+        if not isinstance(path, str) or not path.strip('/') or '\0' in path:
+            raise ValueError("path must name a file")
+        resolved = (self.root / path.strip('/')).resolve()
+        if self.root not in resolved.parents:
+            raise ValueError("Path is outside the projects directory")
+        return resolved.relative_to(self.root).as_posix()
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    def _result_path(self, digest):
+        return self.cache_dir / f"{digest}.json"
+
+    def _load_result(self, digest):
+        if self.cache_dir is None:
+            return self._results.get(digest)
+        try:
+            return serialization.load_file(self._result_path(digest))
+        except (OSError, ValueError):
+            return None
+
+    def _store_result(self, digest, result):
+        if self.cache_dir is None:
+            self._results[digest] = result
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # No fsync: a torn file fails to parse and is parsed again
+            self._result_path(digest).write_bytes(serialization.dumps(result))
+        except OSError as e:
+            logger.warning(f"Could not cache symbols in {self.cache_dir}: {e}")
+            self._results[digest] = result
+
+    def _load_manifest(self):
+        if self.cache_dir is None:
+            return
+        try:
+            manifest = serialization.load_file(self.cache_dir / 'manifest.json')
+        except (OSError, ValueError):
+            return
+        if manifest.get("root") != str(self.root):
+            return
+        for path, (mtime, size, digest) in manifest.get("files", {}).items():
+            result = self._load_result(digest)
+            if result is not None:
+                self._apply(path, (mtime, size), digest, result)
+
+    def _save_manifest(self):
+        if self.cache_dir is None:
+            return
+        with self._lock:
+            manifest = {"root": str(self.root), "files": {path: list(entry) for path, entry in self._files.items()}}
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            atomic_write_json(self.cache_dir / 'manifest.json', manifest)
+        except OSError as e:
+            logger.warning(f"Could not save the symbol manifest in {self.cache_dir}: {e}")
+
+    def _collect_garbage(self):
+        """Delete cached results no indexed file refers to any more"""
+        if self.cache_dir is None or not self.cache_dir.is_dir():
+            return
+        with self._lock:
+            live = {entry[2] for entry in self._files.values()}
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.json') and entry.name != 'manifest.json' and entry.name[:-5] not in live:
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+
+    def _run(self):
+        try:
+            self.build()
+        except Exception as e:
+            logger.error(f"Building the symbol index failed: {e}")
+            return
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                pending, self._pending = self._pending, set()
+            try:
+                self.reindex(sorted(pending))
+            except Exception as e:
+                logger.error(f"Updating the symbol index failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "files": len(self._files),
+                "names": len(self._definitions),
+                "parsed": self.parsed,
+                "cacheHits": self.cache_hits,
+                "lookups": self.lookups,
+                "workers": self.workers,
+                "buildMs": self.build_ms
+            }
@@ -0,0 +1,851 @@
+"""
+Terminal Command Runner for AutoPilot IDE
+Runs whitelisted commands, either one process per command or in a persistent
+per-client shell on a PTY, and streams their output in chunks
+"""
+import os
+import re
+import time
+import atexit
+import codecs
+import collections
+import shutil
+import signal
+import select
+import tempfile
+import threading
+import subprocess
+import logging
+
+try:
+    import pty
+    import fcntl
+    import termios
+except ImportError:  # Windows
+    pty = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds a command may run before it is killed, unless listed below
+TERMINAL_TIMEOUT = float(os.environ.get('TERMINAL_TIMEOUT', 30))
+
+# Longer limits for commands that routinely run for minutes (installs, builds)
+COMMAND_TIMEOUTS = {
+    'npm': 900, 'pip': 900, 'pip3': 900, 'docker': 1800,
+    'git': 300, 'python': 300, 'python3': 300, 'node': 300,
+    'tar': 300, 'zip': 300, 'unzip': 300, 'curl': 300, 'wget': 300, 'ping': 60
+}
+
+# Extra per-command overrides, e.g. TERMINAL_TIMEOUTS="npm=1800,docker=3600"
+for _item in filter(None, os.environ.get('TERMINAL_TIMEOUTS', '').split(',')):
+    _name, _, _seconds = _item.partition('=')
+    COMMAND_TIMEOUTS[_name.strip()] = float(_seconds)
+
+# Largest chunk read from a pipe in one go
+READ_CHUNK_SIZE = 64 * 1024
+
+# Bytes of output a single command may produce before it is stopped
+TERMINAL_MAX_OUTPUT = int(os.environ.get('TERMINAL_MAX_OUTPUT', 1024 * 1024))
+
+# Bytes of recent output kept per client for replay after a reconnect
+TERMINAL_SCROLLBACK = int(os.environ.get('TERMINAL_SCROLLBACK', 256 * 1024))
+
+# How a command ended. ``exit_code`` is None if it never finished normally.
+CommandResult = collections.namedtuple('CommandResult', 'exit_code timed_out cancelled truncated')
+
+
+def command_timeout(parts):
+    """Return the timeout in seconds for a parsed command"""
+    return COMMAND_TIMEOUTS.get(parts[0], TERMINAL_TIMEOUT) if parts else TERMINAL_TIMEOUT
+
+
+def _pump(pipe, stream, on_output):
+    """Forward a pipe to ``on_output(stream, text)`` chunk by chunk until EOF"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    fd = pipe.fileno()
+    try:
+        while True:
+            data = os.read(fd, READ_CHUNK_SIZE)
+            if not data:
+                break
+            text = decoder.decode(data)
+            if text:
+                on_output(stream, text)
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            on_output(stream, tail)
+    except Exception as e:
+        logger.error(f"Error reading command {stream}: {e}")
+    finally:
+        pipe.close()
+
+
+class CommandControl:
+    """Lets another thread stop a running command"""
+
+    def __init__(self):
+        self.cancelled = False
+        self._stop = None
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Stop the command, or stop it as soon as it starts"""
+        with self._lock:
+            self.cancelled = True
+            stop = self._stop
+        if stop is not None:
+            stop()
+
+    def attach(self, stop):
+        """Register how to stop the running command (called by the runner)"""
+        with self._lock:
+            self._stop = stop
+            cancelled = self.cancelled
+        if cancelled:
+            stop()
+
+    def detach(self):
+        with self._lock:
+            self._stop = None
+
+
+class _OutputLimit:
+    """Wraps an output callback and calls ``on_exceeded`` once past ``max_bytes``"""
+
+    def __init__(self, on_output, max_bytes, on_exceeded):
+        self.on_output = on_output
+        self.max_bytes = max_bytes
+        self.on_exceeded = on_exceeded
+        self.sent = 0
+        self.truncated = False
+
+    def __call__(self, *args):
+        if self.truncated:
+            return
+        text = args[-1]
+        size = len(text.encode('utf-8'))
+        if self.max_bytes is not None and self.sent + size > self.max_bytes:
+            self.truncated = True
+            text = text.encode('utf-8')[:self.max_bytes - self.sent].decode('utf-8', errors='ignore')
+            if text:
+                self.on_output(*args[:-1], text)
+            self.on_exceeded()
+            return
+        self.sent += size
+        self.on_output(*args)
+
+
+def _kill_group(process):
+    """Kill a process started with start_new_session and everything it spawned"""
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_streaming(parts, on_output, timeout=None, cwd=None, max_output=TERMINAL_MAX_OUTPUT, control=None):
+    """Run ``parts`` and call ``on_output(stream, text)`` as output arrives
+
+    ``stream`` is ``'stdout'`` or ``'stderr'``. The call blocks until the
+    process exits. The process and its children are killed when ``timeout``
+    seconds pass, when more than ``max_output`` bytes are produced, or when
+    ``control`` is cancelled. Returns a CommandResult. Raises
+    FileNotFoundError if the program does not exist.
+    """
+    timeout = command_timeout(parts) if timeout is None else timeout
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    process = subprocess.Popen(
+        parts,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        env=env,
+        start_new_session=True,  # own process group, so it can be killed as a whole
+        shell=False  # NEVER use shell=True
+    )
+    limit = _OutputLimit(on_output, max_output, lambda: _kill_group(process))
+    if control is not None:
+        control.attach(lambda: _kill_group(process))
+
+    readers = [
+        threading.Thread(target=_pump, args=(process.stdout, 'stdout', limit), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, 'stderr', limit), daemon=True)
+    ]
+    for reader in readers:
+        reader.start()
+
+    timed_out = False
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        _kill_group(process)
+        process.wait()
+    finally:
+        if control is not None:
+            control.detach()
+
+    # A background grandchild can keep the pipes open after the command exits;
+    # don't wait on it forever
+    for reader in readers:
+        reader.join(timeout=5)
+    return CommandResult(
+        process.returncode, timed_out, control is not None and control.cancelled, limit.truncated
+    )
+
+
+class Scrollback:
+    """Ring buffer of a client's recent terminal entries
+
+    Entries are dicts such as ``{'id': ..., 'stdout': text}``. Each one is
+    numbered with ``seq``, so a reconnecting client can ask only for what it
+    has not seen. The oldest entries are dropped past ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes=TERMINAL_SCROLLBACK):
+        self.max_bytes = max_bytes
+        self.seq = 0
+        self.size = 0
+        self.last_used = time.monotonic()
+        self._entries = collections.deque()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(entry):
+        return sum(len(value.encode('utf-8')) for value in entry.values() if isinstance(value, str))
+
+    def append(self, entry):
+        """Store an entry and return it with its ``seq`` set"""
+        with self._lock:
+            self.seq += 1
+            entry = dict(entry, seq=self.seq)
+            self._entries.append(entry)
+            self.size += self._size(entry)
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                self.size -= self._size(self._entries.popleft())
+            self.last_used = time.monotonic()
+            return entry
+
+    def since(self, seq=0):
+        """Return the kept entries numbered after ``seq``"""
+        with self._lock:
+            self.last_used = time.monotonic()
+            return [entry for entry in self._entries if entry['seq'] > seq]
+
+
+class ScrollbackStore:
+    """Scrollback buffers keyed by client id, dropped after ``max_age`` unused"""
+
+    def __init__(self, max_bytes=TERMINAL_SCROLLBACK, max_age=None):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def get(self, client_id):
+        """Return the client's buffer, creating it if needed"""
+        with self._lock:
+            buffer = self._buffers.get(client_id)
+            if buffer is None:
+                buffer = self._buffers[client_id] = Scrollback(self.max_bytes)
+            return buffer
+
+    def discard(self, client_id):
+        with self._lock:
+            self._buffers.pop(client_id, None)
+
+    def prune(self):
+        """Drop buffers unused for longer than ``max_age``; return how many"""
+        if self.max_age is None:
+            return 0
+        cutoff = time.monotonic() - self.max_age
+        with self._lock:
+            stale = [key for key, buffer in self._buffers.items() if buffer.last_used < cutoff]
+            for key in stale:
+                del self._buffers[key]
+        return len(stale)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "clients": len(self._buffers),
+                "bytes": sum(buffer.size for buffer in self._buffers.values())
+            }
+
+
+# ============================================================================
+# PERSISTENT SHELL SESSIONS
+# ============================================================================
+
+# Run terminal commands in one long-lived shell per client where PTYs exist
+TERMINAL_SESSIONS = os.environ.get('TERMINAL_SESSIONS', 'true').lower() == 'true'
+
+# Seconds an idle session is kept before its shell is shut down
+TERMINAL_SESSION_IDLE = float(os.environ.get('TERMINAL_SESSION_IDLE', 900))
+
+# Seconds to wait for a new shell's first prompt
+SESSION_START_TIMEOUT = 10
+
+# The prompt is a marker carrying the last exit code and the working
+# directory, so the reader can tell where one command's output ends
+PROMPT_RE = re.compile('\x1eAPIDE:(\\d+):([^\x1e]*)\x1e')
+_SESSION_RC = (
+    "set +H\n"
+    "unset HISTFILE PROMPT_COMMAND\n"
+    "PS1='\\036APIDE:$?:$PWD\\036'\n"
+    "PS2=''\n"
+)
+
+
+def sessions_supported():
+    """Return True if PTY shell sessions can run on this host"""
+    return TERMINAL_SESSIONS and pty is not None and shutil.which('bash') is not None
+
+
+class ShellSession:
+    """A bash shell on a PTY that runs one command line at a time
+
+    The shell keeps its working directory and environment between commands.
+    Each ``run`` writes one line and streams output until the next prompt.
+    """
+
+    def __init__(self, cwd=None):
+        self.cwd = str(cwd) if cwd else os.getcwd()
+        self.commands_run = 0
+        self.last_used = time.monotonic()
+        self.process = None
+        self._master_fd = None
+        self._reader = None
+        self._on_output = None
+        self._busy = False
+        self._stop_requested = False
+        self._prompts = 0
+        self._last_exit = None
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def busy(self):
+        return self._busy
+
+    @property
+    def alive(self):
+        return not self._closed and self.process is not None and self.process.poll() is None
+
+    def idle_seconds(self):
+        return 0.0 if self._busy else time.monotonic() - self.last_used
+
+    def start(self):
+        """Spawn the shell and wait for its first prompt"""
+        master_fd, slave_fd = pty.openpty()
+        # Raw input, so bytes in a command line are never taken as line
+        # editing or signal keys, no echo and plain \n line endings
+        attrs = termios.tcgetattr(slave_fd)
+        attrs[1] &= ~termios.ONLCR
+        attrs[3] &= ~(termios.ECHO | termios.ICANON | termios.ISIG | termios.IEXTEN)
+        attrs[6][termios.VMIN] = 1
+        attrs[6][termios.VTIME] = 0
+        termios.tcsetattr(slave_fd, termios.TCSANOW, attrs)
+
+        rc_fd, rc_path = tempfile.mkstemp(prefix='autopilot-bashrc-')
+        with os.fdopen(rc_fd, 'w') as f:
+            f.write(_SESSION_RC)
+
+        env = dict(os.environ, PYTHONUNBUFFERED='1', TERM='dumb')
+        try:
+            self.process = subprocess.Popen(
+                ['bash', '--noprofile', '--rcfile', rc_path, '--noediting', '-i'],
+                stdin=slave_fd, stdout=slave_fd, stderr=slave_fd,
+                cwd=self.cwd, env=env,
+                start_new_session=True,
+                preexec_fn=_set_controlling_tty
+            )
+        finally:
+            os.close(slave_fd)
+
+        self._master_fd = master_fd
+        self._reader = threading.Thread(target=self._read_loop, name='terminal-session', daemon=True)
+        self._reader.start()
+        try:
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._prompts or self._closed, SESSION_START_TIMEOUT):
+                    raise RuntimeError("Shell did not start")
+                if self._closed:
+                    raise RuntimeError("Shell exited during startup")
+        except Exception:
+            self.close()
+            raise
+        finally:
+            os.unlink(rc_path)
+        return self
+
+    def run(self, line, on_output, timeout=None, max_output=TERMINAL_MAX_OUTPUT, control=None):
+        """Run one command line, streaming output to ``on_output(text)``
+
+        Blocks until the shell prints its next prompt and returns a
+        CommandResult. A command that runs past ``timeout``, produces more
+        than ``max_output`` bytes or is cancelled through ``control`` is
+        interrupted, then killed; the shell itself keeps running.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Terminal session is closed")
+            if self._busy:
+                raise RuntimeError("A command is already running in this terminal")
+            self._busy = True
+            self._stop_requested = False
+            prompts = self._prompts
+        limit = _OutputLimit(on_output, max_output, self._request_stop)
+        self._on_output = limit
+        if control is not None:
+            control.attach(self._request_stop)
+
+        try:
+            os.write(self._master_fd, line.encode('utf-8') + b'\n')
+            done = lambda: self._prompts > prompts or self._closed  # noqa: E731
+            with self._cond:
+                self._cond.wait_for(lambda: done() or self._stop_requested, timeout)
+                finished = done()
+            if not finished:
+                for sig in (signal.SIGINT, signal.SIGKILL):
+                    self._signal_foreground(sig)
+                    with self._cond:
+                        if self._cond.wait_for(done, 2):
+                            break
+                else:
+                    self.close()
+            with self._cond:
+                cancelled = control is not None and control.cancelled
+                timed_out = not finished and not cancelled and not limit.truncated
+                exit_code = None if self._closed and self._prompts == prompts else self._last_exit
+                return CommandResult(exit_code, timed_out, cancelled, limit.truncated)
+        finally:
+            if control is not None:
+                control.detach()
+            with self._cond:
+                self._busy = False
+                self._on_output = None
+                self.commands_run += 1
+                self.last_used = time.monotonic()
+
+    def _request_stop(self):
+        with self._cond:
+            self._stop_requested = True
+            self._cond.notify_all()
+
+    def close(self):
+        """Shut the shell down and release the PTY"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self.process is not None and self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGHUP)
+                self.process.wait(timeout=2)
+            except (ProcessLookupError, subprocess.TimeoutExpired):
+                try:
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.process.wait()
+        if self._master_fd is not None:
+            try:
+                os.close(self._master_fd)
+            except OSError:
+                pass
+        if self._reader is not None and self._reader is not threading.current_thread():
+            self._reader.join(timeout=2)
+
+    def _signal_foreground(self, sig):
+        """Send ``sig`` to the command in the foreground of the shell"""
+        try:
+            pgrp = os.tcgetpgrp(self._master_fd)
+            if pgrp != self.process.pid:
+                os.killpg(pgrp, sig)
+        except OSError:
+            pass
+
+    def _emit(self, text):
+        callback = self._on_output
+        if text and callback is not None:
+            try:
+                callback(text)
+            except Exception as e:
+                logger.error(f"Terminal output callback failed: {e}")
+
+    def _read_loop(self):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        buffer = ''
+        try:
+            while True:
+                try:
+                    # Wait in select rather than a blocking read, so that
+                    # under eventlet the reader yields to other green threads
+                    select.select([self._master_fd], [], [])
+                    data = os.read(self._master_fd, READ_CHUNK_SIZE)
+                except (OSError, ValueError):
+                    break  # EIO once the shell has exited
+                if not data:
+                    break
+                buffer += decoder.decode(data)
+
+                while True:
+                    match = PROMPT_RE.search(buffer)
+                    if match is None:
+                        break
+                    self._emit(buffer[:match.start()])
+                    buffer = buffer[match.end():]
+                    with self._cond:
+                        self._last_exit = int(match.group(1))
+                        self.cwd = match.group(2)
+                        self._prompts += 1
+                        self._cond.notify_all()
+
+                # Hold back what could be the start of a prompt marker
+                marker = buffer.rfind('\x1e')
+                if marker == -1 or len(buffer) - marker > 4096:
+                    marker = len(buffer)
+                self._emit(buffer[:marker])
+                buffer = buffer[marker:]
+        finally:
+            with self._cond:
+                self._closed = True
+                self._cond.notify_all()
+
+
+def _set_controlling_tty():
+    """Make the PTY on stdin the controlling terminal (runs in the child)"""
+    fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+
+
+class SessionManager:
+    """Shell sessions keyed by client id, closed on disconnect or when idle"""
+
+    def __init__(self, cwd=None, idle_timeout=TERMINAL_SESSION_IDLE):
+        self.cwd = cwd
+        self.idle_timeout = idle_timeout
+        self.started = 0
+        self.reaped = 0
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self._stop = threading.Event()
+        atexit.register(self.close_all)
+
+    def get(self, client_id):
+        """Return the client's session, starting a shell if it has none"""
+        with self._lock:
+            session = self._sessions.get(client_id)
+            if session is not None and session.alive:
+                return session
+            session = ShellSession(self.cwd)
+            self._sessions[client_id] = session
+            self._ensure_reaper()
+        try:
+            session.start()
+        except Exception:
+            with self._lock:
+                if self._sessions.get(client_id) is session:
+                    del self._sessions[client_id]
+            raise
+        self.started += 1
+        logger.info(f"Started terminal session for {client_id} (pid {session.process.pid})")
+        return session
+
+    def cwd_for(self, client_id):
+        """Return the working directory of the client's shell without starting one"""
+        with self._lock:
+            session = self._sessions.get(client_id)
+        if session is not None and session.alive:
+            return session.cwd
+        return str(self.cwd) if self.cwd else os.getcwd()
+
+    def close(self, client_id):
+        """Close a client's session; return False if it had none"""
+        with self._lock:
+            session = self._sessions.pop(client_id, None)
+        if session is None:
+            return False
+        session.close()
+        return True
+
+    def reap_idle(self):
+        """Close sessions idle for longer than the idle timeout; return how many"""
+        with self._lock:
+            idle = [
+                client_id for client_id, session in self._sessions.items()
+                if not session.alive or session.idle_seconds() > self.idle_timeout
+            ]
+        for client_id in idle:
+            self.close(client_id)
+        self.reaped += len(idle)
+        return len(idle)
+
+    def close_all(self):
+        """Close every session and stop the reaper"""
+        self._stop.set()
+        with self._lock:
+            client_ids = list(self._sessions)
+        for client_id in client_ids:
+            self.close(client_id)
+
+    def stats(self):
+        """Return session counters"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            "active": len(sessions),
+            "busy": sum(1 for session in sessions if session.busy),
+            "started": self.started,
+            "reaped": self.reaped
+        }
+
+    def _ensure_reaper(self):
+        if self._reaper is None or not self._reaper.is_alive():
+            self._stop.clear()
+            self._reaper = threading.Thread(target=self._reap_loop, name='terminal-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(1.0, min(60.0, self.idle_timeout / 4))
+        while not self._stop.wait(interval):
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.error(f"Error reaping terminal sessions: {e}")
+
+
+# ============================================================================
+# COMMAND SCHEDULING
+# ============================================================================
+
+# Commands allowed to run at once across all clients, and per client
+TERMINAL_MAX_CONCURRENT = int(os.environ.get('TERMINAL_MAX_CONCURRENT', max(2, os.cpu_count() or 2)))
+TERMINAL_MAX_PER_CLIENT = int(os.environ.get('TERMINAL_MAX_PER_CLIENT', 2))
+
+# Commands a single client may have waiting before new ones are refused
+TERMINAL_MAX_QUEUED = int(os.environ.get('TERMINAL_MAX_QUEUED', 20))
+
+# Recent queue wait times kept for the percentiles in stats()
+_WAIT_SAMPLES = 1000
+
+
+def _start_thread(fn):
+    threading.Thread(target=fn, daemon=True).start()
+
+
+class CommandScheduler:
+    """Bounded executor for terminal commands with round-robin fairness
+
+    At most ``max_concurrent`` jobs run at once, and at most
+    ``max_per_client`` for any one client. Waiting jobs are queued per
+    client and dispatched round-robin across clients, so one client
+    submitting many long commands only delays others by one slot.
+    ``on_position(client_id, job_id, position)`` is called whenever a
+    queued job's estimated place in line changes.
+    """
+
+    def __init__(self, max_concurrent=TERMINAL_MAX_CONCURRENT, max_per_client=TERMINAL_MAX_PER_CLIENT,
+                 max_queued_per_client=TERMINAL_MAX_QUEUED, spawn=_start_thread, on_position=None):
+        self.max_concurrent = max_concurrent
+        self.max_per_client = max_per_client
+        self.max_queued_per_client = max_queued_per_client
+        self.spawn = spawn
+        self.on_position = on_position
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.peak_queued = 0
+        self._queues = collections.OrderedDict()  # client_id -> deque of (job_id, fn, queued_at)
+        self._running = collections.Counter()
+        self._running_total = 0
+        self._positions = {}  # (client_id, job_id) -> last reported position
+        self._waits = collections.deque(maxlen=_WAIT_SAMPLES)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self.closed = False
+
+    def submit(self, client_id, job_id, fn):
+        """Queue ``fn`` for a client; return its place in line (0 = started now)
+
+        Raises RuntimeError if the client already has too many commands
+        waiting, or if the scheduler has been closed.
+        """
+        with self._lock:
+            if self.closed:
+                self.rejected += 1
+                raise RuntimeError("Server is shutting down")
+            queue = self._queues.setdefault(client_id, collections.deque())
+            if len(queue) >= self.max_queued_per_client:
+                self.rejected += 1
+                raise RuntimeError(f"Too many queued commands (limit {self.max_queued_per_client})")
+            queue.append((job_id, fn, time.monotonic()))
+            self.submitted += 1
+            started = self._dispatch()
+            # A new client enters the rotation ahead of later turns of
+            # existing clients, so other jobs' positions can move too
+            changes = self._position_changes()
+            position = self._positions.get((client_id, job_id), 0)
+            self.peak_queued = max(self.peak_queued, self._queued_count())
+
+        self._start(started)
+        self._report(changes)
+        return position
+
+    def cancel(self, client_id, job_id):
+        """Remove a job that has not started yet; return False if it was not queued"""
+        with self._lock:
+            queue = self._queues.get(client_id)
+            if not queue:
+                return False
+            for entry in queue:
+                if entry[0] == job_id:
+                    queue.remove(entry)
+                    if not queue:
+                        del self._queues[client_id]
+                    self._positions.pop((client_id, job_id), None)
+                    self.cancelled += 1
+                    break
+            else:
+                return False
+            changes = self._position_changes()
+        self._report(changes)
+        return True
+
+    def drop_client(self, client_id):
+        """Discard every queued job of a client; return the dropped job ids"""
+        with self._lock:
+            queue = self._queues.pop(client_id, None) or ()
+            for job_id, _, _ in queue:
+                self._positions.pop((client_id, job_id), None)
+            self.cancelled += len(queue)
+            changes = self._position_changes()
+        self._report(changes)
+        return [job_id for job_id, _, _ in queue]
+
+    def close(self):
+        """Refuse new jobs and discard queued ones; return {client_id: [job_id, ...]} dropped"""
+        with self._lock:
+            self.closed = True
+            queues, self._queues = self._queues, collections.OrderedDict()
+            self._positions.clear()
+            dropped = {client_id: [job_id for job_id, _, _ in queue] for client_id, queue in queues.items()}
+            self.cancelled += sum(len(job_ids) for job_ids in dropped.values())
+        return dropped
+
+    def wait_idle(self, timeout=None):
+        """Block until no job is running; return False if ``timeout`` passed first"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._running_total == 0, timeout)
+
+    def stats(self):
+        """Return queue depth, concurrency and wait-time metrics"""
+        with self._lock:
+            waits = sorted(self._waits)
+            queued_by_client = {client_id: len(queue) for client_id, queue in self._queues.items() if queue}
+            return {
+                "running": self._running_total,
+                "queued": self._queued_count(),
+                "clientsWaiting": len(queued_by_client),
+                "peakQueued": self.peak_queued,
+                "maxConcurrent": self.max_concurrent,
+                "maxPerClient": self.max_per_client,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "cancelled": self.cancelled,
+                "waitMs": {
+                    "avg": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+                    "p50": round(waits[len(waits) // 2] * 1000, 2) if waits else 0.0,
+                    "p95": round(waits[int(len(waits) * 0.95)] * 1000, 2) if waits else 0.0,
+                    "max": round(waits[-1] * 1000, 2) if waits else 0.0
+                }
+            }
+
+    def _queued_count(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _dispatch(self):
+        """Pick the jobs that may start now (lock held); return them"""
+        started = []
+        while self._running_total < self.max_concurrent:
+            for client_id, queue in self._queues.items():
+                if queue and self._running[client_id] < self.max_per_client:
+                    break
+            else:
+                break
+            job_id, fn, queued_at = queue.popleft()
+            # The client just served goes to the back of the rotation
+            self._queues.move_to_end(client_id)
+            if not queue:
+                del self._queues[client_id]
+            self._running[client_id] += 1
+            self._running_total += 1
+            self._waits.append(time.monotonic() - queued_at)
+            self._positions.pop((client_id, job_id), None)
+            started.append((client_id, job_id, fn))
+        return started
+
+    def _queued_positions(self):
+        """Estimate each queued job's place in line by replaying the rotation"""
+        positions = {}
+        pending = [(client_id, list(queue)) for client_id, queue in self._queues.items() if queue]
+        position = 0
+        depth = 0
+        while pending:
+            remaining = []
+            for client_id, jobs in pending:
+                position += 1
+                positions[(client_id, jobs[depth][0])] = position
+                if depth + 1 < len(jobs):
+                    remaining.append((client_id, jobs))
+            pending = remaining
+            depth += 1
+        return positions
+
+    def _position_changes(self):
+        changes = []
+        for key, position in self._queued_positions().items():
+            if self._positions.get(key) != position:
+                self._positions[key] = position
+                changes.append((key[0], key[1], position))
+        return changes
+
+    def _report(self, changes):
+        if self.on_position is None:
+            return
+        for client_id, job_id, position in changes:
+            try:
+                self.on_position(client_id, job_id, position)
+            except Exception as e:
+                logger.error(f"Queue position callback failed: {e}")
+
+    def _start(self, started):
+        for client_id, job_id, fn in started:
+            self.spawn(lambda c=client_id, j=job_id, f=fn: self._run(c, j, f))
+
+    def _run(self, client_id, job_id, fn):
+        try:
+            fn()
+        except Exception as e:
+            logger.error(f"Terminal job {job_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._running[client_id] -= 1
+                self._running_total -= 1
+                if not self._running[client_id]:
+                    del self._running[client_id]
+                self.completed += 1
+                started = self._dispatch()
+                changes = self._position_changes()
+                if not self._running_total:
+                    self._idle.notify_all()
+            self._start(started)
+            self._report(changes)
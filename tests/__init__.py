@@ -8,6 +8,23 @@ Test Structure:
 - test_app.py: Tests for Flask application and routes
 - test_config.py: Tests for configuration management
 - test_security.py: Tests for security features
+- test_appdata_manager.py: Tests for AppData storage and caching
+- test_storage_backends.py: Tests for the JSON-file and SQLite backends
+- test_write_behind.py: Tests for the coalescing write-behind queue
+- test_serialization.py: Tests for JSON encoding and the disk format
+- test_file_watcher.py: Tests for the filesystem watcher
+- test_file_tree.py: Tests for the paginated file tree
+- test_search_index.py: Tests for the trigram search index
+- test_file_content.py: Tests for ranged file reads and streamed writes
+- test_symbol_index.py: Tests for the Python symbol index
+- test_path_index.py: Tests for the quick-open path index
+- test_terminal.py: Tests for streaming terminal commands
+- test_fast_commands.py: Tests for the in-process terminal commands
+- test_server.py: Tests for the production server entry point
+- test_message_queue.py: Tests for the worker message queue and broker
+- test_project_rooms.py: Tests for project room membership and fan-out counters
+- test_ai_assistant.py: Tests for AI assistant backends and streaming requests
+- test_response_cache.py: Tests for the AI response cache
 - test_integration.py: Integration tests
 
 Run tests with:
@@ -0,0 +1,192 @@
+"""
+Tests for the AI Assistant (ai_assistant.py)
+============================================
+
+Tests for the fake backend, streaming, limits and cancellation.
+"""
+
+import threading
+import pytest
+from ai_assistant import AIBackend, AIRequestManager, BACKENDS, FakeBackend, create_backend, register_backend
+from response_cache import ResponseCache
+from terminal import CommandControl
+
+
+class Recorder:
+    """Collects sent events and signals when a request has finished."""
+
+    def __init__(self):
+        self.events = []
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    def __call__(self, client, event, payload):
+        with self.lock:
+            self.events.append((client, event, payload))
+        if event == 'ai_response':
+            self.done.set()
+
+    def of(self, event):
+        with self.lock:
+            return [payload for _, name, payload in self.events if name == event]
+
+
+def start_thread(fn):
+    threading.Thread(target=fn, daemon=True).start()
+
+
+def make_manager(backend=None, **kwargs):
+    recorder = Recorder()
+    manager = AIRequestManager(backend or FakeBackend(token_delay=0), recorder, start_thread, **kwargs)
+    return manager, recorder
+
+
+class TestFakeBackend:
+    """Test the deterministic offline backend."""
+
+    def test_reply_is_deterministic(self):
+        backend = FakeBackend(token_delay=0)
+        tokens = list(backend.stream('fix this', 'Debug', CommandControl()))
+        assert ''.join(tokens) == 'Debugging: fix this'
+        assert tokens == list(backend.stream('fix this', 'Debug', CommandControl()))
+
+    def test_unknown_mode(self):
+        assert FakeBackend().reply('x', 'Other') == 'Processing: x'
+
+    def test_cancel_stops_waiting(self):
+        control = CommandControl()
+        stream = FakeBackend(token_delay=30).stream('hello', 'Chat', control)
+        threading.Timer(0.05, control.cancel).start()
+        assert list(stream) == []
+
+
+class TestRegistry:
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_backend('missing')
+
+    def test_register_backend(self):
+        @register_backend
+        class Upper(AIBackend):
+            name = 'upper'
+
+            def stream(self, message, mode, control, files=()):
+                yield message.upper()
+
+        try:
+            assert isinstance(create_backend('upper'), Upper)
+        finally:
+            BACKENDS.pop('upper')
+
+
+class TestStreaming:
+    """Test how replies are sent."""
+
+    def test_chunks_add_up_to_reply(self):
+        manager, recorder = make_manager(FakeBackend(token_delay=0, repeat=20), chunk_chars=32)
+        request_id = manager.submit('c1', 'hello world', 'Chat')
+        assert recorder.done.wait(5)
+
+        final = recorder.of('ai_response')[0]
+        chunks = recorder.of('ai_response_chunk')
+        assert final['id'] == request_id and not final['cancelled']
+        assert ''.join(chunk['text'] for chunk in chunks) == final['message']
+        assert [chunk['seq'] for chunk in chunks] == list(range(1, len(chunks) + 1))
+        # Words are batched rather than sent one per event
+        assert len(chunks) < len(final['message'].split())
+        assert manager.stats()['completed'] == 1
+
+    def test_message_is_truncated(self):
+        manager, recorder = make_manager()
+        manager.submit('c1', 'x' * 5000, 'Chat')
+        assert recorder.done.wait(5)
+        assert len(recorder.of('ai_response')[0]['message']) < 1100
+
+    def test_backend_failure(self):
+        class Broken(AIBackend):
+            name = 'broken'
+
+            def stream(self, message, mode, control, files=()):
+                yield 'partial'
+                raise ConnectionError('model unavailable')
+
+        manager, recorder = make_manager(Broken())
+        manager.submit('c1', 'hi', 'Chat')
+        assert recorder.done.wait(5)
+        final = recorder.of('ai_response')[0]
+        assert final['error'] and final['message'] == 'partial'
+        assert manager.stats()['failed'] == 1
+
+
+class TestCache:
+    """Test answering repeated requests from the response cache."""
+
+    def test_repeat_is_served_from_cache(self, tmp_path):
+        class Counting(FakeBackend):
+            calls = 0
+
+            def stream(self, message, mode, control, files=()):
+                Counting.calls += 1
+                return super().stream(message, mode, control, files)
+
+        source = tmp_path / 'main.py'
+        source.write_text('def main(): pass\n')
+        manager, recorder = make_manager(Counting(token_delay=0), cache=ResponseCache())
+        manager.submit('c1', 'explain  main', 'Explain', 'r1', [source])
+        assert recorder.done.wait(5)
+        recorder.done.clear()
+        manager.submit('c2', 'explain main', 'Explain', 'r2', [source])
+        assert recorder.done.wait(5)
+
+        first, second = recorder.of('ai_response')
+        assert Counting.calls == 1
+        assert second['cached'] and not first['cached']
+        assert second['message'] == first['message']
+        assert [c['text'] for c in recorder.of('ai_response_chunk') if c['id'] == 'r2'] == [first['message']]
+
+    def test_cancelled_replies_are_not_cached(self):
+        cache = ResponseCache()
+        manager, recorder = make_manager(FakeBackend(token_delay=30), cache=cache)
+        manager.submit('c1', 'hi', 'Chat', 'r1')
+        manager.cancel('c1', 'r1')
+        assert recorder.done.wait(5)
+        assert cache.stats()['entries'] == 0
+
+
+class TestLimits:
+    """Test concurrency limits and cancellation."""
+
+    def test_per_client_limit(self):
+        manager, recorder = make_manager(FakeBackend(token_delay=30), max_per_client=1)
+        manager.submit('c1', 'hi', 'Chat', 'r1')
+        with pytest.raises(RuntimeError):
+            manager.submit('c1', 'again', 'Chat', 'r2')
+        manager.submit('c2', 'hi', 'Chat', 'r3')
+        assert manager.stats()['active'] == 2 and manager.stats()['rejected'] == 1
+        manager.close()
+        assert manager.wait_idle(5)
+
+    def test_server_limit(self):
+        manager, recorder = make_manager(FakeBackend(token_delay=30), max_concurrent=1)
+        manager.submit('c1', 'hi', 'Chat')
+        with pytest.raises(RuntimeError):
+            manager.submit('c2', 'hi', 'Chat')
+        manager.close()
+        assert manager.wait_idle(5)
+
+    def test_cancel(self):
+        manager, recorder = make_manager(FakeBackend(token_delay=30))
+        manager.submit('c1', 'hi', 'Chat', 'r1')
+        assert manager.cancel('c2') == []
+        assert manager.cancel('c1', 'r1') == ['r1']
+        assert recorder.done.wait(5)
+        assert recorder.of('ai_response')[0]['cancelled']
+        assert manager.stats()['cancelled'] == 1 and manager.stats()['active'] == 0
+
+    def test_close_refuses_new_requests(self):
+        manager, recorder = make_manager(FakeBackend(token_delay=30))
+        manager.submit('c1', 'hi', 'Chat')
+        assert manager.close() == 1
+        assert manager.wait_idle(5)
+        with pytest.raises(RuntimeError):
+            manager.submit('c1', 'hi', 'Chat')
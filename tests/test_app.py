@@ -46,6 +46,326 @@ class TestRoutes:
         data = json.loads(response.data)
         assert 'installed' in data
         assert 'available' in data
+    
+    def test_api_projects(self, client):
+        """Test projects API endpoint in summary and full mode."""
+        for url in ('/api/projects', '/api/projects?full=true'):
+            response = client.get(url)
+            assert response.status_code == 200
+            data = json.loads(response.data)
+            assert isinstance(data['projects'], list)
+    
+    def test_api_projects_query(self, client):
+        """Test paginated projects query parameters."""
+        response = client.get('/api/projects?limit=5&sort=name&fields=id,name')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert len(data['projects']) <= 5
+        assert 'total' in data and 'nextCursor' in data
+        
+        response = client.get('/api/projects?sort=size')
+        assert response.status_code == 400
+
+
+class TestMetrics:
+    """Test the /api/metrics endpoint."""
+    
+    def test_metrics_sections(self, client):
+        """Test that metrics cover storage, watcher and terminal queue."""
+        data = client.get('/api/metrics').get_json()
+        for key in ('appdataCache', 'appdataWriter', 'fileWatcher', 'terminalQueue', 'projectRooms', 'search', 'fileContent', 'symbols', 'pathIndex'):
+            assert key in data
+        assert {'running', 'queued', 'waitMs'} <= set(data['terminalQueue'])
+
+
+class TestFileTree:
+    """Test the /api/files endpoint."""
+    
+    @pytest.fixture
+    def project_files(self, monkeypatch, tmp_path):
+        import app as app_module
+        from file_tree import FileTree
+        (tmp_path / 'src').mkdir()
+        for i in range(3):
+            (tmp_path / 'src' / f'm{i}.py').write_text('')
+        monkeypatch.setattr(app_module, 'file_tree', FileTree(tmp_path))
+        return tmp_path
+    
+    def test_lists_one_level(self, client, project_files):
+        data = client.get('/api/files').get_json()
+        assert data['files'] == [{'name': 'src', 'type': 'folder', 'path': 'src'}]
+        data = client.get('/api/files?path=src&limit=2').get_json()
+        assert [f['path'] for f in data['files']] == ['src/m0.py', 'src/m1.py']
+        data = client.get(f"/api/files?path=src&cursor={data['nextCursor']}").get_json()
+        assert [f['path'] for f in data['files']] == ['src/m2.py']
+    
+    def test_errors(self, client, project_files):
+        assert client.get('/api/files?path=../..').status_code == 400
+        assert client.get('/api/files?limit=x').status_code == 400
+        assert client.get('/api/files?path=missing').status_code == 404
+
+
+class TestFileContent:
+    """Test the /api/file endpoints."""
+    
+    @pytest.fixture
+    def project_files(self, monkeypatch, tmp_path):
+        import app as app_module
+        from file_content import FileContent
+        (tmp_path / 'notes.txt').write_text('first\nsecond\nthird\n')
+        monkeypatch.setattr(app_module, 'file_content', FileContent(tmp_path))
+        return tmp_path
+    
+    def test_line_and_byte_reads(self, client, project_files):
+        response = client.get('/api/file?path=notes.txt&line=2&count=1')
+        data = response.get_json()
+        assert data['lines'] == ['second'] and data['nextLine'] == 3
+        assert response.headers['ETag'] == data['etag']
+        data = client.get('/api/file?path=notes.txt&offset=6&length=6').get_json()
+        assert data['text'] == 'second' and data['nextOffset'] == 12
+    
+    def test_raw_download_supports_ranges(self, client, project_files):
+        response = client.get('/api/file/raw?path=notes.txt', headers={'Range': 'bytes=6-11'})
+        assert response.status_code == 206 and response.data == b'second'
+    
+    def test_write_with_if_match(self, client, project_files):
+        etag = client.get('/api/file?path=notes.txt').headers['ETag']
+        response = client.put('/api/file?path=notes.txt', data=b'new text', headers={'If-Match': etag})
+        assert response.status_code == 200
+        assert (project_files / 'notes.txt').read_bytes() == b'new text'
+        stale = client.put('/api/file?path=notes.txt', data=b'lost', headers={'If-Match': etag})
+        assert stale.status_code == 412
+    
+    def test_write_larger_than_the_request_limit(self, client, project_files, monkeypatch):
+        from app import app
+        monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 16)
+        body = b'x' * 1000
+        assert client.put('/api/file?path=big.txt', data=body).status_code == 200
+        assert (project_files / 'big.txt').read_bytes() == body
+        import app as app_module
+        monkeypatch.setattr(app_module, 'FILE_WRITE_MAX_BYTES', 100)
+        assert client.put('/api/file?path=big.txt', data=body).status_code == 413
+        assert (project_files / 'big.txt').read_bytes() == body
+    
+    def test_errors(self, client, project_files):
+        assert client.get('/api/file?path=../etc/passwd').status_code == 400
+        assert client.get('/api/file?path=missing.txt').status_code == 404
+        assert client.get('/api/file?path=notes.txt&line=x').status_code == 400
+        assert client.get('/api/file/raw?path=missing.txt').status_code == 404
+        assert client.put('/api/file?path=nodir/x.txt', data=b'x').status_code == 404
+
+
+class TestSearch:
+    """Test the /api/search endpoint."""
+    
+    @pytest.fixture
+    def index(self, monkeypatch, tmp_path):
+        import app as app_module
+        from search_index import SearchIndex
+        (tmp_path / 'src').mkdir()
+        (tmp_path / 'src' / 'a.py').write_text('import os\nos.getcwd()\n')
+        (tmp_path / 'b.txt').write_text('nothing here\n')
+        index = SearchIndex(tmp_path)
+        monkeypatch.setattr(app_module, 'search_index', index)
+        return index
+    
+    def lines(self, response):
+        import json
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    
+    def test_streams_matches_then_summary(self, client, index):
+        index.build()
+        response = client.get('/api/search?q=os.')
+        assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+        *matches, summary = self.lines(response)
+        assert matches == [{'path': 'src/a.py', 'line': 2, 'column': 1, 'text': 'os.getcwd()'}]
+        assert summary['done'] and summary['matches'] == 1 and summary['candidates'] == 1
+        assert not summary['truncated'] and not summary['timedOut']
+    
+    def test_regex_and_limit(self, client, index):
+        index.build()
+        *matches, summary = self.lines(client.get('/api/search?q=^%5Cw&regex=true&limit=1'))
+        assert len(matches) == 1 and summary['truncated']
+    
+    def test_errors(self, client, index):
+        assert client.get('/api/search?q=x').status_code == 503
+        index.build()
+        assert client.get('/api/search').status_code == 400
+        assert client.get('/api/search?q=(&regex=true').status_code == 400
+        assert client.get('/api/search?q=x&limit=0').status_code == 400
+        assert client.get('/api/search?q=x&path=../..').status_code == 400
+
+
+class TestFindFiles:
+    """Test the /api/files/find endpoint."""
+    
+    @pytest.fixture
+    def index(self, monkeypatch, tmp_path):
+        import app as app_module
+        from path_index import PathIndex
+        (tmp_path / 'web' / 'src').mkdir(parents=True)
+        (tmp_path / 'web' / 'src' / 'UserController.ts').write_text('')
+        (tmp_path / 'web' / 'src' / 'store.ts').write_text('')
+        (tmp_path / 'api').mkdir()
+        (tmp_path / 'api' / 'user_controller.py').write_text('')
+        index = PathIndex(tmp_path)
+        monkeypatch.setattr(app_module, 'path_index', index)
+        return index
+    
+    def test_ranked_results(self, client, index):
+        index.build()
+        data = client.get('/api/files/find?q=usrctl').get_json()
+        assert [r['path'] for r in data['results']] == ['web/src/UserController.ts', 'api/user_controller.py']
+        assert data['results'][0]['positions'] == [8, 9, 11, 12, 15, 18]
+        assert not data['truncated'] and 'elapsedMs' in data
+    
+    def test_project_and_limit(self, client, index):
+        index.build()
+        data = client.get('/api/files/find?q=usrctl&project=web').get_json()
+        assert [r['path'] for r in data['results']] == ['web/src/UserController.ts']
+        assert len(client.get('/api/files/find?q=s&limit=1').get_json()['results']) == 1
+    
+    def test_errors(self, client, index):
+        assert client.get('/api/files/find?q=x').status_code == 503
+        index.build()
+        assert client.get('/api/files/find').status_code == 400
+        assert client.get('/api/files/find?q=x&limit=0').status_code == 400
+
+class TestSymbols:
+    """Test the /api/symbols endpoint."""
+    
+    @pytest.fixture
+    def index(self, monkeypatch, tmp_path):
+        import app as app_module
+        from symbol_index import SymbolIndex
+        (tmp_path / 'src').mkdir()
+        (tmp_path / 'src' / 'a.py').write_text('class Widget:\n    def draw(self):\n        pass\n')
+        index = SymbolIndex(tmp_path, workers=0)
+        monkeypatch.setattr(app_module, 'symbol_index', index)
+        return index
+    
+    def test_outline(self, client, index):
+        response = client.get('/api/symbols?path=src/a.py')
+        assert response.status_code == 200
+        widget = response.get_json()['symbols'][0]
+        assert widget['name'] == 'Widget' and widget['children'][0]['name'] == 'draw'
+    
+    def test_lookup(self, client, index):
+        index.build()
+        data = client.get('/api/symbols?q=draw&kind=method').get_json()
+        assert data['count'] == 1 and data['symbols'][0]['path'] == 'src/a.py'
+        assert client.get('/api/symbols?q=wid&match=prefix').get_json()['symbols'][0]['name'] == 'Widget'
+    
+    def test_errors(self, client, index):
+        assert client.get('/api/symbols?q=draw').status_code == 503
+        index.build()
+        assert client.get('/api/symbols').status_code == 400
+        assert client.get('/api/symbols?q=x&kind=module').status_code == 400
+        assert client.get('/api/symbols?path=../x.py').status_code == 400
+        assert client.get('/api/symbols?path=src/missing.py').status_code == 404
+
+
+class TestConditionalRequests:
+    """Test ETag / If-None-Match handling on collection endpoints."""
+    
+    def test_unchanged_collection_returns_304(self, client):
+        """Test that a matching ETag is answered with 304 and no body."""
+        for url in ('/api/projects', '/api/layouts', '/api/themes', '/api/extensions'):
+            first = client.get(url)
+            assert first.status_code == 200
+            etag = first.headers['ETag']
+            
+            second = client.get(url, headers={'If-None-Match': etag})
+            assert second.status_code == 304
+            assert second.data == b''
+    
+    def test_etag_changes_after_write(self, client):
+        """Test that writing to a collection invalidates its ETag."""
+        etag = client.get('/api/layouts').headers['ETag']
+        client.post('/api/layouts', json={'id': 'etag-test-layout', 'name': 'ETag Test'})
+        try:
+            response = client.get('/api/layouts', headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            assert response.headers['ETag'] != etag
+        finally:
+            client.delete('/api/layouts/etag-test-layout')
+    
+    def test_etag_changes_after_in_place_edit(self, client, monkeypatch):
+        """Test that editing a project file in place changes the summary ETag."""
+        from app import appdata_manager
+        appdata_manager.save_project({'id': 'etag-edit-project', 'name': 'Before'})
+        try:
+            etag = client.get('/api/projects').headers['ETag']
+            path = appdata_manager.get_projects_dir() / 'etag-edit-project.json'
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'id': 'etag-edit-project', 'name': 'After edit'}, f)
+            monkeypatch.setattr(appdata_manager.backend._caches['projects'], 'revalidate_interval', 0)
+            response = client.get('/api/projects', headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            assert response.headers['ETag'] != etag
+            names = [p['name'] for p in json.loads(response.data)['projects'] if p['id'] == 'etag-edit-project']
+            assert names == ['After edit']
+        finally:
+            appdata_manager.delete_project('etag-edit-project')
+
+    def test_etag_depends_on_query(self, client):
+        """Test that different query strings get different ETags."""
+        full = client.get('/api/projects?full=true').headers['ETag']
+        summary = client.get('/api/projects').headers['ETag']
+        assert full != summary
+
+
+class TestCompression:
+    """Test gzip negotiation on API responses."""
+    
+    def test_large_response_is_gzipped(self, client, monkeypatch):
+        """Test that responses above the threshold are compressed when accepted."""
+        import gzip
+        monkeypatch.setitem(app.config, 'GZIP_MIN_SIZE', 10)
+        plain = client.get('/api/extensions')
+        assert 'Content-Encoding' not in plain.headers
+        
+        response = client.get('/api/extensions', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+    
+    def test_small_response_is_not_gzipped(self, client, monkeypatch):
+        """Test that bodies under the threshold are sent as is."""
+        monkeypatch.setitem(app.config, 'GZIP_MIN_SIZE', 10 ** 9)
+        response = client.get('/api/extensions', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+
+
+class TestBatchEndpoints:
+    """Test the :batchGet and :batchUpsert endpoints."""
+    
+    def test_batch_upsert_then_get(self, client):
+        """Test a round trip through the batch endpoints."""
+        ids = ['batch-test-theme-1', 'batch-test-theme-2']
+        try:
+            response = client.post('/api/themes:batchUpsert', json={'records': [{'id': i, 'name': i} for i in ids]})
+            assert response.status_code == 200
+            assert [item['status'] for item in response.get_json()['items']] == ['ok', 'ok']
+            
+            response = client.post('/api/themes:batchGet', json={'ids': ids + ['batch-test-missing']})
+            items = response.get_json()['items']
+            assert [item['status'] for item in items] == ['ok', 'ok', 'not_found']
+            assert items[0]['record']['name'] == ids[0]
+        finally:
+            from appdata_manager import appdata_manager
+            for i in ids:
+                (appdata_manager.get_themes_dir() / f'{i}.json').unlink(missing_ok=True)
+            appdata_manager.invalidate_cache('themes')
+    
+    def test_batch_rejects_bad_input(self, client):
+        """Test that invalid ids reject the batch and bad bodies are 400s."""
+        response = client.post('/api/projects:batchUpsert', json={'records': [{'id': '../escape'}]})
+        assert response.status_code == 400
+        assert response.get_json()['items'][0]['status'] == 'invalid'
+        
+        assert client.post('/api/layouts:batchGet', json={'ids': 'x'}).status_code == 400
+        assert client.post('/api/settings:batchGet', json={'ids': []}).status_code in (404, 405)
 
 
 class TestCommandValidation:
@@ -140,6 +460,276 @@ class TestSocketIO:
         })
         received = socket_client.get_received()
         assert len(received) >= 0
+    
+    def test_ai_reply_is_streamed(self, socket_client):
+        """Test that the reply arrives as chunks followed by the whole message."""
+        import time
+        socket_client.get_received()
+        ack = socket_client.emit('ai_message', {'message': 'hello there', 'mode': 'Explain', 'id': 'ai-1'}, callback=True)
+        assert ack == {'id': 'ai-1'}
+        chunks, final = [], None
+        deadline = time.monotonic() + 10
+        while final is None and time.monotonic() < deadline:
+            for packet in socket_client.get_received():
+                if packet['name'] == 'ai_response_chunk':
+                    chunks.append(packet['args'][0]['text'])
+                elif packet['name'] == 'ai_response':
+                    final = packet['args'][0]
+            time.sleep(0.01)
+        assert final['message'] == 'Explaining: hello there' and not final['cancelled']
+        assert ''.join(chunks) == final['message']
+    
+    @pytest.mark.parametrize('files', ['main.py', ['../outside.py'], ['/etc/passwd'], ['a.py'] * 21])
+    def test_ai_files_outside_projects_rejected(self, socket_client, files):
+        ack = socket_client.emit('ai_message', {'message': 'explain', 'files': files}, callback=True)
+        assert 'error' in ack
+    
+    def test_ai_cancel(self, socket_client):
+        import time
+        socket_client.emit('ai_message', {'message': 'word ' * 200, 'id': 'ai-long'})
+        assert socket_client.emit('ai_cancel', {'id': 'ai-long'}, callback=True) == {'cancelled': ['ai-long']}
+        final = None
+        deadline = time.monotonic() + 5
+        while final is None and time.monotonic() < deadline:
+            final = next((p['args'][0] for p in socket_client.get_received() if p['name'] == 'ai_response'), None)
+            time.sleep(0.01)
+        assert final['cancelled']
+    
+    def test_terminal_output_is_streamed(self, socket_client, tmp_path):
+        """Test that a slow command's first output arrives well before it exits."""
+        import shutil
+        import time
+        if not shutil.which('python3'):
+            pytest.skip('python3 is not on PATH')
+        script = tmp_path / 'slow.py'
+        script.write_text('import time\nprint("first", flush=True)\ntime.sleep(1.5)\nprint("done")\n')
+        socket_client.get_received()
+        
+        socket_client.emit('terminal_execute', {'command': f'python3 {script}', 'id': 'slow-1'})
+        start = time.monotonic()
+        first_output = exited = None
+        outputs = []
+        while exited is None and time.monotonic() - start < 10:
+            for packet in socket_client.get_received():
+                payload = packet['args'][0]
+                if packet['name'] == 'terminal_output' and first_output is None:
+                    first_output = time.monotonic() - start
+                if packet['name'] == 'terminal_output':
+                    outputs.append(payload.get('stdout', ''))
+                if packet['name'] == 'terminal_exit':
+                    exited = time.monotonic() - start
+                    assert payload['id'] == 'slow-1' and payload['exitCode'] == 0
+            time.sleep(0.02)
+        
+        assert exited is not None
+        assert ''.join(outputs) == 'first\ndone\n'
+        assert exited - first_output > 1.0
+    
+    def test_terminal_session_keeps_cwd(self, tmp_path):
+        """Test that cd persists between commands and the shell is closed on disconnect."""
+        import time
+        from app import terminal_sessions
+        if terminal_sessions is None:
+            pytest.skip('PTY sessions are not supported here')
+        client = socketio.test_client(app)
+        
+        def run(command):
+            client.emit('terminal_execute', {'command': command})
+            deadline = time.monotonic() + 10
+            output = []
+            while time.monotonic() < deadline:
+                for packet in client.get_received():
+                    if packet['name'] == 'terminal_output':
+                        output.append(packet['args'][0].get('stdout', ''))
+                    if packet['name'] == 'terminal_exit':
+                        return ''.join(output), packet['args'][0]
+                time.sleep(0.01)
+            pytest.fail(f'{command} did not finish')
+        
+        run(f'cd {tmp_path}')
+        output, result = run('pwd')
+        assert output.strip() == str(tmp_path)
+        assert result['cwd'] == str(tmp_path)
+        
+        active = terminal_sessions.stats()['active']
+        client.disconnect()
+        assert terminal_sessions.stats()['active'] == active - 1
+    
+    def test_terminal_session_does_not_expand_arguments(self, tmp_path):
+        """Test that globs, braces and ~ reach the command as typed."""
+        import time
+        from app import terminal_sessions
+        if terminal_sessions is None:
+            pytest.skip('PTY sessions are not supported here')
+        client = socketio.test_client(app)
+        
+        def run(command):
+            client.emit('terminal_execute', {'command': command})
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                for packet in client.get_received():
+                    if packet['name'] == 'terminal_exit':
+                        return packet['args'][0]
+                time.sleep(0.01)
+            pytest.fail(f'{command} did not finish')
+        
+        try:
+            run(f'cd {tmp_path}')
+            run('touch {a,b} ~x *')
+            assert sorted(p.name for p in tmp_path.iterdir()) == ['*', '{a,b}', '~x']
+        finally:
+            client.disconnect()
+    
+    def test_control_characters_blocked(self):
+        """Test that line editing and signal keys cannot be smuggled into a command."""
+        from app import validate_command
+        for char in ['\x15', '\x17', '\x03', '\x1a', '\x04', '\x7f', '\t']:
+            valid, message = validate_command(f'touch /tmp/zz {char}bash -c whoami')
+            assert not valid and 'Control character' in message
+        assert validate_command('touch /tmp/zz')[0]
+    
+    def test_scrollback_replayed_on_reattach(self):
+        """Test that a reconnecting client gets the output it missed."""
+        import time
+        first = socketio.test_client(app)
+        assert first.emit('terminal_attach', {'clientId': 'replay-test-client-0001'}, callback=True) == {
+            'status': 'attached'
+        }
+        first.emit('terminal_execute', {'command': 'echo replayed', 'id': 'echo-1'})
+        deadline = time.monotonic() + 10
+        while not any(p['name'] == 'terminal_exit' for p in first.get_received()):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        first.disconnect()
+        
+        second = socketio.test_client(app)
+        second.emit('terminal_attach', {'clientId': 'replay-test-client-0001', 'since': 0})
+        replay = [p for p in second.get_received() if p['name'] == 'terminal_scrollback'][0]['args'][0]
+        entries = replay['entries']
+        assert entries[0] == {'id': 'echo-1', 'command': 'echo replayed', 'seq': 1}
+        assert ''.join(e.get('stdout', '') for e in entries) == 'replayed\n'
+        
+        last_seq = entries[-1]['seq']
+        second.emit('terminal_attach', {'clientId': 'replay-test-client-0001', 'since': last_seq})
+        replay = [p for p in second.get_received() if p['name'] == 'terminal_scrollback'][0]['args'][0]
+        assert replay['entries'] == []
+        second.disconnect()
+    
+    def test_terminal_cancel(self, socket_client, tmp_path):
+        """Test that terminal_cancel stops a running command."""
+        import shutil
+        import time
+        if not shutil.which('python3'):
+            pytest.skip('python3 is not on PATH')
+        script = tmp_path / 'sleepy.py'
+        script.write_text('import time\nprint("started", flush=True)\ntime.sleep(30)\n')
+        socket_client.emit('terminal_execute', {'command': f'python3 {script}', 'id': 'sleepy-1'})
+        
+        start = time.monotonic()
+        exit_event = None
+        cancelled = False
+        while exit_event is None and time.monotonic() - start < 10:
+            for packet in socket_client.get_received():
+                if packet['name'] == 'terminal_output' and not cancelled:
+                    socket_client.emit('terminal_cancel', {'id': 'sleepy-1'})
+                    cancelled = True
+                if packet['name'] == 'terminal_exit':
+                    exit_event = packet['args'][0]
+            time.sleep(0.01)
+        assert exit_event is not None and exit_event['cancelled']
+        assert time.monotonic() - start < 8
+    
+    def test_drain_finishes_running_commands(self, monkeypatch, tmp_path):
+        """Test that drain lets a running command finish, refuses new ones and disconnects clients."""
+        import shutil
+        import time
+        import app as app_module
+        from terminal import CommandScheduler
+        from ai_assistant import AIRequestManager, FakeBackend
+        if not shutil.which('python3'):
+            pytest.skip('python3 is not on PATH')
+        monkeypatch.setattr(app_module, 'terminal_scheduler', CommandScheduler(
+            max_per_client=1, spawn=socketio.start_background_task
+        ))
+        monkeypatch.setattr(app_module, 'ai_requests', AIRequestManager(
+            FakeBackend(), lambda *args: None, socketio.start_background_task
+        ))
+        client = socketio.test_client(app)
+        script = tmp_path / 'short.py'
+        script.write_text('import time\ntime.sleep(0.5)\nprint("finished")\n')
+        sent = []
+        send_terminal = app_module.send_terminal
+        monkeypatch.setattr(app_module, 'send_terminal', lambda *args: sent.append(args) or send_terminal(*args))
+        client.emit('terminal_execute', {'command': f'python3 {script}', 'id': 'short-1'})
+        
+        assert app_module.drain(timeout=10)
+        exits = [payload for _, event, payload in sent if event == 'terminal_exit']
+        assert exits[0]['id'] == 'short-1' and exits[0]['exitCode'] == 0
+        assert not client.is_connected()
+        
+        client = socketio.test_client(app)
+        client.emit('terminal_execute', {'command': 'pwd', 'id': 'late-1'})
+        deadline = time.monotonic() + 5
+        output = []
+        while time.monotonic() < deadline and not output:
+            output = [r['args'][0] for r in client.get_received() if r['name'] == 'terminal_output']
+            time.sleep(0.01)
+        assert 'shutting down' in output[0]['stderr']
+        client.disconnect()
+    
+    def test_file_changes_are_broadcast(self, socket_client):
+        """Test that watcher batches reach connected clients as typed events."""
+        from app import broadcast_file_changes
+        socket_client.get_received()
+        broadcast_file_changes({'layout_changed': {'collection': 'layouts', 'changes': [{'id': 'l1', 'change': 'modified'}]}})
+        received = socket_client.get_received()
+        assert [(r['name'], r['args'][0]['changes'][0]['id']) for r in received] == [('layout_changed', 'l1')]
+
+
+class TestProjectRooms:
+    """Test project-scoped change events."""
+    
+    def test_join_and_leave(self, socket_client):
+        assert socket_client.emit('join_project', {'projectId': 'rooms-a'}, callback=True)['status'] == 'joined'
+        assert socket_client.emit('leave_project', {'projectId': 'rooms-a'}, callback=True)['status'] == 'left'
+        assert 'error' in socket_client.emit('leave_project', {'projectId': 'rooms-a'}, callback=True)
+    
+    @pytest.mark.parametrize('project_id', [None, '', '../etc', 'a/b', 'x' * 200])
+    def test_invalid_project_id(self, socket_client, project_id):
+        assert 'error' in socket_client.emit('join_project', {'projectId': project_id}, callback=True)
+    
+    def test_events_reach_only_subscribers(self):
+        """Test that project and file events go to the project's room only."""
+        from app import broadcast_file_changes, project_rooms
+        following = socketio.test_client(app)
+        other = socketio.test_client(app)
+        following.emit('join_project', {'projectId': 'rooms-b'}, callback=True)
+        other.emit('join_project', {'projectId': 'rooms-c'}, callback=True)
+        following.get_received()
+        other.get_received()
+        
+        broadcast_file_changes({
+            'project_changed': {'collection': 'projects', 'changes': [{'id': 'rooms-b', 'change': 'modified'}]},
+            'file_changed': {'changes': [
+                {'path': 'rooms-b/main.py', 'change': 'modified'},
+                {'path': 'nobody-follows/x.py', 'change': 'created'}
+            ]}
+        })
+        
+        received = following.get_received()
+        assert [r['name'] for r in received] == ['project_changed', 'file_changed']
+        assert received[1]['args'][0] == {
+            'projectId': 'rooms-b', 'changes': [{'path': 'rooms-b/main.py', 'change': 'modified'}]
+        }
+        assert other.get_received() == []
+        stats = project_rooms.stats()
+        assert stats['perRoom']['rooms-b']['events'] == 2
+        assert stats['perRoom']['rooms-b']['deliveries'] == 2
+        assert stats['eventsSkipped'] >= 1
+        
+        following.disconnect()
+        other.disconnect()
+        assert 'rooms-b' not in project_rooms.stats()['perRoom']
 
 
 class TestSecurity:
@@ -0,0 +1,439 @@
+"""
+Tests for AppData Manager (appdata_manager.py)
+===============================================
+
+Tests for collection storage, caching and invalidation.
+"""
+
+import os
+import json
+import threading
+import pytest
+from appdata_manager import AppDataManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """Create an AppDataManager rooted in a temporary directory."""
+    return AppDataManager(base_dir=tmp_path / 'appdata')
+
+
+def _write_record(directory, record):
+    """Write a record file behind the manager's back."""
+    with open(directory / f"{record['id']}.json", 'w', encoding='utf-8') as f:
+        json.dump(record, f)
+
+
+class TestCollectionCache:
+    """Test the write-through collection cache."""
+
+    def test_list_is_served_from_cache(self, manager):
+        """Test that repeated listings do not re-read the directory."""
+        manager.save_project({'id': 'p1', 'name': 'One'})
+        manager.list_projects()
+        manager.list_projects()
+        stats = manager.get_cache_stats()['projects']
+        assert stats['hits'] >= 1
+        assert stats['records'] == 1
+
+    def test_save_and_delete_write_through(self, manager):
+        """Test that save/delete update the cached listing."""
+        manager.save_project({'id': 'p1', 'name': 'One', 'lastOpened': '2024-01-01'})
+        manager.save_project({'id': 'p2', 'name': 'Two', 'lastOpened': '2024-02-01'})
+        assert [p['id'] for p in manager.list_projects()] == ['p2', 'p1']
+
+        assert manager.delete_project('p2')
+        assert [p['id'] for p in manager.list_projects()] == ['p1']
+        assert not manager.delete_project('p2')
+
+    def test_out_of_band_file_is_picked_up(self, manager):
+        """Test that files added outside the manager are noticed."""
+        manager.list_themes()
+        _write_record(manager.get_themes_dir(), {'id': 'solar', 'name': 'Solar'})
+        assert [t['id'] for t in manager.list_themes()] == ['solar']
+
+    def test_out_of_band_edit_is_picked_up(self, manager):
+        """Test that in-place edits are noticed after revalidation."""
+        manager.save_extension({'id': 'lint', 'name': 'Lint'})
+        manager.list_extensions()
+
+        path = manager.get_extensions_dir() / 'lint.json'
+        _write_record(manager.get_extensions_dir(), {'id': 'lint', 'name': 'Linter v2'})
+        os.utime(path, ns=(1, 1))
+        manager.backend._caches['extensions'].revalidate_interval = 0
+
+        assert manager.list_extensions()[0]['name'] == 'Linter v2'
+        assert manager.load_extension('lint')['name'] == 'Linter v2'
+
+    def test_returned_records_do_not_alias_cache(self, manager):
+        """Test that mutating a loaded record does not change the cache."""
+        manager.save_extension({'id': 'lint', 'name': 'Lint', 'enabled': False})
+        extension = manager.load_extension('lint')
+        extension['enabled'] = True
+        assert manager.load_extension('lint')['enabled'] is False
+
+    def test_collection_version_tracks_changes(self, manager):
+        """Test that the collection version moves on saves and outside edits."""
+        before = manager.collection_version('themes')
+        assert manager.collection_version('themes') == before
+        manager.save_theme({'id': 'dark', 'name': 'Dark'})
+        after_save = manager.collection_version('themes')
+        assert after_save != before
+        manager.list_themes()
+        _write_record(manager.get_themes_dir(), {'id': 'light', 'name': 'Light'})
+        assert manager.collection_version('themes') != after_save
+
+    def test_missing_record_raises(self, manager):
+        """Test that loading an unknown record raises FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            manager.load_layout('nope')
+
+
+class TestManifest:
+    """Test the per-collection summary manifest (_index.json)."""
+
+    def test_save_maintains_manifest(self, manager):
+        """Test that saving a project writes its summary to the manifest."""
+        manager.save_project({'id': 'p1', 'name': 'One', 'type': 'Python', 'files': ['a.py']})
+        manifest = json.loads((manager.get_projects_dir() / '_index.json').read_text())
+        assert manifest['records']['p1']['summary'] == {'id': 'p1', 'name': 'One', 'type': 'Python'}
+        assert manager.list_project_summaries() == [{'id': 'p1', 'name': 'One', 'type': 'Python'}]
+
+    def test_manifest_is_not_listed_as_record(self, manager):
+        """Test that the manifest file never shows up as a project."""
+        manager.save_project({'id': 'p1', 'name': 'One'})
+        assert [p['id'] for p in manager.list_projects()] == ['p1']
+
+    def test_summaries_do_not_parse_records(self, manager):
+        """Test that a fresh manifest answers without reading record files."""
+        manager.save_project({'id': 'p1', 'name': 'One'})
+        project_file = manager.get_projects_dir() / 'p1.json'
+        stat = project_file.stat()
+        project_file.write_text('not json')
+        os.utime(project_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        fresh = AppDataManager(base_dir=manager.base_dir)
+        assert fresh.list_project_summaries() == [{'id': 'p1', 'name': 'One'}]
+
+    def test_delete_updates_manifest(self, manager):
+        """Test that deleting a project removes it from the manifest."""
+        manager.save_project({'id': 'p1', 'name': 'One'})
+        manager.save_project({'id': 'p2', 'name': 'Two'})
+        manager.delete_project('p1')
+        fresh = AppDataManager(base_dir=manager.base_dir)
+        assert [p['id'] for p in fresh.list_project_summaries()] == ['p2']
+
+    def test_missing_manifest_is_rebuilt(self, manager):
+        """Test that a missing manifest is rebuilt from the record files."""
+        _write_record(manager.get_projects_dir(), {'id': 'p1', 'name': 'One'})
+        assert manager.list_project_summaries() == [{'id': 'p1', 'name': 'One'}]
+        assert (manager.get_projects_dir() / '_index.json').exists()
+
+    def test_corrupted_manifest_is_rebuilt(self, manager):
+        """Test that a corrupted manifest is rebuilt from the record files."""
+        manager.save_project({'id': 'p1', 'name': 'One'})
+        (manager.get_projects_dir() / '_index.json').write_text('{broken')
+        fresh = AppDataManager(base_dir=manager.base_dir)
+        assert fresh.list_project_summaries() == [{'id': 'p1', 'name': 'One'}]
+
+    def test_out_of_band_record_is_reconciled(self, manager):
+        """Test that files added outside the manager reach the manifest."""
+        manager.save_project({'id': 'p1', 'name': 'One', 'lastOpened': '2024-01-01'})
+        _write_record(manager.get_projects_dir(), {'id': 'p2', 'name': 'Two', 'lastOpened': '2024-02-01'})
+        assert [p['id'] for p in manager.list_project_summaries()] == ['p2', 'p1']
+
+    def test_in_place_edit_reaches_summaries(self, manager):
+        """Test that rewriting a record file in place updates summaries and version."""
+        manager.save_project({'id': 'p1', 'name': 'One'})
+        assert manager.list_project_summaries() == [{'id': 'p1', 'name': 'One'}]
+        version = manager.collection_version('projects')
+        directory = manager.get_projects_dir()
+        dir_mtime = directory.stat().st_mtime_ns
+
+        manager.backend._caches['projects'].revalidate_interval = 0
+        _write_record(directory, {'id': 'p1', 'name': 'Renamed'})
+        assert directory.stat().st_mtime_ns == dir_mtime
+        assert manager.collection_version('projects') != version
+        assert manager.list_project_summaries() == [{'id': 'p1', 'name': 'Renamed'}]
+
+        _write_record(directory, {'id': 'p1', 'name': 'After restart'})
+        fresh = AppDataManager(base_dir=manager.base_dir)
+        assert fresh.list_project_summaries() == [{'id': 'p1', 'name': 'After restart'}]
+
+    def test_invalidation_changes_version(self, manager):
+        """Test that a watcher invalidation never leaves a matching version behind."""
+        manager.save_project({'id': 'p1', 'name': 'One'})
+        manager.list_project_summaries()
+        version = manager.collection_version('projects')
+        _write_record(manager.get_projects_dir(), {'id': 'p1', 'name': 'Renamed'})
+        manager.invalidate_cache('projects')
+        assert manager.collection_version('projects') != version
+        assert manager.list_project_summaries() == [{'id': 'p1', 'name': 'Renamed'}]
+
+        version = manager.collection_version('projects')
+        manager.invalidate_cache('projects')
+        assert manager.collection_version('projects') == version
+
+    def test_manifest_writes_are_deferred(self, manager):
+        """Test that a burst of saves rewrites the manifest once, and a stale one is repaired."""
+        manager.backend._caches['projects'].manifest_write_interval = 60
+        manifest_path = manager.get_projects_dir() / '_index.json'
+        manager.save_project({'id': 'p0', 'name': 'Zero'})
+        for i in range(1, 20):
+            manager.save_project({'id': f'p{i}', 'name': str(i)})
+        assert list(json.loads(manifest_path.read_text())['records']) == ['p0']
+        assert len(manager.list_project_summaries()) == 20
+
+        fresh = AppDataManager(base_dir=manager.base_dir)
+        assert len(fresh.list_project_summaries()) == 20
+
+        manager.flush()
+        assert len(json.loads(manifest_path.read_text())['records']) == 20
+
+    def test_manifest_id_is_reserved(self, manager):
+        """Test that a record cannot overwrite the manifest."""
+        with pytest.raises(ValueError):
+            manager.save_project({'id': '_index', 'name': 'Bad'})
+
+
+class TestWriteBehind:
+    """Test coalesced, atomic layout and settings saves."""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        """Create a manager with a long write window."""
+        manager = AppDataManager(base_dir=tmp_path / 'appdata', write_delay=60)
+        yield manager
+        manager.close()
+
+    def test_layout_burst_costs_one_write(self, manager):
+        """Test that a resize storm results in a single disk write."""
+        for width in range(30):
+            manager.save_layout({'id': 'main', 'name': 'Main', 'width': width})
+        assert not (manager.get_layouts_dir() / 'main.json').exists()
+        assert manager.load_layout('main')['width'] == 29
+        assert [layout['width'] for layout in manager.list_layouts()] == [29]
+
+        manager.flush()
+        stored = json.loads((manager.get_layouts_dir() / 'main.json').read_text())
+        assert stored['width'] == 29
+        assert manager.get_writer_stats()['written'] == 1
+
+    def test_settings_are_written_atomically(self, manager):
+        """Test that settings saves leave no temporary files behind."""
+        manager.save_settings({'theme': 'light'})
+        assert manager.load_settings() == {'theme': 'light'}
+        manager.flush()
+        settings_dir = manager.get_settings_file().parent
+        assert [p.name for p in settings_dir.iterdir()] == ['settings.json']
+        assert json.loads(manager.get_settings_file().read_text()) == {'theme': 'light'}
+
+    def test_delete_cancels_queued_layout(self, manager):
+        """Test that deleting a queued layout drops the pending write."""
+        manager.save_layout({'id': 'tmp', 'name': 'Tmp'})
+        assert manager.delete_layout('tmp')
+        manager.flush()
+        assert not (manager.get_layouts_dir() / 'tmp.json').exists()
+
+    def test_delete_during_write_is_not_undone(self, manager, monkeypatch):
+        """Test that a layout deleted while its save is being written stays deleted."""
+        started, release = threading.Event(), threading.Event()
+        put = manager.backend.put
+
+        def slow_put(*args):
+            started.set()
+            release.wait(5)
+            return put(*args)
+
+        monkeypatch.setattr(manager.backend, 'put', slow_put)
+        manager.save_layout({'id': 'main', 'name': 'Main'})
+        flushing = threading.Thread(target=manager.flush)
+        flushing.start()
+        assert started.wait(5)
+        # Still readable while the write is in progress
+        assert manager.load_layout('main')['name'] == 'Main'
+        assert [layout['id'] for layout in manager.list_layout_summaries()] == ['main']
+
+        assert manager.delete_layout('main')
+        with pytest.raises(FileNotFoundError):
+            manager.load_layout('main')
+        assert manager.list_layouts() == []
+        release.set()
+        flushing.join(5)
+        manager.flush()
+        assert not (manager.get_layouts_dir() / 'main.json').exists()
+        assert not manager.delete_layout('main')
+
+    def test_close_flushes(self, tmp_path):
+        """Test that shutting down writes queued saves."""
+        manager = AppDataManager(base_dir=tmp_path / 'appdata', write_delay=60)
+        manager.save_layout({'id': 'main', 'name': 'Main'})
+        manager.close()
+        assert (manager.get_layouts_dir() / 'main.json').exists()
+
+
+class TestQueries:
+    """Test paginated, filtered and sorted queries."""
+
+    @pytest.fixture
+    def populated(self, manager):
+        """Create ten projects of alternating type."""
+        for i in range(10):
+            manager.save_project({
+                'id': f'p{i}',
+                'name': f'Project {9 - i}',
+                'type': 'Python' if i % 2 else 'Go',
+                'lastOpened': f'2024-01-{10 + i}',
+                'files': [f'file{i}.py']
+            })
+        return manager
+
+    def test_cursor_pages_cover_everything_in_order(self, populated):
+        """Test that following nextCursor yields every record once."""
+        seen, cursor = [], None
+        while True:
+            page = populated.query_projects(limit=3, cursor=cursor)
+            seen += [p['id'] for p in page['items']]
+            cursor = page['nextCursor']
+            if not cursor:
+                break
+        assert seen == [f'p{i}' for i in range(9, -1, -1)]
+        assert page['total'] == 10
+
+    def test_offset_and_sort(self, populated):
+        """Test offset paging with an ascending name sort."""
+        page = populated.query_projects(limit=2, offset=1, sort='name', fields=['id'])
+        assert page['items'] == [{'id': 'p8'}, {'id': 'p7'}]
+
+    def test_type_filter(self, populated):
+        """Test filtering by project type."""
+        page = populated.query_projects(record_type='Go', fields=['id', 'type'])
+        assert page['total'] == 5
+        assert {p['type'] for p in page['items']} == {'Go'}
+
+    def test_projection_loads_full_records_only_when_needed(self, populated):
+        """Test that non-summary fields are loaded for the page only."""
+        page = populated.query_projects(limit=1, fields=['id', 'files'])
+        assert page['items'] == [{'id': 'p9', 'files': ['file9.py']}]
+
+    def test_index_follows_saves_and_deletes(self, populated):
+        """Test that the sorted index is updated in place."""
+        populated.query_projects(limit=1)
+        populated.save_project({'id': 'new', 'name': 'New', 'lastOpened': '2025-01-01'})
+        populated.delete_project('p9')
+        page = populated.query_projects(limit=2, fields=['id'])
+        assert page['items'] == [{'id': 'new'}, {'id': 'p8'}]
+        assert page['total'] == 10
+
+    def test_out_of_band_change_rebuilds_index(self, populated):
+        """Test that records added behind the manager's back are queried."""
+        populated.query_projects(limit=1)
+        _write_record(populated.get_projects_dir(), {'id': 'ext', 'lastOpened': '2030-01-01'})
+        assert populated.query_projects(limit=1, fields=['id'])['items'] == [{'id': 'ext'}]
+
+    def test_invalid_parameters(self, populated):
+        """Test that bad sort fields and cursors are rejected."""
+        with pytest.raises(ValueError):
+            populated.query_projects(sort='size')
+        with pytest.raises(ValueError):
+            populated.query_projects(cursor='not-a-cursor')
+
+    def test_layout_query_sees_queued_saves(self, tmp_path):
+        """Test that layouts still in the write-behind queue are queried."""
+        manager = AppDataManager(base_dir=tmp_path / 'appdata', write_delay=60)
+        manager.save_layout({'id': 'a', 'name': 'A'})
+        manager.save_layout({'id': 'b', 'name': 'B'})
+        page = manager.query_layouts(sort='name', fields=['id'])
+        assert page['items'] == [{'id': 'a'}, {'id': 'b'}]
+        manager.close()
+
+    def test_layout_writes_keep_the_query_index(self, tmp_path):
+        """Test that queued layout writes landing on disk do not force an index rebuild."""
+        manager = AppDataManager(base_dir=tmp_path / 'appdata', write_delay=60)
+        manager.save_layout({'id': 'a', 'name': 'A'})
+        manager.flush()
+        manager.query_layouts(fields=['id'])
+        index = manager._query_indexes['layouts']
+
+        manager.save_layout({'id': 'b', 'name': 'B'})
+        manager.flush()
+        manager.delete_layout('a')
+        manager.flush()
+        page = manager.query_layouts(sort='name', fields=['id'])
+        assert page['items'] == [{'id': 'b'}]
+        assert manager._query_indexes['layouts'] is index
+        manager.close()
+
+
+class TestBatch:
+    """Test batch reads and writes."""
+
+    def test_batch_upsert_and_get(self, manager):
+        """Test that a batch is written at once and read back per id."""
+        records = [{'id': f'p{i}', 'name': f'Project {i}'} for i in range(3)]
+        ok, results = manager.batch_upsert('projects', records)
+        assert ok and [r['status'] for r in results] == ['ok'] * 3
+
+        results = manager.batch_get('projects', ['p0', 'nope', '../etc'])
+        assert [r['status'] for r in results] == ['ok', 'not_found', 'invalid']
+        assert results[0]['record']['name'] == 'Project 0'
+        manager.close()
+
+    def test_invalid_id_rejects_whole_batch(self, manager):
+        """Test that nothing is written when any record is invalid."""
+        ok, results = manager.batch_upsert('themes', [{'id': 'good'}, {'id': '../bad'}, {'name': 'no id'}])
+        assert not ok
+        assert [r['status'] for r in results] == ['ok', 'invalid', 'invalid']
+        assert manager.list_themes() == []
+
+    def test_batch_upsert_updates_query_index(self, manager):
+        """Test that batched records show up in queries."""
+        manager.query_projects(limit=10)
+        manager.batch_upsert('projects', [{'id': 'a', 'lastOpened': '2024-01-01'}, {'id': 'b', 'lastOpened': '2024-02-01'}])
+        assert [p['id'] for p in manager.query_projects(limit=10)['items']] == ['b', 'a']
+
+    def test_batch_layouts_replace_pending_saves(self, tmp_path):
+        """Test that a batch supersedes a layout save still in the write queue."""
+        manager = AppDataManager(base_dir=tmp_path / 'appdata', write_delay=60)
+        manager.save_layout({'id': 'l1', 'name': 'Old'})
+        manager.batch_upsert('layouts', [{'id': 'l1', 'name': 'New'}])
+        manager.flush()
+        assert manager.load_layout('l1')['name'] == 'New'
+        assert 'savedAt' in manager.load_layout('l1')
+        manager.close()
+
+
+class TestStorageInfo:
+    """Test incremental storage accounting."""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        """Create a manager whose background scan never repeats during a test."""
+        manager = AppDataManager(base_dir=tmp_path / 'appdata', write_delay=0, storage_scan_interval=3600)
+        yield manager
+        manager.close()
+
+    def test_counts_follow_saves_and_deletes(self, manager, monkeypatch):
+        """Test that counts come from running totals, not listings."""
+        monkeypatch.setattr(manager, 'list_projects', lambda: pytest.fail('listed projects'))
+        manager.save_project({'id': 'p1', 'name': 'One'})
+        manager.save_project({'id': 'p2', 'name': 'Two'})
+        manager.delete_project('p1')
+        info = manager.get_storage_info()
+        assert info['projects'] == 1
+        assert info['collections']['projects']['bytes'] == (manager.get_projects_dir() / 'p2.json').stat().st_size
+
+    def test_reconcile_counts_other_directories(self, manager):
+        """Test that logs and cache are included after a reconciliation scan."""
+        (manager.get_logs_dir() / 'big.log').write_bytes(b'x' * 5000)
+        manager.reconcile_storage()
+        info = manager.get_storage_info()
+        assert info['totalSize'] >= 5000
+        assert info['lastScan'] is not None
+
+        manager.save_theme({'id': 't1', 'name': 'Theme'})
+        assert manager.get_storage_info()['totalSize'] > info['totalSize']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
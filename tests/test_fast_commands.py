@@ -0,0 +1,176 @@
+"""
+Tests for In-Process Terminal Commands (fast_commands.py)
+=========================================================
+
+Tests that the in-process commands match the real programs and fall back
+for anything outside the supported subset.
+"""
+
+import os
+import shutil
+import subprocess
+import pytest
+import fast_commands
+from fast_commands import run_fast
+from terminal import CommandControl
+
+
+def _run(parts, cwd, **kwargs):
+    """Return (result, stdout, stderr) for a fast-path command."""
+    output = {'stdout': [], 'stderr': []}
+    result = run_fast(parts, lambda stream, text: output[stream].append(text), str(cwd), **kwargs)
+    return result, ''.join(output['stdout']), ''.join(output['stderr'])
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    """A directory with a few files of different shapes."""
+    (tmp_path / 'words.txt').write_text('alpha beta\ngamma\n\ndelta epsilon\n')
+    (tmp_path / 'numbers.txt').write_text(''.join(f'{i}\n' for i in range(1, 101)))
+    (tmp_path / 'partial.txt').write_text('no trailing newline')
+    (tmp_path / '.hidden').write_text('')
+    (tmp_path / 'Upper').write_text('')
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'inner.txt').write_text('x\n')
+    return tmp_path
+
+
+MATCHING_COMMANDS = [
+    ['ls'],
+    ['ls', '-a'],
+    ['ls', '-A'],
+    ['ls', '-1', 'sub', 'words.txt', 'missing'],
+    ['ls', 'sub', '.'],
+    ['cat', 'words.txt', 'partial.txt'],
+    ['cat', 'missing', 'words.txt'],
+    ['cat', 'sub'],
+    ['head', '-n', '3', 'numbers.txt'],
+    ['head', '-5', 'numbers.txt', 'words.txt'],
+    ['tail', 'numbers.txt'],
+    ['tail', '-n2', 'partial.txt'],
+    ['tail', '-n', '0', 'words.txt'],
+    ['wc', 'words.txt'],
+    ['wc', '-l', 'numbers.txt'],
+    ['wc', '-lc', 'numbers.txt'],
+    ['wc', 'words.txt', 'numbers.txt', 'partial.txt'],
+    ['echo', '-n', 'hello', 'world'],
+    ['echo', 'hello', '-n'],
+    ['echo', '-n', '-x', '-'],
+    ['pwd'],
+    ['date', '-u', '+%Y']
+]
+
+
+class TestMatchesRealPrograms:
+    """Test output and exit codes against the installed programs."""
+
+    @pytest.mark.parametrize('parts', MATCHING_COMMANDS, ids=' '.join)
+    def test_same_output(self, workspace, parts):
+        if not shutil.which(parts[0]):
+            pytest.skip(f'{parts[0]} is not installed')
+        expected = subprocess.run(
+            parts, cwd=workspace, capture_output=True, text=True, env=dict(os.environ, LC_ALL='C')
+        )
+        result, stdout, stderr = _run(parts, workspace)
+        assert result is not None
+        assert stdout == expected.stdout
+        assert result.exit_code == expected.returncode
+        assert bool(stderr) == bool(expected.stderr)
+
+    def test_tail_reads_large_file_from_the_end(self, tmp_path):
+        """Test tail on a file spanning many read blocks."""
+        path = tmp_path / 'big.log'
+        path.write_text(''.join(f'line {i}\n' for i in range(200000)))
+        result, stdout, _ = _run(['tail', '-n', '3', 'big.log'], tmp_path)
+        assert result.exit_code == 0
+        assert stdout == 'line 199997\nline 199998\nline 199999\n'
+
+    def test_wc_counts_words_across_read_blocks(self, tmp_path, monkeypatch):
+        """Test that a word split between two reads is counted once."""
+        monkeypatch.setattr(fast_commands, 'READ_CHUNK_SIZE', 4)
+        (tmp_path / 'f.txt').write_text('abcdefgh ij klmnop\n')
+        _, stdout, _ = _run(['wc', '-w', 'f.txt'], tmp_path)
+        assert stdout == '3 f.txt\n'
+
+
+class TestFallback:
+    """Test that unsupported commands are left to the real programs."""
+
+    @pytest.mark.parametrize('parts', [
+        ['grep', 'x', 'words.txt'],
+        ['ls', '-l'],
+        ['ls', '*.txt'],
+        ['cat'],
+        ['cat', '-n', 'words.txt'],
+        ['tail', '-f', 'words.txt'],
+        ['head', 'words.txt', '|', 'wc'],
+        ['echo', '$HOME'],
+        ['echo', '-e', 'a\\tb'],
+        ['echo', '-ne', 'x'],
+        ['echo', '-n', '-n', 'x'],
+        ['echo', '-nE', 'x'],
+        ['echo', '-En', 'x'],
+        ['pwd', '-P'],
+        ['date', '--iso-8601']
+    ], ids=' '.join)
+    def test_declined(self, workspace, parts):
+        result, stdout, stderr = _run(parts, workspace)
+        assert result is None
+        assert stdout == stderr == ''
+
+    @pytest.mark.parametrize('parts', [
+        ['head', '-n', '1', '/dev/zero'],
+        ['wc', '-l', '/dev/zero'],
+        ['cat', 'words.txt', '/dev/zero'],
+        ['tail', '/dev/zero']
+    ], ids=' '.join)
+    def test_devices_declined(self, workspace, parts):
+        """Test that endless devices go to the real program, which has a timeout."""
+        if not os.path.exists('/dev/zero'):
+            pytest.skip('no /dev/zero')
+        result, stdout, stderr = _run(parts, workspace)
+        assert result is None
+        assert stdout == stderr == ''
+
+    @pytest.mark.skipif(not hasattr(os, 'mkfifo'), reason='no FIFOs')
+    def test_fifo_declined(self, workspace):
+        """Test that a FIFO with no writer is not opened, which would block."""
+        os.mkfifo(workspace / 'pipe')
+        for program in ('cat', 'head', 'tail', 'wc'):
+            assert _run([program, 'pipe'], workspace)[0] is None
+
+    def test_disabled(self, workspace, monkeypatch):
+        """Test that TERMINAL_FAST_PATH=false sends everything to the real programs."""
+        monkeypatch.setattr(fast_commands, 'TERMINAL_FAST_PATH', False)
+        assert _run(['pwd'], workspace)[0] is None
+
+
+class TestLimits:
+    """Test the output cap and cancellation."""
+
+    def test_output_cap(self, tmp_path):
+        (tmp_path / 'big.txt').write_text('x' * 200000)
+        result, stdout, _ = _run(['cat', 'big.txt'], tmp_path, max_output=1000)
+        assert result.truncated
+        assert len(stdout) == 1000
+
+    def test_cancelled(self, workspace):
+        control = CommandControl()
+        control.cancel()
+        result, stdout, _ = _run(['cat', 'words.txt'], workspace, control=control)
+        assert result.cancelled
+        assert stdout == ''
+
+    def test_timeout(self, tmp_path):
+        (tmp_path / 'big.txt').write_text('x\n' * 200000)
+        result, stdout, _ = _run(['wc', '-l', 'big.txt'], tmp_path, timeout=0)
+        assert result.timed_out and not result.cancelled
+        assert stdout == ''
+
+    def test_head_reads_a_long_line_in_pieces(self, tmp_path):
+        (tmp_path / 'line.txt').write_text('é' * 100000 + '\nnext\n')
+        output = []
+        result = run_fast(['head', '-n', '1', 'line.txt'], lambda stream, text: output.append(text), str(tmp_path))
+        assert result.exit_code == 0
+        assert len(output) > 1
+        assert ''.join(output) == 'é' * 100000 + '\n'
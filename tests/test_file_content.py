@@ -0,0 +1,210 @@
+"""
+Tests for File Content (file_content.py)
+========================================
+
+Tests for byte-range and line-range reads, the line index, streamed writes
+with ETag checks, and path checks.
+"""
+
+import io
+import os
+import pytest
+from file_content import Conflict, FileContent, LineIndex, TooLarge, _utf8_boundary
+
+
+@pytest.fixture
+def files(tmp_path):
+    """Create a projects directory with a few text files."""
+    (tmp_path / 'app').mkdir()
+    (tmp_path / 'app' / 'log.txt').write_text(''.join(f'entry {n}\n' for n in range(1, 5001)))
+    (tmp_path / 'app' / 'short.txt').write_text('one\ntwo')
+    (tmp_path / 'app' / 'empty.txt').write_text('')
+    return FileContent(tmp_path)
+
+
+class TestByteReads:
+    """Test reading byte ranges."""
+
+    def test_first_chunk_and_next_offset(self, files):
+        result = files.read_bytes('app/log.txt', length=16)
+        assert result['text'] == 'entry 1\nentry 2\n'
+        assert result['nextOffset'] == 16 and result['size'] == os.path.getsize(files.root / 'app' / 'log.txt')
+        result = files.read_bytes('app/log.txt', offset=16, length=8)
+        assert result['text'] == 'entry 3\n'
+
+    def test_last_chunk(self, files):
+        result = files.read_bytes('app/short.txt', offset=4)
+        assert result['text'] == 'two' and result['nextOffset'] is None
+
+    def test_does_not_split_characters(self, tmp_path):
+        (tmp_path / 'u.txt').write_text('aé€😀z', encoding='utf-8')
+        files = FileContent(tmp_path)
+        texts, offset = [], 0
+        while offset is not None:
+            result = files.read_bytes('u.txt', offset=offset, length=4)
+            texts.append(result['text'])
+            offset = result['nextOffset']
+        assert ''.join(texts) == 'aé€😀z'
+
+    def test_empty_file(self, files):
+        result = files.read_bytes('app/empty.txt')
+        assert result['text'] == '' and result['nextOffset'] is None
+
+    def test_binary_flag(self, tmp_path):
+        (tmp_path / 'b.bin').write_bytes(b'\x00\x01\x02')
+        assert FileContent(tmp_path).read_bytes('b.bin')['binary']
+
+    @pytest.mark.parametrize('kwargs', [{'offset': -1}, {'length': 0}, {'offset': 10 ** 9}])
+    def test_invalid_ranges(self, files, kwargs):
+        with pytest.raises(ValueError):
+            files.read_bytes('app/short.txt', **kwargs)
+
+
+class TestLineReads:
+    """Test reading line ranges."""
+
+    def test_middle_of_file(self, files):
+        result = files.read_lines('app/log.txt', line=2500, count=3)
+        assert result['lines'] == ['entry 2500', 'entry 2501', 'entry 2502']
+        assert result['nextLine'] == 2503
+        # The whole file fits in one index block, so its length is known
+        assert result['totalLines'] == 5000
+
+    def test_total_unknown_until_the_index_reaches_the_end(self, tmp_path):
+        (tmp_path / 'big.txt').write_text('x' * 99 + '\n' * 2000)
+        files = FileContent(tmp_path)
+        files._line_index(files.root / 'big.txt', os.stat(tmp_path / 'big.txt')).block = 64
+        result = files.read_lines('big.txt', count=1)
+        assert result['lines'] == ['x' * 99] and result['totalLines'] is None
+        assert files.read_lines('big.txt', count=1, total=True)['totalLines'] == 2000
+
+    def test_end_of_file(self, files):
+        result = files.read_lines('app/log.txt', line=4999, count=10)
+        assert result['lines'] == ['entry 4999', 'entry 5000']
+        assert result['nextLine'] is None and result['totalLines'] == 5000
+
+    def test_last_line_without_newline(self, files):
+        result = files.read_lines('app/short.txt', total=True)
+        assert result['lines'] == ['one', 'two'] and result['totalLines'] == 2
+
+    def test_past_the_end(self, files):
+        result = files.read_lines('app/short.txt', line=3)
+        assert result['lines'] == [] and result['offset'] is None
+
+    def test_empty_file(self, files):
+        assert files.read_lines('app/empty.txt')['totalLines'] == 0
+
+    def test_long_lines_are_cut(self, tmp_path, monkeypatch):
+        import file_content
+        monkeypatch.setattr(file_content, 'FILE_LINE_MAX_BYTES', 4)
+        (tmp_path / 'wide.txt').write_text('abcdefgh\nxy\n')
+        result = FileContent(tmp_path).read_lines('wide.txt')
+        assert result['lines'] == ['abcd', 'xy'] and result['truncated'] == [1]
+
+    def test_index_is_reused_until_the_file_changes(self, files):
+        files.read_lines('app/log.txt', line=4000, count=1)
+        assert files.stats()['lineIndexes'] == 1
+        index = files._indexes[files.root / 'app' / 'log.txt'][2]
+        files.read_lines('app/log.txt', line=10, count=1)
+        assert files._indexes[files.root / 'app' / 'log.txt'][2] is index
+        files.write('app/log.txt', io.BytesIO(b'replaced\n'))
+        assert files.read_lines('app/log.txt')['lines'] == ['replaced']
+
+
+class TestLineIndex:
+    """Test line offsets across index blocks."""
+
+    def test_offsets_match_a_full_scan(self, tmp_path):
+        import mmap
+        data = b''.join(b'x' * (n % 37) + b'\n' for n in range(2000))
+        path = tmp_path / 'lines.txt'
+        path.write_bytes(data)
+        starts = [0] + [i + 1 for i, byte in enumerate(data) if byte == 10][:-1]
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            index = LineIndex(len(data), block=256)
+            for line in (1, 2, 7, 500, 1999, 2000, 1000, 3):
+                assert index.offset_of(mm, line) == starts[line - 1]
+            assert index.offset_of(mm, 2001) is None
+            assert index.total_lines(mm) == 2000
+
+    @pytest.mark.parametrize('text, cut', [('abc', 3), ('aé', 3), ('€', 3), ('😀', 4)])
+    def test_utf8_boundary_keeps_whole_characters(self, text, cut):
+        data = text.encode('utf-8')
+        assert _utf8_boundary(data) == cut
+        assert _utf8_boundary(data[:-1]) == cut - len(text[-1].encode('utf-8'))
+
+
+class TestWrites:
+    """Test streamed writes."""
+
+    def test_creates_and_replaces(self, files):
+        info = files.write('app/new.txt', io.BytesIO(b'hello'))
+        assert (files.root / 'app' / 'new.txt').read_bytes() == b'hello'
+        assert info['size'] == 5 and info['path'] == 'app/new.txt'
+        files.write('app/new.txt', io.BytesIO(b'bye'))
+        assert (files.root / 'app' / 'new.txt').read_bytes() == b'bye'
+        assert not [p for p in os.listdir(files.root / 'app') if p.endswith('.tmp')]
+
+    def test_if_match(self, files):
+        current = files.read_bytes('app/short.txt')['etag']
+        files.write('app/short.txt', io.BytesIO(b'v2'), if_match=current)
+        with pytest.raises(Conflict):
+            files.write('app/short.txt', io.BytesIO(b'v3'), if_match=current)
+        with pytest.raises(Conflict):
+            files.write('app/missing.txt', io.BytesIO(b'x'), if_match='*')
+        assert (files.root / 'app' / 'short.txt').read_bytes() == b'v2'
+        assert files.stats()['conflicts'] == 2
+
+    def test_failed_stream_leaves_file_alone(self, files):
+        class Broken(io.RawIOBase):
+            def read(self, size=-1):
+                raise OSError("connection reset")
+        with pytest.raises(OSError):
+            files.write('app/short.txt', Broken())
+        assert (files.root / 'app' / 'short.txt').read_text() == 'one\ntwo'
+        assert not [p for p in os.listdir(files.root / 'app') if p.endswith('.tmp')]
+
+    def test_keeps_permissions(self, files):
+        target = files.root / 'app' / 'short.txt'
+        os.chmod(target, 0o600)
+        files.write('app/short.txt', io.BytesIO(b'x'))
+        assert oct(os.stat(target).st_mode & 0o777) == oct(0o600)
+
+    def test_missing_directory(self, files):
+        with pytest.raises(FileNotFoundError):
+            files.write('nowhere/x.txt', io.BytesIO(b'x'))
+
+    def test_too_large(self, files, monkeypatch):
+        monkeypatch.setattr('file_content.FILE_WRITE_CHUNK', 4)
+        files.write('app/short.txt', io.BytesIO(b'x' * 10), max_bytes=10)
+        with pytest.raises(TooLarge):
+            files.write('app/short.txt', io.BytesIO(b'y' * 11), max_bytes=10)
+        assert (files.root / 'app' / 'short.txt').read_bytes() == b'x' * 10
+        assert not [p for p in os.listdir(files.root / 'app') if p.endswith('.tmp')]
+
+
+class TestPaths:
+    """Test path checks."""
+
+    @pytest.mark.parametrize('path', ['', '/', '..', '../outside.txt', 'app/../../x'])
+    def test_rejected(self, files, path):
+        with pytest.raises(ValueError):
+            files.read_bytes(path)
+
+    def test_directory(self, files):
+        with pytest.raises(IsADirectoryError):
+            files.read_lines('app')
+        with pytest.raises(IsADirectoryError):
+            files.write('app', io.BytesIO(b''))
+
+    def test_missing_file(self, files):
+        with pytest.raises(FileNotFoundError):
+            files.read_bytes('app/missing.txt')
+
+    @pytest.mark.skipif(not hasattr(os, 'mkfifo'), reason="needs named pipes")
+    def test_fifo_is_not_opened(self, files):
+        os.mkfifo(files.root / 'app' / 'pipe')
+        with pytest.raises(ValueError):
+            files.read_bytes('app/pipe')
+        with pytest.raises(ValueError):
+            files.read_lines('app/pipe')
@@ -0,0 +1,135 @@
+"""
+Tests for the File Tree (file_tree.py)
+======================================
+
+Tests for listing order, paging, ignore patterns, path checks and the
+listing cache.
+"""
+
+import os
+import pytest
+from file_tree import FileTree
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """Create a small project directory."""
+    (tmp_path / 'src').mkdir()
+    (tmp_path / 'src' / 'app.py').write_text('print(1)\n')
+    (tmp_path / 'Docs').mkdir()
+    (tmp_path / '.git').mkdir()
+    (tmp_path / 'node_modules').mkdir()
+    (tmp_path / 'README.md').write_text('# readme\n')
+    (tmp_path / 'b.txt').write_text('b')
+    (tmp_path / 'cache.pyc').write_bytes(b'\0')
+    return FileTree(tmp_path)
+
+
+class TestListing:
+    """Test what a listing contains."""
+
+    def test_one_level_folders_first(self, tree):
+        page = tree.list('')
+        assert [(e['name'], e['type']) for e in page['files']] == [
+            ('Docs', 'folder'), ('src', 'folder'), ('b.txt', 'file'), ('README.md', 'file')
+        ]
+        assert page['total'] == 4 and page['nextCursor'] is None
+        readme = page['files'][3]
+        assert readme['path'] == 'README.md' and readme['size'] == 9 and 'modified' in readme
+
+    def test_subdirectory(self, tree):
+        page = tree.list('src')
+        assert page['path'] == 'src'
+        assert page['files'] == [{'name': 'app.py', 'type': 'file', 'path': 'src/app.py',
+                                  'size': 9, 'modified': page['files'][0]['modified']}]
+
+    def test_custom_ignore(self, tmp_path):
+        (tmp_path / 'keep.py').write_text('')
+        (tmp_path / 'skip.log').write_text('')
+        assert [e['name'] for e in FileTree(tmp_path, ignore=['*.log']).list('')['files']] == ['keep.py']
+
+    @pytest.mark.parametrize('path', ['..', '../..', 'src/../../etc', '/../etc'])
+    def test_paths_outside_root(self, tree, path):
+        with pytest.raises(ValueError):
+            tree.list(path)
+
+    def test_symlink_out_of_root(self, tree, tmp_path_factory):
+        outside = tmp_path_factory.mktemp('outside')
+        os.symlink(outside, tree.root / 'link')
+        with pytest.raises(ValueError):
+            tree.list('link')
+
+    def test_missing_directory(self, tree):
+        with pytest.raises(FileNotFoundError):
+            tree.list('nope')
+        with pytest.raises(NotADirectoryError):
+            tree.list('README.md')
+
+
+class TestPaging:
+    """Test limit, offset and cursor paging."""
+
+    @pytest.fixture
+    def big(self, tmp_path):
+        for i in range(25):
+            (tmp_path / f'dir{i:02d}').mkdir()
+        for i in range(75):
+            (tmp_path / f'file{i:02d}.txt').write_text('')
+        return FileTree(tmp_path)
+
+    def test_cursor_walks_every_entry_once(self, big):
+        seen, cursor = [], None
+        while True:
+            page = big.list('', limit=10, cursor=cursor)
+            seen.extend(e['name'] for e in page['files'])
+            cursor = page['nextCursor']
+            if cursor is None:
+                break
+        assert seen == [f'dir{i:02d}' for i in range(25)] + [f'file{i:02d}.txt' for i in range(75)]
+
+    def test_cursor_survives_inserts(self, big):
+        page = big.list('', limit=30)
+        (big.root / 'file00a.txt').write_text('')
+        big.invalidate('')
+        following = big.list('', limit=2, cursor=page['nextCursor'])
+        assert [e['name'] for e in following['files']] == ['file05.txt', 'file06.txt']
+
+    def test_offset(self, big):
+        assert [e['name'] for e in big.list('', limit=2, offset=24)['files']] == ['dir24', 'file00.txt']
+
+    @pytest.mark.parametrize('kwargs', [{'limit': 0}, {'offset': -1}, {'cursor': 'not-a-cursor'}])
+    def test_bad_arguments(self, big, kwargs):
+        with pytest.raises(ValueError):
+            big.list('', **kwargs)
+
+
+class TestCache:
+    """Test the listing cache."""
+
+    def test_reused_until_directory_changes(self, tree):
+        tree.list('')
+        tree.list('')
+        assert tree.stats()['hits'] == 1 and tree.stats()['misses'] == 1
+
+        (tree.root / 'new.txt').write_text('')
+        os.utime(tree.root, ns=(0, os.stat(tree.root).st_mtime_ns + 10**9))
+        assert 'new.txt' in [e['name'] for e in tree.list('')['files']]
+        assert tree.stats()['misses'] == 2
+
+    def test_ttl(self, tree):
+        tree.ttl = 0
+        tree.list('')
+        tree.list('')
+        assert tree.stats()['hits'] == 0
+
+    def test_watcher_events_invalidate(self, tree):
+        tree.list('src')
+        tree.on_file_changes({'file_changed': {'changes': [{'path': 'src/new.py', 'change': 'created'}]}})
+        assert tree.stats()['listings'] == 0
+
+    def test_bounded_by_names(self, tree):
+        tree.max_names = 5
+        tree.list('')
+        tree.list('src')
+        tree.list('Docs')
+        assert tree.stats()['names'] <= 5
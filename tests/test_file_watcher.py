@@ -0,0 +1,111 @@
+"""
+Tests for the Filesystem Watcher (file_watcher.py)
+==================================================
+
+Tests for event classification, debouncing, cache invalidation and the
+watchdog-driven end-to-end path.
+"""
+
+import time
+import threading
+import pytest
+from appdata_manager import AppDataManager
+from file_watcher import FileWatcher
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """Create an AppDataManager rooted in a temporary directory."""
+    manager = AppDataManager(base_dir=tmp_path / 'appdata', write_delay=0)
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def watcher(manager, tmp_path):
+    """Create a watcher over temporary AppData and projects directories."""
+    projects_dir = tmp_path / 'projects'
+    projects_dir.mkdir()
+    watcher = FileWatcher(manager, projects_dir, debounce=0.05, max_delay=0.5)
+    yield watcher
+    watcher.stop()
+
+
+class TestClassification:
+    """Test how raw events become typed change events."""
+
+    def test_record_and_file_changes(self, watcher):
+        """Test that AppData records and project files map to their events."""
+        watcher.record(watcher.appdata_dir, watcher.appdata_dir / 'projects' / 'p1.json', 'modified')
+        watcher.record(watcher.appdata_dir, watcher.appdata_dir / 'settings' / 'settings.json', 'modified')
+        watcher.record(watcher.projects_dir, watcher.projects_dir / 'src' / 'main.py', 'created')
+        events = watcher.flush()
+        assert events['project_changed'] == {'collection': 'projects', 'changes': [{'id': 'p1', 'change': 'modified'}]}
+        assert events['settings_changed'] == {'change': 'modified'}
+        assert events['file_changed'] == {'changes': [{'path': 'src/main.py', 'change': 'created'}]}
+
+    def test_internal_files_are_ignored(self, watcher):
+        """Test that manifests, temp files, logs and ignored directories are skipped."""
+        appdata = watcher.appdata_dir
+        watcher.record(appdata, appdata / 'projects' / '_index.json', 'modified')
+        watcher.record(appdata, appdata / 'projects' / '.p1.json.1.2.tmp', 'created')
+        watcher.record(appdata, appdata / 'logs' / 'autopilot-ide.log', 'modified')
+        watcher.record(watcher.projects_dir, watcher.projects_dir / '.git' / 'index', 'modified')
+        assert watcher.flush() == {}
+
+    def test_burst_is_reported_once(self, watcher):
+        """Test that repeated changes to one file collapse into one entry."""
+        path = watcher.appdata_dir / 'layouts' / 'main.json'
+        watcher.record(watcher.appdata_dir, path, 'created')
+        for _ in range(50):
+            watcher.record(watcher.appdata_dir, path, 'modified')
+        assert watcher.flush()['layout_changed']['changes'] == [{'id': 'main', 'change': 'created'}]
+
+    def test_changed_collections_are_invalidated(self, watcher, manager, monkeypatch):
+        """Test that the manager cache is invalidated for each changed collection."""
+        invalidated = []
+        monkeypatch.setattr(manager, 'invalidate_cache', invalidated.append)
+        watcher.record(watcher.appdata_dir, watcher.appdata_dir / 'themes' / 'dark.json', 'deleted')
+        watcher.flush()
+        assert invalidated == ['themes']
+
+
+class TestWatching:
+    """Test the watcher against real filesystem events."""
+
+    def test_external_change_is_pushed(self, watcher, manager):
+        """Test that a file written behind the server's back reaches listeners."""
+        pytest.importorskip('watchdog')
+        received = []
+        done = threading.Event()
+        watcher.add_listener(lambda events: (received.append(events), done.set()))
+        manager.save_project({'id': 'p1', 'name': 'Before'})
+        assert manager.load_project('p1')['name'] == 'Before'
+        assert watcher.start()
+
+        (manager.get_projects_dir() / 'p1.json').write_text('{"id": "p1", "name": "After edit"}')
+        assert done.wait(5)
+        changes = [c for events in received for c in events.get('project_changed', {}).get('changes', [])]
+        assert {'id': 'p1', 'change': 'modified'} in changes
+        assert manager.list_projects()[0]['name'] == 'After edit'
+
+    def test_project_file_change_is_pushed(self, watcher):
+        """Test that edits under the projects directory emit file_changed."""
+        pytest.importorskip('watchdog')
+        received = []
+        watcher.add_listener(received.append)
+        assert watcher.start()
+
+        (watcher.projects_dir / 'notes.txt').write_text('hello')
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            paths = [c['path'] for events in received for c in events.get('file_changed', {}).get('changes', [])]
+            if 'notes.txt' in paths:
+                break
+            time.sleep(0.05)
+        else:
+            pytest.fail('file_changed was not emitted')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
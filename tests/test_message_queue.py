@@ -0,0 +1,276 @@
+"""
+Tests for the Message Queue (message_queue.py)
+==============================================
+
+Tests for the built-in broker, the Socket.IO manager on top of it, AppData
+change notifications, and two server processes sharing one queue.
+"""
+
+import os
+import sys
+import time
+import socket
+import threading
+import subprocess
+import http.client
+import pytest
+import socketio
+import message_queue
+from appdata_manager import AppDataManager
+from message_queue import MessageBroker, TCPManager, create_manager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+@pytest.fixture
+def broker():
+    """Run a broker on a free local port."""
+    broker = MessageBroker()
+    broker.start()
+    yield broker
+    broker.stop()
+
+
+def connect_raw(broker):
+    sock = socket.create_connection(('127.0.0.1', broker.port), timeout=5)
+    assert wait_until(lambda: broker.stats()['clients'] >= 1)
+    return sock
+
+
+def start_manager(url, channel='test'):
+    """Create a listening manager attached to its own Socket.IO server."""
+    manager = create_manager(url, channel)
+    socketio.Server(client_manager=manager, async_mode='threading')
+    manager.initialize()
+    return manager
+
+
+class TestBroker:
+    """Test the relay itself."""
+
+    def test_relays_to_every_client(self, broker):
+        """Test that a message reaches every connection, the sender included."""
+        first = connect_raw(broker)
+        second = socket.create_connection(('127.0.0.1', broker.port), timeout=5)
+        assert wait_until(lambda: broker.stats()['clients'] == 2)
+
+        message_queue._send_message(first, b'{"hello": 1}')
+        assert message_queue._recv_message(first) == b'{"hello": 1}'
+        assert message_queue._recv_message(second) == b'{"hello": 1}'
+        assert broker.stats()['relayed'] == 1
+        first.close()
+        second.close()
+
+    def test_oversized_message_drops_client(self, broker, monkeypatch):
+        """Test that a bogus length header disconnects that client only."""
+        monkeypatch.setattr(message_queue, 'MAX_MESSAGE_SIZE', 16)
+        sock = connect_raw(broker)
+        sock.sendall(message_queue._HEADER.pack(1024))
+        assert wait_until(lambda: broker.stats()['clients'] == 0)
+        sock.close()
+
+
+class TestManager:
+    """Test Socket.IO emits and invalidations over the broker."""
+
+    def test_create_manager_picks_backend(self, broker):
+        assert isinstance(create_manager(broker.url), TCPManager)
+
+    def test_emit_reaches_other_worker(self, broker):
+        """Test that an emit on one server is handled by the other's manager."""
+        sender = start_manager(broker.url)
+        receiver = start_manager(broker.url)
+        assert wait_until(lambda: broker.stats()['clients'] == 2)
+
+        received = []
+        original = receiver._handle_emit
+        receiver._handle_emit = lambda message: (received.append(message), original(message))
+        sender.server.emit('file_changed', {'path': 'a.py'}, to='room-1')
+
+        assert wait_until(lambda: received)
+        assert received[0]['event'] == 'file_changed'
+        assert received[0]['data'] == [{'path': 'a.py'}]
+        assert received[0]['room'] == 'room-1'
+
+    def test_invalidation_round_trip(self, broker):
+        """Test that invalidations reach other workers but not the sender."""
+        sender = start_manager(broker.url)
+        receiver = start_manager(broker.url)
+        assert wait_until(lambda: broker.stats()['clients'] == 2)
+        heard_by_sender, heard_by_receiver = [], []
+        sender.add_invalidation_listener(heard_by_sender.append)
+        receiver.add_invalidation_listener(heard_by_receiver.append)
+
+        sender.publish_invalidation('projects')
+
+        assert wait_until(lambda: heard_by_receiver == ['projects'])
+        assert heard_by_sender == []
+        assert sender.stats()['invalidationsSent'] == 1
+        assert receiver.stats()['invalidationsReceived'] == 1
+
+    def test_channels_are_separate(self, broker):
+        sender = start_manager(broker.url, channel='one')
+        receiver = start_manager(broker.url, channel='two')
+        assert wait_until(lambda: broker.stats()['clients'] == 2)
+        heard = []
+        receiver.add_invalidation_listener(heard.append)
+
+        sender.publish_invalidation('projects')
+        assert wait_until(lambda: broker.stats()['relayed'] == 1)
+        time.sleep(0.1)
+        assert heard == []
+
+    def test_publish_gives_up_while_broker_is_down(self, monkeypatch):
+        """Test that emits are dropped after bounded retries, without holding the lock."""
+        monkeypatch.setattr(message_queue, 'RECONNECT_DELAY', 0.05)
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            url = f"tcp://127.0.0.1:{probe.getsockname()[1]}"
+        manager = create_manager(url, 'test')
+        locked_while_waiting = []
+        original_sleep = time.sleep
+        monkeypatch.setattr(message_queue.time, 'sleep', lambda seconds: (
+            locked_while_waiting.append(manager._publish_lock.locked()), original_sleep(seconds)))
+
+        started = time.monotonic()
+        manager.publish_invalidation('projects')
+        assert time.monotonic() - started < 2
+        assert len(locked_while_waiting) == message_queue.PUBLISH_ATTEMPTS - 1
+        assert not any(locked_while_waiting)
+        assert manager.stats()['messagesDropped'] == 1
+
+    def test_publish_reconnects_after_broker_restart(self, broker):
+        """Test that a dropped connection is replaced on the next emit."""
+        sender = create_manager(broker.url, 'test')
+        sender.publish_invalidation('projects')
+        assert wait_until(lambda: broker.stats()['relayed'] == 1)
+        sender._publisher.close()
+        sender.publish_invalidation('themes')
+        assert wait_until(lambda: broker.stats()['relayed'] == 2)
+        assert sender.stats()['messagesDropped'] == 0
+
+
+class TestChangeListeners:
+    """Test the AppData change notifications that feed the queue."""
+
+    def test_writes_notify(self, tmp_path):
+        manager = AppDataManager(base_dir=tmp_path / 'appdata', write_delay=0)
+        changes = []
+        manager.add_change_listener(changes.append)
+        try:
+            manager.save_project({'id': 'p1', 'name': 'One'})
+            manager.delete_project('p1')
+            manager.save_settings({'theme': 'dark'})
+            assert wait_until(lambda: 'settings' in changes)
+            assert changes[:2] == ['projects', 'projects']
+        finally:
+            manager.close()
+
+    def test_failing_listener_does_not_break_writes(self, tmp_path):
+        manager = AppDataManager(base_dir=tmp_path / 'appdata', write_delay=0)
+        manager.add_change_listener(lambda collection: 1 / 0)
+        try:
+            manager.save_project({'id': 'p1', 'name': 'One'})
+            assert manager.load_project('p1')['name'] == 'One'
+        finally:
+            manager.close()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+@pytest.fixture
+def workers(tmp_path, broker):
+    """Run two single-worker servers that share the broker."""
+    env = dict(
+        os.environ, HOME=str(tmp_path), SECRET_KEY='test', WATCH_ENABLED='false',
+        PROJECTS_DIR=str(tmp_path / 'projects'), UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+        SOCKETIO_MESSAGE_QUEUE=broker.url, APPDATA_CACHE_REVALIDATE='3600', TERMINAL_SESSIONS='false'
+    )
+    ports = [free_port(), free_port()]
+    processes = [
+        subprocess.Popen(
+            [sys.executable, 'server.py', '--async-mode', 'threading', '--workers', '1',
+             '--bind', f'127.0.0.1:{port}'],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        for port in ports
+    ]
+    try:
+        for port in ports:
+            def ready(port=port):
+                try:
+                    return request(port, 'GET', '/api/settings')[0] == 200
+                except OSError:
+                    return False
+            assert wait_until(ready, timeout=30), f"server on port {port} did not start"
+        assert wait_until(lambda: broker.stats()['clients'] >= 2)
+        yield ports
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=60)
+
+
+class TestMultipleWorkers:
+    """Test two server processes behind one message queue."""
+
+    def test_appdata_writes_are_seen_by_the_other_worker(self, workers):
+        first, second = workers
+        assert request(first, 'POST', '/api/projects', b'{"id": "p1", "name": "Before"}')[0] in (200, 201)
+        assert b'Before' in request(second, 'GET', '/api/projects/p1')[1]
+
+        request(first, 'PUT', '/api/projects/p1', b'{"id": "p1", "name": "After"}')
+        assert wait_until(lambda: b'After' in request(second, 'GET', '/api/projects/p1')[1])
+
+    def test_terminal_output_reaches_client_on_other_worker(self, workers):
+        """Test that a re-attached terminal on the other worker gets the output."""
+        first, second = workers
+        client_id = 'multi-worker-client-1'
+        runner = socketio.Client()
+        viewer = socketio.Client()
+        output = []
+        viewer.on('terminal_output', lambda data: output.append(data.get('stdout', '')))
+        try:
+            runner.connect(f'http://127.0.0.1:{first}', transports=['polling'])
+            viewer.connect(f'http://127.0.0.1:{second}', transports=['polling'])
+            assert runner.call('terminal_attach', {'clientId': client_id})['status'] == 'attached'
+            assert viewer.call('terminal_attach', {'clientId': client_id})['status'] == 'attached'
+
+            runner.emit('terminal_execute', {'command': 'echo from-the-first-worker', 'id': 'c1'})
+            assert wait_until(lambda: 'from-the-first-worker' in ''.join(output), timeout=10)
+        finally:
+            runner.disconnect()
+            viewer.disconnect()
+
+    def test_polling_session_is_bound_to_one_worker(self, workers):
+        """Test why long-polling needs sticky sessions: the other worker rejects the sid."""
+        first, second = workers
+        status, body = request(first, 'GET', '/socket.io/?EIO=4&transport=polling')
+        assert status == 200
+        sid = body.split(b'"sid":"')[1].split(b'"')[0].decode()
+
+        path = f'/socket.io/?EIO=4&transport=polling&sid={sid}'
+        assert request(second, 'POST', path, b'40')[0] == 400
+        assert request(first, 'POST', path, b'40')[0] == 200
@@ -0,0 +1,186 @@
+"""
+Tests for Path Index (path_index.py)
+====================================
+
+Tests for fuzzy path lookups, ranking, the candidate budget, bitset helpers
+and keeping the index current from file watcher events.
+"""
+
+import random
+import pytest
+from path_index import PathIndex, _bitset, _set_bits, score
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Create a projects directory with a few files."""
+    files = [
+        'web/src/components/UserController.tsx',
+        'web/src/components/user_list.tsx',
+        'web/src/utils/string.ts',
+        'api/handlers/user_controller.py',
+        'api/handlers/session.py',
+        'api/models/user.py',
+        'api/README.md',
+        'setup.py',
+    ]
+    for name in files:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('')
+    (tmp_path / 'api' / '__pycache__').mkdir()
+    (tmp_path / 'api' / '__pycache__' / 'user.cpython-311.pyc').write_text('')
+    return tmp_path
+
+
+@pytest.fixture
+def index(project):
+    """Build an index over the projects directory."""
+    index = PathIndex(project)
+    index.build()
+    return index
+
+
+def found(result):
+    return [item['path'] for item in result['results']]
+
+
+class TestBitsets:
+    """Test the bitset helpers."""
+
+    def test_round_trip(self):
+        rng = random.Random(3)
+        flags = [rng.random() < 0.2 for _ in range(1003)]
+        value = int.from_bytes(_bitset(flags), 'little')
+        assert list(_set_bits(value)) == [i for i, flag in enumerate(flags) if flag]
+
+    def test_empty(self):
+        assert _bitset([]) == bytearray()
+        assert list(_set_bits(0)) == []
+
+
+class TestFind:
+    """Test fuzzy lookups and ranking."""
+
+    def test_subsequence_ignoring_case(self, index):
+        assert set(found(index.find('usrctl'))) == {
+            'web/src/components/UserController.tsx', 'api/handlers/user_controller.py'
+        }
+
+    def test_basename_matches_rank_first(self, index):
+        assert found(index.find('user')) == [
+            'api/models/user.py', 'api/handlers/user_controller.py',
+            'web/src/components/user_list.tsx', 'web/src/components/UserController.tsx'
+        ]
+        # 'string.ts' only matches across its directories
+        assert found(index.find('ctl'))[-2:] == ['web/src/utils/string.ts', 'web/src/components/user_list.tsx']
+
+    def test_ties_prefer_shorter_paths(self, index):
+        assert found(index.find('uc')) == ['api/handlers/user_controller.py', 'web/src/components/UserController.tsx']
+
+    def test_path_queries(self, index):
+        assert found(index.find('api/models')) == ['api/models/user.py']
+        assert found(index.find('handlers session')) == ['api/handlers/session.py']
+
+    def test_positions(self, index):
+        result = index.find('setup')['results'][0]
+        assert result == {'path': 'setup.py', 'name': 'setup.py', 'score': result['score'], 'positions': [0, 1, 2, 3, 4]}
+        best = index.find('usr.py')['results'][0]
+        assert ''.join(best['path'][p] for p in best['positions']).lower() == 'usr.py'
+
+    def test_no_match_and_ignored_files(self, index):
+        assert found(index.find('zzz')) == []
+        assert found(index.find('cpython')) == []
+
+    def test_project_and_limit(self, index):
+        assert found(index.find('user', project='web')) == [
+            'web/src/components/user_list.tsx', 'web/src/components/UserController.tsx'
+        ]
+        assert found(index.find('user', project='missing')) == []
+        assert len(index.find('s', limit=2)['results']) == 2
+
+    def test_characters_outside_the_alphabet(self, index, project):
+        (project / 'web' / 'café menu.txt').write_text('')
+        index.update(['web/café menu.txt'])
+        assert found(index.find('cafémenu')) == ['web/café menu.txt']
+
+    def test_candidate_budget(self, project):
+        index = PathIndex(project, candidates=2)
+        index.build()
+        result = index.find('s')
+        assert result['examined'] == 2 and result['truncated']
+        assert index.stats()['truncated'] == 1
+
+    @pytest.mark.parametrize('query', ['', '   ', 'x' * 300, None])
+    def test_invalid_queries(self, index, query):
+        with pytest.raises(ValueError):
+            index.find(query)
+
+    def test_without_possessive_quantifiers(self, index, monkeypatch):
+        expected = index.find('usrctl')['results']
+        monkeypatch.setattr('path_index._SKIP', '*')
+        assert index.find('usrctl')['results'] == expected
+
+    def test_score(self):
+        assert score('user.py', [0, 1]) > score('user.py', [0, 2])
+        assert score('a_user.py', [2], 0) > score('abuser.py', [2], 0)
+        assert score('aUser.py', [1], 0) > score('auser.py', [1], 0)
+
+
+class TestUpdates:
+    """Test keeping the index current."""
+
+    def event(self, *changes):
+        return {'file_changed': {'changes': [{'path': path, 'change': change} for path, change in changes]}}
+
+    def test_created_and_deleted_files(self, index, project):
+        (project / 'api' / 'billing.py').write_text('')
+        index.on_file_changes(self.event(('api/billing.py', 'created')))
+        assert found(index.find('billing')) == ['api/billing.py']
+        (project / 'api' / 'billing.py').unlink()
+        index.on_file_changes(self.event(('api/billing.py', 'deleted')))
+        assert found(index.find('billing')) == []
+
+    def test_modified_files_are_skipped(self, index):
+        index.on_file_changes(self.event(('api/missing.py', 'modified')))
+        assert index.stats()['files'] == 8
+
+    def test_new_and_removed_directories(self, index, project):
+        (project / 'lib' / 'deep').mkdir(parents=True)
+        (project / 'lib' / 'deep' / 'a.py').write_text('')
+        (project / 'lib' / 'b.py').write_text('')
+        index.on_file_changes(self.event(('lib', 'created')))
+        assert sorted(found(index.find('lib'))) == ['lib/b.py', 'lib/deep/a.py']
+        for path in ('lib/deep/a.py', 'lib/b.py'):
+            (project / path).unlink()
+        (project / 'lib' / 'deep').rmdir()
+        (project / 'lib').rmdir()
+        index.on_file_changes(self.event(('lib', 'deleted')))
+        assert found(index.find('lib')) == [] and index.stats()['files'] == 8
+
+    def test_changes_during_build_are_applied(self, project):
+        index = PathIndex(project)
+        (project / 'late.py').write_text('')
+        index.on_file_changes(self.event(('late.py', 'created')))
+        index.build()
+        assert found(index.find('late')) == ['late.py']
+
+    def test_compaction_keeps_results(self, project):
+        index = PathIndex(project)
+        index.build()
+        (project / 'bulk').mkdir()
+        names = [f'bulk/file_{n}.txt' for n in range(1200)]
+        for name in names:
+            (project / name).write_text('')
+        index.update(['bulk'])
+        for name in names:
+            (project / name).unlink()
+        index.update(names)
+        assert len(index._paths) == 8
+        assert found(index.find('usrctl'))
+        assert index.stats()['files'] == 8
+
+    def test_stats(self, index):
+        index.find('user')
+        stats = index.stats()
+        assert stats['ready'] and stats['files'] == 8 and stats['projects'] == 2 and stats['queries'] == 1
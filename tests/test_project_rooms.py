@@ -0,0 +1,55 @@
+"""
+Tests for Project Rooms (project_rooms.py)
+==========================================
+
+Tests for room membership and fan-out counters.
+"""
+
+from project_rooms import ProjectRooms, room_name
+
+
+def test_room_name():
+    assert room_name('p1') == 'project:p1'
+
+
+def test_membership():
+    rooms = ProjectRooms()
+    assert rooms.join('sid-1', 'p1') and rooms.join('sid-2', 'p1') and rooms.join('sid-1', 'p2')
+    assert rooms.subscribers('p1') == 2
+    assert rooms.projects('sid-1') == ['p1', 'p2']
+
+    assert rooms.leave('sid-2', 'p1')
+    assert not rooms.leave('sid-2', 'p1')
+    assert rooms.leave_all('sid-1') == ['p1', 'p2']
+    assert rooms.subscribers('p1') == 0
+    assert rooms.stats()['rooms'] == 0 and rooms.stats()['connections'] == 0
+
+
+def test_join_limit():
+    rooms = ProjectRooms(max_per_client=2)
+    assert rooms.join('sid', 'p1') and rooms.join('sid', 'p2')
+    assert not rooms.join('sid', 'p3')
+    assert rooms.join('sid', 'p1')  # already following
+
+
+def test_fan_out_counters():
+    rooms = ProjectRooms()
+    rooms.join('sid-1', 'p1')
+    rooms.join('sid-2', 'p1')
+
+    assert rooms.record('p1')
+    assert rooms.record('p1')
+    assert not rooms.record('p2')
+
+    stats = rooms.stats()
+    assert stats['perRoom']['p1'] == {'events': 2, 'deliveries': 4, 'subscribers': 2}
+    assert stats['eventsSent'] == 2 and stats['deliveries'] == 4 and stats['eventsSkipped'] == 1
+
+
+def test_counters_go_with_the_room():
+    rooms = ProjectRooms()
+    rooms.join('sid', 'p1')
+    rooms.record('p1')
+    rooms.leave('sid', 'p1')
+    assert rooms.stats()['perRoom'] == {}
+    assert rooms.stats()['eventsSent'] == 1
@@ -0,0 +1,136 @@
+"""
+Tests for the Response Cache (response_cache.py)
+================================================
+
+Tests for keys, LRU and TTL eviction, and the disk spill.
+"""
+
+import os
+import time
+import response_cache
+from response_cache import FileHasher, ResponseCache, normalize_message
+
+
+def test_normalize_message():
+    assert normalize_message('  explain\n\tthis   function ') == 'explain this function'
+
+
+class TestKeys:
+    """Test what a cache key depends on."""
+
+    def test_whitespace_does_not_matter(self):
+        cache = ResponseCache()
+        assert cache.key('Explain', 'what does  this do') == cache.key('Explain', 'what does this do\n')
+        assert cache.key('Explain', 'what does this do') != cache.key('Debug', 'what does this do')
+
+    def test_file_contents_matter(self, tmp_path):
+        source = tmp_path / 'main.py'
+        source.write_text('print(1)\n')
+        cache = ResponseCache()
+        before = cache.key('Explain', 'explain', [source])
+        assert cache.key('Explain', 'explain', [source]) == before
+
+        source.write_text('print(2)\n')
+        os.utime(source, ns=(time.time_ns(), time.time_ns() + 10**9))
+        assert cache.key('Explain', 'explain', [source]) != before
+
+    def test_hasher_rereads_only_changed_files(self, tmp_path, monkeypatch):
+        source = tmp_path / 'main.py'
+        source.write_text('x = 1\n')
+        hasher = FileHasher()
+        first = hasher.digest(source)
+        opened = []
+        real_open = open
+        monkeypatch.setattr('builtins.open', lambda *args, **kwargs: opened.append(args) or real_open(*args, **kwargs))
+        assert hasher.digest(source) == first
+        assert opened == []
+        assert hasher.digest(tmp_path / 'missing.py') is None
+
+
+class TestEviction:
+    """Test the memory bounds and expiry."""
+
+    def test_lru_order(self):
+        cache = ResponseCache(max_entries=2)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        assert cache.get('a') == 'A'
+        cache.put('c', 'C')
+        assert cache.get('b') is None
+        assert cache.get('a') == 'A' and cache.get('c') == 'C'
+        assert cache.stats()['evictions'] == 1
+
+    def test_byte_bound(self):
+        cache = ResponseCache(max_bytes=10)
+        cache.put('a', 'x' * 6)
+        cache.put('b', 'y' * 6)
+        assert cache.get('a') is None
+        assert cache.stats()['bytes'] == 6
+        cache.put('huge', 'z' * 11)
+        assert cache.get('huge') is None
+
+    def test_ttl(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(response_cache.time, 'time', lambda: now[0])
+        cache = ResponseCache(ttl=60)
+        cache.put('a', 'A')
+        now[0] += 59
+        assert cache.get('a') == 'A'
+        now[0] += 2
+        assert cache.get('a') is None
+        assert cache.stats()['expirations'] == 1
+
+    def test_stats(self):
+        cache = ResponseCache()
+        assert cache.stats()['hitRatio'] is None
+        cache.put('a', 'héllo')
+        cache.get('a')
+        cache.get('missing')
+        stats = cache.stats()
+        assert stats['hits'] == 1 and stats['misses'] == 1 and stats['hitRatio'] == 0.5
+        assert stats['entries'] == 1 and stats['bytes'] == len('héllo'.encode('utf-8'))
+
+
+class TestSpill:
+    """Test the disk spill of evicted replies."""
+
+    def test_evicted_replies_come_back_from_disk(self, tmp_path):
+        cache = ResponseCache(max_entries=1, spill_dir=tmp_path)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        assert (tmp_path / 'a.json').exists()
+        assert cache.stats()['spilledEntries'] == 1
+
+        assert cache.get('a') == 'A'
+        assert cache.stats()['diskHits'] == 1
+        assert not (tmp_path / 'a.json').exists()
+        assert (tmp_path / 'b.json').exists()
+
+    def test_spill_survives_restart(self, tmp_path):
+        cache = ResponseCache(max_entries=1, spill_dir=tmp_path)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        assert ResponseCache(spill_dir=tmp_path).get('a') == 'A'
+
+    def test_spill_is_trimmed(self, tmp_path):
+        cache = ResponseCache(max_entries=1, spill_dir=tmp_path, spill_max_bytes=100)
+        for n in range(10):
+            cache.put(f'k{n}', 'v' * 40)
+        assert cache.stats()['spilledBytes'] <= 100
+        assert len(list(tmp_path.iterdir())) == cache.stats()['spilledEntries']
+        assert cache.get('k0') is None
+
+    def test_missing_spill_file_is_a_miss(self, tmp_path):
+        cache = ResponseCache(max_entries=1, spill_dir=tmp_path)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        (tmp_path / 'a.json').unlink()
+        assert cache.get('a') is None
+
+    def test_clear(self, tmp_path):
+        cache = ResponseCache(max_entries=1, spill_dir=tmp_path)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        cache.clear()
+        assert cache.get('a') is None and cache.get('b') is None
+        assert list(tmp_path.iterdir()) == []
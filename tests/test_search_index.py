@@ -0,0 +1,214 @@
+"""
+Tests for the Search Index (search_index.py)
+============================================
+
+Tests for literal and regex queries, trigram filtering, incremental updates
+from file watcher events and saving/loading the index.
+"""
+
+import os
+import time
+import pytest
+from search_index import SearchIndex, _literal_runs, sre_parse
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Create a small projects directory."""
+    root = tmp_path / 'projects'
+    (root / 'app' / 'src').mkdir(parents=True)
+    (root / 'app' / 'src' / 'main.py').write_text('def load_config():\n    return {}\n\n# TODO: cache\n')
+    (root / 'app' / 'README.md').write_text('Call load_config() first.\nThen run it.\n')
+    (root / 'app' / 'logo.png').write_bytes(b'\x89PNG\0load_config')
+    (root / 'app' / 'node_modules').mkdir()
+    (root / 'app' / 'node_modules' / 'dep.js').write_text('load_config')
+    (root / 'other').mkdir()
+    (root / 'other' / 'notes.txt').write_text('LOAD_CONFIG in capitals\n')
+    return root
+
+
+@pytest.fixture
+def index(project, tmp_path):
+    index = SearchIndex(project, tmp_path / 'cache' / 'search-index.bin')
+    index.build()
+    return index
+
+
+def search(index, query, **kwargs):
+    candidates, matches = index.search(query, **kwargs)
+    return candidates, [(m['path'], m['line'], m['column'], m['text']) for m in matches]
+
+
+class TestQueries:
+    """Test what searches find."""
+
+    def test_literal_ignores_case_by_default(self, index):
+        _, matches = search(index, 'load_config')
+        assert matches == [
+            ('app/README.md', 1, 6, 'Call load_config() first.'),
+            ('app/src/main.py', 1, 5, 'def load_config():'),
+            ('other/notes.txt', 1, 1, 'LOAD_CONFIG in capitals'),
+        ]
+
+    def test_case_sensitive(self, index):
+        _, matches = search(index, 'LOAD_CONFIG', case_sensitive=True)
+        assert [m[0] for m in matches] == ['other/notes.txt']
+
+    def test_regex(self, index):
+        _, matches = search(index, r'^def \w+\(', regex=True)
+        assert matches == [('app/src/main.py', 1, 1, 'def load_config():')]
+
+    def test_regex_alternation_scans_every_file(self, index):
+        candidates, matches = search(index, 'TODO|Then', regex=True)
+        assert candidates == 3
+        assert [(m[0], m[1]) for m in matches] == [('app/README.md', 2), ('app/src/main.py', 4)]
+
+    def test_trigrams_rule_out_files(self, index):
+        candidates, matches = search(index, 'capitals')
+        assert candidates == 1 and len(matches) == 1
+        assert search(index, 'no such text') == (0, [])
+
+    def test_binary_and_ignored_files_are_skipped(self, index):
+        _, matches = search(index, 'load_config')
+        assert not any(path.endswith(('logo.png', 'dep.js')) for path, *_ in matches)
+
+    def test_one_match_per_line(self, index, project):
+        (project / 'other' / 'repeat.txt').write_text('ab ab ab\nab\n')
+        index.on_file_changes({'file_changed': {'changes': [{'path': 'other/repeat.txt', 'change': 'created'}]}})
+        index._apply_pending()
+        _, matches = search(index, 'ab')
+        assert [(m[1], m[2]) for m in matches] == [(1, 1), (2, 1)]
+
+    def test_path_narrows_search(self, index):
+        _, matches = search(index, 'load_config', path='other')
+        assert [m[0] for m in matches] == ['other/notes.txt']
+
+    @pytest.mark.parametrize('query, kwargs', [
+        ('', {}), ('x' * 300, {}), ('(unclosed', {'regex': True}),
+    ])
+    def test_invalid_queries(self, index, query, kwargs):
+        with pytest.raises(ValueError):
+            index.search(query, **kwargs)
+
+    def test_time_budget(self, index):
+        _, matches = index.search('load_config', time_budget=0)
+        assert list(matches) == [] and matches.timed_out
+        _, matches = index.search('load_config')
+        assert len(list(matches)) == 3 and not matches.timed_out
+
+    def test_path_outside_root(self, index):
+        with pytest.raises(ValueError):
+            index.search('x', path='../..')
+
+
+class TestLiteralRuns:
+    """Test which literals a regex is known to contain."""
+
+    @pytest.mark.parametrize('pattern, runs', [
+        (r'foo\.bar', ['foo.bar']),
+        (r'foo.*bar', ['foo', 'bar']),
+        (r'^class (Base)+Handler', ['class ', 'Base', 'Handler']),
+        (r'(?:abc)?def', ['def']),
+        (r'[ab]cd|efg', []),
+    ])
+    def test_runs(self, pattern, runs):
+        assert _literal_runs(sre_parse.parse(pattern), False) == runs
+
+    def test_non_ascii_breaks_runs_when_ignoring_case(self):
+        assert _literal_runs(sre_parse.parse('caféine'), True) == ['caf', 'ine']
+
+
+class TestUpdates:
+    """Test that file changes reach the index."""
+
+    def notify(self, index, path, change):
+        """Queue a change and apply it as the background thread would."""
+        index.on_file_changes({'file_changed': {'changes': [{'path': path, 'change': change}]}})
+        index._apply_pending()
+
+    def test_modified_file(self, index, project):
+        (project / 'other' / 'notes.txt').write_text('renamed_setting here\n')
+        self.notify(index, 'other/notes.txt', 'modified')
+        assert search(index, 'renamed_setting')[1] == [('other/notes.txt', 1, 1, 'renamed_setting here')]
+        assert [m[0] for m in search(index, 'load_config')[1]] == ['app/README.md', 'app/src/main.py']
+        assert index.stats()['deadDocuments'] == 1
+
+    def test_deleted_directory(self, index, project):
+        (project / 'app' / 'src' / 'main.py').unlink()
+        (project / 'app' / 'src').rmdir()
+        self.notify(index, 'app/src', 'deleted')
+        assert [m[0] for m in search(index, 'load_config')[1]] == ['app/README.md', 'other/notes.txt']
+
+    def test_created_directory(self, index, project):
+        (project / 'new' / 'pkg').mkdir(parents=True)
+        (project / 'new' / 'pkg' / 'mod.py').write_text('load_config()\n')
+        self.notify(index, 'new', 'created')
+        assert 'new/pkg/mod.py' in [m[0] for m in search(index, 'load_config')[1]]
+
+    def test_search_does_not_wait_for_updates(self, index, project):
+        """Test that a search serves the current index while an update holds the lock."""
+        (project / 'other' / 'queued.txt').write_text('queued_change\n')
+        index.on_file_changes({'file_changed': {'changes': [{'path': 'other/queued.txt', 'change': 'created'}]}})
+        with index._update_lock:
+            assert search(index, 'queued_change') == (0, [])
+            assert len(search(index, 'load_config')[1]) == 3
+        assert index.stats()['pending'] == 1
+
+    def test_compaction_keeps_results(self, project, tmp_path):
+        index = SearchIndex(project)
+        index.build()
+        for n in range(1200):
+            (project / 'other' / 'notes.txt').write_text(f'version {n} of load_config\n')
+            os.utime(project / 'other' / 'notes.txt', ns=(n, n))
+            self.notify(index, 'other/notes.txt', 'modified')
+        stats = index.stats()
+        assert stats['deadDocuments'] < 1000 and stats['files'] == 3
+        assert search(index, 'version 1199')[1] == [('other/notes.txt', 1, 1, 'version 1199 of load_config')]
+
+
+class TestPersistence:
+    """Test saving and loading the index."""
+
+    def test_reload_picks_up_offline_changes(self, index, project, tmp_path):
+        assert index.index_path.exists()
+        (project / 'other' / 'notes.txt').unlink()
+        (project / 'other' / 'fresh.txt').write_text('load_config again\n')
+
+        reloaded = SearchIndex(project, index.index_path)
+        assert reloaded.load()
+        reloaded.build()
+        assert [m[0] for m in search(reloaded, 'load_config')[1]] == [
+            'app/README.md', 'app/src/main.py', 'other/fresh.txt'
+        ]
+        assert reloaded.stats()['updates'] == 1
+
+    def test_unreadable_index_is_rebuilt(self, project, tmp_path):
+        path = tmp_path / 'broken.bin'
+        path.write_bytes(b'not an index')
+        index = SearchIndex(project, path)
+        assert not index.load()
+        index.build()
+        assert len(search(index, 'load_config')[1]) == 3
+
+    def test_index_of_another_root_is_ignored(self, index, tmp_path):
+        other = tmp_path / 'elsewhere'
+        other.mkdir()
+        assert not SearchIndex(other, index.index_path).load()
+
+    def test_background_updates(self, project, tmp_path):
+        index = SearchIndex(project, tmp_path / 'index.bin', save_interval=0.01)
+        index.start()
+        try:
+            for _ in range(200):
+                if index.ready:
+                    break
+                time.sleep(0.01)
+            assert index.ready
+            (project / 'other' / 'late.txt').write_text('arrived_later\n')
+            index.on_file_changes({'file_changed': {'changes': [{'path': 'other/late.txt', 'change': 'created'}]}})
+        finally:
+            index.stop()
+        assert index.stats()['pending'] == 0
+        reloaded = SearchIndex(project, tmp_path / 'index.bin')
+        assert reloaded.load()
+        assert search(reloaded, 'arrived_later')[0] == 1
@@ -0,0 +1,53 @@
+"""
+Tests for JSON Serialization (serialization.py)
+===============================================
+
+Tests for encoding, decoding and the pretty/compact disk formats.
+"""
+
+import json
+import pytest
+import serialization
+from storage_backends import atomic_write_json
+
+
+class TestSerialization:
+    """Test the serialization helpers."""
+
+    def test_round_trip(self):
+        """Test that encoded data decodes to the same value."""
+        data = {'id': 'p1', 'name': 'Projekt ü', 'tags': [1, 2.5, None, True]}
+        encoded = serialization.dumps(data)
+        assert isinstance(encoded, bytes)
+        assert serialization.loads(encoded) == data
+        assert serialization.loads(encoded.decode('utf-8')) == data
+
+    def test_compact_by_default(self):
+        """Test that compact output has no whitespace and pretty output is indented."""
+        assert serialization.dumps({'a': [1, 2]}) == b'{"a":[1,2]}'
+        assert serialization.dumps({'a': 1}, pretty=True) == b'{\n  "a": 1\n}'
+
+    def test_falls_back_for_values_orjson_rejects(self):
+        """Test that non-string keys and huge integers still serialize."""
+        data = {1: 2 ** 70}
+        assert json.loads(serialization.dumps(data)) == {'1': 2 ** 70}
+
+    @pytest.mark.parametrize('value', [2 ** 64, 2 ** 70, -2 ** 63 - 1, 10 ** 30, 2 ** 64 - 1, -2 ** 63])
+    def test_integers_beyond_64_bits_round_trip(self, value):
+        """Test that huge integers written by the fallback load back exactly."""
+        data = {'id': 'x', 'size': value, 'tags': ['1234567890123456789012']}
+        assert serialization.loads(serialization.dumps(data)) == data
+        assert serialization.loads(serialization.dumps(data).decode('utf-8')) == data
+
+    def test_atomic_write_pretty_mode(self, tmp_path):
+        """Test that files are compact unless pretty output is requested."""
+        path = tmp_path / 'record.json'
+        atomic_write_json(path, {'id': 'x'})
+        assert path.read_bytes() == b'{"id":"x"}'
+        atomic_write_json(path, {'id': 'x'}, pretty=True)
+        assert b'\n' in path.read_bytes()
+        assert serialization.load_file(path) == {'id': 'x'}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,57 @@
+"""
+Tests for the Production Server Entry Point (server.py)
+=======================================================
+
+Tests for async mode selection and gunicorn settings.
+"""
+
+import os
+import importlib.util
+import pytest
+import server
+
+
+class TestAsyncMode:
+    """Test async mode selection."""
+
+    def test_threading_is_always_available(self):
+        assert server.resolve_async_mode('threading') == 'threading'
+
+    def test_eventlet_falls_back_when_missing(self, monkeypatch):
+        """Test that a host without eventlet still starts, in threading mode."""
+        monkeypatch.setattr(importlib.util, 'find_spec', lambda name: None)
+        assert server.resolve_async_mode('eventlet') == 'threading'
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            server.resolve_async_mode('gevent')
+
+
+class TestGunicornOptions:
+    """Test the gunicorn settings built for each mode."""
+
+    def test_eventlet_workers(self):
+        options = server.gunicorn_options('0.0.0.0:8000', 2, 'eventlet', graceful_timeout=30)
+        assert options['worker_class'] == 'eventlet'
+        assert options['bind'] == '0.0.0.0:8000' and options['workers'] == 2
+        assert options['graceful_timeout'] > 30
+        assert options['worker_exit'] is server._worker_exit
+
+    def test_threading_uses_threaded_workers(self):
+        options = server.gunicorn_options('127.0.0.1:9000', 1, 'threading', threads=50)
+        assert options['worker_class'] == 'gthread' and options['threads'] == 50
+
+
+class TestLocalBroker:
+    """Test the broker started for several workers."""
+
+    def test_points_workers_at_broker(self, monkeypatch):
+        monkeypatch.setattr(server.ProductionConfig, 'MESSAGE_QUEUE', None)
+        monkeypatch.setenv('SOCKETIO_MESSAGE_QUEUE', '')
+        broker = server.start_local_broker()
+        try:
+            assert broker.url.startswith('tcp://127.0.0.1:')
+            assert server.ProductionConfig.MESSAGE_QUEUE == broker.url
+            assert os.environ['SOCKETIO_MESSAGE_QUEUE'] == broker.url
+        finally:
+            broker.stop()
@@ -0,0 +1,116 @@
+"""
+Tests for Storage Backends (storage_backends.py)
+================================================
+
+Tests that the JSON-file and SQLite backends behave the same, and for
+migrating AppData between them.
+"""
+
+import pytest
+from appdata_manager import AppDataManager
+from storage_backends import JSONFileBackend, SQLiteBackend, migrate, main
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def backend(request, tmp_path):
+    """Create each storage backend in a temporary directory."""
+    if request.param == 'json':
+        backend = JSONFileBackend(tmp_path)
+    else:
+        backend = SQLiteBackend(tmp_path / 'appdata.db')
+    yield backend
+    backend.close()
+
+
+class TestBackendContract:
+    """Test the behaviour shared by all backends."""
+
+    def test_put_get_delete(self, backend):
+        """Test the basic record lifecycle."""
+        backend.put('themes', 'dark', {'id': 'dark', 'name': 'Dark'})
+        assert backend.get('themes', 'dark') == {'id': 'dark', 'name': 'Dark'}
+        assert backend.delete('themes', 'dark')
+        assert not backend.delete('themes', 'dark')
+        with pytest.raises(FileNotFoundError):
+            backend.get('themes', 'dark')
+
+    def test_list_is_sorted_by_sort_key(self, backend):
+        """Test that projects are listed by lastOpened, newest first."""
+        backend.put('projects', 'a', {'id': 'a', 'lastOpened': '2024-01-01'})
+        backend.put('projects', 'b', {'id': 'b', 'lastOpened': '2024-03-01'})
+        backend.put('projects', 'c', {'id': 'c'})
+        assert [p['id'] for p in backend.list('projects')] == ['b', 'a', 'c']
+
+    def test_summaries_only_hold_summary_fields(self, backend):
+        """Test that summaries drop non-summary fields."""
+        backend.put('layouts', 'l1', {'id': 'l1', 'name': 'Main', 'savedAt': 'x', 'panels': [1, 2]})
+        assert backend.summaries('layouts') == [{'id': 'l1', 'name': 'Main', 'savedAt': 'x'}]
+
+    def test_version_changes_on_write(self, backend):
+        """Test that the collection version moves on every write."""
+        before = backend.version('extensions')
+        backend.put('extensions', 'e1', {'id': 'e1'})
+        assert backend.version('extensions') != before
+
+    def test_put_many(self, backend):
+        """Test bulk writes."""
+        records = [(f'p{i}', {'id': f'p{i}', 'lastOpened': f'2024-01-{i + 10}'}) for i in range(5)]
+        assert backend.put_many('projects', records) == 5
+        assert [p['id'] for p in backend.summaries('projects')] == ['p4', 'p3', 'p2', 'p1', 'p0']
+
+    def test_put_many_last_duplicate_wins(self, backend):
+        """Test that a repeated id in one batch keeps its last value."""
+        backend.put_many('themes', [('a', {'id': 'a', 'v': 1}), ('a', {'id': 'a', 'v': 2})])
+        assert backend.get('themes', 'a') == {'id': 'a', 'v': 2}
+        assert backend.usage('themes')[0] == 1
+
+    def test_get_many_skips_missing(self, backend):
+        """Test bulk reads return only the records that exist."""
+        backend.put('themes', 'a', {'id': 'a'})
+        backend.put('themes', 'b', {'id': 'b'})
+        assert backend.get_many('themes', ['a', 'missing', 'b']) == {'a': {'id': 'a'}, 'b': {'id': 'b'}}
+
+    def test_usage_is_tracked_incrementally(self, backend):
+        """Test record counts and byte totals across put, replace and delete."""
+        backend.put('themes', 'a', {'id': 'a', 'name': 'A'})
+        backend.put('themes', 'b', {'id': 'b', 'name': 'B'})
+        count, size = backend.usage('themes')
+        assert count == 2 and size > 0
+
+        backend.put('themes', 'a', {'id': 'a', 'name': 'A' * 100})
+        assert backend.usage('themes')[1] > size
+
+        backend.delete('themes', 'a')
+        backend.delete('themes', 'b')
+        assert backend.usage('themes') == (0, 0)
+
+
+class TestMigration:
+    """Test copying AppData between backends."""
+
+    def test_migrate_json_to_sqlite(self, tmp_path):
+        """Test that every record survives a JSON to SQLite migration."""
+        source = JSONFileBackend(tmp_path)
+        source.put('projects', 'p1', {'id': 'p1', 'name': 'One'})
+        source.put('themes', 't1', {'id': 't1', 'name': 'Theme'})
+        target = SQLiteBackend(tmp_path / 'appdata.db')
+
+        counts = migrate(source, target)
+
+        assert counts['projects'] == 1 and counts['themes'] == 1
+        assert target.get('projects', 'p1') == {'id': 'p1', 'name': 'One'}
+        target.close()
+
+    def test_migrate_command(self, tmp_path, capsys):
+        """Test the one-shot migration command line."""
+        AppDataManager(base_dir=tmp_path).save_project({'id': 'p1', 'name': 'One'})
+
+        main(['migrate', 'json', 'sqlite', '--base-dir', str(tmp_path)])
+
+        manager = AppDataManager(base_dir=tmp_path, backend='sqlite')
+        assert manager.load_project('p1')['name'] == 'One'
+        assert 'projects: 1 records' in capsys.readouterr().out
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,283 @@
+"""
+Tests for Symbol Index (symbol_index.py)
+========================================
+
+Tests for symbol extraction, outlines, workspace lookups, the content-hash
+cache and incremental re-indexing.
+"""
+
+import os
+import time
+import pytest
+from symbol_index import SymbolIndex, extract_symbols
+
+SOURCE = '''\
+import os
+import os.path as osp
+from . import sibling
+from ..pkg.mod import thing as other
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+
+class Service(Base):
+    """Doc"""
+
+    class Config:
+        debug = True
+
+    def start(self):
+        def helper():
+            import sys
+            return sys
+
+        return helper
+
+    async def stop(self):
+        pass
+
+
+def main():
+    return Service()
+'''
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Create a projects directory with a few Python files."""
+    root = tmp_path / 'projects'
+    (root / 'app' / 'pkg').mkdir(parents=True)
+    (root / 'app' / 'service.py').write_text(SOURCE)
+    (root / 'app' / 'pkg' / 'util.py').write_text('def main():\n    pass\n\n\nclass Helper:\n    pass\n')
+    (root / 'app' / 'notes.txt').write_text('def not_python(): pass\n')
+    (root / 'app' / '__pycache__').mkdir()
+    (root / 'app' / '__pycache__' / 'cached.py').write_text('def ignored(): pass\n')
+    return root
+
+
+@pytest.fixture
+def index(project, tmp_path):
+    """Build an index that parses in-process and caches under tmp_path."""
+    index = SymbolIndex(project, tmp_path / 'cache', workers=0)
+    index.build()
+    return index
+
+
+def names(symbols):
+    return [(s['name'], s['kind']) for s in symbols]
+
+
+class TestExtraction:
+    """Test the symbols extracted from source."""
+
+    def test_top_level(self):
+        result = extract_symbols(SOURCE)
+        assert result['error'] is None
+        assert names(result['symbols']) == [
+            ('os', 'import'), ('osp', 'import'), ('sibling', 'import'), ('other', 'import'),
+            ('json', 'import'), ('json', 'import'), ('Service', 'class'), ('main', 'function')
+        ]
+
+    def test_imports(self):
+        imports = [s for s in extract_symbols(SOURCE)['symbols'] if s['kind'] == 'import']
+        assert imports[1]['module'] == 'os.path'
+        assert imports[2]['module'] == '.' and imports[2]['imported'] == 'sibling'
+        assert imports[3]['module'] == '..pkg.mod' and imports[3]['imported'] == 'thing'
+
+    def test_nesting_and_locations(self):
+        service = extract_symbols(SOURCE)['symbols'][6]
+        assert (service['line'], service['column'], service['endLine']) == (12, 1, 26)
+        assert names(service['children']) == [('Config', 'class'), ('start', 'method'), ('stop', 'method')]
+        start = service['children'][1]
+        # Nested functions are listed, imports inside functions are not
+        assert names(start['children']) == [('helper', 'function')]
+        assert start['children'][0]['qualname'] == 'Service.start.helper'
+        assert start['column'] == 5
+
+    def test_syntax_error(self):
+        result = extract_symbols('def broken(:\n')
+        assert result['symbols'] == [] and 'line 1' in result['error']
+
+    def test_null_bytes(self):
+        assert extract_symbols(b'x = 1\0')['error']
+
+
+class TestQueries:
+    """Test outlines and workspace lookups."""
+
+    def test_outline(self, index):
+        outline = index.outline('app/service.py')
+        assert outline['path'] == 'app/service.py' and outline['error'] is None
+        assert names(outline['symbols'])[-2:] == [('Service', 'class'), ('main', 'function')]
+
+    def test_outline_indexes_unknown_files(self, project, tmp_path):
+        index = SymbolIndex(project, tmp_path / 'cache', workers=0)
+        assert names(index.outline('app/pkg/util.py')['symbols']) == [('main', 'function'), ('Helper', 'class')]
+
+    def test_outline_does_not_wait_for_indexing(self, project, index):
+        (project / 'app' / 'pkg' / 'util.py').write_text('def changed():\n    pass\n')
+        with index._update_lock:
+            outline = index.outline('app/pkg/util.py')
+        assert names(outline['symbols']) == [('changed', 'function')]
+        assert index._pending == {'app/pkg/util.py'}
+
+    @pytest.mark.parametrize('path', ['', '../x.py', 'app/notes.txt'])
+    def test_outline_rejects(self, index, path):
+        with pytest.raises(ValueError):
+            index.outline(path)
+
+    def test_outline_missing(self, index):
+        with pytest.raises(FileNotFoundError):
+            index.outline('app/missing.py')
+
+    def test_exact_lookup(self, index):
+        found = index.lookup('main')
+        assert sorted(d['path'] for d in found) == ['app/pkg/util.py', 'app/service.py']
+        assert all(d['kind'] == 'function' and d['line'] for d in found)
+
+    def test_lookup_includes_methods_with_qualname(self, index):
+        found = index.lookup('stop', kind='method')
+        assert [(d['qualname'], d['path'], d['line']) for d in found] == [('Service.stop', 'app/service.py', 25)]
+        assert index.lookup('stop', kind='function') == []
+
+    def test_prefix_and_substring(self, index):
+        assert [d['name'] for d in index.lookup('he', match='prefix')] == ['Helper', 'helper']
+        assert {d['name'] for d in index.lookup('ELP', match='substring')} == {'helper', 'Helper'}
+
+    def test_lookup_limit_and_ignored_files(self, index):
+        assert len(index.lookup('main', limit=1)) == 1
+        assert index.lookup('ignored') == [] and index.lookup('not_python') == []
+
+    @pytest.mark.parametrize('kwargs', [{'name': ''}, {'name': 'x', 'match': 'fuzzy'}, {'name': 'x', 'kind': 'import'}])
+    def test_invalid_lookup(self, index, kwargs):
+        with pytest.raises(ValueError):
+            index.lookup(**kwargs)
+
+
+class TestIncremental:
+    """Test the content-hash cache and re-indexing of changed files."""
+
+    def test_unchanged_files_are_not_parsed_again(self, index):
+        assert index.reindex(['app']) == 0
+        assert index.stats()['parsed'] == 2
+
+    def test_changed_file(self, project, index):
+        (project / 'app' / 'pkg' / 'util.py').write_text('def renamed():\n    pass\n')
+        assert index.reindex(['app/pkg/util.py']) == 1
+        assert index.lookup('renamed')[0]['path'] == 'app/pkg/util.py'
+        assert [d['path'] for d in index.lookup('main')] == ['app/service.py']
+        assert index.lookup('Helper') == []
+
+    def test_touched_file_with_same_content_uses_the_cache(self, project, index):
+        target = project / 'app' / 'service.py'
+        os.utime(target, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+        assert index.reindex(['app/service.py']) == 0
+        assert index.stats()['cacheHits'] == 1
+
+    def test_copies_share_one_parse(self, project, tmp_path):
+        (project / 'app' / 'copy.py').write_text(SOURCE)
+        index = SymbolIndex(project, tmp_path / 'cache', workers=0)
+        index.build()
+        assert index.stats()['parsed'] == 2 and index.stats()['files'] == 3
+        assert len(index.lookup('Service')) == 2
+
+    def test_deleted_file_and_directory(self, project, index):
+        (project / 'app' / 'service.py').unlink()
+        index.reindex(['app/service.py'])
+        assert index.lookup('Service') == []
+        (project / 'app' / 'pkg' / 'util.py').unlink()
+        (project / 'app' / 'pkg').rmdir()
+        index.reindex(['app/pkg'])
+        assert index.stats()['files'] == 0 and index.stats()['names'] == 0
+
+    def test_new_directory(self, project, index):
+        (project / 'lib').mkdir()
+        (project / 'lib' / 'extra.py').write_text('class Extra: pass\n')
+        index.reindex(['lib'])
+        assert index.lookup('Extra')[0]['path'] == 'lib/extra.py'
+
+    def test_restart_reuses_manifest_and_cache(self, project, tmp_path, index):
+        restarted = SymbolIndex(project, tmp_path / 'cache', workers=0)
+        restarted.build()
+        assert restarted.stats()['parsed'] == 0 and restarted.stats()['files'] == 2
+        assert len(restarted.lookup('main')) == 2
+
+    def test_stale_cache_entries_are_collected(self, project, tmp_path, index):
+        (project / 'app' / 'pkg' / 'util.py').write_text('x = 1\n')
+        index.reindex(['app/pkg/util.py'])
+        cache = tmp_path / 'cache' / 'v1'
+        assert len([p for p in os.listdir(cache) if p != 'manifest.json']) == 3
+        SymbolIndex(project, tmp_path / 'cache', workers=0).build()
+        assert len([p for p in os.listdir(cache) if p != 'manifest.json']) == 2
+
+    def test_large_files_are_skipped(self, project, tmp_path):
+        index = SymbolIndex(project, tmp_path / 'cache', workers=0, max_file_size=100)
+        index.build()
+        assert index.stats()['files'] == 1
+
+    def test_without_cache_dir(self, project):
+        index = SymbolIndex(project, workers=0)
+        index.build()
+        assert len(index.lookup('main')) == 2
+
+
+class TestBackground:
+    """Test the process pool and the background thread."""
+
+    def test_process_pool(self, project, tmp_path):
+        for n in range(40):
+            (project / 'app' / f'gen_{n}.py').write_text(f'def generated_{n}():\n    pass\n')
+        index = SymbolIndex(project, tmp_path / 'cache', workers=2)
+        try:
+            index.build()
+            assert index.stats()['parsed'] == 42
+            assert index.lookup('generated_39')[0]['path'] == 'app/gen_39.py'
+            assert index._pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+        finally:
+            index.stop()
+
+    def test_dead_worker_is_replaced(self, project, tmp_path):
+        """Test that a killed worker neither fails the build nor leaves the index unready."""
+        for n in range(40):
+            (project / 'app' / f'gen_{n}.py').write_text(f'def generated_{n}():\n    pass\n')
+        index = SymbolIndex(project, tmp_path / 'cache', workers=2)
+        try:
+            index.reindex(['app/gen_0.py', 'app/gen_1.py'])
+            broken = index._pool
+            for process in list(broken._processes.values()):
+                process.kill()
+                process.join()
+            index.build()
+            assert index.ready and index._pool is not broken
+            assert index.stats()['files'] == 42
+            assert index.lookup('generated_39')[0]['path'] == 'app/gen_39.py'
+        finally:
+            index.stop()
+
+    def test_sources_are_parsed_in_chunks(self, project, tmp_path, monkeypatch):
+        import symbol_index
+        monkeypatch.setattr(symbol_index, 'SYMBOLS_CHUNK_BYTES', 100)
+        for n in range(10):
+            (project / 'app' / f'gen_{n}.py').write_text(f'def generated_{n}():\n    pass\n' * 3)
+        index = SymbolIndex(project, tmp_path / 'cache', workers=0)
+        index.build()
+        assert index.stats()['parsed'] == 12 and index.stats()['files'] == 12
+        assert index.lookup('generated_9')[0]['path'] == 'app/gen_9.py'
+
+    def test_watcher_events(self, project, tmp_path):
+        index = SymbolIndex(project, tmp_path / 'cache', workers=0)
+        index.start()
+        try:
+            deadline = time.time() + 10
+            while not index.ready and time.time() < deadline:
+                time.sleep(0.01)
+            (project / 'app' / 'late.py').write_text('def late(): pass\n')
+            index.on_file_changes({'file_changed': {'changes': [{'path': 'app/late.py', 'change': 'created'}]}})
+            while not index.lookup('late') and time.time() < deadline:
+                time.sleep(0.01)
+            assert index.lookup('late')[0]['path'] == 'app/late.py'
+        finally:
+            index.stop()
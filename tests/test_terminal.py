@@ -0,0 +1,388 @@
+"""
+Tests for the Terminal Command Runner (terminal.py)
+===================================================
+
+Tests for streaming output, timeouts and error handling.
+"""
+
+import os
+import sys
+import time
+import threading
+import pytest
+from terminal import (
+    CommandControl, CommandScheduler, Scrollback, SessionManager, ShellSession, command_timeout, run_streaming,
+    sessions_supported, TERMINAL_TIMEOUT
+)
+
+
+SLOW_PRODUCER = '''
+import time
+print("first", flush=True)
+time.sleep(1.5)
+print("done")
+'''
+
+
+def _process_gone(pid, wait=2.0):
+    """Return True once ``pid`` has exited (zombies count as exited)."""
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        if os.path.isdir('/proc'):
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    if f.read().rsplit(')', 1)[1].split()[0] in ('Z', 'X'):
+                        return True
+            except FileNotFoundError:
+                return True
+        else:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def slow_script(tmp_path):
+    """Write a script that prints, pauses, then prints again."""
+    path = tmp_path / 'slow.py'
+    path.write_text(SLOW_PRODUCER)
+    return path
+
+
+class TestRunStreaming:
+    """Test run_streaming."""
+
+    def test_output_arrives_before_exit(self, slow_script):
+        """Test that the first chunk is delivered long before the process ends."""
+        arrivals = []
+        start = time.monotonic()
+        exit_code, timed_out, _, _ = run_streaming(
+            [sys.executable, str(slow_script)],
+            lambda stream, text: arrivals.append((time.monotonic() - start, stream, text))
+        )
+        finished = time.monotonic() - start
+
+        assert exit_code == 0 and not timed_out
+        assert arrivals[0][1] == 'stdout' and arrivals[0][2].startswith('first')
+        assert finished - arrivals[0][0] > 1.0
+        assert ''.join(text for _, _, text in arrivals) == 'first\ndone\n'
+
+    def test_timeout_kills_process(self, slow_script):
+        """Test that a command over its limit is killed and reported."""
+        start = time.monotonic()
+        exit_code, timed_out, _, _ = run_streaming(
+            [sys.executable, str(slow_script)], lambda *_: None, timeout=0.3
+        )
+        assert timed_out and exit_code != 0
+        assert time.monotonic() - start < 1.4
+
+    def test_stderr_is_separate(self, tmp_path):
+        """Test that stderr is reported on its own stream."""
+        script = tmp_path / 'err.py'
+        script.write_text('import sys\nsys.stderr.write("oops")\nsys.exit(3)\n')
+        chunks = []
+        exit_code = run_streaming([sys.executable, str(script)], lambda *chunk: chunks.append(chunk)).exit_code
+        assert exit_code == 3
+        assert chunks == [('stderr', 'oops')]
+
+    def test_cancel_kills_process_group(self, tmp_path):
+        """Test that cancelling stops the command and the processes it started."""
+        script = tmp_path / 'spawner.py'
+        script.write_text(
+            'import subprocess, sys, time\n'
+            'child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])\n'
+            'print(child.pid, flush=True)\n'
+            'time.sleep(30)\n'
+        )
+        control = CommandControl()
+        output = []
+
+        def on_output(stream, text):
+            output.append(text)
+            control.cancel()
+
+        start = time.monotonic()
+        result = run_streaming([sys.executable, str(script)], on_output, control=control)
+        assert result.cancelled and not result.timed_out
+        assert time.monotonic() - start < 5
+        child_pid = int(''.join(output).split()[0])
+        assert _process_gone(child_pid)
+
+    def test_output_cap_stops_command(self, tmp_path):
+        """Test that a command producing endless output is cut off at the limit."""
+        script = tmp_path / 'flood.py'
+        script.write_text('while True:\n    print("x" * 99)\n')
+        output = []
+        result = run_streaming([sys.executable, str(script)], lambda stream, text: output.append(text),
+                               max_output=10000)
+        assert result.truncated and not result.timed_out
+        assert 0 < len(''.join(output)) <= 10000
+
+    def test_missing_program(self):
+        """Test that an unknown program raises FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            run_streaming(['definitely-not-a-real-program'], lambda *_: None)
+
+
+class TestTimeouts:
+    """Test per-command timeouts."""
+
+    def test_long_running_tools_get_longer_limits(self):
+        """Test that installs get more time than the default."""
+        assert command_timeout(['npm', 'install']) > TERMINAL_TIMEOUT
+        assert command_timeout(['ls']) == TERMINAL_TIMEOUT
+
+
+
+@pytest.fixture
+def session(tmp_path):
+    """Start a shell session in a temporary directory."""
+    if not sessions_supported():
+        pytest.skip('PTY sessions are not supported here')
+    session = ShellSession(tmp_path).start()
+    yield session
+    session.close()
+
+
+def _run(session, line, timeout=5):
+    """Run a line and return (output, exit code, timed out)."""
+    output = []
+    result = session.run(line, output.append, timeout)
+    return ''.join(output), result.exit_code, result.timed_out
+
+
+class TestShellSession:
+    """Test persistent PTY shell sessions."""
+
+    def test_cwd_persists_between_commands(self, session, tmp_path):
+        """Test that cd and pushd affect later commands."""
+        (tmp_path / 'sub').mkdir()
+        assert _run(session, 'cd sub')[1:] == (0, False)
+        assert _run(session, 'pwd')[0] == f'{tmp_path / "sub"}\n'
+        assert session.cwd == str(tmp_path / 'sub')
+        _run(session, 'pushd /')
+        _run(session, 'popd')
+        assert session.cwd == str(tmp_path / 'sub')
+
+    def test_exit_code_and_output(self, session):
+        """Test that exit codes are reported and output is not echoed or mangled."""
+        output, exit_code, _ = _run(session, 'ls /definitely/missing')
+        assert exit_code != 0
+        assert 'ls /definitely/missing' not in output.splitlines()
+        assert '\r' not in output
+
+    def test_one_process_for_many_commands(self, session):
+        """Test that the same shell runs every command."""
+        pid = session.process.pid
+        for _ in range(5):
+            _run(session, 'echo hi')
+        assert session.process.pid == pid and session.alive
+
+    def test_timeout_interrupts_command(self, session):
+        """Test that a command over its limit is stopped and the shell survives."""
+        start = time.monotonic()
+        _, _, timed_out = _run(session, 'sleep 30', timeout=0.3)
+        assert timed_out and time.monotonic() - start < 5
+        assert _run(session, 'echo still here')[0] == 'still here\n'
+
+    def test_cancel_and_output_cap(self, session):
+        """Test that a cancelled or flooding command stops and the shell survives."""
+        control = CommandControl()
+        threading.Timer(0.2, control.cancel).start()
+        result = session.run('sleep 30', lambda text: None, timeout=10, control=control)
+        assert result.cancelled and not result.timed_out
+
+        output = []
+        result = session.run('yes', output.append, timeout=10, max_output=5000)
+        assert result.truncated and len(''.join(output)) <= 5000
+        assert _run(session, 'echo ok')[0] == 'ok\n'
+
+    def test_control_characters_are_plain_input(self, session):
+        """Test that the PTY does not treat ^U or ^C in a line as editing or signal keys."""
+        output, exit_code, _ = _run(session, "printf '%s|' a\x15echo b\x03c")
+        assert exit_code == 0
+        assert output == 'a\x15echo|b\x03c|'
+
+    def test_concurrent_command_is_rejected(self, session):
+        """Test that a busy session refuses a second command."""
+        worker = threading.Thread(target=_run, args=(session, 'sleep 0.5'))
+        worker.start()
+        time.sleep(0.1)
+        with pytest.raises(RuntimeError):
+            session.run('pwd', lambda text: None)
+        worker.join()
+
+
+class TestSessionManager:
+    """Test session lookup, teardown and idle reaping."""
+
+    def test_sessions_are_per_client_and_reaped(self, tmp_path):
+        """Test one session per client and that idle sessions are closed."""
+        if not sessions_supported():
+            pytest.skip('PTY sessions are not supported here')
+        manager = SessionManager(cwd=tmp_path, idle_timeout=3600)
+        try:
+            first = manager.get('client-a')
+            assert manager.get('client-a') is first
+            assert manager.get('client-b') is not first
+            assert manager.close('client-b')
+            assert manager.stats()['active'] == 1
+
+            manager.idle_timeout = 0
+            time.sleep(0.01)
+            assert manager.reap_idle() == 1
+            assert not first.alive
+        finally:
+            manager.close_all()
+
+    def test_cwd_for_does_not_start_a_shell(self, tmp_path):
+        """Test that cwd_for follows cd without starting sessions."""
+        if not sessions_supported():
+            pytest.skip('PTY sessions are not supported here')
+        manager = SessionManager(cwd=tmp_path, idle_timeout=3600)
+        try:
+            assert manager.cwd_for('client-a') == str(tmp_path)
+            assert manager.stats()['active'] == 0
+            (tmp_path / 'sub').mkdir()
+            manager.get('client-a').run('cd sub', lambda text: None)
+            assert manager.cwd_for('client-a') == str(tmp_path / 'sub')
+        finally:
+            manager.close_all()
+
+
+
+class _ManualSpawn:
+    """Collects started jobs so a test decides when each one finishes."""
+
+    def __init__(self):
+        self.started = []
+
+    def __call__(self, run):
+        self.started.append(run)
+
+    def finish_next(self):
+        self.started.pop(0)()
+
+
+class TestCommandScheduler:
+    """Test the bounded, fair command executor."""
+
+    def _scheduler(self, **kwargs):
+        spawn = _ManualSpawn()
+        order = []
+        positions = {}
+        scheduler = CommandScheduler(
+            spawn=spawn, on_position=lambda client, job, pos: positions.__setitem__(job, pos), **kwargs
+        )
+        submit = lambda client, job: scheduler.submit(client, job, lambda: order.append(job))  # noqa: E731
+        return scheduler, spawn, order, positions, submit
+
+    def test_global_limit(self):
+        """Test that no more than max_concurrent jobs start."""
+        scheduler, spawn, _, _, submit = self._scheduler(max_concurrent=2, max_per_client=5)
+        assert [submit('a', f'a{i}') for i in range(4)] == [0, 0, 1, 2]
+        assert len(spawn.started) == 2
+        assert scheduler.stats()['running'] == 2 and scheduler.stats()['queued'] == 2
+
+    def test_round_robin_across_clients(self):
+        """Test that a flooding client cannot starve a late one."""
+        scheduler, spawn, order, _, submit = self._scheduler(max_concurrent=1, max_per_client=1)
+        for i in range(4):
+            submit('flood', f'f{i}')
+        submit('late', 'l0')
+        while spawn.started:
+            spawn.finish_next()
+        assert order == ['f0', 'f1', 'l0', 'f2', 'f3']
+        assert scheduler.stats()['completed'] == 5
+
+    def test_per_client_limit(self):
+        """Test that one client's extra jobs wait while other clients run."""
+        scheduler, spawn, _, _, submit = self._scheduler(max_concurrent=4, max_per_client=1)
+        submit('a', 'a0')
+        submit('a', 'a1')
+        submit('b', 'b0')
+        assert len(spawn.started) == 2
+        assert scheduler.stats()['queued'] == 1
+
+    def test_positions_are_reported(self):
+        """Test that queued jobs learn their place in line as it changes."""
+        scheduler, spawn, _, positions, submit = self._scheduler(max_concurrent=1, max_per_client=1)
+        submit('a', 'a0')
+        submit('a', 'a1')
+        submit('a', 'a2')
+        assert positions == {'a1': 1, 'a2': 2}
+        submit('b', 'b0')
+        assert positions['b0'] == 2 and positions['a2'] == 3
+        spawn.finish_next()
+        assert positions['b0'] == 1 and positions['a2'] == 2
+
+    def test_queue_cap_cancel_and_drop(self):
+        """Test refusing, cancelling and dropping queued jobs."""
+        scheduler, spawn, order, _, submit = self._scheduler(
+            max_concurrent=1, max_per_client=1, max_queued_per_client=2
+        )
+        submit('a', 'a0')
+        submit('a', 'a1')
+        submit('a', 'a2')
+        with pytest.raises(RuntimeError):
+            submit('a', 'a3')
+        assert scheduler.cancel('a', 'a1')
+        assert not scheduler.cancel('a', 'a0')
+        assert scheduler.drop_client('a') == ['a2']
+        while spawn.started:
+            spawn.finish_next()
+        assert order == ['a0']
+        stats = scheduler.stats()
+        assert stats['rejected'] == 1 and stats['cancelled'] == 2 and stats['queued'] == 0
+
+    def test_close_and_wait_idle(self):
+        """Test that closing drops queued jobs, refuses new ones and lets running ones finish."""
+        scheduler, spawn, order, _, submit = self._scheduler(max_concurrent=1, max_per_client=1)
+        submit('a', 'a0')
+        submit('a', 'a1')
+        submit('b', 'b0')
+        assert scheduler.close() == {'a': ['a1'], 'b': ['b0']}
+        with pytest.raises(RuntimeError):
+            submit('a', 'a2')
+        assert not scheduler.wait_idle(timeout=0.01)
+        spawn.finish_next()
+        assert scheduler.wait_idle(timeout=0)
+        assert order == ['a0']
+
+    def test_wait_time_metrics(self):
+        """Test that queue wait times are measured."""
+        scheduler, spawn, _, _, submit = self._scheduler(max_concurrent=1)
+        submit('a', 'a0')
+        submit('b', 'b0')
+        time.sleep(0.05)
+        spawn.finish_next()
+        wait = scheduler.stats()['waitMs']
+        assert wait['max'] >= 40 and wait['p50'] >= 0
+
+
+
+class TestScrollback:
+    """Test the per-client scrollback ring buffer."""
+
+    def test_entries_are_numbered_and_trimmed(self):
+        """Test that old entries fall off past the size limit."""
+        scrollback = Scrollback(max_bytes=100)
+        for i in range(10):
+            scrollback.append({'id': 'c', 'stdout': f'{i}' * 30})
+        entries = scrollback.since(0)
+        assert [entry['seq'] for entry in entries] == [8, 9, 10]
+        assert scrollback.size <= 100
+
+    def test_since_returns_only_newer_entries(self):
+        """Test that a client only gets what it has not seen."""
+        scrollback = Scrollback()
+        for text in ('a', 'b', 'c'):
+            scrollback.append({'stdout': text})
+        assert [entry['stdout'] for entry in scrollback.since(1)] == ['b', 'c']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,135 @@
+"""
+Tests for Write-Behind Queue (write_behind.py)
+==============================================
+
+Tests for coalescing, flushing and shutdown of background writes.
+"""
+
+import time
+import threading
+import pytest
+from write_behind import DELETED, CoalescingWriter
+
+
+@pytest.fixture
+def writes():
+    """Collect (key, value) pairs written by the queue."""
+    return []
+
+
+class TestCoalescingWriter:
+    """Test the coalescing write-behind queue."""
+
+    def test_burst_is_written_once(self, writes):
+        """Test that repeated writes to one key collapse into one."""
+        writer = CoalescingWriter(delay=0.05)
+        for i in range(50):
+            writer.submit('layout', i, lambda value: writes.append(value))
+        writer.flush()
+        assert writes == [49]
+        assert writer.stats()['written'] == 1
+        writer.close()
+
+    def test_pending_value_is_visible(self, writes):
+        """Test that queued values can be read back before they are written."""
+        writer = CoalescingWriter(delay=60)
+        writer.submit(('layouts', 'main'), {'id': 'main'}, writes.append)
+        assert writer.get_pending(('layouts', 'main')) == {'id': 'main'}
+        assert writer.pending_items('layouts') == {'main': {'id': 'main'}}
+        assert writes == []
+        writer.close()
+        assert writes == [{'id': 'main'}]
+
+    def test_write_happens_after_delay(self, writes):
+        """Test that queued writes reach storage without an explicit flush."""
+        writer = CoalescingWriter(delay=0.01)
+        writer.submit('settings', 1, writes.append)
+        deadline = time.monotonic() + 2
+        while not writes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writes == [1]
+        writer.close()
+
+    def test_cancel(self, writes):
+        """Test that a cancelled write never happens."""
+        writer = CoalescingWriter(delay=60)
+        writer.submit('layout', 1, writes.append)
+        assert writer.cancel('layout')
+        writer.close()
+        assert writes == []
+
+    def test_zero_delay_writes_synchronously(self, writes):
+        """Test that a zero window disables the background thread."""
+        writer = CoalescingWriter(delay=0)
+        writer.submit('layout', 1, writes.append)
+        assert writes == [1]
+
+    def test_failed_write_is_counted(self):
+        """Test that a failing write does not kill the queue."""
+        def fail(value):
+            raise OSError('disk full')
+
+        writer = CoalescingWriter(delay=0.01)
+        writer.submit('a', 1, fail)
+        writer.flush()
+        assert writer.stats()['failed'] == 1
+        writer.close()
+
+    def test_value_stays_visible_while_written(self, writes):
+        """Test that a value is readable until its write has finished."""
+        started, release = threading.Event(), threading.Event()
+
+        def slow_write(value):
+            started.set()
+            release.wait(5)
+            writes.append(value)
+
+        writer = CoalescingWriter(delay=0.01)
+        writer.submit(('layouts', 'main'), {'id': 'main'}, slow_write)
+        assert started.wait(5)
+        assert writer.get_pending(('layouts', 'main')) == {'id': 'main'}
+        assert writer.pending_items('layouts') == {'main': {'id': 'main'}}
+        release.set()
+        writer.flush()
+        assert writer.get_pending(('layouts', 'main')) is None
+        assert writes == [{'id': 'main'}]
+        writer.close()
+
+    def test_delete_is_ordered_after_write_in_flight(self, writes):
+        """Test that a delete queued during a write runs after it."""
+        started, release = threading.Event(), threading.Event()
+
+        def slow_write(value):
+            started.set()
+            release.wait(5)
+            writes.append(value)
+
+        writer = CoalescingWriter(delay=0.01)
+        writer.submit('layout', 1, slow_write)
+        assert started.wait(5)
+        writer.delete('layout', lambda: writes.append('deleted'))
+        assert writer.get_pending('layout') is DELETED
+        release.set()
+        writer.flush()
+        assert writes == [1, 'deleted']
+        writer.close()
+
+    def test_cancel_waits_for_write_in_flight(self, writes):
+        """Test that cancel returns only once a running write of the key is done."""
+        started = threading.Event()
+
+        def slow_write(value):
+            started.set()
+            time.sleep(0.1)
+            writes.append(value)
+
+        writer = CoalescingWriter(delay=0.01)
+        writer.submit('layout', 1, slow_write)
+        assert started.wait(5)
+        assert not writer.cancel('layout')
+        assert writes == [1]
+        writer.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
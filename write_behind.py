@@ -0,0 +1,197 @@
+"""
+Write-Behind Queue for AutoPilot IDE
+Defers and coalesces repeated writes to the same record on a background thread
+"""
+import os
+import time
+import atexit
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds a write may wait for newer writes to the same key to replace it.
+# 0 writes synchronously on the caller's thread.
+WRITE_COALESCE_WINDOW = float(os.environ.get('APPDATA_WRITE_DELAY', 0.5))
+
+
+
+class _Deleted:
+    def __repr__(self):
+        return 'DELETED'
+
+
+# Queued value of a key whose latest operation is a delete (see ``delete``)
+DELETED = _Deleted()
+
+
+class CoalescingWriter:
+    """Write-behind queue that collapses repeated writes to the same key
+
+    ``submit(key, value, write)`` schedules ``write(value)`` to run at most
+    ``delay`` seconds later. Further submits for the same key before then
+    replace the pending value, so a burst of N writes costs one disk write.
+    All writes run on a single background thread, so writes to one key are
+    never reordered. A value stays visible to ``get_pending`` and
+    ``pending_items`` until its write has finished; deletes are queued as
+    DELETED so they are ordered after any write to the same key.
+    """
+
+    def __init__(self, delay=WRITE_COALESCE_WINDOW, name='appdata-writer'):
+        self.delay = delay
+        self.name = name
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self._pending = {}  # key -> [deadline, value, write]
+        self._in_flight = {}  # key -> value being written
+        self._flush_requested = False
+        self._closed = False
+        self._thread = None
+        self._cond = threading.Condition()
+        atexit.register(self.close)
+
+    def submit(self, key, value, write):
+        """Schedule ``write(value)``, replacing any pending write for ``key``"""
+        if self.delay <= 0 or self._closed:
+            self.submitted += 1
+            self._run(key, value, write)
+            return
+
+        with self._cond:
+            self.submitted += 1
+            entry = self._pending.get(key)
+            if entry is None:
+                # The first write of a burst sets the deadline, so a steady
+                # stream of updates is still persisted every ``delay`` seconds
+                self._pending[key] = [time.monotonic() + self.delay, value, write]
+            else:
+                entry[1] = value
+                entry[2] = write
+            self._ensure_thread()
+            self._cond.notify()
+
+    def delete(self, key, remove):
+        """Schedule ``remove()`` in place of any pending write for ``key``
+
+        Until it has run, ``get_pending`` returns DELETED for ``key``.
+        """
+        self.submit(key, DELETED, lambda _: remove())
+
+    def get_pending(self, key, default=None):
+        """Return the not-yet-written value for ``key`` (or DELETED), or ``default``"""
+        with self._cond:
+            entry = self._pending.get(key)
+            if entry is not None:
+                return entry[1]
+            return self._in_flight.get(key, default)
+
+    def pending_items(self, prefix):
+        """Return ``{key[1]: value}`` for pending keys of the form ``(prefix, id)``"""
+        with self._cond:
+            items = {
+                key[1]: value for key, value in self._in_flight.items()
+                if isinstance(key, tuple) and len(key) == 2 and key[0] == prefix
+            }
+            items.update(
+                (key[1], entry[1]) for key, entry in self._pending.items()
+                if isinstance(key, tuple) and len(key) == 2 and key[0] == prefix
+            )
+            return items
+
+    def cancel(self, key):
+        """Drop a pending write; return True if one was pending
+
+        A write of ``key`` already in progress is waited for, so whatever the
+        caller writes next is not overwritten by it.
+        """
+        with self._cond:
+            if key in self._in_flight and self._thread is not threading.current_thread():
+                self._cond.wait_for(lambda: key not in self._in_flight)
+            return self._pending.pop(key, None) is not None
+
+    def flush(self, timeout=None):
+        """Write everything that is pending and wait until it is on disk"""
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                batch = self._take(list(self._pending))
+            else:
+                self._flush_requested = True
+                self._cond.notify()
+                self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+                return
+
+        self._write_batch(batch)
+
+    def close(self):
+        """Flush pending writes and stop the background thread"""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def stats(self):
+        """Return write/coalesce counters"""
+        with self._cond:
+            return {
+                "submitted": self.submitted,
+                "written": self.written,
+                "coalesced": self.submitted - self.written - self.failed - len(self._pending) - len(self._in_flight),
+                "failed": self.failed,
+                "pending": len(self._pending) + len(self._in_flight)
+            }
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self, key, value, write):
+        try:
+            write(value)
+            self.written += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Background write of {key} failed: {e}")
+
+    def _take(self, keys):
+        """Move ``keys`` from the queue to in flight; the caller holds the lock"""
+        batch = [(key, self._pending.pop(key)) for key in keys]
+        for key, (_, value, _) in batch:
+            self._in_flight[key] = value
+        return batch
+
+    def _write_batch(self, batch):
+        """Run the writes of a batch from ``_take``, keeping each value
+        visible until its own write is done"""
+        for key, (_, value, write) in batch:
+            try:
+                self._run(key, value, write)
+            finally:
+                with self._cond:
+                    self._in_flight.pop(key, None)
+                    self._cond.notify_all()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed and not self._pending:
+                        return
+                    now = time.monotonic()
+                    if self._flush_requested or self._closed:
+                        due = list(self._pending)
+                    else:
+                        due = [key for key, entry in self._pending.items() if entry[0] <= now]
+                    if due:
+                        break
+                    self._flush_requested = False
+                    self._cond.notify_all()
+                    deadline = min((entry[0] for entry in self._pending.values()), default=None)
+                    self._cond.wait(None if deadline is None else deadline - now)
+
+                batch = self._take(due)
+
+            self._write_batch(batch)
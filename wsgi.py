@@ -0,0 +1,24 @@
+"""
+WSGI Entry Point for AutoPilot IDE
+
+    gunicorn --worker-class eventlet --workers 1 --bind 0.0.0.0:8000 wsgi:app
+
+``python server.py`` runs the same app with the settings from ProductionConfig
+and drains terminal work before each worker exits.
+"""
+import atexit
+
+from server import prepare
+
+async_mode = prepare()
+
+from app import app, socketio, file_watcher, path_index, search_index, symbol_index, shutdown  # noqa: E402
+
+file_watcher.start()
+if path_index is not None:
+    path_index.start()
+if search_index is not None:
+    search_index.start()
+if symbol_index is not None:
+    symbol_index.start()
+atexit.register(shutdown)